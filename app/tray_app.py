@@ -1,27 +1,83 @@
 import logging
 import os
+import signal
 import subprocess
 import sys
 import threading
+from collections.abc import Callable
+from datetime import datetime
 
 import pystray
 from PIL import Image, ImageDraw
 from watchdog.observers import Observer
 
+from service.event_recorder import EventRecorder
 from service.file_rename_handler import FileRenameHandler
-from utils.config_manager import get_src_dir
+from service.inotify_observer import InotifyObserver, inotify_available
+from service.ipc_server import SubmitServer, default_address
+from service.rename_stats import STATE_BUSY, STATE_ERROR, STATE_IDLE, STATE_PAUSED, StatusSnapshot
+from service.watch_supervisor import WatchObserver, WatchSupervisor
+from utils.config_manager import (
+    get_catch_up_scan,
+    get_ipc_address,
+    get_ipc_enabled,
+    get_ipc_workers,
+    get_observer_backend,
+    get_profile_duration,
+    get_profile_interval,
+    get_profile_signals,
+    get_record_directory,
+    get_record_events,
+    get_record_sizes,
+    get_recovery_scan,
+    get_src_dir,
+    get_status_refresh_interval,
+    get_supervisor_interval,
+    get_supervisor_max_backoff,
+)
+from utils.log_rotation import get_log_info
+from utils.profiling import MemorySnapshotter, SamplingProfiler
 
 logger = logging.getLogger(__name__)
 
+# 状態ごとのアイコン背景色
+ICON_COLORS = {
+    STATE_IDLE: '#4A90D9',
+    STATE_BUSY: '#E8A33D',
+    STATE_ERROR: '#D9534F',
+    STATE_PAUSED: '#8C8C8C',
+}
+
+STATE_LABELS = {
+    STATE_IDLE: '待機中',
+    STATE_BUSY: '処理中',
+    STATE_ERROR: 'エラーあり',
+    STATE_PAUSED: '一時停止中',
+}
+
 
 class TrayApp:
     """タスクトレイアプリケーション"""
 
     def __init__(self):
         self.src_dir = get_src_dir()
-        self.observer = None
+        self.observer: WatchObserver | None = None
+        self.event_handler = None
+        self.recorder = None
+        self.record_observer: WatchObserver | None = None
+        self.supervisor = None
+        self.ipc_server = None
         self.icon = None
         self._validate_src_dir()
+        self.refresh_interval = get_status_refresh_interval()
+        self._stop_event = threading.Event()
+        self._snapshot = StatusSnapshot(STATE_IDLE, 0, 0, None, None)
+        # 状態ごとのアイコンは起動時に一度だけ描画する
+        self._icons = {state: self._create_icon_image(state) for state in ICON_COLORS}
+        # プロファイルは操作されるまで何も実行しない
+        log_directory = self._log_directory()
+        self.profiler = SamplingProfiler(log_directory, get_profile_duration(), get_profile_interval())
+        self.memory_snapshotter = MemorySnapshotter(log_directory)
 
     def _validate_src_dir(self):
         """監視フォルダの存在確認"""
@@ -29,35 +85,84 @@ class TrayApp:
             logger.error(f"監視フォルダが存在しません: {self.src_dir}")
             sys.exit(1)
 
-    def _create_icon_image(self) -> Image.Image:
+    def _create_icon_image(self, state: str = STATE_IDLE) -> Image.Image:
         """タスクトレイ用のアイコン画像を作成"""
         # 64x64の画像を作成
         size = 64
         image = Image.new('RGBA', (size, size), (0, 0, 0, 0))
         draw = ImageDraw.Draw(image)
 
-        # 背景円（青）
-        draw.ellipse([4, 4, size - 4, size - 4], fill='#4A90D9')
+        # 背景円（状態ごとの色）
+        color = ICON_COLORS.get(state, ICON_COLORS[STATE_IDLE])
+        draw.ellipse([4, 4, size - 4, size - 4], fill=color)
 
         # ファイルアイコン風の図形（白）
         # 外枠
         draw.rectangle([20, 12, 44, 52], fill='white')
         # 折り返し部分
-        draw.polygon([(32, 12), (44, 24), (32, 24)], fill='#4A90D9')
+        draw.polygon([(32, 12), (44, 24), (32, 24)], fill=color)
 
         # 矢印（リネームを表現）
-        draw.line([(24, 38), (40, 38)], fill='#4A90D9', width=3)
-        draw.polygon([(36, 33), (42, 38), (36, 43)], fill='#4A90D9')
+        draw.line([(24, 38), (40, 38)], fill=color, width=3)
+        draw.polygon([(36, 33), (42, 38), (36, 43)], fill=color)
 
         return image
 
+    @staticmethod
+    def _log_directory() -> str:
+        log_info = get_log_info()
+        return str(log_info['log_directory']) if log_info else 'logs'
+
     def _open_folder(self):
         """監視フォルダをエクスプローラーで開く"""
         subprocess.Popen(['explorer', self.src_dir])
 
+    def _is_paused(self) -> bool:
+        return self.event_handler is not None and self.event_handler.paused
+
+    def _toggle_pause(self):
+        """リネームの一時停止と再開を切り替える"""
+        if self.event_handler is None:
+            return
+        if self.event_handler.paused:
+            self.event_handler.resume()
+        else:
+            self.event_handler.pause()
+        self._refresh_status()
+
+    def _profile_text(self) -> str:
+        if self.profiler.running:
+            return "CPUプロファイルを停止して保存"
+        return f"CPUプロファイルを開始（{self.profiler.duration:.0f}秒）"
+
+    def _memory_text(self) -> str:
+        if self.memory_snapshotter.tracing:
+            return "メモリのスナップショットを保存"
+        return "メモリ割り当ての追跡を開始"
+
+    def _install_signal_handlers(self):
+        """シグナルでプロファイルを開始・停止できるようにする（メインスレッドでのみ登録可能）"""
+        handlers = {
+            'SIGUSR1': lambda signum, frame: self.profiler.toggle(),
+            'SIGUSR2': lambda signum, frame: self.memory_snapshotter.toggle(),
+            # WindowsではCtrl+BreakでCPUプロファイルを操作する
+            'SIGBREAK': lambda signum, frame: self.profiler.toggle(),
+        }
+        for name, handler in handlers.items():
+            signum = getattr(signal, name, None)
+            if signum is None:
+                continue
+            try:
+                signal.signal(signum, handler)
+            except (ValueError, OSError) as e:
+                logger.warning(f"シグナルハンドラーを登録できませんでした: {name}: {e}")
+
     def _quit_app(self):
         """アプリケーションを終了"""
         logger.info("アプリケーションを終了します")
+        self._stop_event.set()
+        # 採取中のプロファイルは保存してから終了する
+        self.profiler.stop(wait=True)
         self.stop_watching()
         if self.icon:
             self.icon.stop()
@@ -70,43 +175,234 @@ class TrayApp:
                 action=None,
                 enabled=False
             ),
+            pystray.MenuItem(
+                text=lambda item: self._status_text(),
+                action=None,
+                enabled=False
+            ),
+            pystray.MenuItem(
+                text=lambda item: self._error_text(),
+                action=None,
+                enabled=False,
+                # pystrayは呼び出し可能なオブジェクトも受け付ける（型は既定値の True から bool と推論される）
+                visible=lambda item: self._snapshot.last_error is not None  # type: ignore[arg-type]
+            ),
             pystray.Menu.SEPARATOR,
+            pystray.MenuItem(
+                text="一時停止",
+                action=lambda: self._toggle_pause(),
+                checked=lambda item: self._is_paused()
+            ),
             pystray.MenuItem(
                 text="監視フォルダを開く",
                 action=lambda: self._open_folder()
             ),
             pystray.Menu.SEPARATOR,
+            pystray.MenuItem(
+                text=lambda item: self._profile_text(),
+                action=lambda: self.profiler.toggle()
+            ),
+            pystray.MenuItem(
+                text=lambda item: self._memory_text(),
+                action=lambda: self.memory_snapshotter.toggle()
+            ),
+            pystray.Menu.SEPARATOR,
             pystray.MenuItem(
                 text="終了",
                 action=lambda: self._quit_app()
             )
         )
 
+    def _status_text(self) -> str:
+        """メニューに表示する処理状況"""
+        snapshot = self._snapshot
+        return (
+            f"状態: {STATE_LABELS[snapshot.state]} / 待ち {snapshot.queue_depth} 件 / "
+            f"直近1分 {snapshot.renames_last_minute} 件"
+        )
+
+    def _error_text(self) -> str:
+        """メニューに表示する最後のエラー"""
+        snapshot = self._snapshot
+        if snapshot.last_error is None or snapshot.last_error_time is None:
+            return ""
+        error_time = datetime.fromtimestamp(snapshot.last_error_time).strftime('%H:%M:%S')
+        return f"最終エラー ({error_time}): {snapshot.last_error[:60]}"
+
+    def _take_snapshot(self) -> StatusSnapshot:
+        """ハンドラーと監視キューのカウンターから処理状況を取得"""
+        if self.event_handler is None:
+            return self._snapshot
+        event_queue = getattr(self.observer, 'event_queue', None)
+        pending = event_queue.qsize() if event_queue is not None else 0
+        pending += self.event_handler.pending_count
+        return self.event_handler.stats.snapshot(extra_queue_depth=pending, paused=self.event_handler.paused)
+
+    def _refresh_status(self):
+        """処理状況が変化した場合のみアイコンとメニューを更新"""
+        snapshot = self._take_snapshot()
+        previous = self._snapshot
+        if snapshot == previous:
+            return
+        self._snapshot = snapshot
+        if self.icon is None:
+            return
+        if snapshot.state != previous.state:
+            self.icon.icon = self._icons[snapshot.state]
+        self.icon.update_menu()
+
+    def _on_icon_ready(self, icon):
+        """アイコン表示後に状態表示の定期更新を開始（pystrayのsetupスレッドで実行）"""
+        icon.visible = True
+        while not self._stop_event.wait(self.refresh_interval):
+            try:
+                self._refresh_status()
+            except Exception as e:
+                logger.warning(f"タスクトレイの状態更新に失敗しました: {e}")
+
     def start_watching(self):
         """ファイル監視を開始"""
         event_handler = FileRenameHandler()
-        self.observer = Observer()
-        self.observer.schedule(event_handler, self.src_dir, recursive=False)
-        self.observer.start()
+        self.event_handler = event_handler
+        if get_record_events():
+            self._start_recording()
+        self.supervisor = WatchSupervisor(
+            self.src_dir,
+            self._create_observer,
+            on_recovered=self._on_watch_recovered,
+            check_interval=get_supervisor_interval(),
+            max_backoff=get_supervisor_max_backoff(),
+        )
+        self.supervisor.start()
         logger.info(f"フォルダ監視を開始しました: {self.src_dir}")
+        if get_ipc_enabled():
+            self._start_ipc_server(event_handler)
+
+        if get_catch_up_scan():
+            # 停止中に追加されたファイルを低優先度で処理する
+            threading.Thread(
+                target=event_handler.scan_directory,
+                args=(self.src_dir,),
+                daemon=True
+            ).start()
+
+    def _new_observer(self, on_overflow: Callable[[], None] | None = None) -> WatchObserver:
+        """設定に応じた監視を作成"""
+        if get_observer_backend() == 'inotify' and inotify_available():
+            return InotifyObserver(on_overflow=on_overflow)
+        if get_observer_backend() == 'inotify':
+            logger.warning("inotifyを使用できないため、watchdogで監視します")
+        return Observer()
+
+    def _create_observer(self) -> WatchObserver:
+        """ハンドラーを登録した監視を作成（復旧時も使用、記録中は記録用の監視も作り直す）"""
+        if self.event_handler is None:
+            raise RuntimeError("監視を開始する前にハンドラーを作成してください")
+        observer = self._new_observer(self._on_event_overflow)
+        observer.schedule(self.event_handler, self.src_dir, recursive=False)
+        if self.recorder:
+            self._restart_record_observer(self.recorder)
+        self.observer = observer
+        return observer
+
+    def _restart_record_observer(self, recorder: EventRecorder):
+        """記録用のハンドラーを別の監視で開始する
+
+        同じ監視に登録すると、イベントはリネームの処理を待ってから記録用のハンドラーに渡されるため、
+        記録される時刻が処理の遅れの分だけずれる。
+        """
+        self._stop_record_observer()
+        observer = self._new_observer()
+        observer.schedule(recorder, self.src_dir, recursive=False)
+        observer.start()
+        self.record_observer = observer
+
+    def _stop_record_observer(self):
+        observer = self.record_observer
+        if observer is None:
+            return
+        self.record_observer = None
+        try:
+            observer.stop()
+            observer.join()
+        except Exception as e:
+            logger.debug(f"記録用の監視の終了処理でエラーが発生しました: {e}")
+
+    def _on_event_overflow(self):
+        """イベントを取りこぼした場合、監視フォルダを走査して未処理のファイルを処理する"""
+        if self.event_handler is None:
+            return
+        threading.Thread(target=self.event_handler.scan_directory, args=(self.src_dir,), daemon=True).start()
+
+    def _on_watch_recovered(self):
+        """監視の復旧後、停止中に追加されたファイルを処理する"""
+        if self.event_handler is None:
+            return
+        # 置き換えられたフォルダのハンドルを開き直す
+        self.event_handler.close_directories()
+        if get_recovery_scan():
+            self.event_handler.scan_directory(self.src_dir)
+
+    def _watch(self):
+        """監視を開始し、終了まで監視の状態を確認する（監視スレッドで実行）"""
+        try:
+            self.start_watching()
+            if self.supervisor is not None and self.supervisor.check_interval > 0:
+                self.supervisor.run(self._stop_event)
+        except Exception:
+            logger.exception("ファイル監視スレッドでエラーが発生しました")
+
+    def _start_ipc_server(self, event_handler: FileRenameHandler):
+        """他のアプリケーションからファイルのパスの受け付けを開始"""
+        server = SubmitServer(
+            get_ipc_address() or default_address(), event_handler.submit, self.src_dir, get_ipc_workers()
+        )
+        try:
+            server.start()
+        except OSError as e:
+            logger.error(f"ファイルの受け付けを開始できませんでした: {server.address}: {e}")
+            return
+        self.ipc_server = server
+
+    def _start_recording(self):
+        """監視イベントの記録を開始"""
+        directory = get_record_directory() or self._log_directory()
+        os.makedirs(directory, exist_ok=True)
+
+        filename = f"events-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl.gz"
+        self.recorder = EventRecorder(os.path.join(directory, filename), self.src_dir, get_record_sizes())
 
     def stop_watching(self):
         """ファイル監視を停止"""
+        if self.supervisor:
+            self.supervisor.stop()
+        if self.ipc_server:
+            self.ipc_server.stop()
+            self.ipc_server = None
         if self.observer:
             self.observer.stop()
             self.observer.join()
             logger.info("フォルダ監視を停止しました")
+        self._stop_record_observer()
+        if self.event_handler:
+            self.event_handler.close()
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
 
     def run(self):
         """アプリケーションを実行"""
+        if get_profile_signals():
+            self._install_signal_handlers()
+
         # ファイル監視を別スレッドで開始
-        watch_thread = threading.Thread(target=self.start_watching, daemon=True)
+        watch_thread = threading.Thread(target=self._watch, daemon=True)
         watch_thread.start()
 
         # タスクトレイアイコンを設定
         self.icon = pystray.Icon(
             name="FileFolderRenamer",
-            icon=self._create_icon_image(),
+            icon=self._icons[STATE_IDLE],
             title="FileFolderRenamer",
             menu=self._create_menu()
         )
@@ -114,4 +410,4 @@ class TrayApp:
         logger.info("タスクトレイに常駐しています")
 
         # タスクトレイアイコンを実行（メインスレッドでブロック）
-        self.icon.run()
+        self.icon.run(setup=self._on_icon_ready)
@@ -0,0 +1,77 @@
+import argparse
+import random
+import string
+import time
+
+from service.bulk_matcher import BulkMatcher, np
+from utils.config_manager import get_rename_patterns
+
+
+def generate_names(count, seed=0):
+    """パターンに一致する名前を一定の割合で含むファイル名（拡張子を除く）を生成"""
+    generator = random.Random(seed)
+    characters = string.ascii_letters + string.digits
+    names = []
+    for _ in range(count):
+        name = ''.join(generator.choices(string.ascii_lowercase + ' -_', k=generator.randint(8, 40)))
+        roll = generator.random()
+        if roll < 0.2:
+            name += '_' + ''.join(generator.choices(characters, k=6))
+        elif roll < 0.3:
+            name += '_magnate_' + ''.join(generator.choices(characters, k=6))
+        names.append(name)
+    return names
+
+
+def best_of(repeat, function):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="ファイル名を1件ずつ照合した場合とまとめて照合した場合の所要時間を比較するスクリプト"
+    )
+    parser.add_argument(
+        "-n", "--count",
+        type=int,
+        default=1_000_000,
+        help="生成するファイル名の数（デフォルト: 1000000）"
+    )
+    parser.add_argument(
+        "-r", "--repeat",
+        type=int,
+        default=3,
+        help="計測の繰り返し回数（最良値を採用、デフォルト: 3）"
+    )
+
+    args = parser.parse_args()
+
+    patterns = get_rename_patterns()
+    names = generate_names(args.count)
+    print(f"ファイル名: {len(names)} 件 / パターン: {len(patterns)} 件")
+
+    baseline, expected = best_of(
+        args.repeat, lambda: [any(pattern.search(name) for pattern in patterns) for name in names]
+    )
+    print(f"{'1件ずつ':<16} {baseline:>8.3f} 秒")
+
+    modes = [False] + ([True] if np is not None else [])
+    for use_numpy in modes:
+        matcher = BulkMatcher(patterns, use_numpy=use_numpy)
+        elapsed, result = best_of(args.repeat, lambda: matcher.matches(names))
+        label = "まとめて(NumPy)" if use_numpy else "まとめて"
+        status = "一致" if result == expected else "不一致"
+        print(f"{label:<16} {elapsed:>8.3f} 秒  {baseline / elapsed:>5.2f} 倍  結果: {status}")
+    if np is None:
+        print("NumPyがインストールされていないため、NumPyを使う照合は計測していません")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from watchdog.events import FileClosedEvent, FileSystemEventHandler
+from watchdog.observers import Observer
+
+from service.inotify_observer import InotifyObserver, inotify_available
+
+# 別プロセスで、ファイルごとに小さな書き込みを繰り返す（書き込みごとに変更イベントが発生する）
+_WRITER = """
+import os, sys
+root, files, writes = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+for number in range(files):
+    fd = os.open(os.path.join(root, f"file{number}_{number % 1000000:06d}.bin"), os.O_WRONLY | os.O_CREAT, 0o644)
+    for _ in range(writes):
+        os.write(fd, b"x")
+    os.close(fd)
+"""
+
+
+class CountingHandler(FileSystemEventHandler):
+    """受け取ったイベントを数え、すべてのファイルが閉じられたら通知する"""
+
+    def __init__(self, files: int):
+        self.files = files
+        self.events = 0
+        self.closed = 0
+        self.done = threading.Event()
+
+    def dispatch(self, event):
+        self.events += 1
+        if isinstance(event, FileClosedEvent):
+            self.closed += 1
+            if self.closed >= self.files:
+                self.done.set()
+
+
+def run(observer, files: int, writes: int) -> tuple[float, float, int]:
+    """(監視側のCPU時間, 経過時間, ハンドラーが受け取ったイベント数) を返す"""
+    with tempfile.TemporaryDirectory() as root:
+        handler = CountingHandler(files)
+        observer.schedule(handler, root, recursive=False)
+        observer.start()
+        try:
+            cpu_start = time.process_time()
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', _WRITER, root, str(files), str(writes)], check=True)
+            if not handler.done.wait(300):
+                print(f"  タイムアウト（書き込み完了 {handler.closed} / {files} 件）")
+            return time.process_time() - cpu_start, time.perf_counter() - start, handler.events
+        finally:
+            observer.stop()
+            observer.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="大量の書き込み（変更イベント）があるフォルダで、watchdogとinotifyの監視の負荷を比較するスクリプト"
+    )
+    parser.add_argument(
+        "-n", "--files",
+        type=int,
+        default=2000,
+        help="作成するファイルの数（デフォルト: 2000）"
+    )
+    parser.add_argument(
+        "-w", "--writes",
+        type=int,
+        default=100,
+        help="ファイルごとの書き込み回数（デフォルト: 100）"
+    )
+
+    args = parser.parse_args()
+    if not inotify_available():
+        parser.error("inotifyはLinuxでのみ使用できます")
+
+    print(f"ファイル: {args.files} 件 × 書き込み {args.writes} 回（書き込みの合計 {args.files * args.writes:,} 回）")
+    print(f"{'':<10} {'CPU時間':>10} {'経過時間':>10} {'受信イベント':>14} {'µs/ファイル':>12}")
+    baseline = None
+    for label, observer in (("watchdog", Observer()), ("inotify", InotifyObserver())):
+        cpu, elapsed, events = run(observer, args.files, args.writes)
+        per_file = cpu / args.files * 1_000_000
+        ratio = '' if baseline is None else f"（{baseline / cpu:.1f} 倍）"
+        baseline = baseline or cpu
+        print(f"{label:<10} {cpu:>9.3f}秒 {elapsed:>9.3f}秒 {events:>14,} {per_file:>12,.1f}{ratio}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import os
+import random
+import time
+
+from watchdog.events import FileCreatedEvent
+
+from service.file_rename_handler import FileRenameHandler
+from service.fs_backend import InMemoryFileSystem
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="メモリ上のファイルシステムと仮想の時計で作成イベントを処理し、リネーム処理の性能を計測するスクリプト"
+    )
+    parser.add_argument(
+        "-n", "--count",
+        type=int,
+        default=200_000,
+        help="作成イベントの数（デフォルト: 200000）"
+    )
+    parser.add_argument(
+        "--match-rate",
+        type=float,
+        default=0.5,
+        help="パターンに一致するファイルの割合（デフォルト: 0.5）"
+    )
+    parser.add_argument(
+        "--collision-rate",
+        type=float,
+        default=0.1,
+        help="変換後の名前が重複するファイルの割合（デフォルト: 0.1）"
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="ファイル操作ごとに仮想の時計を進める秒数（遅い共有フォルダの再現、デフォルト: 0）"
+    )
+
+    args = parser.parse_args()
+
+    fs = InMemoryFileSystem(latency=args.latency)
+    root = os.path.join(os.sep, 'bench')
+    fs.makedirs(root)
+    handler = FileRenameHandler(fs=fs)
+    generator = random.Random(0)
+
+    paths = []
+    for number in range(args.count):
+        roll = generator.random()
+        if roll < args.collision_rate:
+            # 変換後の名前（doc0.pdf〜doc999.pdf）が重複し、連番を付与する
+            name = f"doc{number % 1000}_{number % 1_000_000:06d}.pdf"
+        elif roll < args.match_rate:
+            name = f"file{number}_{number % 1_000_000:06d}.pdf"
+        else:
+            name = f"file{number}.pdf"
+        path = os.path.join(root, name)
+        fs.write(path)
+        paths.append(path)
+
+    start = time.perf_counter()
+    for path in paths:
+        handler.on_created(FileCreatedEvent(path))
+    elapsed = time.perf_counter() - start
+    handler.close()
+
+    print(f"イベント: {len(paths)} 件 / 処理時間: {elapsed:.3f} 秒（{len(paths) / elapsed:,.0f} 件/秒）")
+    print(f"リネーム: {handler.stats.renames_total} 件 / ファイル操作: {fs.operations} 回")
+    print(f"仮想の経過時間: {fs.monotonic():,.1f} 秒（待機時間 {handler.wait_time} 秒/件を含む）")
+
+
+if __name__ == "__main__":
+    main()
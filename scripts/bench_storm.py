@@ -0,0 +1,69 @@
+import argparse
+import os
+import time
+
+from watchdog.events import FileCreatedEvent
+
+from service.file_rename_handler import FileRenameHandler
+from service.fs_backend import InMemoryFileSystem
+
+
+def run(count, storm_threshold):
+    """count 件のファイルの作成イベントを処理し、(処理時間, 仮想の経過時間, 残った対象ファイル数) を返す"""
+    fs = InMemoryFileSystem()
+    root = os.path.join(os.sep, 'storm')
+    fs.makedirs(root)
+    handler = FileRenameHandler(fs=fs)
+    handler.storm_threshold = storm_threshold
+    paths = [os.path.join(root, f"file{number}_{number % 1_000_000:06d}.pdf") for number in range(count)]
+    for path in paths:
+        fs.write(path)
+
+    start = time.perf_counter()
+    for path in paths:
+        handler.on_created(FileCreatedEvent(path))
+    # 多発中のフォルダの走査が終わるまで仮想の時計を進める
+    while handler._storm_scans:
+        fs.advance(handler.storm_scan_interval)
+    elapsed = time.perf_counter() - start
+    handler.close()
+
+    remaining = sum(1 for name in fs.listdir(root) if handler.should_rename(os.path.splitext(name)[0]))
+    return elapsed, fs.monotonic(), remaining
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="大量のファイルが届いた場合の、イベントごとの処理とまとめて走査する処理の性能を比較するスクリプト"
+    )
+    parser.add_argument(
+        "-n", "--count",
+        type=int,
+        default=100_000,
+        help="同時に届くファイルの数（デフォルト: 100000）"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1000.0,
+        help="まとめて走査に切り替える受信頻度（件/秒、デフォルト: 1000）"
+    )
+
+    args = parser.parse_args()
+
+    print(f"ファイル: {args.count} 件")
+    print("所要時間 = CPU時間 + 待機時間（wait_time の待機と走査の間隔。仮想の時計で計測）")
+    print(f"{'':<12} {'CPU時間':>10} {'所要時間':>14} {'件/秒':>12}  未処理")
+    baseline = None
+    for label, threshold in (("イベントごと", 0.0), ("まとめて走査", args.threshold)):
+        elapsed, virtual, remaining = run(args.count, threshold)
+        total = elapsed + virtual
+        baseline = baseline or total
+        print(
+            f"{label:<12} {elapsed:>9.3f}秒 {total:>12,.1f}秒 {args.count / total:>12,.1f}  {remaining} 件"
+            f"（{baseline / total:,.0f} 倍）"
+        )
+
+
+if __name__ == "__main__":
+    main()
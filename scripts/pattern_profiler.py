@@ -0,0 +1,96 @@
+import argparse
+import os
+import re
+import sys
+import time
+
+from utils.config_manager import get_rename_patterns
+from utils.pattern_guard import check_pattern
+
+
+def load_names(source):
+    if source == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, encoding='utf-8', errors='surrogateescape') as f:
+            lines = f.read().splitlines()
+    # パス形式で渡された場合も拡張子を除いたファイル名で照合する
+    return [os.path.splitext(os.path.basename(line))[0] for line in lines if line.strip()]
+
+
+def profile_patterns(patterns, names, repeat=5):
+    results = []
+    for pattern in patterns:
+        search = pattern.search
+        hits = sum(1 for name in names if search(name))
+
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            for name in names:
+                search(name)
+            elapsed = time.perf_counter_ns() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        results.append({
+            'pattern': pattern.pattern,
+            'ns_per_name': (best or 0) / max(len(names), 1),
+            'hit_rate': hits / max(len(names), 1),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="リネームパターンのファイル名1件あたりの照合時間とヒット率を計測するスクリプト"
+    )
+    parser.add_argument(
+        "names",
+        help="ファイル名の一覧（1行1件、'-'で標準入力）"
+    )
+    parser.add_argument(
+        "-p", "--pattern",
+        action="append",
+        help="計測するパターン（複数指定可、デフォルト: config.iniの[Rename]）"
+    )
+    parser.add_argument(
+        "-r", "--repeat",
+        type=int,
+        default=5,
+        help="計測の繰り返し回数（最良値を採用、デフォルト: 5）"
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="破滅的バックトラックの検査結果も表示"
+    )
+
+    args = parser.parse_args()
+
+    if args.pattern:
+        patterns = [re.compile(p if p.endswith('$') else p + '$') for p in args.pattern]
+    else:
+        patterns = get_rename_patterns()
+
+    names = load_names(args.names)
+    print(f"ファイル名: {len(names)} 件 / パターン: {len(patterns)} 件")
+    print(f"{'ns/件':>10}  {'ヒット率':>8}  パターン")
+
+    for result in profile_patterns(patterns, names, args.repeat):
+        print(f"{result['ns_per_name']:>10.1f}  {result['hit_rate']:>8.1%}  {result['pattern']}")
+
+    if args.check:
+        print("")
+        for pattern in patterns:
+            report = check_pattern(pattern)
+            status = "NG" if report.over_budget else "OK"
+            print(
+                f"[{status}] {pattern.pattern}: 最大 {report.worst_seconds * 1000:.3f}ms "
+                f"({report.worst_input_length}文字)"
+            )
+            for finding in report.nested_quantifiers:
+                print(f"    警告: {finding}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,21 @@
 import os
+import re
+import sys
 import argparse
-from pathlib import Path
+import fnmatch
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+from pathlib import Path
+
+
+@dataclass
+class TreeEntry:
+    name: str
+    path: str
+    is_dir: bool
+    size: int | None = None
+    stat_error: bool = False
 
 
 class ProjectStructureGenerator:
@@ -23,16 +37,24 @@ class ProjectStructureGenerator:
             'config.ini', 'alembic.ini', '.env', 'Procfile'
         }
 
-    def should_ignore(self, path):
-        path_name = path.name.lower()
+        self._compiled_patterns = None
+        self._matcher = None
+
+    def _ignore_matcher(self):
+        # 除外パターンを1つの正規表現にまとめる（ignore_patternsが変更された場合は作り直す）
+        patterns = frozenset(self.ignore_patterns)
+        if patterns != self._compiled_patterns:
+            self._compiled_patterns = patterns
+            self._matcher = re.compile(
+                '|'.join(fnmatch.translate(pattern) for pattern in sorted(patterns)) or r'(?!)',
+                re.IGNORECASE
+            )
+        return self._matcher
 
-        for pattern in self.ignore_patterns:
-            if pattern.startswith('*'):
-                if path_name.endswith(pattern[1:]):
-                    return True
-            elif pattern in path_name:
-                return True
-        return False
+    def should_ignore(self, path):
+        # 'env' が 'environment' に一致しないよう、名前全体で判定する
+        name = path if isinstance(path, str) else path.name
+        return self._ignore_matcher().match(name) is not None
 
     def get_file_size_str(self, size):
         if size < 1024:
@@ -40,66 +62,141 @@ class ProjectStructureGenerator:
         elif size < 1024 * 1024:
             return f"{size // 1024}KB"
         elif size < 1024 * 1024 * 1024:
-            return f"{size // (1024 * 1024):.1f}MB"
+            return f"{size / (1024 * 1024):.1f}MB"
         else:
-            return f"{size // (1024 * 1024 * 1024):.1f}GB"
+            return f"{size / (1024 * 1024 * 1024):.1f}GB"
 
-    def generate_structure(self, root_path=".", max_depth=None, show_size=False):
-        output_lines = []
+    def list_directory(self, path, show_size=False):
+        """フォルダ内の表示対象を並べ替えて返す（アクセスできない場合はNone）"""
+        entries = []
+        try:
+            with os.scandir(path) as iterator:
+                for entry in iterator:
+                    if self.should_ignore(entry.name):
+                        continue
+                    try:
+                        # シンボリックリンク先のフォルダは循環を避けるため展開しない
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        is_dir = False
+                    tree_entry = TreeEntry(entry.name, entry.path, is_dir)
+                    if show_size and not is_dir:
+                        try:
+                            # DirEntryのstat結果はキャッシュされる（Windowsではscandirの結果に含まれる）
+                            tree_entry.size = entry.stat().st_size
+                        except OSError:
+                            tree_entry.stat_error = True
+                    entries.append(tree_entry)
+        except (PermissionError, FileNotFoundError, NotADirectoryError):
+            return None
+
+        entries.sort(key=lambda e: (not e.is_dir, e.name not in self.important_files, e.name.lower()))
+        return entries
+
+    def _format_entry(self, entry, prefix, is_last, show_size):
+        connector = "└── " if is_last else "├── "
+        line = f"{prefix}{connector}{entry.name}"
+        if not entry.is_dir:
+            if entry.stat_error:
+                line += " (アクセス不可)"
+            elif show_size and entry.size is not None:
+                line += f" ({self.get_file_size_str(entry.size)})"
+        return line
+
+    def iter_structure(self, root_path=".", max_depth=None, show_size=False, jobs=1):
+        """プロジェクト構造を1行ずつ返す（ツリー全体をメモリに保持しない）
+
+        jobs が2以上の場合は、表示中のフォルダのサブフォルダを先行して並列に読み込む。
+        """
         root = Path(root_path).resolve()
 
-        output_lines.extend([
+        yield from [
             "=" * 60,
             f"プロジェクト構造: {root.name}",
             f"パス: {root}",
             f"生成日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
             "=" * 60,
             ""
-        ])
+        ]
+
+        if self.should_ignore(root.name):
+            return
+
+        root_entry = TreeEntry(root.name, str(root), root.is_dir())
+        if show_size and not root_entry.is_dir:
+            try:
+                root_entry.size = root.stat().st_size
+            except OSError:
+                root_entry.stat_error = True
+        yield self._format_entry(root_entry, "", True, show_size)
+        if not root_entry.is_dir or (max_depth is not None and max_depth < 1):
+            return
+
+        executor = ThreadPoolExecutor(max_workers=jobs) if jobs > 1 else None
+
+        def can_descend(level):
+            return max_depth is None or level <= max_depth
+
+        def prefetch(entries, level):
+            # 次に表示するサブフォルダの一覧を並列に読み込んでおく
+            if executor is None or not can_descend(level):
+                return {}
+            return {
+                entry.path: executor.submit(self.list_directory, entry.path, show_size)
+                for entry in entries if entry.is_dir
+            }
 
-        def print_tree(path, prefix="", is_last=True, level=0):
-            if max_depth is not None and level > max_depth:
-                return
-
-            if self.should_ignore(path):
+        try:
+            entries = self.list_directory(str(root), show_size)
+            if entries is None:
+                yield "    (アクセス権限なし)"
                 return
 
-            connector = "└── " if is_last else "├── "
-            line = f"{prefix}{connector}{path.name}"
-
-            if path.is_file():
-                try:
-                    size = path.stat().st_size
-                    if show_size:
-                        line += f" ({self.get_file_size_str(size)})"
-
-                except (OSError, PermissionError):
-                    line += " (アクセス不可)"
-
-            output_lines.append(line)
-
-            if path.is_dir():
-                try:
-                    children = [p for p in path.iterdir() if not self.should_ignore(p)]
-
-                    def sort_key(x):
-                        is_file = x.is_file()
-                        is_important = x.name in self.important_files
-                        return is_file, not is_important, x.name.lower()
-
-                    children.sort(key=sort_key)
-
-                    for i, child in enumerate(children):
-                        is_last_child = i == len(children) - 1
-                        extension = "    " if is_last else "│   "
-                        print_tree(child, prefix + extension, is_last_child, level + 1)
-
-                except PermissionError:
-                    output_lines.append(f"{prefix}    (アクセス権限なし)")
-
-        print_tree(root)
-
-        return "\n".join(output_lines)
+            # (表示中のフォルダの一覧, 次の位置, 行頭, 先行読み込み中のサブフォルダ)
+            stack = [(entries, 0, "    ", prefetch(entries, 2))]
+            while stack:
+                entries, index, prefix, pending = stack[-1]
+                if index >= len(entries):
+                    stack.pop()
+                    continue
+                stack[-1] = (entries, index + 1, prefix, pending)
+
+                entry = entries[index]
+                is_last = index == len(entries) - 1
+                yield self._format_entry(entry, prefix, is_last, show_size)
+
+                level = len(stack) + 1
+                if not entry.is_dir or not can_descend(level):
+                    continue
+
+                future: Future | None = pending.pop(entry.path, None)
+                children = future.result() if future is not None else self.list_directory(entry.path, show_size)
+                child_prefix = prefix + ("    " if is_last else "│   ")
+                if children is None:
+                    yield f"{child_prefix}(アクセス権限なし)"
+                    continue
+                stack.append((children, 0, child_prefix, prefetch(children, level + 1)))
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def generate_structure(self, root_path=".", max_depth=None, show_size=False, jobs=1):
+        return "\n".join(self.iter_structure(root_path, max_depth, show_size, jobs))
+
+    def write_structure(self, lines, filename):
+        """構造を1行ずつファイルに書き出す"""
+        try:
+            count = 0
+            with open(filename, 'w', encoding='utf-8') as f:
+                for line in lines:
+                    f.write(line)
+                    f.write("\n")
+                    count += 1
+            print(f"プロジェクト構造を '{filename}' に保存しました（{count} 行）")
+            return True
+        except OSError as e:
+            print(f"❌ ファイル保存エラー: {e}")
+            return False
 
     def save_to_file(self, content, filename):
         try:
@@ -129,7 +226,7 @@ def main():
     parser.add_argument(
         "-o", "--output",
         default="project_structure.txt",
-        help="出力ファイル名 (デフォルト: project_structure.txt)"
+        help="出力ファイル名、'-'で標準出力 (デフォルト: project_structure.txt)"
     )
     parser.add_argument(
         "-d", "--depth",
@@ -146,6 +243,12 @@ def main():
         action="store_true",
         help="隠しファイルも表示"
     )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="サブフォルダを並列に読み込むスレッド数 (デフォルト: 1)"
+    )
 
     args = parser.parse_args()
 
@@ -157,19 +260,25 @@ def main():
             if not pattern.startswith('.')
         }
 
+    if not os.path.exists(args.path):
+        print(f"エラー: パス '{args.path}' が見つかりません")
+        return
+
     try:
-        structure = generator.generate_structure(
+        lines = generator.iter_structure(
             root_path=args.path,
             max_depth=args.depth,
-            show_size=args.show_size
+            show_size=args.show_size,
+            jobs=args.jobs
         )
 
+        if args.output == "-":
+            for line in lines:
+                sys.stdout.write(line + "\n")
         # ファイルに保存
-        if generator.save_to_file(structure, args.output):
+        elif generator.write_structure(lines, args.output):
             print(f"ファイルの場所: {os.path.abspath(args.output)}")
 
-    except FileNotFoundError:
-        print(f"エラー: パス '{args.path}' が見つかりません")
     except PermissionError:
         print(f"エラー: パス '{args.path}' にアクセス権限がありません")
     except Exception as e:
@@ -181,8 +290,8 @@ def quick_structure(path=None, depth=3):
         current_dir = os.path.basename(os.getcwd())
         path = ".." if current_dir == "scripts" else "."
     generator = ProjectStructureGenerator()
-    structure = generator.generate_structure(path, max_depth=depth, show_size=True)
-    print(structure)
+    for line in generator.iter_structure(path, max_depth=depth, show_size=True):
+        print(line)
 
 
 def save_structure(path=None, output_file="project_structure.txt", depth=None):
@@ -190,8 +299,8 @@ def save_structure(path=None, output_file="project_structure.txt", depth=None):
         current_dir = os.path.basename(os.getcwd())
         path = ".." if current_dir == "scripts" else "."
     generator = ProjectStructureGenerator()
-    structure = generator.generate_structure(path, max_depth=depth, show_size=True)
-    return generator.save_to_file(structure, output_file)
+    lines = generator.iter_structure(path, max_depth=depth, show_size=True)
+    return generator.write_structure(lines, output_file)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,59 @@
+import argparse
+import tempfile
+
+from service.event_recorder import EventReplayer
+from service.file_rename_handler import FileRenameHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="記録した監視イベントを作業用フォルダ上で再生し、処理時間を計測するスクリプト"
+    )
+    parser.add_argument(
+        "recording",
+        help="記録ファイル（events-*.jsonl.gz）"
+    )
+    parser.add_argument(
+        "--scratch",
+        help="作業用フォルダ (デフォルト: 一時フォルダを作成)"
+    )
+    parser.add_argument(
+        "-s", "--speed",
+        type=float,
+        default=1.0,
+        help="再生速度の倍率、0で待機なし (デフォルト: 1.0)"
+    )
+    parser.add_argument(
+        "--wait-time",
+        type=float,
+        help="書き込み完了の待機時間を上書き（秒）"
+    )
+
+    args = parser.parse_args()
+
+    handler = FileRenameHandler()
+    if args.wait_time is not None:
+        handler.wait_time = args.wait_time
+
+    if args.scratch:
+        replay(args.recording, args.scratch, handler, args.speed)
+    else:
+        with tempfile.TemporaryDirectory(prefix="replay-") as scratch_dir:
+            replay(args.recording, scratch_dir, handler, args.speed)
+
+
+def replay(recording, scratch_dir, handler, speed):
+    replayer = EventReplayer(recording, scratch_dir, handler, speed)
+    print(f"再生開始: {len(replayer.events)} 件のイベント (作業用フォルダ: {scratch_dir})")
+    # まとめてリネームする処理やリネーム後の処理の完了も再生時間に含める
+    result = replayer.run(finish=handler.close)
+
+    rate = result.event_count / result.elapsed_seconds if result.elapsed_seconds > 0 else 0.0
+    print(f"イベント数: {result.event_count}")
+    print(f"記録時間: {result.recorded_seconds:.2f}秒 / 再生時間: {result.elapsed_seconds:.2f}秒")
+    print(f"処理速度: {rate:.1f} 件/秒")
+    print(f"最大遅延: {result.max_lag_seconds:.3f}秒")
+
+
+if __name__ == "__main__":
+    main()
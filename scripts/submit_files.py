@@ -0,0 +1,45 @@
+import argparse
+import sys
+
+from service.ipc_server import submit_paths
+from utils.config_manager import get_ipc_address
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="書き込みを終えたファイルのパスを常駐中のアプリケーションに送信し、リネーム後のパスを表示するスクリプト"
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        help="送信するファイルのパス（省略時は標準入力から1行に1つ）"
+    )
+    parser.add_argument(
+        "-a", "--address",
+        help="接続先 (デフォルト: config.ini の [IPC] address、空の場合は既定の接続先)"
+    )
+    parser.add_argument(
+        "-b", "--batch-size",
+        type=int,
+        default=500,
+        help="1回の要求で送信するパスの数 (デフォルト: 500)"
+    )
+
+    args = parser.parse_args()
+
+    paths = args.paths or (line.rstrip("\n") for line in sys.stdin if line.strip())
+    failed = 0
+    try:
+        for result in submit_paths(paths, args.address or get_ipc_address() or None, batch_size=args.batch_size):
+            print(f"{result['status']}\t{result['path']}\t{result['new_path'] or ''}")
+            if result['status'] in ('failed', 'missing'):
+                failed += 1
+    except (ConnectionError, FileNotFoundError) as e:
+        print(f"エラー: 接続できません: {e}", file=sys.stderr)
+        sys.exit(2)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import glob
+
+from service.lifecycle_trace import load_traces, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="ファイルごとの処理区間の記録から、区間ごとの所要時間（p50・p99）を集計するスクリプト"
+    )
+    parser.add_argument(
+        "traces",
+        nargs="+",
+        help="記録ファイル（lifecycle-trace.jsonl*、ワイルドカード可）"
+    )
+    parser.add_argument(
+        "-s", "--slowest",
+        type=int,
+        default=5,
+        help="所要時間の長いファイルを表示する件数 (デフォルト: 5)"
+    )
+
+    args = parser.parse_args()
+
+    paths = sorted({path for pattern in args.traces for path in glob.glob(pattern)})
+    traces = load_traces(paths)
+    if not traces:
+        print("記録がありません")
+        return
+
+    print(f"記録: {len(traces)} 件 (ファイル: {len(paths)} 個)")
+    print(f"{'区間':<16}{'件数':>8}{'p50(ms)':>12}{'p99(ms)':>12}{'最大(ms)':>12}")
+    for name, summary in summarize(traces).items():
+        print(
+            f"{name:<16}{summary['count']:>8}{summary['p50']:>12.1f}"
+            f"{summary['p99']:>12.1f}{summary['max']:>12.1f}"
+        )
+
+    if args.slowest > 0:
+        print()
+        print("所要時間の長いファイル:")
+        for trace in sorted(traces, key=lambda t: t['total_ms'], reverse=True)[:args.slowest]:
+            spans = ", ".join(f"{name} {duration:.1f}ms" for name, _, duration in trace['spans'])
+            print(f"  {trace['total_ms']:.1f}ms [{trace['outcome']}] {trace['file']} ({spans})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import importlib
+import re
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+
+
+def _load_numpy() -> Any:
+    """NumPy（任意の依存パッケージ、requirements-optional.txt）を読み込む（ない場合はNone）"""
+    try:
+        return importlib.import_module('numpy')
+    except ImportError:
+        return None
+
+
+np: Any = _load_numpy()
+
+# 末尾の固定長の規則（例: _magnate_[A-Za-z0-9]{6}$）。文字クラスはASCIIの文字と範囲のみ対象
+_SUFFIX_RULE = re.compile(r'(?P<literal>[A-Za-z0-9_\- ]*)\[(?P<cls>[!-~]+?)\]\{(?P<count>[1-9][0-9]*)\}\$')
+
+# NumPyで一度に判定するファイル名の数
+_CHUNK_SIZE = 65536
+
+
+@dataclass(frozen=True)
+class SuffixRule:
+    """「固定の文字列 + 文字クラスの固定長の繰り返し」で終わるファイル名に一致するパターン"""
+    pattern: re.Pattern
+    literal: str
+    allowed: frozenset[str]
+    count: int
+
+    @property
+    def width(self) -> int:
+        return len(self.literal) + self.count
+
+
+def _parse_class(body: str) -> frozenset[str] | None:
+    """文字クラスの中身（a-z0-9_ など）を文字の集合に変換（否定・エスケープを含む場合はNone）"""
+    if body.startswith('^') or '\\' in body or '[' in body:
+        return None
+    allowed = set()
+    index = 0
+    while index < len(body):
+        if index + 2 < len(body) and body[index + 1] == '-':
+            start, end = body[index], body[index + 2]
+            if start > end:
+                return None
+            allowed.update(chr(code) for code in range(ord(start), ord(end) + 1))
+            index += 3
+        else:
+            allowed.add(body[index])
+            index += 1
+    return frozenset(allowed)
+
+
+def parse_suffix_rule(pattern: re.Pattern) -> SuffixRule | None:
+    """末尾の固定長の規則として扱えるパターンであれば SuffixRule を返す"""
+    if not isinstance(pattern.pattern, str) or pattern.flags & ~re.UNICODE:
+        return None
+    match = _SUFFIX_RULE.fullmatch(pattern.pattern)
+    if match is None:
+        return None
+    allowed = _parse_class(match['cls'])
+    if allowed is None:
+        return None
+    return SuffixRule(pattern, match['literal'], allowed, int(match['count']))
+
+
+class BulkMatcher:
+    """多数のファイル名をまとめて照合する
+
+    末尾の固定長の規則は、NumPyがあれば末尾の文字を配列に詰めて長さと文字の種類をまとめて判定し、
+    末尾の改行のため判定できない名前のみ正規表現で確認する。NumPyがない場合は一致し得る位置のみで照合する。
+    それ以外のパターンは、いずれの規則にも一致しなかった名前のみ正規表現で照合する。
+    結果は any(pattern.search(name) for pattern in patterns) と常に一致する。
+    """
+
+    def __init__(self, patterns: list[re.Pattern], use_numpy: bool | None = None):
+        self.patterns = patterns
+        self.rules = [parse_suffix_rule(pattern) or pattern for pattern in patterns]
+        self.use_numpy = np is not None if use_numpy is None else use_numpy and np is not None
+
+    def matches(self, names: Sequence[str]) -> list[bool]:
+        """ファイル名（拡張子を除く）ごとに、いずれかのパターンに一致するかを返す"""
+        if self.use_numpy:
+            result = []
+            for start in range(0, len(names), _CHUNK_SIZE):
+                result.extend(self._numpy_matches(names[start:start + _CHUNK_SIZE]))
+            return result
+
+        result = [False] * len(names)
+        remaining: Sequence[int] = range(len(names))
+        for rule in self.rules:
+            if isinstance(rule, SuffixRule):
+                hits = self._suffix_hits(rule, names, remaining)
+            else:
+                search = rule.search
+                hits = [index for index in remaining if search(names[index])]
+            if not hits:
+                continue
+            for index in hits:
+                result[index] = True
+            remaining = [index for index in remaining if not result[index]]
+            if not remaining:
+                break
+        return result
+
+    @staticmethod
+    def _suffix_hits(rule: SuffixRule, names: Sequence[str], indexes: Sequence[int]) -> list[int]:
+        width = rule.width
+        search = rule.pattern.search
+        # $ は末尾の改行の直前にも一致するため、改行で終わる名前は正規表現で照合する
+        hits = [index for index in indexes if names[index].endswith('\n') and search(names[index])]
+
+        # 一致する位置は末尾から width 文字目に限られるため、その位置のみで照合する
+        literal, literal_end = rule.literal, len(rule.literal) - width
+        match = rule.pattern.match
+        hits.extend(
+            index for index in indexes
+            if len(name := names[index]) >= width
+            and (not literal or name[-width:literal_end] == literal)
+            and match(name, len(name) - width)
+        )
+        return hits
+
+    def _numpy_matches(self, names: Sequence[str]) -> list[bool]:
+        # すべての名前を連結したUCS4の配列と、各名前の終了位置
+        lengths = np.fromiter(map(len, names), dtype=np.int64, count=len(names))
+        codes = np.frombuffer(''.join(names).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        ends = np.cumsum(lengths)
+        ends_with_newline = (lengths > 0) & (codes[np.maximum(ends - 1, 0)] == 10) if len(codes) else lengths < 0
+
+        result = np.zeros(len(names), dtype=bool)
+        for rule in self.rules:
+            if isinstance(rule, SuffixRule):
+                result |= self._numpy_suffix_mask(rule, codes, ends, lengths)
+                # 改行で終わる名前のみ正規表現で確認する
+                candidates = np.flatnonzero(ends_with_newline & ~result)
+            else:
+                candidates = np.flatnonzero(~result)
+            search = rule.pattern.search if isinstance(rule, SuffixRule) else rule.search
+            for index in candidates.tolist():
+                if search(names[index]):
+                    result[index] = True
+        return result.tolist()
+
+    @staticmethod
+    def _numpy_suffix_mask(rule: SuffixRule, codes, ends, lengths):
+        """末尾 width 文字が「固定の文字列 + 許可された文字」である名前"""
+        width = rule.width
+        literal_length = len(rule.literal)
+        valid = lengths >= width
+        if not valid.any():
+            return valid
+        # 各名前の末尾 width 文字の位置（短すぎる名前は valid で除外する）
+        positions = np.maximum(ends[:, None] - width + np.arange(width), 0)
+        tails = codes[positions]
+
+        table = np.zeros(128, dtype=bool)
+        table[[ord(char) for char in rule.allowed]] = True
+        suffix = tails[:, literal_length:]
+        mask = valid & (suffix < 128).all(axis=1) & table[np.minimum(suffix, 127)].all(axis=1)
+        if literal_length:
+            literal = np.array([ord(char) for char in rule.literal], dtype=np.uint32)
+            mask &= (tails[:, :literal_length] == literal).all(axis=1)
+        return mask
@@ -0,0 +1,174 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from service.directory_handle import Directory
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FileType:
+    """先頭バイトから判定したファイルの種類
+
+    generic は他の形式の入れ物にも使われる形式（ZIP・TIFFなど）で、拡張子の修正には使わない。
+    """
+    name: str
+    extensions: tuple[str, ...]
+    generic: bool = False
+
+    @property
+    def extension(self) -> str:
+        """修正時に付与する拡張子"""
+        return self.extensions[0]
+
+
+PDF = FileType('pdf', ('.pdf', '.ai'))
+PNG = FileType('png', ('.png',))
+JPEG = FileType('jpeg', ('.jpg', '.jpeg', '.jpe', '.jfif'))
+GIF = FileType('gif', ('.gif',))
+BMP = FileType('bmp', ('.bmp',))
+# カメラのRAW（.cr2・.nef・.dng など）もTIFFの形式
+TIFF = FileType('tiff', ('.tif', '.tiff'), generic=True)
+WEBP = FileType('webp', ('.webp',))
+# EPUB・ODT・JAR・APK などもZIPの形式
+ZIP = FileType('zip', ('.zip',), generic=True)
+DOCX = FileType('docx', ('.docx', '.docm'))
+XLSX = FileType('xlsx', ('.xlsx', '.xlsm'))
+PPTX = FileType('pptx', ('.pptx', '.pptm'))
+GZIP = FileType('gzip', ('.gz', '.tgz'), generic=True)
+SEVEN_ZIP = FileType('7z', ('.7z',))
+RAR = FileType('rar', ('.rar',))
+MP4 = FileType('mp4', ('.mp4', '.m4v', '.m4a', '.mov'))
+HEIC = FileType('heic', ('.heic', '.heif', '.hif'))
+AVIF = FileType('avif', ('.avif',))
+THREE_GP = FileType('3gp', ('.3gp', '.3g2'))
+# 主ブランドを判定できない ISO Base Media File Format
+ISO_MEDIA = FileType('isobmff', ('.mp4',), generic=True)
+
+# (先頭からの位置, マジックバイト, 種類) 。ZIPはOffice文書の判定を別に行う
+_SIGNATURES: list[tuple[int, bytes, FileType]] = [
+    (0, b'%PDF-', PDF),
+    (0, b'\x89PNG\r\n\x1a\n', PNG),
+    (0, b'\xff\xd8\xff', JPEG),
+    (0, b'GIF87a', GIF),
+    (0, b'GIF89a', GIF),
+    (0, b'II*\x00', TIFF),
+    (0, b'MM\x00*', TIFF),
+    (0, b'\x1f\x8b', GZIP),
+    (0, b"7z\xbc\xaf'\x1c", SEVEN_ZIP),
+    (0, b'Rar!\x1a\x07', RAR),
+]
+# ISO Base Media File Format（先頭4バイトの後の ftyp に続く主ブランド）
+_FTYP_BRANDS: dict[bytes, FileType] = {
+    **dict.fromkeys((b'isom', b'iso2', b'iso4', b'iso5', b'iso6', b'mp41', b'mp42', b'avc1', b'M4V ', b'M4A ', b'qt  '), MP4),
+    **dict.fromkeys((b'heic', b'heix', b'heim', b'heis', b'hevc', b'hevx', b'mif1', b'msf1'), HEIC),
+    **dict.fromkeys((b'avif', b'avis'), AVIF),
+    **dict.fromkeys((b'3gp4', b'3gp5', b'3gp6', b'3g2a', b'3g2b', b'3g2c'), THREE_GP),
+}
+# BMPの情報ヘッダーの大きさ（BITMAPCOREHEADER〜BITMAPV5HEADER）
+_BMP_HEADER_SIZES = frozenset((12, 40, 52, 56, 64, 108, 124))
+_ZIP_MAGIC = b'PK\x03\x04'
+# Office文書（OOXML）は先頭付近のエントリ名で判定する
+_OOXML_MARKERS: list[tuple[bytes, FileType]] = [
+    (b'word/', DOCX),
+    (b'xl/', XLSX),
+    (b'ppt/', PPTX),
+]
+
+KNOWN_EXTENSIONS = frozenset(
+    extension
+    for file_type in (
+        PDF, PNG, JPEG, GIF, BMP, TIFF, WEBP, ZIP, DOCX, XLSX, PPTX, GZIP, SEVEN_ZIP, RAR, MP4, HEIC, AVIF, THREE_GP,
+    )
+    for extension in file_type.extensions
+)
+
+
+def detect_type(head: bytes) -> FileType | None:
+    """ファイルの先頭バイトから種類を判定（判定できない場合はNone）"""
+    if head.startswith(_ZIP_MAGIC):
+        for marker, file_type in _OOXML_MARKERS:
+            if marker in head:
+                return file_type
+        return ZIP
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return WEBP
+    if head.startswith(b'BM') and _is_bmp(head):
+        return BMP
+    if head[4:8] == b'ftyp' and len(head) >= 12:
+        return _FTYP_BRANDS.get(head[8:12], ISO_MEDIA)
+    for offset, magic, file_type in _SIGNATURES:
+        if head.startswith(magic, offset):
+            return file_type
+    return None
+
+
+def _is_bmp(head: bytes) -> bool:
+    # "BM" で始まるテキストと区別するため、予約領域（0）と情報ヘッダーの大きさを確認する
+    if len(head) < 18 or head[6:10] != b'\0\0\0\0':
+        return False
+    return int.from_bytes(head[14:18], 'little') in _BMP_HEADER_SIZES
+
+
+def corrected_name(filename: str, extension: str, file_type: FileType | None) -> tuple[str, str]:
+    """判定した種類に合わせて (拡張子を除いた名前, 拡張子) を修正する
+
+    既知の拡張子が別の種類を示している場合は置き換え、未知の拡張子の場合は
+    名前の一部として残して末尾に付与する（例: data.v2 → data.v2.pdf）。
+    他の形式の入れ物にも使われる形式（generic）と判定した場合は変更しない。
+    """
+    if file_type is None or file_type.generic or extension.lower() in file_type.extensions:
+        return filename, extension
+    if extension and extension.lower() not in KNOWN_EXTENSIONS:
+        return f"{filename}{extension}", file_type.extension
+    return filename, file_type.extension
+
+
+class ContentSniffer:
+    """ファイルの先頭数KBを読み込んで種類を判定し、結果を(デバイス, inode, 更新時刻)で保持する
+
+    再走査や同じファイルへの繰り返しのイベントではファイルを読み直さない。inodeがない場合
+    （Windowsの os.scandir の stat など）は(パス, サイズ, 更新時刻)で保持する。
+    """
+
+    def __init__(self, max_bytes: int = 4096, cache_size: int = 10000):
+        self.max_bytes = max_bytes
+        self.cache_size = cache_size
+        self.reads = 0
+        self.hits = 0
+        self._cache: OrderedDict[tuple, FileType | None] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def sniff(self, handle: Directory, name: str, stat: os.stat_result) -> FileType | None:
+        """フォルダ内のファイルの種類を判定（読み込めない場合はNone）"""
+        if stat.st_ino:
+            key = (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+        else:
+            # 同じ更新時刻のファイル（アーカイブから展開したファイルなど）を区別する
+            key = (handle.path, name, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+
+        try:
+            head = handle.read_head(name, self.max_bytes)
+        except OSError as e:
+            # 書き込み中でロックされている場合などは次のイベントで再判定する
+            logger.debug(f"ファイルの先頭を読み込めませんでした: {handle.join(name)}: {e}")
+            return None
+        if not head:
+            # 作成直後の空ファイルは書き込み後に再判定する
+            return None
+        file_type = detect_type(head)
+
+        with self._lock:
+            self.reads += 1
+            self._cache[key] = file_type
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return file_type
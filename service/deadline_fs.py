@@ -0,0 +1,329 @@
+import errno
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from service.directory_handle import DirEntry, Directory, ScandirIterator
+from service.file_mover import ProgressCallback
+from service.fs_backend import FileSystem
+from service.timer_queue import TimerHandle, TimerQueue
+
+logger = logging.getLogger(__name__)
+
+
+class RootUnavailableError(OSError):
+    """応答しないフォルダへの操作（期限を過ぎた、または復旧を待っている）"""
+
+    def __init__(self, root: str, message: str):
+        super().__init__(errno.ETIMEDOUT, message, root)
+        self.root = root
+
+
+@dataclass
+class _Root:
+    """フォルダごとの操作用スレッドと状態"""
+    executor: ThreadPoolExecutor
+    degraded: bool = False
+    degraded_at: float = 0.0
+    probe_timer: TimerHandle | None = None
+    probe_future: Future | None = None
+
+
+class _ListedEntry:
+    """期限内に列挙したフォルダのエントリ（statは期限付きで行う）"""
+
+    __slots__ = ('name', 'path', '_is_file', '_is_dir', '_entry', '_call')
+
+    def __init__(self, entry: DirEntry, call: Callable):
+        self.name = entry.name
+        self.path = entry.path
+        # d_type がない場合の stat も列挙と同じ期限内に行う
+        self._is_file = entry.is_file(follow_symlinks=False)
+        self._is_dir = entry.is_dir(follow_symlinks=False)
+        self._entry = entry
+        self._call = call
+
+    def is_file(self, follow_symlinks: bool = True) -> bool:
+        if follow_symlinks:
+            return self._call(self._entry.is_file)
+        return self._is_file
+
+    def is_dir(self, follow_symlinks: bool = True) -> bool:
+        if follow_symlinks:
+            return self._call(self._entry.is_dir)
+        return self._is_dir
+
+    def is_symlink(self) -> bool:
+        return self._entry.is_symlink()
+
+    def stat(self, follow_symlinks: bool = True) -> os.stat_result:
+        return self._call(self._entry.stat, follow_symlinks=follow_symlinks)
+
+
+class _ListedEntries:
+    def __init__(self, entries: list[_ListedEntry]):
+        self._entries = entries
+
+    def __iter__(self) -> Iterator[_ListedEntry]:
+        return iter(self._entries)
+
+    def __enter__(self) -> '_ListedEntries':
+        return self
+
+    def __exit__(self, *exc_info: object) -> bool:
+        return False
+
+
+class DeadlineDirectory:
+    """すべての操作を期限付きで行うフォルダのハンドル"""
+
+    def __init__(self, fs: 'DeadlineFileSystem', root: str, inner: Directory):
+        self.path = inner.path
+        self._fs = fs
+        self._root = root
+        self._inner = inner
+
+    def _call(self, function: Callable, *args, **kwargs):
+        return self._fs.call(self._root, function, *args, **kwargs)
+
+    def stat(self, name: str) -> os.stat_result | None:
+        return self._call(self._inner.stat, name)
+
+    def exists(self, name: str) -> bool:
+        return self.stat(name) is not None
+
+    def rename(self, src_name: str, dst_name: str):
+        self._call(self._inner.rename, src_name, dst_name)
+
+    def read_head(self, name: str, size: int) -> bytes:
+        return self._call(self._inner.read_head, name, size)
+
+    def scandir(self) -> ScandirIterator:
+        def listed() -> _ListedEntries:
+            with self._inner.scandir() as entries:
+                return _ListedEntries([_ListedEntry(entry, self._call) for entry in entries])
+        return self._call(listed)
+
+    def join(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def close(self):
+        self._fs.close_handle(self._root, self._inner)
+
+
+class DeadlineFileSystem(FileSystem):
+    """ファイル操作を期限付きで行い、応答しないフォルダの処理を保留する
+
+    操作はフォルダ（ルート）ごとのスレッドで行い、期限を過ぎた場合はそのフォルダを応答なしとして
+    以降の操作を待たずに RootUnavailableError とする。応答なしのフォルダは probe_interval 秒ごとに
+    確認し、応答した時点で復旧として登録された関数に通知する。他のフォルダの操作は影響を受けない。
+    """
+
+    def __init__(
+        self,
+        inner: FileSystem,
+        timeout: float = 10.0,
+        probe_interval: float = 15.0,
+        workers: int = 4,
+        roots: list[str] | None = None,
+    ):
+        self.inner = inner
+        self.timeout = timeout
+        self.probe_interval = probe_interval
+        self.workers = workers
+        # 登録したフォルダの配下はまとめて扱う（それ以外はフォルダごと）
+        self.roots = sorted((os.path.normpath(root) for root in roots or []), key=len, reverse=True)
+        self.timers = inner.create_timers()
+        self._roots: dict[str, _Root] = {}
+        self._listeners: list[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+
+    def add_recovery_listener(self, listener: Callable[[str], None]):
+        """フォルダが復旧したときに呼び出す関数を登録する（引数はフォルダのパス）"""
+        self._listeners.append(listener)
+
+    def root_for(self, directory: str) -> str:
+        directory = os.path.normpath(directory)
+        for root in self.roots:
+            if directory == root or directory.startswith(root.rstrip(os.sep) + os.sep):
+                return root
+        return directory
+
+    def is_degraded(self, root: str) -> bool:
+        state = self._roots.get(root)
+        return state is not None and state.degraded
+
+    @property
+    def degraded_roots(self) -> list[str]:
+        with self._lock:
+            return [root for root, state in self._roots.items() if state.degraded]
+
+    def _state(self, root: str) -> _Root:
+        state = self._roots.get(root)
+        if state is None:
+            with self._lock:
+                state = self._roots.get(root)
+                if state is None:
+                    executor = ThreadPoolExecutor(self.workers, thread_name_prefix='fs-deadline')
+                    state = self._roots[root] = _Root(executor)
+        return state
+
+    def call(self, root: str, function: Callable, *args, **kwargs):
+        """root のスレッドで function を実行し、期限内に終わらない場合は RootUnavailableError"""
+        state = self._state(root)
+        if state.degraded:
+            raise RootUnavailableError(root, "フォルダが応答しないため、復旧まで処理を保留しています")
+        future = state.executor.submit(function, *args, **kwargs)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            if future.done():
+                # 操作自体が送出した TimeoutError
+                raise
+            self._degrade(root, getattr(function, '__name__', repr(function)))
+            raise RootUnavailableError(root, f"フォルダの操作が {self.timeout:g} 秒以内に終わりませんでした") from None
+
+    def call_while_progressing(self, root: str, function: Callable, *args, **kwargs):
+        """root のスレッドで function(*args, progress=...) を実行する
+
+        大きなファイルのコピーなど時間のかかる操作用。進捗が通知されるたびに期限を延ばし、
+        timeout 秒の間に進捗がない場合は RootUnavailableError とする。
+        """
+        state = self._state(root)
+        if state.degraded:
+            raise RootUnavailableError(root, "フォルダが応答しないため、復旧まで処理を保留しています")
+        # 期限の計測は future.result の待機と同じ実時間で行う
+        last_progress = [time.monotonic()]
+
+        def progress(copied: int, total: int):
+            last_progress[0] = time.monotonic()
+
+        future = state.executor.submit(function, *args, progress=progress, **kwargs)
+        while True:
+            try:
+                return future.result(max(last_progress[0] + self.timeout - time.monotonic(), 0.0))
+            except TimeoutError:
+                if future.done():
+                    raise
+                if time.monotonic() < last_progress[0] + self.timeout:
+                    continue
+            self._degrade(root, getattr(function, '__name__', repr(function)))
+            raise RootUnavailableError(root, f"フォルダの操作が {self.timeout:g} 秒以上進みませんでした")
+
+    def _degrade(self, root: str, operation: str):
+        state = self._state(root)
+        with self._lock:
+            if state.degraded:
+                return
+            state.degraded = True
+            state.degraded_at = self.inner.monotonic()
+            state.probe_timer = self.timers.schedule(self.probe_interval, self._probe, root)
+        logger.warning(
+            f"フォルダが応答しません（{operation} が {self.timeout:g} 秒以内に終わりませんでした）。"
+            f"復旧を確認するまで処理を保留します: {root}"
+        )
+
+    def _probe(self, root: str):
+        """応答なしのフォルダを確認する（タイマースレッドで実行）"""
+        state = self._state(root)
+        # 前回の確認が終わっていない場合は新たに登録せずに待つ
+        if state.probe_future is None or state.probe_future.done():
+            state.probe_future = state.executor.submit(self._check, root)
+        try:
+            state.probe_future.result(self.timeout)
+        except Exception:
+            # エラーでも応答があれば復旧とする（エラーはフォルダへの以降の操作で扱う）
+            pass
+        if not state.probe_future.done():
+            with self._lock:
+                state.probe_timer = self.timers.schedule(self.probe_interval, self._probe, root)
+            return
+
+        with self._lock:
+            state.degraded = False
+            state.probe_timer = None
+            state.probe_future = None
+            elapsed = self.inner.monotonic() - state.degraded_at
+        logger.info(f"フォルダが復旧しました（{elapsed:.1f} 秒）: {root}")
+        for listener in list(self._listeners):
+            try:
+                listener(root)
+            except Exception:
+                logger.exception(f"フォルダの復旧の通知でエラーが発生しました: {root}")
+
+    def _check(self, root: str):
+        # フォルダを開くことで、共有フォルダの接続先に問い合わせる
+        self.inner.open_directory(root).close()
+
+    def close_handle(self, root: str, inner: Directory):
+        """ハンドルを閉じる（応答しないフォルダの場合は待たない）"""
+        state = self._state(root)
+        if state.degraded:
+            state.executor.submit(inner.close)
+            return
+        try:
+            self.call(root, inner.close)
+        except OSError as e:
+            logger.warning(f"フォルダのハンドルを閉じられませんでした: {root}: {e}")
+
+    def close(self):
+        self.timers.stop()
+        with self._lock:
+            roots = list(self._roots.values())
+        for state in roots:
+            # 応答しない操作の終了は待たない
+            state.executor.shutdown(wait=False, cancel_futures=True)
+        self.inner.close()
+
+    # --- FileSystem ---
+
+    def open_directory(self, path: str) -> Directory:
+        root = self.root_for(path)
+        return DeadlineDirectory(self, root, self.call(root, self.inner.open_directory, path))
+
+    def lexists(self, path: str) -> bool:
+        return self.call(self.root_for(os.path.dirname(path) or os.curdir), self.inner.lexists, path)
+
+    def move_file(self, src_path: str, dst_dir: str, dst_name: str, progress: ProgressCallback | None = None) -> str:
+        src_root = self.root_for(os.path.dirname(src_path) or os.curdir)
+        dst_root = self.root_for(dst_dir)
+        for root in (src_root, dst_root):
+            if self.is_degraded(root):
+                raise RootUnavailableError(root, "フォルダが応答しないため、復旧まで処理を保留しています")
+
+        caller_progress = progress
+
+        def move(progress: ProgressCallback) -> str:
+            def report(copied: int, total: int):
+                progress(copied, total)
+                if caller_progress is not None:
+                    caller_progress(copied, total)
+            return self.inner.move_file(src_path, dst_dir, dst_name, report)
+
+        try:
+            # 別のドライブへのコピーは、進捗がある間は期限を延ばす
+            return self.call_while_progressing(dst_root, move)
+        except RootUnavailableError:
+            # どちらのフォルダが応答しないか区別できないため、移動元も確認の対象にする
+            if src_root != dst_root:
+                self._degrade(src_root, 'move_file')
+            raise
+
+    def monotonic(self) -> float:
+        return self.inner.monotonic()
+
+    def time(self) -> float:
+        return self.inner.time()
+
+    def sleep(self, seconds: float):
+        self.inner.sleep(seconds)
+
+    def create_timers(self) -> TimerQueue:
+        return self.inner.create_timers()
+
+    def create_executor(self, max_workers: int, name: str) -> Executor:
+        return self.inner.create_executor(max_workers, name)
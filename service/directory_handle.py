@@ -0,0 +1,167 @@
+import os
+import threading
+from collections.abc import Iterable, Iterator
+from typing import Protocol
+
+# dir_fd をサポートするプラットフォーム（Linux・macOSなど）ではフォルダを開いたまま保持する
+DIR_FD_SUPPORTED = os.stat in os.supports_dir_fd and os.rename in os.supports_dir_fd
+
+
+def split_name(name: str) -> tuple[str, str]:
+    """ファイル名を拡張子を除いた名前と拡張子に分割（Path.stem/Path.suffixと同じ規則）"""
+    index = name.rfind('.')
+    if 0 < index < len(name) - 1:
+        return name[:index], name[index:]
+    return name, ''
+
+
+class DirEntry(Protocol):
+    """os.DirEntry と同じ操作を持つフォルダのエントリ"""
+
+    @property
+    def name(self) -> str: ...
+
+    @property
+    def path(self) -> str: ...
+
+    def is_file(self, *, follow_symlinks: bool = True) -> bool: ...
+
+    def is_dir(self, *, follow_symlinks: bool = True) -> bool: ...
+
+    def is_symlink(self) -> bool: ...
+
+    def stat(self, *, follow_symlinks: bool = True) -> os.stat_result: ...
+
+
+class ScandirIterator(Protocol):
+    """os.scandir の戻り値と同様に with 文で使えるエントリの一覧"""
+
+    def __iter__(self) -> Iterator[DirEntry]: ...
+
+    def __enter__(self) -> Iterable[DirEntry]: ...
+
+    def __exit__(self, *exc_info: object) -> object: ...
+
+
+class Directory(Protocol):
+    """フォルダのハンドル（DirectoryHandle と各ファイルシステムの実装）に共通の操作"""
+
+    path: str
+
+    def stat(self, name: str) -> os.stat_result | None: ...
+
+    def exists(self, name: str) -> bool: ...
+
+    def rename(self, src_name: str, dst_name: str) -> None: ...
+
+    def read_head(self, name: str, size: int) -> bytes: ...
+
+    def scandir(self) -> ScandirIterator: ...
+
+    def join(self, name: str) -> str: ...
+
+    def close(self) -> None: ...
+
+
+class DirectoryHandle:
+    """フォルダを開いたまま保持し、フォルダ内の相対名でstat・リネームを行う
+
+    ファイル名は os.fsdecode で復元可能な文字列として扱うため、
+    UTF-8として不正なバイト列を含む名前でも処理できる。
+    他のスレッドが操作中に close した場合、フォルダは操作が終わった時点で閉じ、
+    以降の操作はパスで行う。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: int | None = None
+        # 操作中のスレッド数と、操作の終了後に閉じるファイルディスクリプタ
+        self._users = 0
+        self._closing_fd: int | None = None
+        self._lock = threading.Lock()
+        if DIR_FD_SUPPORTED:
+            self._fd = os.open(path, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+
+    def _acquire(self) -> int | None:
+        """操作の間、閉じられないようにファイルディスクリプタを保持する（閉じた後はNone）"""
+        with self._lock:
+            fd = self._fd
+            if fd is not None:
+                self._users += 1
+            return fd
+
+    def _release(self, fd: int | None):
+        if fd is None:
+            return
+        with self._lock:
+            self._users -= 1
+            if self._users or self._closing_fd is None:
+                return
+            fd, self._closing_fd = self._closing_fd, None
+        os.close(fd)
+
+    def _target(self, name: str, fd: int | None) -> bytes | str:
+        if fd is not None:
+            return os.fsencode(name)
+        return os.path.join(self.path, name)
+
+    def stat(self, name: str) -> os.stat_result | None:
+        """フォルダ内のファイルをstatする（存在しない場合はNone）"""
+        fd = self._acquire()
+        try:
+            return os.stat(self._target(name, fd), dir_fd=fd, follow_symlinks=False)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        finally:
+            self._release(fd)
+
+    def exists(self, name: str) -> bool:
+        return self.stat(name) is not None
+
+    def rename(self, src_name: str, dst_name: str):
+        """フォルダ内でファイル名を変更する"""
+        fd = self._acquire()
+        try:
+            os.rename(self._target(src_name, fd), self._target(dst_name, fd), src_dir_fd=fd, dst_dir_fd=fd)
+        finally:
+            self._release(fd)
+
+    def read_head(self, name: str, size: int) -> bytes:
+        """ファイルの先頭を1回の読み込みで取得する"""
+        flags = os.O_RDONLY | getattr(os, 'O_BINARY', 0) | getattr(os, 'O_NOFOLLOW', 0)
+        dir_fd = self._acquire()
+        try:
+            fd = os.open(self._target(name, dir_fd), flags, dir_fd=dir_fd)
+        finally:
+            self._release(dir_fd)
+        try:
+            if hasattr(os, 'pread'):
+                return os.pread(fd, size, 0)
+            return os.read(fd, size)
+        finally:
+            os.close(fd)
+
+    def scandir(self) -> ScandirIterator:
+        """フォルダ内のエントリを列挙する"""
+        fd = self._acquire()
+        try:
+            if fd is not None and os.scandir in os.supports_fd:
+                # os.scandir はファイルディスクリプタを複製して使う
+                return os.scandir(fd)
+            return os.scandir(self.path)
+        finally:
+            self._release(fd)
+
+    def join(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def close(self):
+        with self._lock:
+            fd, self._fd = self._fd, None
+            if fd is None:
+                return
+            if self._users:
+                # 操作中のスレッドがあれば、最後の操作の終了時に閉じる
+                self._closing_fd = fd
+                return
+        os.close(fd)
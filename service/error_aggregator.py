@@ -0,0 +1,123 @@
+import errno
+import logging
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from service.timer_queue import TimerQueue
+
+
+def error_class(error: BaseException) -> str:
+    """集約に使うエラーの種類（例外クラスとerrno名）"""
+    name = type(error).__name__
+    code = getattr(error, 'errno', None)
+    if code is None:
+        return name
+    return f"{name}:{errno.errorcode.get(code, str(code))}"
+
+
+@dataclass
+class _Window:
+    started: float
+    # 1件ずつ出力する件数（直前の期間からエラーが続いている場合は0）
+    burst: int
+    count: int = 0
+    samples: list[str] = field(default_factory=list)
+
+    @property
+    def suppressed(self) -> int:
+        return max(self.count - self.burst, 0)
+
+
+class ErrorAggregator:
+    """同じ種類・同じフォルダのエラーを一定時間ごとにまとめてログに出力する
+
+    各期間の最初の burst 件は通常どおり1件ずつ出力し、それ以降は件数とパスの例のみを
+    期間の終わりに1行で出力する。多発が続いている間は次の期間もまとめのみとし、
+    まとめを出力しない期間を挟んだ後は1件ずつの出力に戻る。
+    """
+
+    def __init__(
+        self,
+        target: logging.Logger,
+        window: float = 10.0,
+        burst: int = 5,
+        samples: int = 3,
+        timers: TimerQueue | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.target = target
+        self.window = window
+        self.burst = burst
+        self.samples = samples
+        self.timers = timers
+        self.clock = clock
+        self.suppressed_total = 0
+        self._windows: dict[tuple[str, str], _Window] = {}
+        # 出力を省略した期間の終了時刻
+        self._storms: dict[tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def error(self, kind: str, directory: str, path: str, message: str) -> bool:
+        """エラーを記録する（1件ずつ出力した場合はTrue、まとめた場合はFalse）"""
+        if self.window <= 0:
+            self.target.error(message)
+            return True
+
+        now = self.clock()
+        key = (kind, directory)
+        summary = None
+        with self._lock:
+            window = self._windows.get(key)
+            if window is not None and now - window.started >= self.window:
+                summary = self._close(key, window)
+                window = None
+            if window is None:
+                storming = now - self._storms.get(key, float('-inf')) < self.window
+                window = self._windows[key] = _Window(now, 0 if storming else self.burst)
+            window.count += 1
+            detailed = window.count <= window.burst
+            if not detailed:
+                self.suppressed_total += 1
+                if len(window.samples) < self.samples:
+                    window.samples.append(path)
+            start_timer = window.count == window.burst + 1
+
+        if summary is not None:
+            self.target.error(summary)
+        if detailed:
+            self.target.error(message)
+        elif start_timer and self.timers is not None:
+            # エラーが止まった場合も期間の終わりにまとめを出力する
+            self.timers.schedule(window.started + self.window - now, self._flush_key, key, window)
+        return detailed
+
+    def _close(self, key: tuple[str, str], window: _Window) -> str | None:
+        """期間を終了し、省略したエラーがあればまとめの文を返す"""
+        self._windows.pop(key, None)
+        if not window.suppressed:
+            self._storms.pop(key, None)
+            return None
+        self._storms[key] = window.started + self.window
+        kind, directory = key
+        return (
+            f"{kind} のエラーが多発しています: {directory}（{self.window:.0f} 秒間に {window.count} 件、"
+            f"うち {window.suppressed} 件の出力を省略）例: {', '.join(window.samples)}"
+        )
+
+    def _flush_key(self, key: tuple[str, str], window: _Window):
+        with self._lock:
+            if self._windows.get(key) is not window:
+                return
+            summary = self._close(key, window)
+        if summary is not None:
+            self.target.error(summary)
+
+    def flush(self):
+        """省略中のエラーのまとめをすべて出力する"""
+        with self._lock:
+            summaries = [self._close(key, window) for key, window in list(self._windows.items())]
+        for summary in summaries:
+            if summary is not None:
+                self.target.error(summary)
@@ -0,0 +1,227 @@
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from watchdog.events import (
+    EVENT_TYPE_CLOSED,
+    EVENT_TYPE_CLOSED_NO_WRITE,
+    EVENT_TYPE_CREATED,
+    EVENT_TYPE_DELETED,
+    EVENT_TYPE_MODIFIED,
+    EVENT_TYPE_MOVED,
+    EVENT_TYPE_OPENED,
+    DirCreatedEvent,
+    DirDeletedEvent,
+    DirModifiedEvent,
+    DirMovedEvent,
+    FileClosedEvent,
+    FileClosedNoWriteEvent,
+    FileCreatedEvent,
+    FileDeletedEvent,
+    FileModifiedEvent,
+    FileMovedEvent,
+    FileOpenedEvent,
+    FileSystemEvent,
+    FileSystemEventHandler,
+)
+
+logger = logging.getLogger(__name__)
+
+RECORDING_VERSION = 1
+
+# 記録ファイルを小さくするため、イベント種別は1文字のコードで保存する
+_EVENT_CODES = {
+    EVENT_TYPE_CREATED: 'c',
+    EVENT_TYPE_MODIFIED: 'm',
+    EVENT_TYPE_MOVED: 'v',
+    EVENT_TYPE_DELETED: 'd',
+    EVENT_TYPE_OPENED: 'o',
+    EVENT_TYPE_CLOSED: 'w',
+    EVENT_TYPE_CLOSED_NO_WRITE: 'r',
+}
+
+_FILE_EVENT_CLASSES = {
+    'c': FileCreatedEvent,
+    'm': FileModifiedEvent,
+    'd': FileDeletedEvent,
+    'o': FileOpenedEvent,
+    'w': FileClosedEvent,
+    'r': FileClosedNoWriteEvent,
+}
+
+_DIR_EVENT_CLASSES = {
+    'c': DirCreatedEvent,
+    'm': DirModifiedEvent,
+    'd': DirDeletedEvent,
+}
+
+# ディスクへの書き出し間隔（秒）
+_FLUSH_INTERVAL = 1.0
+
+
+class EventRecorder(FileSystemEventHandler):
+    """watchdogのイベントを時刻付きでgzip圧縮のJSONLファイルに記録する
+
+    1行が1イベントで、[経過秒, 種別コード, ディレクトリか, 元の名前, 移動先の名前, サイズ] の配列。
+    名前は監視フォルダからの相対パスで記録する。
+    """
+
+    def __init__(self, output_path: str, root: str, record_sizes: bool = False):
+        super().__init__()
+        self.output_path = output_path
+        self.root = root
+        self.record_sizes = record_sizes
+        self._start = time.monotonic()
+        self._last_flush = self._start
+        self._lock = threading.Lock()
+        self._file = gzip.open(output_path, 'wt', encoding='utf-8', errors='surrogateescape')
+        self._write([RECORDING_VERSION, time.time(), os.fsdecode(root)])
+        logger.info(f"イベントの記録を開始しました: {output_path}")
+
+    def _relative(self, path: bytes | str) -> str:
+        path = os.fsdecode(path)
+        if not path:
+            return ''
+        return os.path.relpath(path, os.fsdecode(self.root))
+
+    def _write(self, record: list):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+        self._file.write('\n')
+
+    def on_any_event(self, event: FileSystemEvent):
+        code = _EVENT_CODES.get(event.event_type)
+        if code is None:
+            return
+
+        size = None
+        if self.record_sizes and not event.is_directory:
+            try:
+                size = os.stat(event.dest_path or event.src_path).st_size
+            except OSError:
+                pass
+
+        now = time.monotonic()
+        record = [
+            round(now - self._start, 4),
+            code,
+            1 if event.is_directory else 0,
+            self._relative(event.src_path),
+            self._relative(event.dest_path) or None,
+            size,
+        ]
+        with self._lock:
+            if self._file.closed:
+                return
+            self._write(record)
+            if now - self._last_flush >= _FLUSH_INTERVAL:
+                self._file.flush()
+                self._last_flush = now
+
+    def close(self):
+        """記録ファイルを閉じる"""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+                logger.info(f"イベントの記録を終了しました: {self.output_path}")
+
+
+def load_recording(recording_path: str) -> tuple[list, list[list]]:
+    """記録ファイルを読み込み、ヘッダーとイベントの一覧を返す"""
+    with gzip.open(recording_path, 'rt', encoding='utf-8', errors='surrogateescape') as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if not lines or lines[0][0] != RECORDING_VERSION:
+        raise ValueError(f"対応していない記録ファイルです: {recording_path}")
+    return lines[0], lines[1:]
+
+
+@dataclass
+class ReplayResult:
+    """再生結果"""
+    event_count: int
+    elapsed_seconds: float
+    recorded_seconds: float
+    max_lag_seconds: float
+
+
+class EventReplayer:
+    """記録したイベントを作業用フォルダ上で再現しながらハンドラーへ渡す
+
+    speed=1.0で記録時と同じ間隔、2.0で2倍速、0で待機なしに再生する。
+    """
+
+    def __init__(self, recording_path: str, scratch_dir: str, handler: FileSystemEventHandler, speed: float = 1.0):
+        self.scratch_dir = scratch_dir
+        self.handler = handler
+        self.speed = speed
+        _, self.events = load_recording(recording_path)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.scratch_dir, name)
+
+    def _materialize(self, code: str, is_directory: bool, src: str, dest: str | None, size: int | None):
+        """イベントに対応するファイル操作を作業用フォルダに適用する"""
+        src_path = self._path(src)
+        try:
+            if code == 'c':
+                if is_directory:
+                    os.makedirs(src_path, exist_ok=True)
+                else:
+                    with open(src_path, 'ab') as f:
+                        f.truncate(size or 0)
+            elif code in ('m', 'w') and not is_directory and size is not None and os.path.exists(src_path):
+                os.truncate(src_path, size)
+            elif code == 'v' and dest:
+                dest_path = self._path(dest)
+                if os.path.exists(src_path):
+                    os.replace(src_path, dest_path)
+                elif not is_directory:
+                    # ハンドラーが既にリネームしている場合などは移動先を直接作成する
+                    with open(dest_path, 'ab') as f:
+                        f.truncate(size or 0)
+            elif code == 'd' and not is_directory and os.path.exists(src_path):
+                os.remove(src_path)
+        except OSError as e:
+            logger.debug(f"イベントの再現に失敗しました: {src}: {e}")
+
+    def _event(self, code: str, is_directory: bool, src: str, dest: str | None) -> FileSystemEvent | None:
+        if code == 'v':
+            event_class = DirMovedEvent if is_directory else FileMovedEvent
+            return event_class(self._path(src), self._path(dest or ''))
+        event_class = (_DIR_EVENT_CLASSES if is_directory else _FILE_EVENT_CLASSES).get(code)
+        return event_class(self._path(src)) if event_class else None
+
+    def run(self, finish: Callable[[], None] | None = None) -> ReplayResult:
+        """記録を再生する
+
+        finish は最後のイベントの後、再生時間の計測を終える前に呼ぶ（ハンドラーの終了処理など）。
+        """
+        start = time.monotonic()
+        max_lag = 0.0
+        for offset, code, is_directory, src, dest, size in self.events:
+            if self.speed > 0:
+                target = start + offset / self.speed
+                delay = target - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+
+            self._materialize(code, bool(is_directory), src, dest, size)
+            event = self._event(code, bool(is_directory), src, dest)
+            if event is not None:
+                self.handler.dispatch(event)
+        if finish is not None:
+            finish()
+
+        recorded = self.events[-1][0] if self.events else 0.0
+        return ReplayResult(
+            event_count=len(self.events),
+            elapsed_seconds=time.monotonic() - start,
+            recorded_seconds=recorded,
+            max_lag_seconds=max_lag,
+        )
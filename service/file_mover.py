@@ -0,0 +1,228 @@
+import errno
+import itertools
+import logging
+import os
+import secrets
+import shutil
+import time
+from collections.abc import Callable, Iterator
+
+from service.directory_handle import split_name
+
+logger = logging.getLogger(__name__)
+
+# 1回のシステムコールで転送する最大バイト数（転送ごとに進捗を通知するため、遅い共有フォルダでも
+# 数秒ごとに通知できる大きさにする）
+_CHUNK_SIZE = 8 * 1024 * 1024
+# 進捗をログに出力する間隔（秒）
+PROGRESS_INTERVAL = 5.0
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def _candidates(name: str) -> Iterator[str]:
+    """ファイル名の候補を順に返す（2つ目以降は連番を付与）"""
+    stem, extension = split_name(name)
+    yield name
+    for counter in itertools.count(1):
+        yield f"{stem} ({counter}){extension}"
+
+
+def unique_name(directory: str, name: str) -> str:
+    """フォルダ内で重複しないファイル名を取得（重複時は連番を付与）"""
+    for candidate in _candidates(name):
+        if not os.path.lexists(os.path.join(directory, candidate)):
+            return candidate
+    raise AssertionError("unreachable")
+
+
+# リンクに対応していないファイルシステムで os.link が返すエラー
+_LINK_UNSUPPORTED = (errno.EPERM, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOSYS, errno.EMLINK)
+
+
+def _link_and_unlink(src_path: str, final_path: str):
+    """新しい名前へリンクしてから元の名前を削除する（既存のファイルは上書きしない）"""
+    os.link(src_path, final_path)
+    try:
+        os.remove(src_path)
+    except BaseException:
+        os.remove(final_path)
+        raise
+
+
+def _reserve_and_replace(src_path: str, final_path: str):
+    """O_EXCL で名前を確保してから置き換える（既存のファイルは上書きしない）"""
+    os.close(os.open(final_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644))
+    try:
+        os.replace(src_path, final_path)
+    except BaseException:
+        os.remove(final_path)
+        raise
+
+
+def _publish(src_path: str, dst_dir: str, name: str) -> str:
+    """ファイルを移動先フォルダの重複しない名前へ公開し、公開後のパスを返す
+
+    名前の確認とリネームの間に他のプロセスが同じ名前を作成しても上書きしないよう、
+    既存のファイルを上書きしない方法で公開し、名前が既に存在すれば次の連番で再試行する。
+    別のデバイスの場合は EXDEV を送出する。
+    """
+    use_link = os.name != 'nt'
+    for candidate in _candidates(name):
+        final_path = os.path.join(dst_dir, candidate)
+        try:
+            if use_link:
+                try:
+                    _link_and_unlink(src_path, final_path)
+                    return final_path
+                except OSError as e:
+                    if e.errno not in _LINK_UNSUPPORTED:
+                        raise
+                    use_link = False
+            if os.name == 'nt':
+                # Windowsのos.renameは既存のファイルを上書きしない
+                os.rename(src_path, final_path)
+            else:
+                _reserve_and_replace(src_path, final_path)
+            return final_path
+        except FileExistsError:
+            continue
+    raise AssertionError("unreachable")
+
+
+def _same_device(src_path: str, dst_dir: str) -> bool:
+    try:
+        return os.stat(src_path).st_dev == os.stat(dst_dir).st_dev
+    except OSError:
+        return False
+
+
+def _copy_range(src_fd: int, dst_fd: int, size: int, on_chunk: Callable[[int], None]) -> int:
+    """カーネル内でデータを転送し、転送したバイト数を返す（copy_file_range → sendfile → read/write の順に試す）"""
+    copied = 0
+    use_copy_file_range = hasattr(os, 'copy_file_range')
+    use_sendfile = hasattr(os, 'sendfile') and os.name != 'nt'
+
+    while copied < size:
+        count = min(_CHUNK_SIZE, size - copied)
+        sent = 0
+        if use_copy_file_range:
+            try:
+                sent = os.copy_file_range(src_fd, dst_fd, count)  # type: ignore[attr-defined]
+            except OSError as e:
+                # 古いカーネルやファイルシステム間で非対応の場合はsendfileへ切り替える
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                    raise
+                use_copy_file_range = False
+                continue
+        elif use_sendfile:
+            try:
+                sent = os.sendfile(dst_fd, src_fd, None, count)
+            except OSError as e:
+                if e.errno not in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+                    raise
+                use_sendfile = False
+                continue
+        else:
+            data = os.read(src_fd, count)
+            sent = len(data)
+            view = memoryview(data)
+            while view:
+                written = os.write(dst_fd, view)
+                view = view[written:]
+
+        if sent == 0:
+            # コピー中にファイルが切り詰められた場合
+            break
+        copied += sent
+        on_chunk(copied)
+    return copied
+
+
+def _fsync_directory(directory: str):
+    """リネーム結果を永続化するためフォルダをfsyncする（POSIXのみ）"""
+    if os.name == 'nt':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _copy_and_publish(src_path: str, dst_dir: str, dst_name: str, progress: ProgressCallback | None) -> str:
+    """一時ファイルへコピーしてfsyncした後、最終的な名前へアトミックに公開する"""
+    # 異常終了したプロセスの一時ファイルが残っていても（同じプロセスIDでも）衝突しない名前にする
+    temp_path = os.path.join(dst_dir, f".{dst_name}.{os.getpid()}.{secrets.token_hex(4)}.partial")
+    binary = getattr(os, 'O_BINARY', 0)
+    src_fd = os.open(src_path, os.O_RDONLY | binary)
+    try:
+        size = os.fstat(src_fd).st_size
+        dst_fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | binary, 0o644)
+        start = time.monotonic()
+        last_report = start
+
+        def on_chunk(copied: int):
+            nonlocal last_report
+            if progress is not None:
+                progress(copied, size)
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                rate = copied / (now - start) / (1024 * 1024)
+                logger.info(
+                    f"転送中: {dst_name} {copied / (1024 ** 3):.2f}/{size / (1024 ** 3):.2f}GB ({rate:.1f}MB/s)"
+                )
+
+        try:
+            copied = _copy_range(src_fd, dst_fd, size, on_chunk)
+            os.fsync(dst_fd)
+            # コピー中に元のファイルが変更された場合は、不完全なコピーを公開しない
+            if copied != size or os.fstat(dst_fd).st_size != size or os.fstat(src_fd).st_size != size:
+                raise OSError(errno.EAGAIN, "コピー中にファイルのサイズが変わりました", src_path)
+        except BaseException:
+            os.close(dst_fd)
+            os.remove(temp_path)
+            raise
+        os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+    try:
+        shutil.copystat(src_path, temp_path)
+        final_path = _publish(temp_path, dst_dir, dst_name)
+        _fsync_directory(dst_dir)
+    except BaseException:
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    elapsed = max(time.monotonic() - start, 1e-6)
+    final_name = os.path.basename(final_path)
+    logger.info(f"転送完了: {final_name} {size / (1024 * 1024):.1f}MB ({size / elapsed / (1024 * 1024):.1f}MB/s)")
+    try:
+        os.remove(src_path)
+    except OSError as e:
+        # 移動先への公開は完了しているため、移動は成功として扱う（再試行すると重複して公開される）
+        logger.warning(f"移動元のファイルを削除できませんでした: {src_path}: {e}")
+    return final_path
+
+
+def move_file(src_path: str, dst_dir: str, dst_name: str | None = None,
+              progress: ProgressCallback | None = None) -> str:
+    """ファイルを移動先フォルダへ移動し、移動後のパスを返す
+
+    同じデバイス上ではリンクの付け替えで移動し、別のデバイスへはカーネル内コピー・fsync・
+    一時ファイル名からの公開で移動する。移動先に同名のファイルがある場合は連番を付与する。
+    """
+    os.makedirs(dst_dir, exist_ok=True)
+    name = dst_name or os.path.basename(src_path)
+
+    if _same_device(src_path, dst_dir):
+        try:
+            return _publish(src_path, dst_dir, name)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+    return _copy_and_publish(src_path, dst_dir, name, progress)
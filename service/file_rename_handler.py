@@ -1,73 +1,1039 @@
+import hashlib
 import logging
-import time
-from pathlib import Path
+import os
+import re
+import sqlite3
+import threading
+from collections.abc import Callable, Sequence
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import partial
 
 from watchdog.events import FileSystemEventHandler
 
-from utils.config_manager import get_rename_patterns, get_wait_time
+from service.bulk_matcher import BulkMatcher
+from service.content_sniffer import ContentSniffer, corrected_name
+from service.deadline_fs import DeadlineFileSystem, RootUnavailableError
+from service.directory_handle import Directory, split_name
+from service.error_aggregator import ErrorAggregator, error_class
+from service.fs_backend import FileSystem, OSFileSystem
+from service.io_throttle import IOThrottle, lower_current_thread_priority
+from service.lifecycle_trace import (
+    NULL_TRACE,
+    SPAN_COLLISION,
+    SPAN_MATCH,
+    SPAN_QUEUED,
+    SPAN_RENAME,
+    SPAN_STABILITY_WAIT,
+    FileTrace,
+    LifecycleTracer,
+    NullTrace,
+)
+from service.path_filter import PathFilter
+from service.post_actions import PostActionPipeline, build_action
+from service.processed_index import ProcessedIndex
+from service.rename_stats import RenameStats
+from service.retry_scheduler import RetryScheduler
+from service.storm_detector import StormDetector
+from service.timer_queue import TimerHandle
+from utils.config_manager import (
+    get_deadline_enabled,
+    get_deadline_probe_interval,
+    get_deadline_timeout,
+    get_deadline_workers,
+    get_destination_dir,
+    get_error_burst,
+    get_error_window,
+    get_exclude_extensions,
+    get_exclude_globs,
+    get_group_window,
+    get_include_globs,
+    get_index_compact_interval,
+    get_index_directory,
+    get_index_enabled,
+    get_io_burst,
+    get_io_ops_per_second,
+    get_low_priority,
+    get_post_action_command_timeout,
+    get_post_action_queue_size,
+    get_post_action_workers,
+    get_post_actions,
+    get_readiness_mode,
+    get_readiness_timeout,
+    get_rename_patterns,
+    get_resume_workers,
+    get_retry_initial_delay,
+    get_retry_jitter,
+    get_retry_max_attempts,
+    get_retry_max_delay,
+    get_sniff_cache_size,
+    get_sniff_enabled,
+    get_sniff_fix_extension,
+    get_sniff_max_bytes,
+    get_stability_interval,
+    get_storm_exit_threshold,
+    get_storm_min_events,
+    get_storm_scan_interval,
+    get_storm_threshold,
+    get_trace_backup_count,
+    get_trace_directory,
+    get_trace_enabled,
+    get_trace_max_bytes,
+    get_trace_sample_rate,
+    get_typed_rename_patterns,
+    get_wait_time,
+)
+from utils.log_rotation import get_log_info
 
 logger = logging.getLogger(__name__)
 
+# 書き込み完了の判定方法
+READINESS_SLEEP = 'sleep'
+READINESS_CLOSE_WRITE = 'close_write'
+
+# 外部から通知されたファイルの処理結果
+SUBMIT_RENAMED = 'renamed'
+SUBMIT_UNCHANGED = 'unchanged'
+SUBMIT_MISSING = 'missing'
+SUBMIT_FAILED = 'failed'
+SUBMIT_QUEUED = 'queued'
+SUBMIT_IGNORED = 'ignored'
+
+
+@dataclass
+class _GroupMember:
+    """まとめてリネームするファイル"""
+    name: str
+    filename: str
+    extension: str
+    patterns: list[re.Pattern]
+    # まとめてリネームするまで引き継いだ処理区間の記録
+    trace: FileTrace | NullTrace = NULL_TRACE
+
+
+@dataclass
+class _PendingGroup:
+    """同じ名前（拡張子を除く）で届いたファイルのまとまり"""
+    directory: str
+    members: list[_GroupMember]
+    timer: TimerHandle | None = None
+
+
+@dataclass
+class _PendingWrite:
+    """書き込みの完了を待っているファイル"""
+    first_seen: float
+    timer: TimerHandle | None = None
+    # 前回確認したときの (サイズ, 更新時刻)
+    signature: tuple[int, int] | None = None
+
 
 class FileRenameHandler(FileSystemEventHandler):
     """ファイルシステムイベントを処理しファイル名を変換するハンドラー"""
 
-    def __init__(self):
+    def __init__(self, fs: FileSystem | None = None):
         super().__init__()
+        # ファイル操作と時計（テスト・ベンチマークではメモリ上の実装に差し替える）
+        self.fs = fs if fs is not None else self._create_fs()
         self.patterns = get_rename_patterns()
         self.wait_time = get_wait_time()
+        self.destination = get_destination_dir()
+        self.throttle = IOThrottle(get_io_ops_per_second(), get_io_burst())
+        self.low_priority = get_low_priority()
+        self.path_filter = PathFilter(get_include_globs(), get_exclude_globs(), get_exclude_extensions())
+        self.stats = RenameStats()
+        self._thread_state = threading.local()
+        self._directories: dict[str, Directory] = {}
+        self._directories_lock = threading.Lock()
+        self.resume_workers = get_resume_workers()
+        self.paused = False
+        # 一時停止中のイベントはパスごとにまとめ、最後のイベント時刻のみ保持する
+        self._pending: dict[str, float] = {}
+        self._pending_lock = threading.Lock()
+        # 応答しないフォルダのファイルと走査は、フォルダごとに復旧まで保留する
+        self._deferred: dict[str, dict[str, float]] = {}
+        self._deferred_scans: set[str] = set()
+        if isinstance(self.fs, DeadlineFileSystem):
+            self.fs.add_recovery_listener(self._root_recovered)
+        self.post_actions = self._create_post_actions()
+        self.tracer = self._create_tracer()
+        # 再試行などの待機は1つのスレッドでまとめて管理する（最初の登録時に起動）
+        self.timers = self.fs.create_timers()
+        # 共有フォルダの切断などで多発したエラーはまとめて出力する
+        self.errors = ErrorAggregator(
+            logger, get_error_window(), get_error_burst(), timers=self.timers, clock=self.fs.monotonic
+        )
+        # タイマーのスレッドは待機の管理のみを行い、リネームや走査はこのスレッドで実行する
+        self._background_executor: Executor | None = None
+        self._background_lock = threading.Lock()
+        self.retries: RetryScheduler | None = None
+        if get_retry_max_attempts() > 0:
+            self.retries = RetryScheduler(
+                self.timers, partial(self._submit_background, self._retry_file), get_retry_max_attempts(),
+                get_retry_initial_delay(), get_retry_max_delay(), get_retry_jitter(),
+            )
+        self.readiness = get_readiness_mode()
+        self.stability_interval = get_stability_interval()
+        self.readiness_timeout = get_readiness_timeout()
+        self._waiting: dict[str, _PendingWrite] = {}
+        self._waiting_lock = threading.Lock()
+        self.sniffer: ContentSniffer | None = None
+        self.typed_patterns: dict[str, list[re.Pattern]] = {}
+        self.fix_extension = False
+        if get_sniff_enabled():
+            self.sniffer = ContentSniffer(get_sniff_max_bytes(), get_sniff_cache_size())
+            self.typed_patterns = get_typed_rename_patterns()
+            self.fix_extension = get_sniff_fix_extension()
+        self.index_enabled = get_index_enabled()
+        # 同じ名前で続けて届いたファイル（report.pdf と report.xml など）は同じ連番でまとめてリネームする
+        self.group_window = get_group_window()
+        self._groups: dict[tuple[str, str], _PendingGroup] = {}
+        self._groups_lock = threading.Lock()
+        self._indexes: dict[str, ProcessedIndex] = {}
+        self._indexes_lock = threading.Lock()
+        # イベントが多発しているフォルダはイベントごとに処理せず、一定間隔でまとめて走査する
+        self.storm_threshold = get_storm_threshold()
+        self.storm_exit_threshold = get_storm_exit_threshold()
+        self.storm_min_events = get_storm_min_events()
+        self.storm_scan_interval = get_storm_scan_interval()
+        self._storms: dict[str, StormDetector] = {}
+        # 多発中のフォルダと、走査の後にイベントを受けたか
+        self._storm_scans: dict[str, bool] = {}
+        self._storms_lock = threading.Lock()
+
+    @staticmethod
+    def _create_fs() -> FileSystem:
+        """設定に応じてファイル操作の実装を作成"""
+        fs = OSFileSystem()
+        if not get_deadline_enabled():
+            return fs
+        return DeadlineFileSystem(fs, get_deadline_timeout(), get_deadline_probe_interval(), get_deadline_workers())
+
+    @staticmethod
+    def _create_post_actions() -> PostActionPipeline | None:
+        """設定に応じてリネーム後の処理パイプラインを作成"""
+        specs = get_post_actions()
+        if not specs:
+            return None
+        timeout = get_post_action_command_timeout()
+        actions = [build_action(kind, value, timeout) for kind, value in specs]
+        return PostActionPipeline(actions, get_post_action_workers(), get_post_action_queue_size())
+
+    def _create_tracer(self) -> LifecycleTracer | None:
+        """設定に応じてファイルごとの処理区間の記録を作成"""
+        if not get_trace_enabled():
+            return None
+        directory = get_trace_directory()
+        if not directory:
+            log_info = get_log_info()
+            directory = str(log_info['log_directory']) if log_info else 'logs'
+        os.makedirs(directory, exist_ok=True)
+        return LifecycleTracer(
+            os.path.join(directory, 'lifecycle-trace.jsonl'),
+            get_trace_sample_rate(), get_trace_max_bytes(), get_trace_backup_count(),
+            clock=self.fs.monotonic,
+        )
+
+    def close(self):
+        """リネーム後の処理を停止し、フォルダのハンドルを閉じる"""
+        if self.post_actions is not None:
+            self.post_actions.stop()
+            self.post_actions = None
+        if self.tracer is not None:
+            self.tracer.close()
+            self.tracer = None
+        self._flush_groups()
+        self.errors.flush()
+        self.timers.stop()
+        if self._background_executor is not None:
+            self._background_executor.shutdown(wait=True, cancel_futures=True)
+        self.close_directories()
+        with self._indexes_lock:
+            for index in self._indexes.values():
+                index.close()
+            self._indexes.clear()
+        self.fs.close()
 
     def on_created(self, event):
         """新規ファイル作成時の処理"""
-        if event.is_directory:
+        if event.is_directory or not self.path_filter.accepts(event.src_path):
             return
-        self._process_file(event.src_path)
+        self._handle_event(event.src_path)
 
     def on_moved(self, event):
         """ファイル移動時の処理（フォルダに移動されてきたファイル）"""
-        if event.is_directory:
+        # 一時ファイルからの移動は移動先の名前のみで判定する
+        if event.is_directory or not self.path_filter.accepts(event.dest_path):
+            return
+        if self.readiness == READINESS_CLOSE_WRITE:
+            # 書き込み中に名前を変更されたファイルは移動先の名前で扱う
+            self._discard_waiting(event.src_path)
+        self._handle_event(event.dest_path, complete=True)
+
+    def on_closed(self, event):
+        """書き込みを終えたファイルが閉じられた時の処理（LinuxのIN_CLOSE_WRITE）"""
+        if event.is_directory or self.readiness != READINESS_CLOSE_WRITE:
+            return
+        path = os.fsdecode(event.src_path)
+        state = self._take_waiting(path)
+        if state is not None:
+            self._process_ready(path, state.first_seen)
+
+    def _handle_event(self, file_path: bytes | str, complete: bool = False):
+        """処理件数を記録しながらイベントのファイルを処理する
+
+        complete はフォルダへ移動されてきたなど、書き込みが完了しているファイルの場合にTrue。
+        """
+        if self.retries is not None:
+            # 新しいイベントを受けたファイルは失敗回数と隔離を解除する
+            self.retries.forget(os.fsdecode(file_path))
+        if self.paused:
+            self._buffer_event(file_path)
+            return
+        detector = self._storm_detector(file_path)
+        if detector is not None and self._storm_event(detector):
+            return
+        started = self.fs.monotonic()
+        try:
+            if self.readiness == READINESS_CLOSE_WRITE:
+                self._handle_close_write_event(os.fsdecode(file_path), complete)
+                return
+            self.stats.event_received()
+            trace = self._start_trace(file_path)
+            try:
+                self._process_file(file_path)
+            finally:
+                self._end_trace(trace)
+                self.stats.event_finished()
+        finally:
+            if detector is not None:
+                with self._storms_lock:
+                    detector.add_busy(self.fs.monotonic() - started)
+
+    def _storm_detector(self, file_path: bytes | str) -> StormDetector | None:
+        """フォルダのイベントの受信頻度の計測（無効の場合はNone）"""
+        if self.storm_threshold <= 0:
+            return None
+        directory = os.path.dirname(os.fsdecode(file_path)) or os.curdir
+        with self._storms_lock:
+            detector = self._storms.get(directory)
+            if detector is None:
+                detector = self._storms[directory] = StormDetector(
+                    self.storm_threshold, self.storm_exit_threshold, self.storm_min_events,
+                    clock=self.fs.monotonic, name=directory,
+                )
+        return detector
+
+    def _storm_event(self, detector: StormDetector) -> bool:
+        """多発中のフォルダのイベントは個別に処理せず、走査の対象とする（個別に処理しない場合はTrue）"""
+        directory = detector.name
+        rate = 0.0
+        with self._storms_lock:
+            if not detector.record():
+                return False
+            started = directory not in self._storm_scans
+            self._storm_scans[directory] = True
+            if started:
+                self.timers.schedule(self.storm_scan_interval, self._submit_background, self._storm_scan, directory)
+                rate = detector.rate
+        if started:
+            logger.warning(
+                f"イベントが多発しているため、{self.storm_scan_interval:g} 秒ごとにまとめて走査します: "
+                f"{directory}（約 {rate:,.0f} 件/秒）"
+            )
+        return True
+
+    def _submit_background(self, function: Callable, *args):
+        """タイマーから呼び出された処理をバックグラウンドのスレッドに渡す（タイマースレッドで実行）"""
+        with self._background_lock:
+            if self._background_executor is None:
+                self._background_executor = self.fs.create_executor(self.resume_workers, 'background')
+            executor = self._background_executor
+        try:
+            executor.submit(function, *args)
+        except RuntimeError:
+            # 終了処理中
+            pass
+
+    def _storm_scan(self, directory: str):
+        """多発中のフォルダを走査する（バックグラウンドのスレッドで実行）
+
+        多発が収まり、走査の後にイベントがなく、書き込み中のファイルも残っていなければイベントごとの処理に戻す。
+        """
+        if self.paused:
+            self.timers.schedule(self.storm_scan_interval, self._submit_background, self._storm_scan, directory)
+            return
+        with self._storms_lock:
+            self._storm_scans[directory] = False
+        unsettled = self.scan_directory(directory, settle=self.wait_time)
+        with self._storms_lock:
+            detector = self._storms.get(directory)
+            storming = detector is not None and detector.poll()
+            if storming or unsettled or self._storm_scans[directory]:
+                self.timers.schedule(self.storm_scan_interval, self._submit_background, self._storm_scan, directory)
+                return
+            del self._storm_scans[directory]
+        logger.info(f"イベントが落ち着いたため、イベントごとの処理に戻します: {directory}")
+
+    def _handle_close_write_event(self, path: str, complete: bool):
+        """書き込み完了（ファイルが閉じられる）まで待ってから処理する
+
+        ファイルを開いたまま書き込むアプリケーションに備えて、一定間隔でサイズと更新時刻を確認し、
+        変化がなくなった場合または最大待機時間を過ぎた場合も処理する。待機中はタイマーのみでCPUを使わない。
+        """
+        if complete:
+            state = self._take_waiting(path)
+            if state is None:
+                self.stats.event_received()
+                self._process_ready(path, self.fs.monotonic())
+            else:
+                self._process_ready(path, state.first_seen)
             return
-        self._process_file(event.dest_path)
 
-    def _process_file(self, file_path: bytes | str):
-        """ファイルを処理してリネームする"""
+        with self._waiting_lock:
+            if path in self._waiting:
+                # 書き込み中の重複イベントはまとめる
+                return
+            state = _PendingWrite(self.fs.monotonic())
+            state.timer = self.timers.schedule(self.stability_interval, self._submit_background, self._check_stability, path)
+            self._waiting[path] = state
+        self.stats.event_received()
+
+    def _take_waiting(self, path: str) -> _PendingWrite | None:
+        """待機中のファイルを取り出す（他のスレッドが先に取り出した場合はNone）"""
+        with self._waiting_lock:
+            state = self._waiting.pop(path, None)
+        if state is not None and state.timer is not None:
+            self.timers.cancel(state.timer)
+        return state
+
+    def _discard_waiting(self, file_path: bytes | str):
+        if self._take_waiting(os.fsdecode(file_path)) is not None:
+            self.stats.event_finished()
+
+    def _check_stability(self, path: str):
+        """閉じられないファイルのサイズと更新時刻が変化しなくなったかを確認（バックグラウンドのスレッドで実行）"""
+        with self._waiting_lock:
+            state = self._waiting.get(path)
+        if state is None:
+            return
+
+        directory, name = os.path.split(path)
+        try:
+            self.throttle.acquire(background=True)
+            stat = self._directory(directory or os.curdir).stat(name)
+        except RootUnavailableError as e:
+            self._discard_waiting(path)
+            self._defer(path, e)
+            return
+        except OSError:
+            stat = None
+        if stat is None:
+            # 待機中に削除・移動された場合
+            self._discard_waiting(path)
+            return
+
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if signature == state.signature or self.fs.monotonic() - state.first_seen >= self.readiness_timeout:
+            state = self._take_waiting(path)
+            if state is not None:
+                self._process_ready(path, state.first_seen)
+            return
+
+        with self._waiting_lock:
+            if self._waiting.get(path) is state:
+                state.signature = signature
+                state.timer = self.timers.schedule(self.stability_interval, self._submit_background, self._check_stability, path)
+
+    def _process_ready(self, path: str, first_seen: float):
+        """書き込みが完了したファイルを待機せずに処理する（event_receivedは呼び出し元で記録済み）"""
+        try:
+            if self.paused:
+                self._buffer_event(path)
+                return
+            trace = self._start_trace(path, started=first_seen)
+            trace.add_span(SPAN_STABILITY_WAIT, first_seen, self.fs.monotonic())
+            try:
+                self._process_file(path, wait=0)
+            finally:
+                self._end_trace(trace)
+        finally:
+            self.stats.event_finished()
+
+    def submit(self, file_path: bytes | str) -> tuple[str, str | None]:
+        """書き込み完了を通知されたファイルを待機せずに処理し、(処理結果, 処理後のパス) を返す"""
+        path = os.fsdecode(file_path)
+        if not self.path_filter.accepts(path):
+            return SUBMIT_IGNORED, path
+        if self.retries is not None:
+            self.retries.forget(path)
+        if self.paused:
+            self._buffer_event(path)
+            return SUBMIT_QUEUED, path
+
+        # 監視イベントで書き込み完了を待っている場合は、待機をやめてここで処理する
+        state = self._take_waiting(path)
+        if state is None:
+            self.stats.event_received()
+        trace = self._start_trace(path)
+        try:
+            new_path = self._process_file(path, wait=0, group=False)
+        finally:
+            self._end_trace(trace)
+            self.stats.event_finished()
+
+        if new_path is None:
+            try:
+                if self._is_deferred(path):
+                    return SUBMIT_QUEUED, path
+                return (SUBMIT_FAILED if self.fs.lexists(path) else SUBMIT_MISSING), None
+            except RootUnavailableError as e:
+                self._defer(path, e)
+                return SUBMIT_QUEUED, path
+        return (SUBMIT_UNCHANGED if new_path == path else SUBMIT_RENAMED), new_path
+
+    def _retry_file(self, file_path: str):
+        """リネームに失敗したファイルを再処理する（バックグラウンドのスレッドで実行）"""
+        if self.paused:
+            self._buffer_event(file_path)
+            return
+        self._apply_thread_priority()
+        self.stats.event_received()
+        try:
+            self._process_file(file_path, wait=0, background=True)
+        finally:
+            self.stats.event_finished()
+
+    def _schedule_retry(self, file_path: str, message: str):
+        if self.retries is not None:
+            self.retries.schedule(file_path, message)
+
+    def _start_trace(self, file_path: bytes | str, started: float | None = None) -> FileTrace | NullTrace:
+        """サンプリング対象の場合は処理区間の記録を開始し、処理スレッドに関連付ける"""
+        tracer = self.tracer
+        trace = tracer.start(file_path, started) if tracer is not None else NULL_TRACE
+        self._thread_state.trace = trace
+        return trace
+
+    def _end_trace(self, trace: FileTrace | NullTrace):
+        self._thread_state.trace = NULL_TRACE
+        if not trace.handed_off:
+            trace.finish()
+
+    def _trace(self) -> FileTrace | NullTrace:
+        """処理中のファイルの記録（対象外の場合は何も記録しない）"""
+        return getattr(self._thread_state, 'trace', NULL_TRACE)
+
+    @property
+    def pending_count(self) -> int:
+        """一時停止中に保留しているファイル数"""
+        return len(self._pending)
+
+    def _buffer_event(self, file_path: bytes | str):
+        with self._pending_lock:
+            self._pending[os.fsdecode(file_path)] = self.fs.monotonic()
+
+    @property
+    def deferred_count(self) -> int:
+        """応答しないフォルダの復旧を待っているファイル数"""
+        with self._pending_lock:
+            return sum(len(paths) for paths in self._deferred.values())
+
+    def _defer(self, file_path: bytes | str, error: RootUnavailableError):
+        """応答しないフォルダのファイルは、フォルダが復旧してから処理する"""
+        with self._pending_lock:
+            self._deferred.setdefault(error.root, {})[os.fsdecode(file_path)] = self.fs.monotonic()
+        self._trace().mark('deferred')
+
+    def _is_deferred(self, path: str) -> bool:
+        with self._pending_lock:
+            return any(path in paths for paths in self._deferred.values())
+
+    def _root_recovered(self, root: str):
+        """復旧したフォルダの保留中のファイルを処理し、保留した走査を行う"""
+        with self._pending_lock:
+            deferred = self._deferred.pop(root, {})
+            rescan = root in self._deferred_scans
+            self._deferred_scans.discard(root)
+            if self.paused:
+                # 一時停止中は再開時に処理する
+                for file_path, event_time in deferred.items():
+                    self._pending.setdefault(file_path, event_time)
+                deferred = {}
+        if deferred:
+            logger.info(f"フォルダの復旧を待っていたファイルを処理します: {root}（{len(deferred)} 件）")
+            threading.Thread(target=self._drain_pending, args=(deferred,), daemon=True).start()
+        if rescan:
+            threading.Thread(target=self.scan_directory, args=(root,), daemon=True).start()
+
+    def pause(self):
+        """リネームを一時停止する（イベントは保留する）"""
+        self.paused = True
+        logger.info("リネームを一時停止しました")
+
+    def resume(self) -> threading.Thread:
+        """リネームを再開し、保留中のファイルをバックグラウンドで処理する"""
+        self.paused = False
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        logger.info(f"リネームを再開しました（保留中 {len(pending)} 件）")
+
+        drain_thread = threading.Thread(target=self._drain_pending, args=(pending,), daemon=True)
+        drain_thread.start()
+        return drain_thread
+
+    def _drain_pending(self, pending: dict[str, float]):
+        """保留中のファイルをワーカープールで処理する（I/O制限はバックグラウンド扱い）"""
+        if not pending:
+            return
+        with ThreadPoolExecutor(max_workers=self.resume_workers, thread_name_prefix='resume') as executor:
+            for file_path, event_time in pending.items():
+                executor.submit(self._process_pending, file_path, event_time)
+        logger.info(f"保留中のファイルの処理が完了しました: {len(pending)} 件")
+
+    def _process_pending(self, file_path: str, event_time: float):
+        # 処理中に再び一時停止された場合は保留に戻す
+        if self.paused:
+            with self._pending_lock:
+                self._pending.setdefault(file_path, event_time)
+            return
+        self._apply_thread_priority()
+        # 最後のイベントから待機時間が経過していれば待たずに処理する
+        remaining = self.wait_time - (self.fs.monotonic() - event_time)
+        trace = self._start_trace(file_path, started=event_time)
+        trace.add_span(SPAN_QUEUED, event_time, self.fs.monotonic())
+        try:
+            self._process_file(file_path, wait=max(remaining, 0.0), background=True)
+        except Exception as e:
+            logger.error(f"保留中のファイルの処理に失敗しました: {file_path}: {e}")
+        finally:
+            self._end_trace(trace)
+
+    def _apply_thread_priority(self):
+        """設定に応じて再試行・再開・走査のスレッドの優先度を一度だけ下げる（イベントを受け取るスレッドは下げない）"""
+        if not self.low_priority or getattr(self._thread_state, 'priority_lowered', False):
+            return
+        self._thread_state.priority_lowered = True
+        lower_current_thread_priority()
+
+    def _directory(self, path: str) -> Directory:
+        """フォルダのハンドルを取得（初回のみ開く）"""
+        handle = self._directories.get(path)
+        if handle is None:
+            with self._directories_lock:
+                handle = self._directories.get(path)
+                if handle is None:
+                    handle = self.fs.open_directory(path)
+                    self._directories[path] = handle
+        return handle
+
+    def close_directories(self):
+        """保持しているフォルダのハンドルを閉じる"""
+        with self._directories_lock:
+            for handle in self._directories.values():
+                handle.close()
+            self._directories.clear()
+
+    def _process_file(
+        self, file_path: bytes | str, wait: float | None = None, background: bool = False, group: bool = True
+    ) -> str | None:
+        """ファイルを処理してリネームし、処理後のパスを返す（ファイルがない・失敗した場合はNone）
+
+        group がTrueでまとめてリネームする設定の場合は、同じ名前のファイルを待つため元のパスを返す。
+        """
+        trace = self._trace()
         # ファイル書き込み完了を待つ
-        time.sleep(self.wait_time)
+        with trace.span(SPAN_STABILITY_WAIT):
+            if wait is None:
+                self.fs.sleep(self.wait_time)
+            elif wait > 0:
+                self.fs.sleep(wait)
+
+        directory, name = os.path.split(os.fsdecode(file_path))
+        try:
+            handle = self._directory(directory or os.curdir)
+            self.throttle.acquire(background)
+            stat = handle.stat(name)
+        except RootUnavailableError as e:
+            self._defer(file_path, e)
+            return None
+        except OSError:
+            # フォルダごと削除・移動された場合
+            return None
+        if stat is None:
+            trace.mark('missing')
+            return None
+
+        with trace.span(SPAN_MATCH):
+            filename, extension, patterns = self._resolve_name(handle, name, stat, background)
+            needs_rename = self._needs_rename(name, filename, extension, patterns)
+
+        if needs_rename and group and self._grouping:
+            trace.mark('grouped')
+            # 記録はまとめてリネームした後に完了する（追加前に引き継ぎ、待機の終了と競合しないようにする）
+            trace.hand_off()
+            if not self._add_to_group(handle, _GroupMember(name, filename, extension, patterns, trace)):
+                trace.resume()
+            return handle.join(name)
+        if needs_rename:
+            return self.rename_file(handle.join(name), filename, extension, background=background, patterns=patterns)
+        trace.mark('skipped')
+        return handle.join(name)
+
+    @property
+    def _grouping(self) -> bool:
+        # 移動先フォルダへ移動する場合は移動先で連番を決めるためまとめない
+        return self.group_window > 0 and not self.destination
 
-        path = Path(file_path) if isinstance(file_path, str) else Path(str(file_path, encoding='utf-8'))
-        if not path.exists():
+    def _add_to_group(self, handle: Directory, member: _GroupMember) -> bool:
+        """同じ名前のファイルを待つ（最初のファイルから group_window 秒後にまとめてリネーム）
+
+        同じファイルが既に待機中の場合は追加せずFalseを返す。
+        """
+        key = (handle.path, member.filename)
+        with self._groups_lock:
+            group = self._groups.get(key)
+            if group is None:
+                group = self._groups[key] = _PendingGroup(handle.path, [])
+                group.timer = self.timers.schedule(self.group_window, self._submit_background, self._flush_group, key)
+            if any(existing.name == member.name for existing in group.members):
+                return False
+            group.members.append(member)
+            return True
+
+    def _take_group(self, key: tuple[str, str]) -> _PendingGroup | None:
+        with self._groups_lock:
+            group = self._groups.pop(key, None)
+        if group is not None and group.timer is not None:
+            self.timers.cancel(group.timer)
+        return group
+
+    def _flush_group(self, key: tuple[str, str]):
+        """待機を終えたファイルのまとまりをリネームする（バックグラウンドのスレッドで実行）"""
+        group = self._take_group(key)
+        if group is None:
+            return
+        try:
+            handle = self._directory(group.directory)
+        except OSError as e:
+            for member in group.members:
+                path = os.path.join(group.directory, member.name)
+                with self._member_trace(member) as trace:
+                    if isinstance(e, RootUnavailableError):
+                        self._defer(path, e)
+                    else:
+                        trace.mark('error')
+                        self._schedule_retry(path, f"リネーム失敗: {e}")
+            logger.error(f"フォルダを開けないため、まとめてリネームできませんでした: {group.directory}: {e}")
+            return
+        if self.paused:
+            for member in group.members:
+                with self._member_trace(member):
+                    self._buffer_event(handle.join(member.name))
             return
+        self._rename_group(handle, group.members, background=False)
 
-        filename = path.stem  # 拡張子を除いたファイル名
-        extension = path.suffix  # 拡張子
+    @contextmanager
+    def _member_trace(self, member: _GroupMember):
+        """まとめてリネームするファイルの記録を、処理するスレッドで再開して完了する"""
+        trace = member.trace
+        trace.resume()
+        self._thread_state.trace = trace
+        try:
+            yield trace
+        finally:
+            self._end_trace(trace)
+
+    def _flush_groups(self):
+        """待機中のまとまりをすべてリネームする"""
+        with self._groups_lock:
+            keys = list(self._groups)
+        for key in keys:
+            self._flush_group(key)
+
+    def _rename_group(
+        self, handle: Directory, members: list[_GroupMember], background: bool,
+        existing: set[str] | None = None,
+    ) -> list[str | None]:
+        """すべてのファイルに同じ連番を付けてリネームし、変換後のパスを返す
+
+        連番はフォルダを1回だけ読み込んで決める。existing にフォルダ内の名前（normcase済み）を
+        渡した場合は読み込まず、リネームに合わせて更新する。
+        """
+        if existing is None:
+            self.throttle.acquire(background)
+            try:
+                with handle.scandir() as entries:
+                    existing = {os.path.normcase(entry.name) for entry in entries}
+            except OSError as e:
+                for member in members:
+                    with self._member_trace(member) as trace:
+                        if isinstance(e, RootUnavailableError):
+                            self._defer(handle.join(member.name), e)
+                        else:
+                            trace.mark('error')
+                logger.error(f"フォルダの読み込みに失敗しました: {handle.path}: {e}")
+                return [None] * len(members)
+
+        # 待機中に削除・移動されたファイルは除く
+        present = [os.path.normcase(member.name) in existing for member in members]
+        targets = []
+        for member, found in zip(members, present):
+            if found:
+                targets.append(member)
+                continue
+            logger.debug(f"待機中にファイルがなくなったため、リネームしません: {handle.join(member.name)}")
+            with self._member_trace(member) as trace:
+                trace.mark('missing')
+
+        new_filenames = [self._converted_name(member.filename, member.patterns) for member in targets]
+        counter = 0
+        while True:
+            new_names = [
+                f"{new_filename} ({counter}){member.extension}" if counter else f"{new_filename}{member.extension}"
+                for new_filename, member in zip(new_filenames, targets)
+            ]
+            folded = {os.path.normcase(new_name) for new_name in new_names}
+            if len(folded) == len(new_names) and folded.isdisjoint(existing):
+                break
+            counter += 1
+
+        results: list[str | None] = []
+        names = iter(new_names)
+        for member, found in zip(members, present):
+            if not found:
+                results.append(None)
+                continue
+            new_name = next(names)
+            with self._member_trace(member):
+                new_path = self.rename_file(
+                    handle.join(member.name), member.filename, member.extension,
+                    background=background, patterns=member.patterns, new_name=new_name,
+                )
+            if new_path is not None:
+                existing.discard(os.path.normcase(member.name))
+                existing.add(os.path.normcase(new_name))
+            results.append(new_path)
+        return results
+
+    def _resolve_name(
+        self, handle: Directory, name: str, stat: os.stat_result | None, background: bool
+    ) -> tuple[str, str, list[re.Pattern]]:
+        """ファイルの種類に応じて (拡張子を除いた名前, 拡張子, 適用するパターン) を決定"""
+        filename, extension = split_name(name)
+        if self.sniffer is None or stat is None:
+            return filename, extension, self.patterns
+
+        self.throttle.acquire(background)
+        file_type = self.sniffer.sniff(handle, name, stat)
+        if file_type is None:
+            return filename, extension, self.patterns
+        if self.fix_extension:
+            filename, extension = corrected_name(filename, extension, file_type)
+        return filename, extension, self.typed_patterns.get(file_type.name, self.patterns)
+
+    def _converted_name(self, filename: str, patterns: list[re.Pattern] | None) -> str:
+        """全パターンに一致する部分を削除した名前"""
+        for pattern in self.patterns if patterns is None else patterns:
+            filename = pattern.sub('', filename)
+        return filename
+
+    def _needs_rename(self, name: str, filename: str, extension: str, patterns: list[re.Pattern]) -> bool:
+        """パターンに一致するか、拡張子を修正する場合にリネームが必要"""
+        return self.should_rename(filename, patterns) or f"{filename}{extension}" != name
+
+    def scan_directory(self, directory: str, settle: float = 0.0) -> int:
+        """フォルダ内の既存ファイルを走査してリネームする（バックグラウンド処理）
+
+        settle を指定した場合、更新から settle 秒経過していない（書き込み中の可能性がある）ファイルは
+        処理せず、その件数を返す。
+        """
+        self._apply_thread_priority()
+        self.throttle.acquire(background=True)
+        unsettled = 0
+        try:
+            handle = self._directory(directory)
+            index = self._index(directory)
+            with handle.scandir() as entries:
+                # 種類の判定と索引にはstat結果を使う（Windowsではscandirの結果に含まれる）
+                need_stat = self.sniffer is not None or index is not None or settle > 0
+                cutoff = int((self.fs.time() - settle) * 1_000_000_000) if settle > 0 else None
+                files = []
+                # まとめてリネームする場合の連番の判定に使う、フォルダ内のすべての名前
+                existing: set[str] = set()
+                for entry in entries:
+                    if self._grouping:
+                        existing.add(os.path.normcase(entry.name))
+                    if entry.is_file(follow_symlinks=False) and self.path_filter.accepts(entry.name):
+                        stat = entry.stat(follow_symlinks=False) if need_stat else None
+                        if cutoff is not None and stat is not None and stat.st_mtime_ns > cutoff:
+                            unsettled += 1
+                            continue
+                        files.append((entry.name, stat))
+        except RootUnavailableError as e:
+            with self._pending_lock:
+                self._deferred_scans.add(e.root)
+            logger.warning(f"フォルダが応答しないため、復旧後に走査します: {directory}")
+            return 0
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"フォルダの走査に失敗しました: {directory}: {e}")
+            return 0
+
+        scanned = files
+        if index is not None:
+            # 前回までに判定したファイルは読み込み・照合を省略する
+            files = index.unseen(files)
+
+        renamed_count = 0
+        evaluated = []
+        groups: dict[str, list[tuple[_GroupMember, os.stat_result | None]]] = {}
+        matched = self._bulk_matches(files)
+        for position, (name, stat) in enumerate(files):
+            if matched is None:
+                filename, extension, patterns = self._resolve_name(handle, name, stat, background=True)
+                needs_rename = self._needs_rename(name, filename, extension, patterns)
+            else:
+                (filename, extension), patterns = split_name(name), self.patterns
+                needs_rename = matched[position]
+            if needs_rename:
+                renamed_count += 1
+                if self._grouping:
+                    groups.setdefault(filename, []).append((_GroupMember(name, filename, extension, patterns), stat))
+                    continue
+                new_path = self.rename_file(handle.join(name), filename, extension, background=True, patterns=patterns)
+                if new_path is None:
+                    # 失敗したファイルは次回の走査で判定し直す
+                    continue
+                name = os.path.basename(new_path)
+            if stat is not None:
+                # inodeのない場合は名前で記録するため、リネーム後の名前を使う
+                evaluated.append((name, stat))
+
+        for group in groups.values():
+            results = self._rename_group(handle, [member for member, _ in group], True, existing)
+            evaluated.extend(
+                (os.path.basename(result), stat) for (_, stat), result in zip(group, results)
+                if stat is not None and result is not None
+            )
+
+        skipped = ''
+        if index is not None:
+            index.record(evaluated)
+            index.finish_scan(scanned)
+            skipped = f"、判定済み {len(scanned) - len(files)} 件を省略"
+        if unsettled:
+            skipped += f"、書き込み中 {unsettled} 件"
+        logger.info(f"フォルダの走査が完了しました: {directory} (対象 {renamed_count} 件 / 全 {len(scanned)} 件{skipped})")
+        return unsettled
+
+    def _bulk_matches(self, files: Sequence[tuple[str, os.stat_result | None]]) -> list[bool] | None:
+        """種類を判定しない場合は、走査したファイルの名前をまとめて照合する（判定する場合はNone）"""
+        if self.sniffer is None:
+            return BulkMatcher(self.patterns).matches([split_name(name)[0] for name, _ in files])
+        return None
+
+    def _index(self, directory: str) -> ProcessedIndex | None:
+        """監視フォルダの処理済みファイルの索引を取得（初回のみ開く）"""
+        if not self.index_enabled:
+            return None
+        key = os.path.abspath(directory)
+        with self._indexes_lock:
+            index = self._indexes.get(key)
+            if index is None:
+                storage = get_index_directory()
+                if not storage:
+                    log_info = get_log_info()
+                    storage = os.path.join(str(log_info['log_directory']) if log_info else 'logs', 'index')
+                name = hashlib.sha1(os.fsencode(key)).hexdigest()[:16]
+                index = ProcessedIndex(
+                    os.path.join(storage, f"{name}.sqlite3"), self._index_fingerprint(),
+                    get_index_compact_interval(),
+                )
+                self._indexes[key] = index
+        return index
 
-        if self.should_rename(filename):
-            self.rename_file(path, filename, extension)
+    def _index_fingerprint(self) -> str:
+        """判定結果に影響する設定（変更された場合は索引の記録を破棄する）"""
+        typed = sorted((name, [p.pattern for p in patterns]) for name, patterns in self.typed_patterns.items())
+        settings = repr(([p.pattern for p in self.patterns], typed, self.sniffer is not None, self.fix_extension))
+        return hashlib.sha1(settings.encode('utf-8')).hexdigest()
 
-    def should_rename(self, filename: str) -> bool:
+    def should_rename(self, filename: str, patterns: list[re.Pattern] | None = None) -> bool:
         """ファイル名が変換対象かどうかを判定"""
-        return any(pattern.search(filename) for pattern in self.patterns)
+        return any(pattern.search(filename) for pattern in (self.patterns if patterns is None else patterns))
+
+    def rename_file(
+        self, file_path: bytes | str, filename: str, extension: str, background: bool = False,
+        patterns: list[re.Pattern] | None = None, new_name: str | None = None,
+    ) -> str | None:
+        """ファイル名を変換し、変換後のパスを返す（失敗時はNone）
+
+        new_name を指定した場合は連番を探さずにその名前でリネームする。
+        """
+        directory, name = os.path.split(os.fsdecode(file_path))
+        handle = self._directory(directory or os.curdir)
+        source = handle.join(name)
 
-    def rename_file(self, file_path: Path, filename: str, extension: str):
-        """ファイル名を変換する"""
         # 全パターンに一致する部分を削除
-        new_filename = filename
-        for pattern in self.patterns:
-            new_filename = pattern.sub('', new_filename)
-        new_file_path = file_path.parent / f"{new_filename}{extension}"
-
-        # 変換後のファイル名が既に存在する場合は連番を付与
-        base_name = new_filename
-        counter = 1
-        while new_file_path.exists():
-            new_filename = f"{base_name} ({counter})"
-            new_file_path = file_path.parent / f"{new_filename}{extension}"
-            counter += 1
+        new_filename = self._converted_name(filename, patterns)
 
+        trace = self._trace()
         try:
-            file_path.rename(new_file_path)
-            logger.info(f"リネーム完了: {file_path.name} -> {new_file_path.name}")
-        except PermissionError:
-            logger.error(f"ファイルにアクセスできません: {file_path}")
+            if self.destination:
+                # 移動先フォルダへ変換後の名前で移動（別ドライブの場合はコピー後に公開）
+                self.throttle.acquire(background)
+                with trace.span(SPAN_RENAME):
+                    new_path = self.fs.move_file(source, self.destination, f"{new_filename}{extension}")
+                new_name = os.path.basename(new_path)
+            else:
+                new_name = self._rename_in_place(handle, name, new_filename, extension, background, new_name)
+                new_path = handle.join(new_name)
+            logger.info(f"リネーム完了: {name} -> {new_name}")
+            self.stats.record_rename()
+            trace.mark('renamed')
+        except PermissionError as e:
+            message = f"ファイルにアクセスできません: {source}"
+            self.errors.error(error_class(e), handle.path, source, message)
+            self.stats.record_error(message)
+            trace.mark('error')
+            # ウイルス対策ソフトやビューアーによる一時的なロックの場合に備えて再試行する
+            self._schedule_retry(source, message)
+            return None
         except OSError as e:
-            logger.error(f"リネーム失敗: {e}")
+            message = f"リネーム失敗: {e}"
+            self.errors.error(error_class(e), handle.path, source, message)
+            self.stats.record_error(message)
+            trace.mark('error')
+            if isinstance(e, RootUnavailableError):
+                self._defer(source, e)
+            elif not isinstance(e, FileNotFoundError):
+                self._schedule_retry(source, message)
+            return None
+
+        if self.post_actions is not None and self.post_actions.submit(new_path, trace):
+            trace.hand_off()
+        return new_path
+
+    def _rename_in_place(
+        self, handle: Directory, name: str, new_filename: str, extension: str, background: bool,
+        new_name: str | None = None,
+    ) -> str:
+        """同じフォルダ内でリネームし、変換後のファイル名を返す"""
+        trace = self._trace()
+        if new_name is None:
+            # 変換後のファイル名が既に存在する場合は連番を付与
+            new_name = f"{new_filename}{extension}"
+            counter = 1
+            with trace.span(SPAN_COLLISION):
+                self.throttle.acquire(background)
+                while handle.exists(new_name):
+                    new_name = f"{new_filename} ({counter}){extension}"
+                    counter += 1
+                    self.throttle.acquire(background)
+
+        self.throttle.acquire(background)
+        with trace.span(SPAN_RENAME):
+            handle.rename(name, new_name)
+        return new_name
+
@@ -0,0 +1,363 @@
+import errno
+import itertools
+import os
+import stat as stat_module
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import ParamSpec, TypeVar
+
+from service.directory_handle import Directory, DirectoryHandle, ScandirIterator, split_name
+from service.file_mover import ProgressCallback, move_file
+from service.timer_queue import TimerQueue
+
+_P = ParamSpec('_P')
+_T = TypeVar('_T')
+
+
+class FileSystem(ABC):
+    """リネーム処理が使うファイルシステムと時計"""
+
+    @abstractmethod
+    def open_directory(self, path: str) -> Directory:
+        """フォルダのハンドルを開く（フォルダがない場合はOSError）"""
+
+    @abstractmethod
+    def lexists(self, path: str) -> bool:
+        """パスが存在するか（シンボリックリンクはリンク自体を確認）"""
+
+    @abstractmethod
+    def move_file(self, src_path: str, dst_dir: str, dst_name: str, progress: ProgressCallback | None = None) -> str:
+        """ファイルを移動先フォルダへ移動し、移動後のパスを返す（同名のファイルがある場合は連番を付与）
+
+        progress にはコピーの進捗（コピー済みのバイト数, 全体のバイト数）を通知する。
+        """
+
+    @abstractmethod
+    def monotonic(self) -> float:
+        """待機時間の計測に使う時計（秒）"""
+
+    @abstractmethod
+    def sleep(self, seconds: float):
+        """seconds 秒待機する"""
+
+    @abstractmethod
+    def create_timers(self) -> TimerQueue:
+        """この時計で動作するタイマーを作成する"""
+
+    def create_executor(self, max_workers: int, name: str) -> Executor:
+        """タイマーから渡されたリネームや走査を実行するスレッドを作成する"""
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    def time(self) -> float:
+        """ファイルの更新時刻と比較する現在時刻（エポック秒）"""
+        return time.time()
+
+    def close(self):
+        """使用しているスレッドなどを解放する"""
+
+
+class OSFileSystem(FileSystem):
+    """ローカルのOSのファイルシステムと実時間の時計"""
+
+    def open_directory(self, path: str) -> Directory:
+        return DirectoryHandle(path)
+
+    def lexists(self, path: str) -> bool:
+        return os.path.lexists(path)
+
+    def move_file(self, src_path: str, dst_dir: str, dst_name: str, progress: ProgressCallback | None = None) -> str:
+        return move_file(src_path, dst_dir, dst_name, progress)
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+    def create_timers(self) -> TimerQueue:
+        return TimerQueue()
+
+
+class InlineExecutor(Executor):
+    """渡された処理を呼び出したスレッドで実行する（仮想の時計を進めたときに処理まで完了させる）"""
+
+    def submit(self, fn: Callable[_P, _T], /, *args: _P.args, **kwargs: _P.kwargs) -> Future[_T]:
+        future: Future[_T] = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def _not_found(path: str) -> FileNotFoundError:
+    return FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+
+
+@dataclass
+class _MemoryFile:
+    ino: int
+    data: bytes
+    mtime_ns: int
+
+
+class MemoryDirEntry:
+    """os.DirEntry と同じ属性を持つ、メモリ上のフォルダのエントリ"""
+
+    __slots__ = ('name', 'path', '_stat')
+
+    def __init__(self, name: str, path: str, stat: os.stat_result):
+        self.name = name
+        self.path = path
+        self._stat = stat
+
+    def is_file(self, follow_symlinks: bool = True) -> bool:
+        return stat_module.S_ISREG(self._stat.st_mode)
+
+    def is_dir(self, follow_symlinks: bool = True) -> bool:
+        return stat_module.S_ISDIR(self._stat.st_mode)
+
+    def is_symlink(self) -> bool:
+        return False
+
+    def stat(self, follow_symlinks: bool = True) -> os.stat_result:
+        return self._stat
+
+
+class _MemoryScandir:
+    """os.scandir と同様に with 文で使えるエントリの一覧"""
+
+    def __init__(self, entries: list[MemoryDirEntry]):
+        self._entries = entries
+
+    def __iter__(self) -> Iterator[MemoryDirEntry]:
+        return iter(self._entries)
+
+    def __enter__(self) -> '_MemoryScandir':
+        return self
+
+    def __exit__(self, *exc_info: object) -> bool:
+        return False
+
+
+class MemoryDirectory:
+    """InMemoryFileSystem のフォルダのハンドル"""
+
+    def __init__(self, fs: 'InMemoryFileSystem', path: str):
+        self.path = path
+        self._fs = fs
+
+    def stat(self, name: str) -> os.stat_result | None:
+        return self._fs._stat(self.path, name)
+
+    def exists(self, name: str) -> bool:
+        return self.stat(name) is not None
+
+    def rename(self, src_name: str, dst_name: str):
+        self._fs._rename(self.path, src_name, self.path, dst_name)
+
+    def read_head(self, name: str, size: int) -> bytes:
+        return self._fs._read(self.path, name)[:size]
+
+    def scandir(self) -> ScandirIterator:
+        return _MemoryScandir(self._fs._entries(self.path))
+
+    def join(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def close(self):
+        pass
+
+
+class InMemoryFileSystem(FileSystem):
+    """メモリ上のファイルシステムと仮想の時計（ベンチマーク・テスト用）
+
+    sleep は待機せずに仮想の時計を進める。タイマーは advance で時計を進めたときに実行する。
+    latency（または set_latency）で操作ごとの遅延を指定すると、遅い共有フォルダを再現できる
+    （既定では仮想の時計を進めるのみ、real=True の場合は実際に待機する）。
+    """
+
+    def __init__(self, latency: float = 0.0, device: int = 1):
+        self.latency = latency
+        self.device = device
+        self.operations = 0
+        self._now = 0.0
+        self._directories: dict[str, dict[str, _MemoryFile]] = {}
+        self._latencies: dict[str, tuple[float, bool]] = {}
+        self._inodes = itertools.count(1)
+        self._timers: list[TimerQueue] = []
+        self._lock = threading.RLock()
+
+    # --- テスト・ベンチマーク用の操作 ---
+
+    def makedirs(self, path: str):
+        path = os.path.normpath(path)
+        with self._lock:
+            while path not in self._directories:
+                self._directories[path] = {}
+                parent = os.path.dirname(path)
+                if parent == path:
+                    break
+                path = parent
+
+    def write(self, path: str, data: bytes = b''):
+        """ファイルを作成・上書きする（フォルダは自動で作成）"""
+        directory, name = os.path.split(os.path.normpath(path))
+        self.makedirs(directory)
+        with self._lock:
+            files = self._directories[directory]
+            current = files.get(name)
+            ino = current.ino if current is not None else next(self._inodes)
+            files[name] = _MemoryFile(ino, data, int(self._now * 1_000_000_000))
+
+    def remove(self, path: str):
+        directory, name = os.path.split(os.path.normpath(path))
+        with self._lock:
+            if self._directories.get(directory, {}).pop(name, None) is None:
+                raise _not_found(path)
+
+    def listdir(self, path: str) -> list[str]:
+        """フォルダ内のファイル名（名前順）"""
+        with self._lock:
+            files = self._directories.get(os.path.normpath(path))
+            if files is None:
+                raise _not_found(path)
+            return sorted(files)
+
+    def read(self, path: str) -> bytes:
+        return self._read(*os.path.split(os.path.normpath(path)))
+
+    def set_latency(self, directory: str, seconds: float, real: bool = False):
+        """フォルダ内の操作ごとの遅延を設定する（real=True の場合は実際に待機する）"""
+        with self._lock:
+            self._latencies[os.path.normpath(directory)] = (seconds, real)
+
+    def advance(self, seconds: float) -> int:
+        """仮想の時計を進め、期限を過ぎたタイマーを実行して件数を返す"""
+        with self._lock:
+            self._now += seconds
+            timers = list(self._timers)
+        executed = 0
+        for timers_queue in timers:
+            # タイマーの処理で登録された、期限を過ぎたタイマーも実行する
+            while count := timers_queue.run_pending(self._now):
+                executed += count
+        return executed
+
+    # --- FileSystem ---
+
+    def open_directory(self, path: str) -> Directory:
+        normalized = os.path.normpath(path)
+        self._operate(normalized)
+        with self._lock:
+            if normalized not in self._directories:
+                raise _not_found(path)
+        return MemoryDirectory(self, normalized)
+
+    def lexists(self, path: str) -> bool:
+        path = os.path.normpath(path)
+        directory, name = os.path.split(path)
+        self._operate(directory)
+        with self._lock:
+            return path in self._directories or name in self._directories.get(directory, {})
+
+    def move_file(self, src_path: str, dst_dir: str, dst_name: str, progress: ProgressCallback | None = None) -> str:
+        src_directory, src_name = os.path.split(os.path.normpath(src_path))
+        dst_dir = os.path.normpath(dst_dir)
+        self._operate(dst_dir)
+        self.makedirs(dst_dir)
+        with self._lock:
+            # file_mover.unique_name と同じ規則で連番を付与する
+            stem, extension = split_name(dst_name)
+            candidate = dst_name
+            counter = 1
+            while candidate in self._directories[dst_dir]:
+                candidate = f"{stem} ({counter}){extension}"
+                counter += 1
+            self._rename(src_directory, src_name, dst_dir, candidate)
+            size = len(self._directories[dst_dir][candidate].data)
+        if progress is not None:
+            progress(size, size)
+        return os.path.join(dst_dir, candidate)
+
+    def monotonic(self) -> float:
+        return self._now
+
+    def time(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float):
+        with self._lock:
+            self._now += max(seconds, 0.0)
+
+    def create_timers(self) -> TimerQueue:
+        timers = TimerQueue(clock=self.monotonic, autostart=False)
+        with self._lock:
+            self._timers.append(timers)
+        return timers
+
+    def create_executor(self, max_workers: int, name: str) -> Executor:
+        return InlineExecutor()
+
+    # --- MemoryDirectory から呼び出す操作 ---
+
+    def _operate(self, directory: str):
+        """操作の回数を数え、設定された遅延を加える"""
+        with self._lock:
+            self.operations += 1
+            seconds, real = self._latencies.get(directory, (self.latency, False))
+            if seconds > 0 and not real:
+                self._now += seconds
+        if seconds > 0 and real:
+            time.sleep(seconds)
+
+    def _stat(self, directory: str, name: str) -> os.stat_result | None:
+        self._operate(directory)
+        with self._lock:
+            file = self._directories.get(directory, {}).get(name)
+            if file is None:
+                return None
+            return self._stat_result(file)
+
+    def _stat_result(self, file: _MemoryFile) -> os.stat_result:
+        seconds = file.mtime_ns / 1_000_000_000
+        fields = [
+            stat_module.S_IFREG | 0o644, file.ino, self.device, 1, 0, 0, len(file.data),
+            int(seconds), int(seconds), int(seconds), seconds, seconds, seconds,
+            file.mtime_ns, file.mtime_ns, file.mtime_ns,
+        ]
+        return os.stat_result(fields + [0] * (os.stat_result.n_fields - len(fields)))
+
+    def _rename(self, src_directory: str, src_name: str, dst_directory: str, dst_name: str):
+        self._operate(src_directory)
+        with self._lock:
+            files = self._directories.get(src_directory, {})
+            if src_name not in files:
+                raise _not_found(os.path.join(src_directory, src_name))
+            if dst_directory not in self._directories:
+                raise _not_found(dst_directory)
+            # os.rename と同様に既存のファイルは置き換える
+            self._directories[dst_directory][dst_name] = files.pop(src_name)
+
+    def _read(self, directory: str, name: str) -> bytes:
+        self._operate(directory)
+        with self._lock:
+            file = self._directories.get(directory, {}).get(name)
+            if file is None:
+                raise _not_found(os.path.join(directory, name))
+            return file.data
+
+    def _entries(self, directory: str) -> list[MemoryDirEntry]:
+        self._operate(directory)
+        with self._lock:
+            files = self._directories.get(directory)
+            if files is None:
+                raise _not_found(directory)
+            return [
+                MemoryDirEntry(name, os.path.join(directory, name), self._stat_result(file))
+                for name, file in files.items()
+            ]
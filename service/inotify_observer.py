@@ -0,0 +1,340 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+from collections.abc import Callable
+
+from watchdog.events import (
+    DirCreatedEvent,
+    DirMovedEvent,
+    FileClosedEvent,
+    FileCreatedEvent,
+    FileDeletedEvent,
+    FileMovedEvent,
+    FileSystemEvent,
+    FileSystemEventHandler,
+)
+
+logger = logging.getLogger(__name__)
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_UNMOUNT = 0x00002000
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+# 変更・オープン・属性変更などのイベントはカーネルで除外する。
+# IN_MOVED_FROM はフォルダ内の名前の変更を移動イベントにまとめるためのみに使う
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MOVED_FROM | IN_ONLYDIR
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+# 1回の読み込みの大きさ（イベント1件は16バイト + 名前）
+_READ_SIZE = 256 * 1024
+# 1回に受け渡すイベントの上限
+_MAX_BATCH = 4096
+# フォルダ外への移動（対応する IN_MOVED_TO がない）と判定するまでの待ち時間（ミリ秒）
+_MOVE_PAIR_TIMEOUT_MS = 100
+
+# 対応する IN_MOVED_TO を待っている IN_MOVED_FROM（cookie ごとの (wd, 名前, mask, 受信時刻)）
+_MovedFrom = dict[int, tuple[int, bytes, int, float]]
+
+_libc = None
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        _libc.inotify_init1.argtypes = [ctypes.c_int]
+        _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return _libc
+
+
+def inotify_available() -> bool:
+    """inotifyを使用できるか（Linuxのみ）"""
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        return hasattr(_load_libc(), 'inotify_init1')
+    except OSError:
+        return False
+
+
+def _raise_errno(message: str, path: str | None = None):
+    code = ctypes.get_errno()
+    raise OSError(code, f"{message}: {os.strerror(code)}", path)
+
+
+def parse_events(buffer: bytes) -> list[tuple[int, int, int, bytes]]:
+    """read で読み込んだ inotify_event の並びを (wd, mask, cookie, 名前) のリストに変換する"""
+    events = []
+    view = memoryview(buffer)
+    offset = 0
+    unpack = _EVENT_HEADER.unpack_from
+    header_size = _EVENT_HEADER.size
+    while offset + header_size <= len(buffer):
+        wd, mask, cookie, length = unpack(buffer, offset)
+        offset += header_size
+        # 名前は NUL で埋められている
+        name = bytes(view[offset:offset + length]).rstrip(b'\0')
+        offset += length
+        events.append((wd, mask, cookie, name))
+    return events
+
+
+class _BatchQueue(queue.Queue):
+    """イベントのまとまりを受け渡すキュー（qsize は未処理のイベント数）"""
+
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self._events = 0
+
+    def _put(self, item):
+        super()._put(item)
+        self._events += len(item)
+
+    def _get(self):
+        batch = super()._get()
+        self._events -= len(batch)
+        return batch
+
+    def _qsize(self):
+        return self._events
+
+
+_STOP = [None]
+
+
+class InotifyObserver(threading.Thread):
+    """inotifyを直接使う、watchdogのObserverと同じ使い方ができる監視（Linuxのみ）
+
+    ファイルの作成・書き込み完了・移動のみをカーネルで選別するため、大量の書き込み（変更イベント）が
+    あってもPythonのイベントを生成しない。読み込み用のスレッドが大きなバッファでまとめて読み込み、
+    このスレッドがまとめてハンドラーに渡す。監視はフォルダ直下のみ（recursive=False）に対応する。
+    """
+
+    def __init__(self, on_overflow: Callable[[], None] | None = None):
+        super().__init__(name='inotify-observer', daemon=True)
+        self.on_overflow = on_overflow
+        self.event_queue = _BatchQueue()
+        # 監視ディスクリプタごとの (フォルダのパス, ハンドラー)
+        self._watches: dict[int, tuple[str, list[FileSystemEventHandler]]] = {}
+        self._lock = threading.Lock()
+        self._reader: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._closed = False
+        self._fd = _load_libc().inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            _raise_errno("inotifyを初期化できません")
+        self._wake_read, self._wake_write = os.pipe()
+
+    @property
+    def emitters(self) -> list[threading.Thread]:
+        """イベントを読み込むスレッド（監視の確認用）"""
+        return [self._reader] if self._reader is not None else []
+
+    def schedule(self, event_handler: FileSystemEventHandler, path: str, recursive: bool = False):
+        """フォルダの監視を登録する"""
+        if recursive:
+            raise ValueError("inotifyの監視はサブフォルダに対応していません")
+        path = os.fsdecode(path)
+        wd = _load_libc().inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            _raise_errno("フォルダを監視できません", path)
+        with self._lock:
+            _, handlers = self._watches.setdefault(wd, (path, []))
+            handlers.append(event_handler)
+
+    def start(self):
+        self._reader = threading.Thread(target=self._read_loop, name='inotify-reader', daemon=True)
+        self._reader.start()
+        super().start()
+
+    def stop(self):
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        with self._lock:
+            if not self._closed:
+                # 読み込み用のスレッドの待機を終了させる
+                os.write(self._wake_write, b'\0')
+        if self._reader is None:
+            self._close()
+        else:
+            self.event_queue.put(_STOP)
+
+    def join(self, timeout: float | None = None):
+        if self._reader is None:
+            return
+        self._reader.join(timeout)
+        super().join(timeout)
+
+    def _close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for fd in (self._fd, self._wake_read, self._wake_write):
+                os.close(fd)
+
+    # --- 読み込み用のスレッド ---
+
+    def _read_loop(self):
+        poller = select.poll()
+        poller.register(self._fd, select.POLLIN)
+        poller.register(self._wake_read, select.POLLIN)
+        moved_from: _MovedFrom = {}
+        try:
+            while not self._stopped.is_set():
+                timeout = None
+                if moved_from:
+                    # 最も古い IN_MOVED_FROM の期限まで待つ（受信順に並んでいる）
+                    oldest = next(iter(moved_from.values()))[3]
+                    timeout = max((oldest - time.monotonic()) * 1000 + _MOVE_PAIR_TIMEOUT_MS, 0)
+                ready = poller.poll(timeout)
+                if self._stopped.is_set():
+                    return
+                if not ready:
+                    self._put(self._expire_moved(moved_from))
+                    continue
+                if not self._read_available(moved_from):
+                    return
+        except Exception:
+            logger.exception("inotifyのイベントの読み込みでエラーが発生しました")
+        finally:
+            # 停止されていない場合は、監視フォルダの消失などで監視が終了した
+            self.event_queue.put(_STOP)
+
+    def _read_available(self, moved_from: _MovedFrom) -> bool:
+        """読み込めるだけ読み込んでハンドラーに渡す（監視がすべて終了した場合はFalse）"""
+        batch: list[tuple[list[FileSystemEventHandler], FileSystemEvent]] = []
+        while True:
+            try:
+                buffer = os.read(self._fd, _READ_SIZE)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            for wd, mask, cookie, name in parse_events(buffer):
+                if mask & IN_Q_OVERFLOW:
+                    self._overflow()
+                    continue
+                if mask & IN_IGNORED:
+                    if not self._remove_watch(wd):
+                        self._put(batch)
+                        return False
+                    continue
+                if mask & IN_MOVED_FROM:
+                    moved_from[cookie] = (wd, name, mask, time.monotonic())
+                    continue
+                event = self._event(wd, mask, cookie, name, moved_from)
+                if event is not None:
+                    batch.append((self._watches[wd][1], event))
+            # イベントが続いている間も、期限を過ぎた移動はフォルダ外への移動として渡す
+            batch.extend(self._expire_moved(moved_from))
+            if len(batch) >= _MAX_BATCH:
+                self._put(batch)
+                batch = []
+        self._put(batch)
+        return True
+
+    def _event(
+        self, wd: int, mask: int, cookie: int, name: bytes, moved_from: _MovedFrom,
+    ) -> FileSystemEvent | None:
+        """inotifyのイベントをwatchdogのイベントに変換する（ハンドラーに渡さない場合はNone）"""
+        directory = self._directory(wd)
+        if directory is None or not name:
+            return None
+        path = os.path.join(directory, os.fsdecode(name))
+        is_directory = bool(mask & IN_ISDIR)
+        if mask & IN_MOVED_TO:
+            source_wd, source_name, _, _ = moved_from.pop(cookie, (-1, b'', 0, 0.0))
+            source_directory = self._directory(source_wd)
+            if source_directory is None:
+                # フォルダ外から移動されてきたファイルは watchdog と同様に作成として扱う
+                return DirCreatedEvent(path) if is_directory else FileCreatedEvent(path)
+            src_path = os.path.join(source_directory, os.fsdecode(source_name))
+            return DirMovedEvent(src_path, path) if is_directory else FileMovedEvent(src_path, path)
+        if mask & IN_CREATE:
+            return DirCreatedEvent(path) if is_directory else FileCreatedEvent(path)
+        if mask & IN_CLOSE_WRITE and not is_directory:
+            return FileClosedEvent(path)
+        return None
+
+    def _expire_moved(self, moved_from: _MovedFrom) -> list[tuple[list[FileSystemEventHandler], FileSystemEvent]]:
+        """期限までに IN_MOVED_TO のなかった移動（フォルダ外へ移動されたファイル）を削除として返す"""
+        deadline = time.monotonic() - _MOVE_PAIR_TIMEOUT_MS / 1000
+        expired = []
+        for cookie, (wd, name, mask, received) in list(moved_from.items()):
+            if received > deadline:
+                break
+            del moved_from[cookie]
+            directory = self._directory(wd)
+            if directory is not None and not mask & IN_ISDIR:
+                expired.append((self._watches[wd][1], FileDeletedEvent(os.path.join(directory, os.fsdecode(name)))))
+        return expired
+
+    def _directory(self, wd: int) -> str | None:
+        watch = self._watches.get(wd)
+        return watch[0] if watch is not None else None
+
+    def _remove_watch(self, wd: int) -> bool:
+        """削除・アンマウントされたフォルダの監視を取り除く（監視が残っている場合はTrue）"""
+        with self._lock:
+            watch = self._watches.pop(wd, None)
+            remaining = bool(self._watches)
+        if watch is not None:
+            logger.warning(f"監視フォルダが削除またはアンマウントされたため、監視を終了しました: {watch[0]}")
+        return remaining
+
+    def _overflow(self):
+        logger.warning("inotifyのイベントキューが溢れたため、一部のイベントを取得できませんでした")
+        if self.on_overflow is not None:
+            try:
+                self.on_overflow()
+            except Exception:
+                logger.exception("イベントの取りこぼしの処理でエラーが発生しました")
+
+    def _put(self, batch: list[tuple[list[FileSystemEventHandler], FileSystemEvent]]):
+        if batch:
+            self.event_queue.put(batch)
+
+    # --- ハンドラーを呼び出すスレッド ---
+
+    def run(self):
+        try:
+            while True:
+                batch = self.event_queue.get()
+                if batch is _STOP:
+                    return
+                self._dispatch(batch)
+        finally:
+            # 読み込み用のスレッドの終了後にファイルディスクリプタを閉じる
+            if self._reader is not None:
+                self._reader.join()
+            self._close()
+
+    def _dispatch(self, batch: list[tuple[list[FileSystemEventHandler], FileSystemEvent]]):
+        for handlers, event in batch:
+            for handler in handlers:
+                try:
+                    handler.dispatch(event)
+                except Exception:
+                    logger.exception(f"イベントの処理でエラーが発生しました: {event.src_path}")
@@ -0,0 +1,119 @@
+import ctypes
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Linux ioprio_set のシステムコール番号
+_IOPRIO_SYSCALLS = {
+    'x86_64': 251,
+    'i386': 289,
+    'i686': 289,
+    'aarch64': 30,
+    'armv7l': 314,
+}
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_IDLE = 3
+_IOPRIO_CLASS_SHIFT = 13
+
+# Windows SetThreadPriority のバックグラウンドモード（CPU・I/O優先度を同時に下げる）
+_THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+
+
+class IOThrottle:
+    """ファイル操作（stat・リネーム・スキャン）の回数を制限するトークンバケット
+
+    通常のイベント処理はバックグラウンドのスキャンより優先してトークンを取得する。
+    ops_per_second が0以下の場合は制限しない。
+    """
+
+    def __init__(self, ops_per_second: float, burst: int = 10):
+        self.ops_per_second = ops_per_second
+        self.capacity = float(max(burst, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._live_waiting = 0
+        self._condition = threading.Condition()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ops_per_second > 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.ops_per_second)
+            self._updated = now
+
+    def acquire(self, background: bool = False):
+        """トークンを1つ取得する（取得できるまで待機）"""
+        if not self.enabled:
+            return
+
+        with self._condition:
+            if not background:
+                self._live_waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    # バックグラウンド処理は通常処理の待ちがない場合のみ取得する
+                    if self._tokens >= 1 and (not background or self._live_waiting == 0):
+                        self._tokens -= 1
+                        return
+                    if self._tokens >= 1:
+                        # 通常処理の待ちが終わった時点で通知される
+                        self._condition.wait()
+                        continue
+                    self._condition.wait((1 - self._tokens) / self.ops_per_second)
+            finally:
+                if not background:
+                    self._live_waiting -= 1
+                    self._condition.notify_all()
+
+
+def lower_current_thread_priority():
+    """呼び出し元スレッドのCPU・I/O優先度を下げる
+
+    スレッド単位で変更できない環境（macOSなど）では変更しない（os.nice はプロセス全体が対象になるため）。
+    """
+    if sys.platform == 'win32':
+        _lower_priority_windows()
+    elif sys.platform.startswith('linux'):
+        _lower_priority_linux()
+    else:
+        logger.debug(f"この環境ではスレッド単位で優先度を変更できないため、変更しません: {sys.platform}")
+
+
+def _lower_priority_windows():
+    try:
+        kernel32 = ctypes.windll.kernel32  # type: ignore[attr-defined]
+        if not kernel32.SetThreadPriority(kernel32.GetCurrentThread(), _THREAD_MODE_BACKGROUND_BEGIN):
+            logger.warning("スレッドをバックグラウンドモードに変更できませんでした")
+    except (AttributeError, OSError) as e:
+        logger.warning(f"スレッド優先度の変更に失敗しました: {e}")
+
+
+def _lower_priority_linux():
+    # Linuxではsetpriority/ioprio_setにスレッドIDを渡すとそのスレッドのみが対象になる
+    thread_id = threading.get_native_id()
+    try:
+        current = os.getpriority(os.PRIO_PROCESS, thread_id)
+        os.setpriority(os.PRIO_PROCESS, thread_id, min(current + 10, 19))
+    except OSError as e:
+        logger.warning(f"CPU優先度の変更に失敗しました: {e}")
+
+    syscall_number = _IOPRIO_SYSCALLS.get(platform.machine())
+    if syscall_number is None:
+        return
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        ioprio = _IOPRIO_CLASS_IDLE << _IOPRIO_CLASS_SHIFT
+        if libc.syscall(syscall_number, _IOPRIO_WHO_PROCESS, thread_id, ioprio) != 0:
+            logger.warning(f"I/O優先度の変更に失敗しました: {os.strerror(ctypes.get_errno())}")
+    except (AttributeError, OSError) as e:
+        logger.warning(f"I/O優先度の変更に失敗しました: {e}")
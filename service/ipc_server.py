@@ -0,0 +1,314 @@
+import json
+import logging
+import os
+import queue
+import secrets
+import stat
+import sys
+import tempfile
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client, Connection, Listener
+
+logger = logging.getLogger(__name__)
+
+# 1つの接続で処理中にできるパスの上限（超えた場合は読み込みを待たせる）
+_MAX_IN_FLIGHT = 1024
+
+# 送信スレッドに接続を閉じさせる
+_CLOSE = object()
+
+STATUS_FAILED = 'failed'
+STATUS_IGNORED = 'ignored'
+
+
+def default_address() -> str:
+    """既定の接続先（WindowsはNamed Pipe、それ以外はUnixドメインソケット）"""
+    if sys.platform == 'win32':
+        return r'\\.\pipe\FileFolderRenamer'
+    directory = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(directory, f"FileFolderRenamer-{os.getuid()}.sock")
+
+
+def default_authkey() -> bytes | None:
+    """既定の認証キー（Windowsのみ。Named Pipeには接続できるユーザーの制限がないため）
+
+    キーはユーザーごとのフォルダ（%LOCALAPPDATA%）に作成し、サーバーとクライアントで共有する。
+    Unixドメインソケットはファイルの権限で接続を制限するため使用しない。
+    """
+    if sys.platform != 'win32':
+        return None
+    directory = os.path.join(os.environ.get('LOCALAPPDATA') or os.path.expanduser('~'), 'FileFolderRenamer')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, 'ipc.key')
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o600)
+    except FileExistsError:
+        with open(path, 'rb') as f:
+            return f.read()
+    with os.fdopen(fd, 'wb') as f:
+        key = secrets.token_bytes(32)
+        f.write(key)
+    return key
+
+
+def _within(path: str, root: str) -> bool:
+    try:
+        return os.path.commonpath([path, root]) == root
+    except ValueError:
+        # ドライブが異なる場合
+        return False
+
+
+class SubmitServer:
+    """書き込みを終えたファイルのパスを受け付けて、待機せずにリネームするローカルAPI
+
+    1つの接続で要求を続けて送信でき、パスごとの結果は処理が終わった順に返す。
+    要求: {"id": 任意, "paths": ["...", ...]}（"path" で1件のみでも可）
+    応答: {"id": 要求のid, "path": "...", "status": "renamed" など, "new_path": "..."} をパスごとに1つ、
+    最後に {"id": 要求のid, "done": true, "count": 件数}
+    """
+
+    def __init__(
+        self,
+        address: str,
+        submit: Callable[[str], tuple[str, str | None]],
+        root: str,
+        workers: int = 4,
+        authkey: bytes | None = None,
+    ):
+        self.address = address
+        self.submit = submit
+        self.root = os.path.realpath(root)
+        self.workers = workers
+        self.authkey = authkey if authkey is not None else default_authkey()
+        self.submitted = 0
+        self._listener: Listener | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if sys.platform != 'win32':
+            self._remove_stale_socket()
+            # 他のユーザーから接続されないよう、作成時から所有者のみが読み書きできるソケットにする
+            # （作成後の chmod では、それまでの間に接続される）
+            previous_umask = os.umask(0o177)
+            try:
+                listener = Listener(self.address, authkey=self.authkey)
+            finally:
+                os.umask(previous_umask)
+        else:
+            listener = Listener(self.address, authkey=self.authkey)
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ipc-submit')
+        self._listener = listener
+        self._executor = executor
+        self._thread = threading.Thread(
+            target=self._accept_loop, args=(listener, executor), name='ipc-server', daemon=True
+        )
+        self._thread.start()
+        logger.info(f"ファイルの受け付けを開始しました: {self.address}")
+
+    def _remove_stale_socket(self):
+        # 前回の異常終了で残ったソケットファイルを削除する
+        try:
+            mode = os.lstat(self.address).st_mode
+        except FileNotFoundError:
+            return
+        if stat.S_ISSOCK(mode):
+            os.remove(self.address)
+
+    def stop(self):
+        if self._listener is None or self._stopped.is_set():
+            return
+        self._stopped.set()
+        try:
+            # 接続待ちの accept を終了させる
+            Client(self.address, authkey=self.authkey).close()
+        except OSError:
+            pass
+        if self._thread is not None:
+            self._thread.join(5.0)
+        self._listener.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        logger.info("ファイルの受け付けを停止しました")
+
+    def _accept_loop(self, listener: Listener, executor: ThreadPoolExecutor):
+        while not self._stopped.is_set():
+            try:
+                connection = listener.accept()
+            except Exception as e:
+                if self._stopped.is_set():
+                    return
+                # 認証に失敗した接続などは破棄して受け付けを続ける
+                logger.warning(f"接続を受け付けられませんでした: {e}")
+                continue
+            if self._stopped.is_set():
+                connection.close()
+                return
+            threading.Thread(
+                target=self._serve, args=(connection, executor), name='ipc-connection', daemon=True
+            ).start()
+
+    def _serve(self, connection: Connection, executor: ThreadPoolExecutor):
+        """接続ごとに要求を読み込み、パスごとにワーカーで処理する
+
+        応答は接続ごとの送信スレッドが送る。クライアントが受信せず送信が詰まっても、
+        要求の読み込みとワーカーの処理は止まらない。
+        """
+        lock = threading.Lock()
+        in_flight = threading.BoundedSemaphore(_MAX_IN_FLIGHT)
+        outbox: queue.SimpleQueue = queue.SimpleQueue()
+        # 要求ごとの [未処理の件数, 全件数]
+        requests: dict[object, list[int]] = {}
+        state = {'outstanding': 0, 'reading': True}
+
+        def send(message: dict | object):
+            # 送信スレッドへ渡すのみでブロックしない（応答の順序を保つため lock の中で呼ぶ）
+            outbox.put(message)
+
+        def write():
+            connected = True
+            try:
+                while True:
+                    message = outbox.get()
+                    if message is _CLOSE:
+                        return
+                    if not connected:
+                        continue
+                    try:
+                        connection.send_bytes(json.dumps(message, ensure_ascii=False).encode('utf-8'))
+                    except OSError:
+                        # クライアントが切断した場合は残りの応答を破棄する
+                        connected = False
+            finally:
+                connection.close()
+
+        def finish(request_id, path: str, status: str, new_path: str | None):
+            in_flight.release()
+            with lock:
+                send({'id': request_id, 'path': path, 'status': status, 'new_path': new_path})
+                remaining = requests[request_id]
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    del requests[request_id]
+                    send({'id': request_id, 'done': True, 'count': remaining[1]})
+                state['outstanding'] -= 1
+                if not state['reading'] and state['outstanding'] == 0:
+                    send(_CLOSE)
+
+        def process(request_id, path: str):
+            try:
+                status, new_path = self._submit_path(path)
+            except Exception as e:
+                logger.error(f"受け付けたファイルの処理に失敗しました: {path}: {e}")
+                status, new_path = STATUS_FAILED, None
+            finish(request_id, path, status, new_path)
+
+        threading.Thread(target=write, name='ipc-writer', daemon=True).start()
+        try:
+            while not self._stopped.is_set():
+                try:
+                    request = json.loads(connection.recv_bytes())
+                    request_id = request.get('id')
+                    paths = request['paths'] if 'paths' in request else [request['path']]
+                    if not isinstance(paths, list) or not all(isinstance(path, str) for path in paths):
+                        raise ValueError("paths はパスの配列で指定してください")
+                except (ValueError, KeyError, AttributeError) as e:
+                    with lock:
+                        send({'id': None, 'error': f"要求を読み込めません: {e}"})
+                    continue
+
+                with lock:
+                    if request_id in requests:
+                        send({'id': request_id, 'error': "処理中の要求と id が重複しています"})
+                        continue
+                    if not paths:
+                        send({'id': request_id, 'done': True, 'count': 0})
+                        continue
+                    requests[request_id] = [len(paths), len(paths)]
+                    state['outstanding'] += len(paths)
+
+                for path in paths:
+                    # 処理待ちが上限に達した場合は読み込みを待たせる（ワーカーは送信を待たないため必ず進む）
+                    in_flight.acquire()
+                    executor.submit(process, request_id, path)
+        except (EOFError, OSError, RuntimeError):
+            # クライアントの切断、または停止によりワーカーが終了した場合
+            pass
+        finally:
+            with lock:
+                state['reading'] = False
+                if state['outstanding'] == 0 or self._stopped.is_set():
+                    send(_CLOSE)
+
+    def _submit_path(self, path: str) -> tuple[str, str | None]:
+        absolute = os.path.realpath(path)
+        if not _within(absolute, self.root):
+            logger.warning(f"監視フォルダ外のファイルは処理しません: {path}")
+            return STATUS_IGNORED, None
+        self.submitted += 1
+        return self.submit(absolute)
+
+
+def submit_paths(
+    paths: Iterable[str], address: str | None = None, authkey: bytes | None = None, batch_size: int = 500,
+    max_pending: int | None = None,
+) -> Iterator[dict]:
+    """パスをまとめて送信し、パスごとの結果を処理が終わった順に返す
+
+    結果を受け取っていないパスが max_pending（既定は batch_size の4倍）を超える場合は、
+    次の要求を送信する前に結果を受け取る。
+    """
+    if authkey is None:
+        authkey = default_authkey()
+    limit = max(max_pending or batch_size * 4, batch_size)
+    with Client(address or default_address(), authkey=authkey) as connection:
+        # 要求ごとの結果を受け取っていない件数
+        remaining: dict[int, int] = {}
+        batch: list[str] = []
+        request_id = 0
+
+        def receive() -> dict | None:
+            message = json.loads(connection.recv_bytes())
+            message_id = message.get('id')
+            if 'error' in message:
+                logger.error(f"要求が拒否されました: {message['error']}")
+                remaining.pop(message_id, None)
+                return None
+            if message.get('done'):
+                remaining.pop(message_id, None)
+                return None
+            if message_id in remaining:
+                remaining[message_id] -= 1
+            return message
+
+        def send(batch: list[str]):
+            nonlocal request_id
+            request_id += 1
+            connection.send_bytes(json.dumps({'id': request_id, 'paths': batch}).encode('utf-8'))
+            remaining[request_id] = len(batch)
+
+        def drain(incoming: int) -> Iterator[dict]:
+            # 送信済みの要求の結果を受け取りながら送信を続ける
+            while remaining and (sum(remaining.values()) + incoming > limit or connection.poll()):
+                message = receive()
+                if message is not None:
+                    yield message
+
+        for path in paths:
+            batch.append(os.path.abspath(path))
+            if len(batch) >= batch_size:
+                yield from drain(len(batch))
+                send(batch)
+                batch = []
+        if batch:
+            yield from drain(len(batch))
+            send(batch)
+
+        while remaining:
+            message = receive()
+            if message is not None:
+                yield message
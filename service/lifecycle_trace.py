@@ -0,0 +1,193 @@
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections.abc import Callable
+from contextlib import contextmanager, nullcontext
+from logging.handlers import RotatingFileHandler
+
+# 記録する区間の名前
+SPAN_QUEUED = 'queued'
+SPAN_STABILITY_WAIT = 'stability_wait'
+SPAN_MATCH = 'match'
+SPAN_COLLISION = 'collision'
+SPAN_RENAME = 'rename'
+SPAN_POST_QUEUED = 'post_queued'
+SPAN_POST_PROCESS = 'post_process'
+
+SPAN_ORDER = (
+    SPAN_QUEUED, SPAN_STABILITY_WAIT, SPAN_MATCH, SPAN_COLLISION, SPAN_RENAME, SPAN_POST_QUEUED, SPAN_POST_PROCESS,
+)
+
+_NULL_CONTEXT = nullcontext()
+
+
+class NullTrace:
+    """サンプリング対象外のファイル用（何も記録しない）"""
+
+    handed_off = False
+    clock = staticmethod(time.monotonic)
+
+    def span(self, name: str):
+        return _NULL_CONTEXT
+
+    def mark(self, outcome: str):
+        pass
+
+    def hand_off(self):
+        pass
+
+    def resume(self):
+        pass
+
+    def add_span(self, name: str, start: float, end: float):
+        pass
+
+    def finish(self, outcome: str | None = None):
+        pass
+
+
+NULL_TRACE = NullTrace()
+
+
+class FileTrace:
+    """1ファイルのイベント受信から後処理完了までの区間を記録する"""
+
+    def __init__(self, tracer: 'LifecycleTracer', file_path: str, started: float | None = None):
+        self._tracer = tracer
+        # 区間の時刻はハンドラーと同じ時計で計測する
+        self.clock = tracer.clock
+        self.file_path = file_path
+        self.started = self.clock() if started is None else started
+        self.started_wall = time.time() - (self.clock() - self.started)
+        self.spans: list[tuple[str, float, float]] = []
+        self.outcome: str | None = None
+        # 記録を完了するスレッド（リネーム後の処理などへ引き渡した場合は引き渡し先のスレッドが完了する）
+        self._owner: int | None = threading.get_ident()
+
+    @contextmanager
+    def span(self, name: str):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, self.clock())
+
+    def add_span(self, name: str, start: float, end: float):
+        self.spans.append((name, start, end))
+
+    def mark(self, outcome: str):
+        """処理結果（renamed・skipped・missing・error）を記録"""
+        self.outcome = outcome
+
+    @property
+    def handed_off(self) -> bool:
+        """記録の完了を現在のスレッド以外に引き継いだか"""
+        return self._owner != threading.get_ident()
+
+    def hand_off(self):
+        """記録の完了を別のスレッドへ引き継ぐ"""
+        self._owner = None
+
+    def resume(self):
+        """引き継いだ記録を、引き継ぎ先のスレッドで再開する"""
+        self._owner = threading.get_ident()
+
+    def finish(self, outcome: str | None = None):
+        if outcome is not None:
+            self.outcome = outcome
+        self._tracer.write(self, self.clock())
+
+
+class LifecycleTracer:
+    """ファイルごとの処理区間をサンプリングしてJSONLに記録する
+
+    記録は専用のロガーとRotatingFileHandlerで行い、アプリケーションログには出力しない。
+    """
+
+    def __init__(self, output_path: str, sample_rate: float = 0.01,
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                 clock: Callable[[], float] = time.monotonic):
+        self.output_path = output_path
+        self.sample_rate = sample_rate
+        self.clock = clock
+        self._random = random.random
+        self._logger = logging.getLogger(f"{__name__}.{id(self)}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._handler = RotatingFileHandler(
+            output_path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+        )
+        self._handler.setFormatter(logging.Formatter('%(message)s'))
+        self._logger.addHandler(self._handler)
+
+    def start(self, file_path: bytes | str, started: float | None = None) -> FileTrace | NullTrace:
+        """サンプリング対象の場合は記録を開始する"""
+        if self.sample_rate <= 0 or (self.sample_rate < 1 and self._random() >= self.sample_rate):
+            return NULL_TRACE
+        return FileTrace(self, os.fsdecode(file_path), started)
+
+    def write(self, trace: FileTrace, finished: float):
+        record = {
+            'file': trace.file_path,
+            'time': round(trace.started_wall, 3),
+            'outcome': trace.outcome,
+            'total_ms': round((finished - trace.started) * 1000, 3),
+            'spans': [
+                [name, round((start - trace.started) * 1000, 3), round((end - start) * 1000, 3)]
+                for name, start, end in trace.spans
+            ],
+        }
+        self._logger.info(json.dumps(record, ensure_ascii=False))
+
+    def close(self):
+        self._logger.removeHandler(self._handler)
+        self._handler.close()
+
+
+def load_traces(paths: list[str]) -> list[dict]:
+    """記録ファイル（ローテーション済みを含む）から記録を読み込む"""
+    traces = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    traces.append(json.loads(line))
+    return traces
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """最近傍法によるパーセンタイル"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(max(math.ceil(fraction * len(ordered)) - 1, 0), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(traces: list[dict]) -> dict[str, dict[str, float]]:
+    """区間ごとの合計時間（1ファイルあたり）のp50・p99・最大を集計"""
+    if not traces:
+        return {}
+    durations: dict[str, list[float]] = {'total': []}
+    for trace in traces:
+        durations['total'].append(trace['total_ms'])
+        per_file: dict[str, float] = {}
+        for name, _, duration in trace['spans']:
+            per_file[name] = per_file.get(name, 0.0) + duration
+        for name, duration in per_file.items():
+            durations.setdefault(name, []).append(duration)
+
+    order = {name: i for i, name in enumerate(('total',) + SPAN_ORDER)}
+    return {
+        name: {
+            'count': len(values),
+            'p50': percentile(values, 0.50),
+            'p99': percentile(values, 0.99),
+            'max': max(values),
+        }
+        for name, values in sorted(durations.items(), key=lambda item: order.get(item[0], len(order)))
+    }
@@ -0,0 +1,41 @@
+import fnmatch
+import os
+import re
+
+
+class PathFilter:
+    """イベントのパスを待機・statの前に判定する軽量フィルター
+
+    除外globと除外拡張子を1つの正規表現にまとめ、ファイル名のみで判定する。
+    include_globs が空の場合は除外に該当しない全ファイルを対象とする。
+    """
+
+    def __init__(
+        self,
+        include_globs: list[str] | None = None,
+        exclude_globs: list[str] | None = None,
+        exclude_extensions: list[str] | None = None,
+    ):
+        exclude_patterns = list(exclude_globs or [])
+        for extension in exclude_extensions or []:
+            extension = extension if extension.startswith('.') else f".{extension}"
+            exclude_patterns.append(f"*{extension}")
+
+        self._include = self._compile(include_globs or [])
+        self._exclude = self._compile(exclude_patterns)
+
+    @staticmethod
+    def _compile(globs: list[str]) -> re.Pattern | None:
+        if not globs:
+            return None
+        # globは大文字小文字を区別しない（Windowsのファイル名規則に合わせる）
+        return re.compile('|'.join(fnmatch.translate(glob) for glob in globs), re.IGNORECASE)
+
+    def accepts(self, file_path: bytes | str) -> bool:
+        """パスが処理対象かどうかを判定"""
+        name = os.path.basename(os.fsdecode(file_path))
+        if self._exclude is not None and self._exclude.match(name):
+            return False
+        if self._include is not None and not self._include.match(name):
+            return False
+        return True
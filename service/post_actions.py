@@ -0,0 +1,218 @@
+import logging
+import os
+import queue
+import re
+import shlex
+import subprocess
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+
+from service.directory_handle import split_name
+from service.file_mover import move_file
+from service.lifecycle_trace import NULL_TRACE, SPAN_POST_PROCESS, SPAN_POST_QUEUED, FileTrace, NullTrace
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+_PLACEHOLDER = re.compile(r'\{(\w+)\}')
+_PLACEHOLDER_NAMES = ('path', 'dir', 'name', 'stem', 'ext', 'year', 'month', 'day')
+
+
+def check_template(template: str):
+    """テンプレートに不明なプレースホルダーがある場合は ValueError（設定の読み込み時に確認する）"""
+    unknown = sorted({name for name in _PLACEHOLDER.findall(template) if name not in _PLACEHOLDER_NAMES})
+    if unknown:
+        raise ValueError(
+            f"不明なプレースホルダーです: {', '.join('{' + name + '}' for name in unknown)}（{template}）"
+        )
+
+
+def expand_template(template: str, values: dict[str, str]) -> str:
+    """既知のプレースホルダーのみを置換する（それ以外の { } はそのまま残す）"""
+    return _PLACEHOLDER.sub(lambda match: values.get(match.group(1), match.group(0)), template)
+
+
+def _placeholders(file_path: str) -> dict[str, str]:
+    """テンプレートで使用できるプレースホルダーの値"""
+    directory, name = os.path.split(file_path)
+    stem, extension = split_name(name)
+    now = datetime.now()
+    return {
+        'path': file_path,
+        'dir': directory,
+        'name': name,
+        'stem': stem,
+        'ext': extension,
+        'year': f"{now.year:04d}",
+        'month': f"{now.month:02d}",
+        'day': f"{now.day:02d}",
+    }
+
+
+class PostRenameAction(ABC):
+    """リネーム後に実行する処理"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @abstractmethod
+    def run(self, file_path: str) -> str:
+        """処理を実行し、処理後のファイルパスを返す"""
+
+
+class MoveToFolderAction(PostRenameAction):
+    """テンプレートで指定したフォルダへ移動する（例: D:\\archive\\{year}\\{month}）"""
+
+    def __init__(self, template: str):
+        super().__init__(f"move:{template}")
+        check_template(template)
+        self.template = template
+
+    def run(self, file_path: str) -> str:
+        target_dir = expand_template(self.template, _placeholders(file_path))
+        target_path = move_file(file_path, target_dir)
+        logger.info(f"ファイルを移動しました: {file_path} -> {target_path}")
+        return target_path
+
+
+def split_command(command: str, posix: bool = os.name != 'nt') -> list[str]:
+    """コマンドを引数に分割する
+
+    Windowsの分割（posix=False）は引用符を残すため、引数を囲む引用符を取り除く
+    （残すと "C:\a b\f.pdf" のように引用符ごとプログラムに渡される）。
+    """
+    args = shlex.split(command, posix=posix)
+    if posix:
+        return args
+    return [arg[1:-1] if len(arg) >= 2 and arg[0] == arg[-1] and arg[0] in '"\'' else arg for arg in args]
+
+
+class CommandAction(PostRenameAction):
+    """プレースホルダー付きのコマンドを実行する（例: notify.exe "{path}"）"""
+
+    def __init__(self, command: str, timeout: float = 60.0):
+        super().__init__(f"command:{command}")
+        check_template(command)
+        # ファイル名に空白が含まれても引数が分割されないよう、置換前に分割する
+        self.args = split_command(command)
+        self.timeout = timeout
+
+    def run(self, file_path: str) -> str:
+        values = _placeholders(file_path)
+        args = [expand_template(arg, values) for arg in self.args]
+        subprocess.run(args, check=True, timeout=self.timeout, capture_output=True)
+        return file_path
+
+
+def build_action(kind: str, value: str, command_timeout: float = 60.0) -> PostRenameAction:
+    """設定値からリネーム後の処理を作成"""
+    if kind == 'move':
+        return MoveToFolderAction(value)
+    if kind == 'command':
+        return CommandAction(value, command_timeout)
+    raise ValueError(f"不明なリネーム後の処理です: {kind}")
+
+
+@dataclass
+class ActionStats:
+    """処理ごとの実行件数と所要時間"""
+    count: int = 0
+    failures: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    @property
+    def average_seconds(self) -> float:
+        return self.total_seconds / self.count if self.count else 0.0
+
+
+class PostActionPipeline:
+    """リネーム後の処理を専用のキューとスレッドで非同期に実行する
+
+    キューが満杯の場合はリネームを待たせずに破棄し、警告を記録する。
+    """
+
+    def __init__(self, actions: list[PostRenameAction], workers: int = 2, queue_size: int = 1000):
+        self.actions = actions
+        self.dropped = 0
+        self.stats = {action.name: ActionStats() for action in actions}
+        self._stats_lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"post-action-{i}", daemon=True)
+            for i in range(max(workers, 1))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, file_path: str, trace: FileTrace | NullTrace = NULL_TRACE) -> bool:
+        """リネーム後のファイルを処理キューに追加（受け付けた場合はトレースの記録も引き継ぐ）"""
+        try:
+            self._queue.put_nowait((file_path, trace, trace.clock()))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"リネーム後の処理キューが満杯のため処理を省略しました: {file_path}")
+            return False
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            file_path, trace, submitted = item
+            trace.add_span(SPAN_POST_QUEUED, submitted, trace.clock())
+            with trace.span(SPAN_POST_PROCESS):
+                self._run_actions(file_path)
+            trace.finish()
+
+    def _run_actions(self, file_path: str):
+        for action in self.actions:
+            start = time.perf_counter()
+            failed = False
+            try:
+                file_path = action.run(file_path)
+            except Exception as e:
+                failed = True
+                logger.error(f"リネーム後の処理に失敗しました: {action.name}: {file_path}: {e}")
+            finally:
+                self._record(action.name, time.perf_counter() - start, failed)
+            if failed:
+                # 後続の処理は前の処理結果を前提とするため中断する
+                return
+
+    def _record(self, name: str, elapsed: float, failed: bool):
+        with self._stats_lock:
+            stats = self.stats[name]
+            stats.count += 1
+            stats.total_seconds += elapsed
+            stats.max_seconds = max(stats.max_seconds, elapsed)
+            if failed:
+                stats.failures += 1
+
+    def log_summary(self):
+        """処理ごとの実行件数・失敗件数・所要時間をログに出力"""
+        for name, stats in self.stats.items():
+            logger.info(
+                f"リネーム後の処理: {name}: {stats.count} 件 (失敗 {stats.failures} 件) "
+                f"平均 {stats.average_seconds * 1000:.1f}ms / 最大 {stats.max_seconds * 1000:.1f}ms"
+            )
+        if self.dropped:
+            logger.warning(f"キュー満杯により省略したリネーム後の処理: {self.dropped} 件")
+
+    def stop(self, timeout: float = 5.0):
+        """キュー内の処理を終えてからスレッドを停止"""
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+        self.log_summary()
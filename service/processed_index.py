@@ -0,0 +1,219 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+
+logger = logging.getLogger(__name__)
+
+# 1回の問い合わせに含めるファイル数（SQLiteの変数の上限 999 を超えないようにする）
+_CHUNK_SIZE = 400
+# テーブルの構成を変更した場合は増やす（古い構成の索引は作り直す）
+_SCHEMA_VERSION = '2'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    dev INTEGER NOT NULL,
+    ino INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    name_hash INTEGER NOT NULL,
+    PRIMARY KEY (dev, ino)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS named_entries (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _key(stat: os.stat_result) -> tuple[int, int, int, int] | None:
+    """(デバイス, inode, サイズ, 更新時刻)。inodeがない場合（Windowsの os.scandir の stat など）はNone"""
+    if not stat.st_ino:
+        return None
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _name_hash(name: str) -> int:
+    """名前の64ビットのハッシュ（プロセスによって変わらない値）"""
+    digest = hashlib.blake2b(name.encode('utf-8', 'surrogatepass'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+
+class ProcessedIndex:
+    """判定済みのファイルを (デバイス, inode, サイズ, 更新時刻, 名前のハッシュ) で記録するSQLiteの索引
+
+    監視フォルダごとに1つのファイルを使い、走査時には新しいファイルと変更されたファイルのみを判定する。
+    行は (デバイス, inode) ごとに1つのみ保持し、ファイルが変更された場合は上書きする。
+    停止中に名前だけを変更されたファイルも、名前のハッシュが変わるため判定し直す。
+    inodeがない場合（Windowsの os.scandir の stat）は、フォルダ内の名前ごとに (サイズ, 更新時刻) を記録する。
+    この場合は名前を変更したファイルを、変更後の名前で次の走査で一度判定し直す。
+    通常の走査では読み込みのみ行い、一定時間ごとに走査で見つからなかった行を削除して圧縮する。
+    リネームのパターンなどの設定（fingerprint）が変わった場合は記録を破棄する。
+    """
+
+    def __init__(self, path: str, fingerprint: str, compact_interval: float = 24 * 60 * 60):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.compact_interval = compact_interval
+        self._lock = threading.Lock()
+        self._connection = self._open()
+
+    def _open(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            connection = self._connect()
+        except sqlite3.DatabaseError as e:
+            # 破損した索引は作り直す（最初の走査ですべて判定し直すのみ）
+            logger.warning(f"処理済みファイルの索引を作り直します: {self.path}: {e}")
+            os.remove(self.path)
+            connection = self._connect()
+
+        if self._get_meta(connection, 'schema') != _SCHEMA_VERSION:
+            with connection:
+                connection.execute("DROP TABLE entries")
+                connection.execute("DROP TABLE named_entries")
+                connection.execute("DELETE FROM meta")
+            connection.executescript(_SCHEMA)
+            with connection:
+                self._set_meta(connection, 'schema', _SCHEMA_VERSION)
+
+        if self._get_meta(connection, 'fingerprint') != self.fingerprint:
+            with connection:
+                connection.execute("DELETE FROM entries")
+                connection.execute("DELETE FROM named_entries")
+                self._set_meta(connection, 'fingerprint', self.fingerprint)
+        return connection
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+        except sqlite3.DatabaseError:
+            connection.close()
+            raise
+        return connection
+
+    @staticmethod
+    def _get_meta(connection: sqlite3.Connection, key: str) -> str | None:
+        row = connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _set_meta(connection: sqlite3.Connection, key: str, value: str | float):
+        connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(
+                self._connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('entries', 'named_entries')
+            )
+
+    def unseen(self, files: list[tuple[str, os.stat_result]]) -> list[tuple[str, os.stat_result]]:
+        """記録されていない・変更されたファイルのみを返す"""
+        result = []
+        with self._lock:
+            for start in range(0, len(files), _CHUNK_SIZE):
+                chunk = [(name, stat, _key(stat)) for name, stat in files[start:start + _CHUNK_SIZE]]
+                known = self._lookup([key[:2] for _, _, key in chunk if key is not None])
+                named = self._lookup_names([name for name, _, key in chunk if key is None])
+                result.extend(
+                    (name, stat) for name, stat, key in chunk
+                    if (known.get(key[:2]) != (*key[2:], _name_hash(name)) if key is not None
+                        else named.get(name) != (stat.st_size, stat.st_mtime_ns))
+                )
+        return result
+
+    def _lookup_names(self, names: list[str]) -> dict[str, tuple[int, int]]:
+        if not names:
+            return {}
+        rows = self._connection.execute(
+            f"SELECT name, size, mtime_ns FROM named_entries WHERE name IN ({','.join('?' * len(names))})", names,
+        )
+        return {name: (size, mtime_ns) for name, size, mtime_ns in rows}
+
+    def _lookup(self, identities: list[tuple[int, int]]) -> dict[tuple[int, int], tuple[int, int, int]]:
+        # 主キーの索引を使うよう、デバイスごとに inode の IN で問い合わせる
+        by_device: dict[int, list[int]] = {}
+        for dev, ino in identities:
+            by_device.setdefault(dev, []).append(ino)
+        known = {}
+        for dev, inodes in by_device.items():
+            rows = self._connection.execute(
+                f"SELECT ino, size, mtime_ns, name_hash FROM entries "
+                f"WHERE dev = ? AND ino IN ({','.join('?' * len(inodes))})",
+                [dev, *inodes],
+            )
+            known.update(((dev, ino), (size, mtime_ns, name_hash)) for ino, size, mtime_ns, name_hash in rows)
+        return known
+
+    def record(self, files: Iterable[tuple[str, os.stat_result]]):
+        """判定を終えたファイル（現在の名前, stat結果）を記録する"""
+        rows = []
+        named_rows = []
+        for name, stat in files:
+            key = _key(stat)
+            if key is not None:
+                rows.append((*key, _name_hash(name)))
+            else:
+                named_rows.append((name, stat.st_size, stat.st_mtime_ns))
+        if not rows and not named_rows:
+            return
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO entries (dev, ino, size, mtime_ns, name_hash) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO named_entries (name, size, mtime_ns) VALUES (?, ?, ?)", named_rows
+            )
+
+    def finish_scan(self, files: list[tuple[str, os.stat_result]]):
+        """走査を完了し、前回の圧縮から一定時間が経過していれば走査したファイルを基に圧縮する"""
+        with self._lock:
+            last = float(self._get_meta(self._connection, 'compacted_at') or 0.0)
+        if time.time() - last >= self.compact_interval:
+            self.compact(files)
+
+    def compact(self, files: list[tuple[str, os.stat_result]]) -> int:
+        """走査したファイル files に含まれない行（削除・移動されたファイル）を削除して圧縮する"""
+        identities = [key[:2] for key in (_key(stat) for _, stat in files) if key is not None]
+        names = [(name,) for name, stat in files if _key(stat) is None]
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS present (dev INTEGER, ino INTEGER, PRIMARY KEY (dev, ino)) WITHOUT ROWID"
+                )
+                self._connection.execute("DELETE FROM present")
+                self._connection.executemany("INSERT OR IGNORE INTO present (dev, ino) VALUES (?, ?)", identities)
+                removed = self._connection.execute(
+                    "DELETE FROM entries WHERE NOT EXISTS "
+                    "(SELECT 1 FROM present WHERE present.dev = entries.dev AND present.ino = entries.ino)"
+                ).rowcount
+                self._connection.execute("DELETE FROM present")
+                self._connection.execute("CREATE TEMP TABLE IF NOT EXISTS present_names (name TEXT PRIMARY KEY) WITHOUT ROWID")
+                self._connection.execute("DELETE FROM present_names")
+                self._connection.executemany("INSERT OR IGNORE INTO present_names (name) VALUES (?)", names)
+                removed += self._connection.execute(
+                    "DELETE FROM named_entries WHERE name NOT IN (SELECT name FROM present_names)"
+                ).rowcount
+                self._connection.execute("DELETE FROM present_names")
+                self._set_meta(self._connection, 'compacted_at', time.time())
+            self._connection.execute("VACUUM")
+        logger.info(f"処理済みファイルの索引を圧縮しました: {self.path}（削除 {removed} 件）")
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,147 @@
+import threading
+import time
+from dataclasses import dataclass
+
+STATE_IDLE = 'idle'
+STATE_BUSY = 'busy'
+STATE_ERROR = 'error'
+STATE_PAUSED = 'paused'
+
+# 直近のエラーとして扱う時間（秒）
+ERROR_STATE_SECONDS = 60
+_WINDOW_SECONDS = 60
+
+
+@dataclass(frozen=True)
+class StatusSnapshot:
+    """トレイ表示用の処理状況"""
+    state: str
+    queue_depth: int
+    renames_last_minute: int
+    last_error: str | None
+    last_error_time: float | None
+
+
+class _ThreadCounts:
+    """1つのスレッドが記録した件数（書き換えるのは記録したスレッドのみ）"""
+
+    def __init__(self, thread: threading.Thread):
+        self.thread = thread
+        self.events_received = 0
+        self.events_finished = 0
+        self.renames_total = 0
+        self.errors_total = 0
+        # 1秒ごとのリネーム件数を保持するリングバッファ
+        self.bucket_seconds = [0] * _WINDOW_SECONDS
+        self.bucket_counts = [0] * _WINDOW_SECONDS
+        self.last_rename_second = 0
+
+
+class RenameStats:
+    """リネーム処理の件数を記録するカウンター
+
+    リネームの処理中にロックを取らないよう、件数はスレッドごとに記録し、参照時に合計する
+    （各スレッドは自分の件数だけを書き換えるため、更新が失われることはない）。
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._threads: dict[int, _ThreadCounts] = {}
+        # 終了したスレッドの件数（参照する側のみが _fold_lock を取って更新する）
+        self._retired = _ThreadCounts(threading.current_thread())
+        self._fold_lock = threading.Lock()
+        self._last_error: tuple[float, str] | None = None
+
+    def _counts(self) -> _ThreadCounts:
+        counts = getattr(self._local, 'counts', None)
+        if counts is None:
+            counts = self._local.counts = _ThreadCounts(threading.current_thread())
+            self._threads[id(counts)] = counts
+        return counts
+
+    def event_received(self):
+        self._counts().events_received += 1
+
+    def event_finished(self):
+        self._counts().events_finished += 1
+
+    def record_rename(self):
+        second = int(time.monotonic())
+        index = second % _WINDOW_SECONDS
+        counts = self._counts()
+        if counts.bucket_seconds[index] != second:
+            counts.bucket_seconds[index] = second
+            counts.bucket_counts[index] = 0
+        counts.bucket_counts[index] += 1
+        counts.last_rename_second = second
+        counts.renames_total += 1
+
+    def record_error(self, message: str):
+        self._counts().errors_total += 1
+        self._last_error = (time.time(), message)
+
+    def _all_counts(self) -> list[_ThreadCounts]:
+        """記録中のスレッドの件数と、終了したスレッドの件数の合計を返す"""
+        oldest = int(time.monotonic()) - _WINDOW_SECONDS
+        with self._fold_lock:
+            retired = self._retired
+            for key, counts in self._threads.copy().items():
+                # 終了したスレッドは直近1分のリネームがなくなった時点で合計に移し、保持する件数を増やさない
+                if not counts.thread.is_alive() and counts.last_rename_second <= oldest:
+                    retired.events_received += counts.events_received
+                    retired.events_finished += counts.events_finished
+                    retired.renames_total += counts.renames_total
+                    retired.errors_total += counts.errors_total
+                    del self._threads[key]
+            return [retired, *self._threads.copy().values()]
+
+    @property
+    def events_received(self) -> int:
+        return sum(counts.events_received for counts in self._all_counts())
+
+    @property
+    def events_finished(self) -> int:
+        return sum(counts.events_finished for counts in self._all_counts())
+
+    @property
+    def renames_total(self) -> int:
+        return sum(counts.renames_total for counts in self._all_counts())
+
+    @property
+    def errors_total(self) -> int:
+        return sum(counts.errors_total for counts in self._all_counts())
+
+    def renames_last_minute(self) -> int:
+        oldest = int(time.monotonic()) - _WINDOW_SECONDS
+        return sum(
+            count
+            for counts in self._all_counts()
+            for second, count in zip(counts.bucket_seconds, counts.bucket_counts)
+            if second > oldest
+        )
+
+    def snapshot(self, extra_queue_depth: int = 0, paused: bool = False) -> StatusSnapshot:
+        """現在の処理状況を取得"""
+        # 完了の件数を先に読み、受信の件数より多く数えないようにする
+        all_counts = self._all_counts()
+        finished = sum(counts.events_finished for counts in all_counts)
+        received = sum(counts.events_received for counts in all_counts)
+        queue_depth = max(received - finished, 0) + extra_queue_depth
+        last_error = self._last_error
+
+        if paused:
+            state = STATE_PAUSED
+        elif last_error is not None and time.time() - last_error[0] < ERROR_STATE_SECONDS:
+            state = STATE_ERROR
+        elif queue_depth > 0:
+            state = STATE_BUSY
+        else:
+            state = STATE_IDLE
+
+        return StatusSnapshot(
+            state=state,
+            queue_depth=queue_depth,
+            renames_last_minute=self.renames_last_minute(),
+            last_error=last_error[1] if last_error else None,
+            last_error_time=last_error[0] if last_error else None,
+        )
@@ -0,0 +1,96 @@
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from service.timer_queue import TimerHandle, TimerQueue
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class QuarantinedFile:
+    """再試行を打ち切ったファイル"""
+    path: str
+    attempts: int
+    last_error: str
+    time: float
+
+
+class RetryScheduler:
+    """リネームに失敗したファイルを間隔を延ばしながら再試行する
+
+    待機中の再試行はすべて TimerQueue に登録するため、件数に関係なくスレッドは増えない。
+    最大回数まで失敗したファイルは隔離リストに移し、新しいイベントがあるまで再試行しない。
+    """
+
+    def __init__(
+        self,
+        timers: TimerQueue,
+        action: Callable[[str], None],
+        max_attempts: int = 5,
+        initial_delay: float = 2.0,
+        max_delay: float = 300.0,
+        jitter: float = 0.2,
+    ):
+        self.timers = timers
+        self.action = action
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.quarantined: dict[str, QuarantinedFile] = {}
+        self._random = random.random
+        self._attempts: dict[str, int] = {}
+        self._pending: dict[str, TimerHandle] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def delay_for(self, attempt: int) -> float:
+        """attempt 回目の再試行までの待機時間（指数バックオフ ± ジッター）"""
+        delay = min(self.initial_delay * (2 ** (attempt - 1)), self.max_delay)
+        return delay * (1 + self.jitter * (2 * self._random() - 1))
+
+    def schedule(self, path: str, error: str) -> bool:
+        """失敗したファイルの再試行を登録する（隔離した場合はFalse）"""
+        with self._lock:
+            if path in self._pending or path in self.quarantined:
+                return path in self._pending
+            attempt = self._attempts.get(path, 0) + 1
+            if attempt > self.max_attempts:
+                self._attempts.pop(path, None)
+                self.quarantined[path] = QuarantinedFile(path, attempt - 1, error, time.time())
+                logger.warning(f"再試行を打ち切り、隔離リストに追加しました（{attempt - 1} 回失敗）: {path}: {error}")
+                return False
+            self._attempts[path] = attempt
+            delay = self.delay_for(attempt)
+            self._pending[path] = self.timers.schedule(delay, self._retry, path)
+        logger.info(f"{delay:.1f} 秒後に再試行します（{attempt}/{self.max_attempts} 回目）: {path}")
+        return True
+
+    def _retry(self, path: str):
+        with self._lock:
+            self._pending.pop(path, None)
+        try:
+            self.action(path)
+        finally:
+            with self._lock:
+                # 処理中に再登録されなかった場合は成功またはファイルの消失として扱う
+                if path not in self._pending and path not in self.quarantined:
+                    self._attempts.pop(path, None)
+
+    def forget(self, path: str):
+        """新しいイベントを受けたファイルの失敗回数・隔離・待機中の再試行を取り消す"""
+        with self._lock:
+            handle = self._pending.pop(path, None)
+            self._attempts.pop(path, None)
+            released = self.quarantined.pop(path, None)
+        if handle is not None:
+            self.timers.cancel(handle)
+        if released is not None:
+            logger.info(f"隔離リストから除外しました: {path}")
@@ -0,0 +1,68 @@
+import time
+from collections.abc import Callable
+
+
+class StormDetector:
+    """イベントの受信頻度からイベントの多発を判定する
+
+    頻度は「件数 / イベントを処理していない時間」で求める。イベントの処理中（待機を含む）に
+    届いたイベントは処理を終えるまで受け取れないため、処理時間を除いて実際に届いた頻度を推定する。
+    min_events 件以上で threshold 件/秒以上になった時点で多発中とし、exit_threshold 件/秒を
+    下回るまで多発中を続ける（ヒステリシス）。頻度は処理していない時間 window 秒ごとに求め直す。
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        exit_threshold: float | None = None,
+        min_events: int = 50,
+        window: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        name: str = '',
+    ):
+        self.name = name
+        self.threshold = threshold
+        self.exit_threshold = threshold / 2 if exit_threshold is None else exit_threshold
+        self.min_events = min_events
+        self.window = window
+        self.clock = clock
+        self.storming = False
+        self.rate = 0.0
+        self._started = clock()
+        self._busy = 0.0
+        self._count = 0
+
+    def record(self) -> bool:
+        """イベントを記録し、多発中かどうかを返す"""
+        idle = self._roll()
+        self._count += 1
+        if not self.storming and self._count >= self.min_events:
+            if self._count / max(idle, 1e-6) >= self.threshold:
+                self.rate = self._count / max(idle, 1e-6)
+                self.storming = True
+        return self.storming
+
+    def add_busy(self, seconds: float):
+        """イベントの処理にかかった時間（頻度の計算から除く）"""
+        self._busy += seconds
+
+    def poll(self) -> bool:
+        """イベントがない間も頻度を求め直し、多発中かどうかを返す"""
+        self._roll()
+        return self.storming
+
+    def _roll(self) -> float:
+        """期間を過ぎていれば頻度を求めて次の期間を始め、現在の期間の処理していない時間を返す"""
+        now = self.clock()
+        idle = now - self._started - self._busy
+        if idle < self.window:
+            return idle
+        self.rate = self._count / idle
+        if self.storming:
+            self.storming = self.rate >= self.exit_threshold
+        else:
+            self.storming = self._count >= self.min_events and self.rate >= self.threshold
+        self._started = now
+        self._busy = 0.0
+        self._count = 0
+        return 0.0
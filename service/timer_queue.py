@@ -0,0 +1,125 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class TimerHandle:
+    """登録したタイマー（cancelで取り消し）"""
+
+    __slots__ = ('deadline', 'callback', 'args', 'cancelled')
+
+    def __init__(self, deadline: float, callback: Callable, args: tuple):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+
+class TimerQueue:
+    """多数のタイマーを1つのヒープと1つのスレッドで管理する
+
+    登録数に関係なくスレッドは1つのみで、次の期限まで待機するため待機中はCPUを使わない。
+    スレッドは最初の登録時に起動する（autostart=False の場合は run_pending を呼び出して処理する）。
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic, autostart: bool = True, name: str = 'timer-queue'):
+        self.clock = clock
+        self.autostart = autostart
+        self.name = name
+        self._heap: list[tuple[float, int, TimerHandle]] = []
+        self._sequence = itertools.count()
+        self._cancelled = 0
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopped = False
+
+    def __len__(self) -> int:
+        return len(self._heap) - self._cancelled
+
+    def schedule(self, delay: float, callback: Callable, *args) -> TimerHandle:
+        """delay 秒後に callback(*args) を実行する"""
+        handle = TimerHandle(self.clock() + max(delay, 0.0), callback, args)
+        with self._condition:
+            heapq.heappush(self._heap, (handle.deadline, next(self._sequence), handle))
+            # 先頭が変わった場合のみ待機中のスレッドを起こす
+            if self._heap[0][2] is handle:
+                self._condition.notify()
+            if self.autostart and self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return handle
+
+    def cancel(self, handle: TimerHandle):
+        """タイマーを取り消す（ヒープからは実行時または再構築時に取り除く）"""
+        with self._condition:
+            if handle.cancelled:
+                return
+            handle.cancelled = True
+            self._cancelled += 1
+            if self._cancelled > 64 and self._cancelled * 2 > len(self._heap):
+                self._heap = [item for item in self._heap if not item[2].cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled = 0
+
+    def next_deadline(self) -> float | None:
+        with self._condition:
+            self._drop_cancelled_head()
+            return self._heap[0][0] if self._heap else None
+
+    def _drop_cancelled_head(self):
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+            self._cancelled -= 1
+
+    def run_pending(self, now: float | None = None) -> int:
+        """期限を過ぎたタイマーを実行し、実行した件数を返す"""
+        now = self.clock() if now is None else now
+        due = []
+        with self._condition:
+            self._drop_cancelled_head()
+            while self._heap and self._heap[0][0] <= now:
+                _, _, handle = heapq.heappop(self._heap)
+                if handle.cancelled:
+                    self._cancelled -= 1
+                    continue
+                # 実行済みのタイマーを取り消しても件数がずれないようにする
+                handle.cancelled = True
+                due.append(handle)
+                self._drop_cancelled_head()
+
+        for handle in due:
+            try:
+                handle.callback(*handle.args)
+            except Exception:
+                logger.exception(f"タイマーの処理でエラーが発生しました: {handle.callback}")
+        return len(due)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    self._drop_cancelled_head()
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    timeout = self._heap[0][0] - self.clock()
+                    if timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+            self.run_pending()
+
+    def stop(self, timeout: float = 5.0):
+        """スレッドを停止する（未実行のタイマーは破棄する）"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
@@ -0,0 +1,185 @@
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable
+from typing import Protocol
+
+from watchdog.events import FileSystemEventHandler
+
+logger = logging.getLogger(__name__)
+
+REASON_MISSING = 'missing'
+REASON_REPLACED = 'replaced'
+REASON_OBSERVER_STOPPED = 'observer_stopped'
+REASON_EMITTER_STOPPED = 'emitter_stopped'
+
+REASON_LABELS = {
+    REASON_MISSING: '監視フォルダが見つかりません',
+    REASON_REPLACED: '監視フォルダが置き換えられました',
+    REASON_OBSERVER_STOPPED: '監視スレッドが停止しました',
+    REASON_EMITTER_STOPPED: 'イベント取得スレッドが停止しました',
+}
+
+
+class _Alive(Protocol):
+    def is_alive(self) -> bool: ...
+
+
+class WatchObserver(Protocol):
+    """監視の実装（watchdogのObserver・InotifyObserver）に共通の操作"""
+
+    @property
+    def emitters(self) -> Iterable[_Alive]: ...
+
+    def schedule(self, event_handler: FileSystemEventHandler, path: str, *, recursive: bool = False) -> object: ...
+
+    def start(self) -> None: ...
+
+    def stop(self) -> None: ...
+
+    def join(self, timeout: float | None = None) -> None: ...
+
+    def is_alive(self) -> bool: ...
+
+
+def _identity(path: str) -> tuple[int, int] | None:
+    """フォルダの(デバイス, inode)（存在しない場合はNone）"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+class WatchSupervisor:
+    """監視スレッドと監視フォルダの状態を定期的に確認し、異常時に監視を作り直す
+
+    ネットワーク共有の切断などで監視フォルダが消えた・置き換えられた場合は、
+    フォルダが戻るまで間隔を延ばしながら再試行し、復旧後に on_recovered を呼び出す。
+    """
+
+    def __init__(
+        self,
+        root: str,
+        create_observer: Callable[[], WatchObserver],
+        on_recovered: Callable[[], None] | None = None,
+        check_interval: float = 5.0,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        self.root = root
+        self.create_observer = create_observer
+        self.on_recovered = on_recovered
+        self.check_interval = check_interval
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.observer: WatchObserver | None = None
+        self.recoveries = 0
+        self.last_recovery_seconds: float | None = None
+        self._identity: tuple[int, int] | None = None
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def start(self) -> WatchObserver:
+        """監視を開始する"""
+        with self._lock:
+            self._identity = _identity(self.root)
+            observer = self.create_observer()
+            observer.start()
+            self.observer = observer
+        return observer
+
+    def stop(self):
+        """以降の復旧を行わないようにする（監視の停止は呼び出し元で行う）"""
+        with self._lock:
+            self._stopped = True
+
+    def check(self) -> str | None:
+        """異常があればその理由を返す"""
+        identity = _identity(self.root)
+        if identity is None:
+            return REASON_MISSING
+        if self._identity is not None and identity != self._identity:
+            return REASON_REPLACED
+
+        observer = self.observer
+        if observer is None:
+            return None
+        if not observer.is_alive():
+            return REASON_OBSERVER_STOPPED
+        if any(not emitter.is_alive() for emitter in observer.emitters):
+            return REASON_EMITTER_STOPPED
+        return None
+
+    def run(self, stop_event: threading.Event):
+        """stop_event が設定されるまで定期的に確認し、異常があれば復旧する"""
+        while not stop_event.wait(self.check_interval):
+            try:
+                reason = self.check()
+                if reason is not None:
+                    self.recover(reason, stop_event)
+            except Exception:
+                # 監視スレッド内の例外が失われないようログに残して確認を続ける
+                logger.exception("監視の状態確認中にエラーが発生しました")
+
+    def recover(self, reason: str, stop_event: threading.Event) -> bool:
+        """監視を作り直す（監視フォルダが戻るまで間隔を延ばしながら再試行）"""
+        detected = time.monotonic()
+        logger.warning(f"{REASON_LABELS.get(reason, reason)}: {self.root}。監視を再開します")
+        backoff = self.initial_backoff
+        attempts = 0
+
+        while not stop_event.is_set():
+            attempts += 1
+            if self._restart():
+                break
+            if self._stopped:
+                return False
+            logger.info(f"監視の再開を {backoff:.0f} 秒後に再試行します（{attempts} 回目）")
+            if stop_event.wait(backoff):
+                return False
+            backoff = min(backoff * 2, self.max_backoff)
+        else:
+            return False
+
+        restarted = time.monotonic()
+        if self.on_recovered is not None:
+            try:
+                self.on_recovered()
+            except Exception:
+                logger.exception("復旧後の処理でエラーが発生しました")
+
+        self.recoveries += 1
+        self.last_recovery_seconds = time.monotonic() - detected
+        logger.info(
+            f"監視を復旧しました: {self.root}（復旧まで {self.last_recovery_seconds:.1f} 秒 / "
+            f"監視の再開 {restarted - detected:.1f} 秒、試行 {attempts} 回）"
+        )
+        return True
+
+    def _restart(self) -> bool:
+        with self._lock:
+            if self._stopped:
+                return False
+            identity = _identity(self.root)
+            if identity is None:
+                return False
+
+            previous = self.observer
+            if previous is not None:
+                try:
+                    previous.stop()
+                    previous.join(self.check_interval)
+                except Exception as e:
+                    logger.debug(f"停止した監視の終了処理でエラーが発生しました: {e}")
+
+            try:
+                observer = self.create_observer()
+                observer.start()
+            except OSError as e:
+                logger.warning(f"監視を開始できませんでした: {self.root}: {e}")
+                return False
+            self.observer = observer
+            self._identity = identity
+            return True
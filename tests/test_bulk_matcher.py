@@ -0,0 +1,89 @@
+import random
+import re
+import string
+
+import pytest
+
+from service.bulk_matcher import BulkMatcher, parse_suffix_rule
+
+PATTERNS = [re.compile(r'_magnate_[A-Za-z0-9]{6}$'), re.compile(r'_[A-Za-z0-9]{6}$')]
+
+EDGE_NAMES = [
+    'report_ABC123', 'report_ABC12', 'report_ABC1234', 'report_AB-123', '_ABC123', 'ABC123', '',
+    'x_ABC123\n', 'x_ABC12\n', '_ABC123\n\n', 'ü_ABC123', 'a_ABCü23', 'bad\udcff_ABC123',
+    'photo_magnate_XYZ789', 'photo_magnatE_XYZ789', 'magnate_XYZ789', 'a_ABC123 ',
+]
+
+
+def _random_names(count: int) -> list[str]:
+    generator = random.Random(0)
+    names = []
+    for _ in range(count):
+        name = ''.join(generator.choices(string.ascii_lowercase + ' -_', k=generator.randint(0, 20)))
+        roll = generator.random()
+        if roll < 0.3:
+            name += '_' + ''.join(generator.choices(string.ascii_letters + string.digits + '-', k=6))
+        elif roll < 0.4:
+            name += '_magnate_' + ''.join(generator.choices(string.ascii_letters + string.digits, k=6))
+        names.append(name)
+    return names
+
+
+def _expected(patterns: list[re.Pattern], names: list[str]) -> list[bool]:
+    return [any(pattern.search(name) for pattern in patterns) for name in names]
+
+
+class TestParseSuffixRule:
+    """末尾の固定長の規則の解析のテスト"""
+
+    def test_parses_literal_and_class(self):
+        """固定の文字列と文字クラスの繰り返しを解析する"""
+        rule = parse_suffix_rule(re.compile(r'_magnate_[A-Za-z0-9]{6}$'))
+        assert rule.literal == '_magnate_'
+        assert rule.count == 6
+        assert rule.width == 15
+        assert rule.allowed == frozenset(string.ascii_letters + string.digits)
+
+    @pytest.mark.parametrize('pattern', [
+        re.compile(r'_[^a-z]{6}$'),
+        re.compile(r'_[\w]{6}$'),
+        re.compile(r'_[A-Za-z0-9]+$'),
+        re.compile(r'^tmp_'),
+        re.compile(r'_[A-Za-z0-9]{6}$', re.IGNORECASE),
+        re.compile(rb'_[A-Za-z0-9]{6}$'),
+    ])
+    def test_rejects_other_patterns(self, pattern):
+        """否定・エスケープ・可変長・フラグ付きのパターンは対象外"""
+        assert parse_suffix_rule(pattern) is None
+
+
+class TestBulkMatcher:
+    """まとめて照合するテスト"""
+
+    @pytest.mark.parametrize('use_numpy', [False, True])
+    def test_matches_per_name_results(self, use_numpy):
+        """1件ずつ照合した場合と同じ結果になる"""
+        if use_numpy:
+            pytest.importorskip('numpy')
+        names = _random_names(5000) + EDGE_NAMES
+        patterns = PATTERNS + [re.compile(r'^tmp'), re.compile(r'_[a-z]{3}$', re.IGNORECASE)]
+
+        matcher = BulkMatcher(patterns, use_numpy=use_numpy)
+
+        assert matcher.use_numpy == use_numpy
+        assert matcher.matches(names) == _expected(patterns, names)
+
+    @pytest.mark.parametrize('use_numpy', [False, True])
+    def test_edge_cases(self, use_numpy):
+        """末尾の改行・短い名前・ASCII以外の文字を正しく判定する"""
+        if use_numpy:
+            pytest.importorskip('numpy')
+        assert BulkMatcher(PATTERNS, use_numpy=use_numpy).matches(EDGE_NAMES) == _expected(PATTERNS, EDGE_NAMES)
+
+    def test_empty_input(self):
+        """名前がない場合は空の結果を返す"""
+        assert BulkMatcher(PATTERNS).matches([]) == []
+
+    def test_without_patterns(self):
+        """パターンがない場合はすべて一致しない"""
+        assert BulkMatcher([]).matches(['report_ABC123']) == [False]
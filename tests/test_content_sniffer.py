@@ -0,0 +1,178 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from service.content_sniffer import (
+    DOCX,
+    HEIC,
+    JPEG,
+    PDF,
+    PNG,
+    TIFF,
+    ZIP,
+    ContentSniffer,
+    corrected_name,
+    detect_type,
+)
+from service.directory_handle import DirectoryHandle
+
+
+@pytest.fixture
+def handle(tmp_path):
+    handle = DirectoryHandle(str(tmp_path))
+    yield handle
+    handle.close()
+
+
+class TestDetectType:
+    """detect_typeのテスト"""
+
+    @pytest.mark.parametrize('head, expected', [
+        (b'%PDF-1.7\n', 'pdf'),
+        (b'\x89PNG\r\n\x1a\n\x00\x00', 'png'),
+        (b'\xff\xd8\xff\xe0\x00\x10JFIF', 'jpeg'),
+        (b'GIF89a\x01\x00', 'gif'),
+        (b'II*\x00\x08\x00', 'tiff'),
+        (b'RIFF\x00\x00\x00\x00WEBPVP8 ', 'webp'),
+        (b'\x1f\x8b\x08\x00', 'gzip'),
+        (b'\x00\x00\x00\x20ftypisom', 'mp4'),
+        (b'\x00\x00\x00\x18ftypheic', 'heic'),
+        (b'\x00\x00\x00\x1cftypavif', 'avif'),
+        (b'\x00\x00\x00\x14ftyp3gp5', '3gp'),
+        (b'\x00\x00\x00\x14ftypcrx ', 'isobmff'),
+        (b'BM\x36\x00\x0c\x00\x00\x00\x00\x00\x36\x00\x00\x00\x28\x00\x00\x00', 'bmp'),
+        (b'PK\x03\x04\x14\x00\x00\x00mimetype', 'zip'),
+        (b'PK\x03\x04\x14\x00\x00\x00[Content_Types].xml...word/document.xml', 'docx'),
+        (b'PK\x03\x04\x14\x00\x00\x00[Content_Types].xml...xl/workbook.xml', 'xlsx'),
+    ])
+    def test_detects_known_types(self, head, expected):
+        """マジックバイトから種類を判定する"""
+        assert detect_type(head).name == expected
+
+    def test_returns_none_for_unknown(self):
+        """判定できない場合はNone"""
+        assert detect_type(b'plain text') is None
+
+    def test_text_starting_with_bm_is_not_bmp(self):
+        """"BM" で始まるテキスト・CSVはBMPとしない"""
+        assert detect_type(b'BMI,height,weight\n22.1,170,64\n') is None
+
+
+class TestCorrectedName:
+    """corrected_nameのテスト"""
+
+    def test_keeps_matching_extension(self):
+        """種類に合う拡張子はそのまま（大文字小文字を区別しない）"""
+        assert corrected_name('photo', '.JPEG', JPEG) == ('photo', '.JPEG')
+
+    def test_adds_missing_extension(self):
+        """拡張子がない場合は付与する"""
+        assert corrected_name('report_ABC123', '', PDF) == ('report_ABC123', '.pdf')
+
+    def test_replaces_wrong_known_extension(self):
+        """別の種類を示す拡張子は置き換える"""
+        assert corrected_name('image', '.jpg', PNG) == ('image', '.png')
+        assert corrected_name('document', '.zip', DOCX) == ('document', '.docx')
+
+    def test_appends_after_unknown_extension(self):
+        """未知の拡張子は名前の一部として残す"""
+        assert corrected_name('data', '.v2', PDF) == ('data.v2', '.pdf')
+
+    @pytest.mark.parametrize('filename, extension, file_type', [
+        ('book', '.epub', ZIP),
+        ('app', '', ZIP),
+        ('x', '.cr2', TIFF),
+    ])
+    def test_generic_container_keeps_name(self, filename, extension, file_type):
+        """他の形式の入れ物にも使われる形式の場合は拡張子を変更しない"""
+        assert corrected_name(filename, extension, file_type) == (filename, extension)
+
+    def test_heic_is_not_renamed_to_mp4(self):
+        """HEICは動画と判定せず、拡張子を変更しない"""
+        assert corrected_name('photo', '.heic', detect_type(b'\x00\x00\x00\x18ftypheic')) == ('photo', '.heic')
+        assert corrected_name('photo', '.heic', HEIC) == ('photo', '.heic')
+
+    def test_unknown_type_keeps_name(self):
+        """種類が不明な場合は変更しない"""
+        assert corrected_name('file', '.txt', None) == ('file', '.txt')
+
+
+class TestContentSniffer:
+    """ContentSnifferのテスト"""
+
+    def test_sniff_reads_file_head(self, tmp_path, handle):
+        """ファイルの先頭を読み込んで判定する"""
+        (tmp_path / 'report').write_bytes(b'%PDF-1.4\n' + b'x' * 10000)
+        sniffer = ContentSniffer()
+
+        assert sniffer.sniff(handle, 'report', os.stat(tmp_path / 'report')) is PDF
+
+    def test_sniff_reads_only_max_bytes(self, tmp_path, handle):
+        """読み込むのは先頭の max_bytes のみ"""
+        (tmp_path / 'report').write_bytes(b'%PDF-1.4\n' + b'x' * 10000)
+        sniffer = ContentSniffer(max_bytes=16)
+
+        with patch.object(handle, 'read_head', wraps=handle.read_head) as mock_read:
+            sniffer.sniff(handle, 'report', os.stat(tmp_path / 'report'))
+        mock_read.assert_called_once_with('report', 16)
+
+    def test_cached_result_is_not_read_again(self, tmp_path, handle):
+        """同じ(デバイス, inode, 更新時刻)のファイルは読み直さない（リネーム後も同じ）"""
+        (tmp_path / 'report').write_bytes(b'%PDF-1.4\n')
+        sniffer = ContentSniffer()
+        sniffer.sniff(handle, 'report', os.stat(tmp_path / 'report'))
+        os.rename(tmp_path / 'report', tmp_path / 'report.pdf')
+
+        with patch.object(handle, 'read_head') as mock_read:
+            result = sniffer.sniff(handle, 'report.pdf', os.stat(tmp_path / 'report.pdf'))
+        mock_read.assert_not_called()
+        assert result is PDF
+        assert (sniffer.reads, sniffer.hits) == (1, 1)
+
+    def test_modified_file_is_read_again(self, tmp_path, handle):
+        """更新時刻が変わった場合は再判定する"""
+        path = tmp_path / 'file'
+        path.write_bytes(b'plain text')
+        sniffer = ContentSniffer()
+        assert sniffer.sniff(handle, 'file', os.stat(path)) is None
+
+        path.write_bytes(b'\x89PNG\r\n\x1a\n')
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        assert sniffer.sniff(handle, 'file', os.stat(path)) is PNG
+
+    def test_empty_file_is_not_cached(self, tmp_path, handle):
+        """作成直後の空ファイルは判定結果を保持しない"""
+        (tmp_path / 'file').write_bytes(b'')
+        sniffer = ContentSniffer()
+        sniffer.sniff(handle, 'file', os.stat(tmp_path / 'file'))
+        assert sniffer.reads == 0
+
+    def test_cache_evicts_oldest_entry(self, tmp_path, handle):
+        """保持件数を超えた場合は最も古い結果を破棄する"""
+        sniffer = ContentSniffer(cache_size=2)
+        for name in ('a', 'b', 'c'):
+            (tmp_path / name).write_bytes(b'%PDF-')
+            sniffer.sniff(handle, name, os.stat(tmp_path / name))
+        sniffer.sniff(handle, 'a', os.stat(tmp_path / 'a'))
+        assert sniffer.reads == 4
+
+    def test_without_inode_is_cached_per_path(self, tmp_path, handle):
+        """inodeがない（Windowsの走査の）場合、同じ更新時刻の別のファイルの結果を使わない"""
+        (tmp_path / 'a').write_bytes(b'%PDF-1.4\n')
+        (tmp_path / 'b').write_bytes(b'\x89PNG\r\n\x1a\n')
+        sniffer = ContentSniffer()
+        fields = list(os.stat(tmp_path / 'a'))
+        fields[1:3] = [0, 0]
+        stat = os.stat_result(fields)
+
+        assert sniffer.sniff(handle, 'a', stat) is PDF
+        assert sniffer.sniff(handle, 'b', stat) is PNG
+
+    def test_unreadable_file_returns_none(self, tmp_path, handle):
+        """読み込めない場合はNoneを返す"""
+        sniffer = ContentSniffer()
+        stat = os.stat(tmp_path)
+        assert sniffer.sniff(handle, 'missing', stat) is None
@@ -0,0 +1,129 @@
+import time
+
+import pytest
+
+from service.deadline_fs import DeadlineFileSystem, RootUnavailableError
+from service.fs_backend import InMemoryFileSystem
+
+
+@pytest.fixture
+def memory():
+    fs = InMemoryFileSystem()
+    fs.write('/slow/a.txt', b'data')
+    fs.write('/fast/b.txt', b'data')
+    return fs
+
+
+@pytest.fixture
+def deadline_fs(memory):
+    fs = DeadlineFileSystem(memory, timeout=0.05, probe_interval=10.0, workers=2)
+    yield fs
+    fs.close()
+
+
+class TestDeadlineFileSystem:
+    """期限付きのファイル操作のテスト"""
+
+    def test_operations_within_deadline(self, deadline_fs):
+        """期限内の操作はそのまま結果を返す"""
+        handle = deadline_fs.open_directory('/fast')
+        assert handle.stat('b.txt').st_size == 4
+        handle.rename('b.txt', 'c.txt')
+        assert deadline_fs.lexists('/fast/c.txt')
+        with handle.scandir() as entries:
+            assert [(entry.name, entry.is_file(follow_symlinks=False)) for entry in entries] == [('c.txt', True)]
+
+    def test_slow_operation_degrades_only_its_root(self, memory, deadline_fs):
+        """期限を過ぎたフォルダは以降の操作を待たずに失敗し、他のフォルダは影響を受けない"""
+        handle = deadline_fs.open_directory('/slow')
+        memory.set_latency('/slow', 0.3, real=True)
+
+        with pytest.raises(RootUnavailableError) as raised:
+            handle.stat('a.txt')
+        assert raised.value.root == '/slow'
+        assert deadline_fs.degraded_roots == ['/slow']
+
+        started = time.monotonic()
+        with pytest.raises(RootUnavailableError):
+            handle.rename('a.txt', 'b.txt')
+        assert time.monotonic() - started < 0.05
+        assert deadline_fs.open_directory('/fast').stat('b.txt') is not None
+
+    def test_probe_restores_root_and_notifies(self, memory, deadline_fs):
+        """確認で応答したフォルダは復旧とし、登録した関数に通知する"""
+        recovered = []
+        deadline_fs.add_recovery_listener(recovered.append)
+        handle = deadline_fs.open_directory('/slow')
+        memory.set_latency('/slow', 0.3, real=True)
+        with pytest.raises(RootUnavailableError):
+            handle.stat('a.txt')
+
+        # 応答しないうちは保留を続ける
+        memory.advance(10.0)
+        assert deadline_fs.is_degraded('/slow')
+        assert recovered == []
+
+        # 応答しなかった確認が終わった後の確認で復旧する
+        memory.set_latency('/slow', 0.0)
+        time.sleep(0.35)
+        memory.advance(10.0)
+        assert not deadline_fs.is_degraded('/slow')
+        assert recovered == ['/slow']
+        assert handle.stat('a.txt') is not None
+
+    def test_timeout_error_from_operation_is_not_degraded(self, deadline_fs):
+        """操作自体が送出した TimeoutError ではフォルダを応答なしとしない"""
+        def fail():
+            raise TimeoutError("socket timeout")
+
+        with pytest.raises(TimeoutError, match="socket timeout"):
+            deadline_fs.call('/fast', fail)
+        assert not deadline_fs.is_degraded('/fast')
+
+    def test_registered_root_covers_subfolders(self, memory):
+        """登録したフォルダの配下はまとめて扱う"""
+        fs = DeadlineFileSystem(memory, timeout=0.05, roots=['/share'])
+        try:
+            assert fs.root_for('/share/sub/dir') == '/share'
+            assert fs.root_for('/shared') == '/shared'
+        finally:
+            fs.close()
+
+    def test_move_file_degrades_both_roots(self, memory, deadline_fs):
+        """移動が期限を過ぎた場合は移動元と移動先の両方を確認の対象にする"""
+        memory.set_latency('/dest', 0.3, real=True)
+        memory.makedirs('/dest')
+
+        with pytest.raises(RootUnavailableError):
+            deadline_fs.move_file('/fast/b.txt', '/dest', 'b.txt')
+        assert sorted(deadline_fs.degraded_roots) == ['/dest', '/fast']
+
+    def test_progressing_call_extends_deadline(self, deadline_fs):
+        """進捗が通知されている間は期限を過ぎても完了を待つ"""
+        def copy(progress):
+            for copied in range(1, 21):
+                time.sleep(0.01)
+                progress(copied, 20)
+            return 'done'
+
+        assert deadline_fs.call_while_progressing('/fast', copy) == 'done'
+        assert not deadline_fs.is_degraded('/fast')
+
+    def test_stalled_progressing_call_degrades(self, deadline_fs):
+        """進捗が期限の間通知されない場合は応答しないフォルダとして扱う"""
+        def copy(progress):
+            progress(1, 10)
+            time.sleep(0.3)
+
+        with pytest.raises(RootUnavailableError):
+            deadline_fs.call_while_progressing('/fast', copy)
+        assert deadline_fs.is_degraded('/fast')
+
+    def test_move_file_passes_progress(self, memory, deadline_fs):
+        """移動の進捗は呼び出し元にも通知する"""
+        reported = []
+        memory.makedirs('/dest')
+
+        assert deadline_fs.move_file('/fast/b.txt', '/dest', 'b.txt', lambda c, t: reported.append((c, t))) \
+            == '/dest/b.txt'
+        assert reported == [(4, 4)]
@@ -0,0 +1,94 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from service.directory_handle import DIR_FD_SUPPORTED, DirectoryHandle, split_name
+
+
+class TestSplitName:
+    """ファイル名分割のテスト"""
+
+    @pytest.mark.parametrize('name, expected', [
+        ('file_ABC123.txt', ('file_ABC123', '.txt')),
+        ('archive.tar.gz', ('archive.tar', '.gz')),
+        ('noextension', ('noextension', '')),
+        ('.hidden', ('.hidden', '')),
+        ('trailingdot.', ('trailingdot.', '')),
+    ])
+    def test_split_name_matches_path_rules(self, name, expected):
+        """Path.stem/Path.suffixと同じ規則で分割する"""
+        assert split_name(name) == expected
+
+
+class TestDirectoryHandle:
+    """DirectoryHandleのテスト"""
+
+    def test_stat_and_rename_relative_to_folder(self, tmp_path):
+        """フォルダ内の相対名でstat・リネームできる"""
+        (tmp_path / 'file_ABC123.txt').write_text('data')
+        handle = DirectoryHandle(str(tmp_path))
+        try:
+            assert handle.exists('file_ABC123.txt') is True
+            assert handle.exists('missing.txt') is False
+
+            handle.rename('file_ABC123.txt', 'file.txt')
+            assert (tmp_path / 'file.txt').read_text() == 'data'
+        finally:
+            handle.close()
+
+    def test_scandir_lists_entries(self, tmp_path):
+        """フォルダ内のエントリを列挙できる"""
+        (tmp_path / 'a.txt').write_text('data')
+        (tmp_path / 'b.txt').write_text('data')
+        handle = DirectoryHandle(str(tmp_path))
+        try:
+            for _ in range(2):
+                with handle.scandir() as entries:
+                    assert sorted(entry.name for entry in entries) == ['a.txt', 'b.txt']
+        finally:
+            handle.close()
+
+    def test_read_head_reads_file_prefix(self, tmp_path):
+        """ファイルの先頭を指定したバイト数だけ読み込む"""
+        (tmp_path / 'file.bin').write_bytes(b'0123456789')
+        handle = DirectoryHandle(str(tmp_path))
+        try:
+            assert handle.read_head('file.bin', 4) == b'0123'
+            assert handle.read_head('file.bin', 100) == b'0123456789'
+        finally:
+            handle.close()
+
+    def test_fallback_without_dir_fd(self, tmp_path):
+        """dir_fd非対応の環境ではフルパスで操作する"""
+        (tmp_path / 'file_ABC123.txt').write_text('data')
+        with patch('service.directory_handle.DIR_FD_SUPPORTED', False):
+            handle = DirectoryHandle(str(tmp_path))
+
+        handle.rename('file_ABC123.txt', 'file.txt')
+        assert handle.exists('file.txt') is True
+        handle.close()
+
+    @pytest.mark.skipif(not DIR_FD_SUPPORTED, reason="dir_fd非対応の環境ではフォルダを開かない")
+    def test_missing_folder_raises(self, tmp_path):
+        """存在しないフォルダは開けない"""
+        with pytest.raises(OSError):
+            DirectoryHandle(str(tmp_path / 'missing'))
+
+    @pytest.mark.skipif(not DIR_FD_SUPPORTED, reason="dir_fd非対応の環境ではフォルダを開かない")
+    def test_close_during_operation_waits_for_it(self, tmp_path):
+        """操作中に閉じた場合、フォルダは操作の終了後に閉じ、以降の操作はパスで行う"""
+        (tmp_path / 'file_ABC123.txt').write_text('data')
+        handle = DirectoryHandle(str(tmp_path))
+        fd = handle._acquire()
+
+        handle.close()
+        # 操作中のファイルディスクリプタは閉じられていない
+        assert os.fstat(fd)
+        assert handle.exists('file_ABC123.txt') is True
+
+        handle._release(fd)
+        with pytest.raises(OSError):
+            os.fstat(fd)
+        handle.rename('file_ABC123.txt', 'file.txt')
+        assert (tmp_path / 'file.txt').read_text() == 'data'
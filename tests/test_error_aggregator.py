@@ -0,0 +1,128 @@
+import errno
+import logging
+
+import pytest
+
+from service.error_aggregator import ErrorAggregator, error_class
+from service.timer_queue import TimerQueue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def target():
+    return logging.getLogger('test_error_aggregator')
+
+
+@pytest.fixture
+def aggregator(target, clock):
+    return ErrorAggregator(target, window=10.0, burst=2, samples=2, clock=clock)
+
+
+def _messages(caplog) -> list[str]:
+    return [record.getMessage() for record in caplog.records]
+
+
+class TestErrorClass:
+    """エラーの種類のテスト"""
+
+    def test_includes_errno_name(self):
+        """errnoを持つ例外はerrno名を含める"""
+        assert error_class(OSError(errno.EROFS, 'Read-only file system')) == 'OSError:EROFS'
+
+    def test_without_errno(self):
+        assert error_class(PermissionError()) == 'PermissionError'
+
+    def test_unknown_errno_uses_number(self):
+        """errno名のないコードは番号で区別する"""
+        assert error_class(OSError(99999, 'unknown')) == 'OSError:99999'
+
+
+class TestErrorAggregator:
+    """エラーの集約のテスト"""
+
+    def test_burst_is_logged_individually(self, aggregator, caplog):
+        """期間内の最初の件数は1件ずつ出力する"""
+        with caplog.at_level(logging.ERROR):
+            assert aggregator.error('OSError', '/share', '/share/a', 'a')
+            assert aggregator.error('OSError', '/share', '/share/b', 'b')
+            assert not aggregator.error('OSError', '/share', '/share/c', 'c')
+
+        assert _messages(caplog) == ['a', 'b']
+        assert aggregator.suppressed_total == 1
+
+    def test_summary_after_window(self, aggregator, clock, caplog):
+        """期間の終わりに件数と例を1行で出力する"""
+        with caplog.at_level(logging.ERROR):
+            for name in 'abcde':
+                aggregator.error('OSError', '/share', f"/share/{name}", name)
+            clock.now = 10.0
+            aggregator.error('OSError', '/share', '/share/f', 'f')
+
+        summary = _messages(caplog)[2]
+        assert '5 件' in summary and '3 件の出力を省略' in summary
+        assert '/share/c, /share/d' in summary
+        assert '/share/e' not in summary
+
+    def test_storm_continues_without_detail(self, aggregator, clock, caplog):
+        """多発が続いている間は次の期間も1件ずつ出力しない"""
+        for name in 'abc':
+            aggregator.error('OSError', '/share', f"/share/{name}", name)
+        clock.now = 10.0
+        with caplog.at_level(logging.ERROR):
+            assert not aggregator.error('OSError', '/share', '/share/d', 'd')
+
+    def test_detail_resumes_after_storm(self, aggregator, clock, caplog):
+        """多発が収まった後は1件ずつの出力に戻る"""
+        for name in 'abc':
+            aggregator.error('OSError', '/share', f"/share/{name}", name)
+        clock.now = 10.0
+        aggregator.flush()
+        clock.now = 25.0
+        caplog.clear()
+
+        with caplog.at_level(logging.ERROR):
+            assert aggregator.error('OSError', '/share', '/share/x', 'x')
+        assert _messages(caplog) == ['x']
+
+    def test_keys_are_independent(self, aggregator, caplog):
+        """エラーの種類・フォルダごとに集約する"""
+        for name in 'abc':
+            aggregator.error('OSError', '/share', f"/share/{name}", name)
+
+        assert aggregator.error('PermissionError', '/share', '/share/x', 'x')
+        assert aggregator.error('OSError', '/other', '/other/x', 'x')
+
+    def test_timer_flushes_when_errors_stop(self, target, clock, caplog):
+        """エラーが止まった場合も期間の終わりにまとめを出力する"""
+        timers = TimerQueue(clock=clock, autostart=False)
+        aggregator = ErrorAggregator(target, window=10.0, burst=1, timers=timers, clock=clock)
+        aggregator.error('OSError', '/share', '/share/a', 'a')
+        aggregator.error('OSError', '/share', '/share/b', 'b')
+
+        clock.now = 10.0
+        caplog.clear()
+        with caplog.at_level(logging.ERROR):
+            timers.run_pending()
+
+        assert len(caplog.records) == 1
+        assert '1 件の出力を省略' in caplog.records[0].getMessage()
+
+    def test_disabled_logs_everything(self, target, caplog):
+        """期間が0の場合はまとめない"""
+        aggregator = ErrorAggregator(target, window=0, burst=0)
+        with caplog.at_level(logging.ERROR):
+            for name in 'abc':
+                aggregator.error('OSError', '/share', f"/share/{name}", name)
+        assert _messages(caplog) == ['a', 'b', 'c']
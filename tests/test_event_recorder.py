@@ -0,0 +1,114 @@
+import gzip
+import json
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from watchdog.events import FileCreatedEvent, FileMovedEvent, FileSystemEventHandler
+
+from service.event_recorder import EventRecorder, EventReplayer, load_recording
+
+
+@pytest.fixture
+def recording_path(tmp_path):
+    return str(tmp_path / 'events.jsonl.gz')
+
+
+class TestEventRecorder:
+    """EventRecorderのテスト"""
+
+    def test_records_events_with_relative_names(self, tmp_path, recording_path):
+        """イベントを監視フォルダからの相対名で記録する"""
+        root = tmp_path / 'root'
+        root.mkdir()
+        recorder = EventRecorder(recording_path, str(root))
+        recorder.dispatch(FileCreatedEvent(str(root / 'a_ABC123.part')))
+        recorder.dispatch(FileMovedEvent(str(root / 'a_ABC123.part'), str(root / 'a_ABC123.pdf')))
+        recorder.close()
+
+        header, events = load_recording(recording_path)
+        assert header[2] == str(root)
+        assert [event[1:5] for event in events] == [
+            ['c', 0, 'a_ABC123.part', None],
+            ['v', 0, 'a_ABC123.part', 'a_ABC123.pdf'],
+        ]
+
+    def test_records_sizes_when_enabled(self, tmp_path, recording_path):
+        """サイズの記録を有効にした場合はファイルサイズを記録する"""
+        (tmp_path / 'file.txt').write_bytes(b'x' * 42)
+        recorder = EventRecorder(recording_path, str(tmp_path), record_sizes=True)
+        recorder.dispatch(FileCreatedEvent(str(tmp_path / 'file.txt')))
+        recorder.close()
+
+        _, events = load_recording(recording_path)
+        assert events[0][5] == 42
+
+    def test_ignores_events_after_close(self, tmp_path, recording_path):
+        """終了後のイベントは記録しない"""
+        recorder = EventRecorder(recording_path, str(tmp_path))
+        recorder.close()
+        recorder.dispatch(FileCreatedEvent(str(tmp_path / 'file.txt')))
+
+        _, events = load_recording(recording_path)
+        assert events == []
+
+    def test_load_recording_rejects_unknown_version(self, recording_path):
+        """対応していない形式の記録ファイルは読み込まない"""
+        with gzip.open(recording_path, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps([99, 0, '/']) + '\n')
+        with pytest.raises(ValueError):
+            load_recording(recording_path)
+
+
+class TestEventReplayer:
+    """EventReplayerのテスト"""
+
+    def _write_recording(self, path, events):
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps([1, 0, '/original']) + '\n')
+            for event in events:
+                f.write(json.dumps(event) + '\n')
+
+    def test_replay_materializes_files_and_dispatches(self, tmp_path, recording_path):
+        """ファイル操作を再現してからハンドラーへイベントを渡す"""
+        self._write_recording(recording_path, [
+            [0.0, 'c', 0, 'a.part', None, 10],
+            [0.01, 'v', 0, 'a.part', 'a_ABC123.pdf', None],
+        ])
+        scratch = tmp_path / 'scratch'
+        scratch.mkdir()
+        handler = MagicMock(spec=FileSystemEventHandler)
+
+        result = EventReplayer(recording_path, str(scratch), handler, speed=0).run()
+
+        assert result.event_count == 2
+        assert (scratch / 'a_ABC123.pdf').stat().st_size == 10
+        dispatched = [call.args[0] for call in handler.dispatch.call_args_list]
+        assert isinstance(dispatched[0], FileCreatedEvent)
+        assert isinstance(dispatched[1], FileMovedEvent)
+        assert dispatched[1].dest_path == str(scratch / 'a_ABC123.pdf')
+
+    def test_replay_respects_speed(self, tmp_path, recording_path):
+        """再生速度に応じてイベント間隔を待機する"""
+        self._write_recording(recording_path, [
+            [0.0, 'c', 0, 'a.txt', None, None],
+            [0.2, 'c', 0, 'b.txt', None, None],
+        ])
+        handler = MagicMock(spec=FileSystemEventHandler)
+
+        result = EventReplayer(recording_path, str(tmp_path), handler, speed=4.0).run()
+
+        assert 0.04 <= result.elapsed_seconds < 0.2
+        assert result.recorded_seconds == 0.2
+
+    def test_finish_is_included_in_elapsed_time(self, tmp_path, recording_path):
+        """終了処理は最後のイベントの後に呼び、再生時間に含める"""
+        self._write_recording(recording_path, [[0.0, 'c', 0, 'a.txt', None, None]])
+        handler = MagicMock(spec=FileSystemEventHandler)
+        finish = MagicMock(side_effect=lambda: time.sleep(0.05))
+
+        result = EventReplayer(recording_path, str(tmp_path), handler, speed=0).run(finish=finish)
+
+        finish.assert_called_once()
+        assert handler.dispatch.call_count == 1
+        assert result.elapsed_seconds >= 0.05
@@ -0,0 +1,186 @@
+import errno
+import os
+from unittest.mock import patch
+
+import pytest
+
+from service.file_mover import move_file, unique_name
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'src' / 'report.pdf'
+    path.parent.mkdir()
+    path.write_bytes(os.urandom(300 * 1024))
+    return path
+
+
+class TestUniqueName:
+    """unique_nameのテスト"""
+
+    def test_unique_name(self, tmp_path):
+        """重複しないファイル名を返す"""
+        (tmp_path / 'a.txt').write_text('')
+        (tmp_path / 'a (1).txt').write_text('')
+        assert unique_name(str(tmp_path), 'a.txt') == 'a (2).txt'
+        assert unique_name(str(tmp_path), 'b.txt') == 'b.txt'
+
+
+class TestMoveFile:
+    """move_fileのテスト"""
+
+    def test_same_device_uses_rename(self, tmp_path, source):
+        """同じデバイス上ではコピーせずに移動する"""
+        data = source.read_bytes()
+        with patch('service.file_mover._copy_and_publish') as mock_copy:
+            moved = move_file(str(source), str(tmp_path / 'dst'), 'renamed.pdf')
+            mock_copy.assert_not_called()
+
+        assert moved == str(tmp_path / 'dst' / 'renamed.pdf')
+        assert (tmp_path / 'dst' / 'renamed.pdf').read_bytes() == data
+        assert not source.exists()
+
+    def test_cross_device_copies_and_publishes(self, tmp_path, source):
+        """別のデバイスへはコピー後に最終的な名前で公開し、元のファイルを削除する"""
+        data = source.read_bytes()
+        with patch('service.file_mover._same_device', return_value=False):
+            moved = move_file(str(source), str(tmp_path / 'dst'))
+
+        assert moved == str(tmp_path / 'dst' / 'report.pdf')
+        assert (tmp_path / 'dst' / 'report.pdf').read_bytes() == data
+        assert os.listdir(tmp_path / 'dst') == ['report.pdf']
+        assert not source.exists()
+
+    def test_rename_exdev_falls_back_to_copy(self, tmp_path, source):
+        """同じデバイスへの移動がEXDEVで失敗した場合はコピーで移動する"""
+        data = source.read_bytes()
+        real_link, real_rename = os.link, os.rename
+
+        def link(src, dst):
+            if src == str(source):
+                raise OSError(errno.EXDEV, "Invalid cross-device link")
+            return real_link(src, dst)
+
+        def rename(src, dst):
+            if src == str(source):
+                raise OSError(errno.EXDEV, "Invalid cross-device link")
+            return real_rename(src, dst)
+
+        with patch('service.file_mover.os.link', side_effect=link), \
+             patch('service.file_mover.os.rename', side_effect=rename):
+            moved = move_file(str(source), str(tmp_path / 'dst'))
+
+        assert open(moved, 'rb').read() == data
+
+    def test_cross_device_reports_progress(self, tmp_path, source):
+        """コピーの進捗をコールバックで通知する"""
+        progress = []
+        with patch('service.file_mover._same_device', return_value=False), \
+             patch('service.file_mover._CHUNK_SIZE', 100 * 1024):
+            move_file(str(source), str(tmp_path / 'dst'), progress=lambda copied, total: progress.append((copied, total)))
+
+        total = 300 * 1024
+        assert progress[-1] == (total, total)
+        assert len(progress) == 3
+
+    def test_falls_back_when_copy_file_range_unsupported(self, tmp_path, source):
+        """copy_file_rangeが使えない場合は他の方法でコピーする"""
+        data = source.read_bytes()
+        with patch('service.file_mover._same_device', return_value=False), \
+             patch('service.file_mover.os.copy_file_range', side_effect=OSError(errno.EXDEV, "xdev"), create=True):
+            moved = move_file(str(source), str(tmp_path / 'dst'))
+
+        assert open(moved, 'rb').read() == data
+
+    def test_collision_adds_counter(self, tmp_path, source):
+        """移動先に同名のファイルがある場合は連番を付与する"""
+        (tmp_path / 'dst').mkdir()
+        (tmp_path / 'dst' / 'report.pdf').write_text('existing')
+        with patch('service.file_mover._same_device', return_value=False):
+            moved = move_file(str(source), str(tmp_path / 'dst'))
+
+        assert os.path.basename(moved) == 'report (1).pdf'
+        assert (tmp_path / 'dst' / 'report.pdf').read_text() == 'existing'
+
+    def test_failed_copy_removes_temporary_file(self, tmp_path, source):
+        """コピーに失敗した場合は一時ファイルを削除し、元のファイルを残す"""
+        with patch('service.file_mover._same_device', return_value=False), \
+             patch('service.file_mover._copy_range', side_effect=OSError(errno.ENOSPC, "No space left")):
+            with pytest.raises(OSError):
+                move_file(str(source), str(tmp_path / 'dst'))
+
+        assert os.listdir(tmp_path / 'dst') == []
+        assert source.exists()
+
+    def test_stale_partial_from_same_pid_does_not_block(self, tmp_path, source):
+        """同じプロセスIDで異常終了した移動の一時ファイルが残っていても移動できる"""
+        (tmp_path / 'dst').mkdir()
+        stale = tmp_path / 'dst' / f".report.pdf.{os.getpid()}.partial"
+        stale.write_text('stale')
+        with patch('service.file_mover._same_device', return_value=False):
+            moved = move_file(str(source), str(tmp_path / 'dst'))
+
+        assert moved == str(tmp_path / 'dst' / 'report.pdf')
+        assert sorted(os.listdir(tmp_path / 'dst')) == [stale.name, 'report.pdf']
+
+    @pytest.mark.skipif(os.name == 'nt', reason="Windowsではos.renameが上書きしないため、リンクを使わない")
+    @pytest.mark.parametrize('same_device', [True, False])
+    def test_name_taken_before_publish_is_not_overwritten(self, tmp_path, source, same_device):
+        """名前の確認後に他のプロセスが同じ名前を作成しても上書きせず、次の連番で公開する"""
+        data = source.read_bytes()
+        taken = tmp_path / 'dst' / 'report.pdf'
+        real_link = os.link
+
+        def link(src, dst):
+            if dst == str(taken) and not taken.exists():
+                taken.write_text('other')
+            return real_link(src, dst)
+
+        with patch('service.file_mover._same_device', return_value=same_device), \
+             patch('service.file_mover.os.link', side_effect=link):
+            moved = move_file(str(source), str(tmp_path / 'dst'))
+
+        assert os.path.basename(moved) == 'report (1).pdf'
+        assert taken.read_text() == 'other'
+        assert open(moved, 'rb').read() == data
+
+    @pytest.mark.skipif(os.name == 'nt', reason="POSIXのみ")
+    def test_link_unsupported_reserves_name(self, tmp_path, source):
+        """リンクに対応していない場合は名前を確保してから置き換える"""
+        (tmp_path / 'dst').mkdir()
+        (tmp_path / 'dst' / 'report.pdf').write_text('existing')
+        data = source.read_bytes()
+        with patch('service.file_mover.os.link', side_effect=OSError(errno.EPERM, "Operation not permitted")):
+            moved = move_file(str(source), str(tmp_path / 'dst'))
+
+        assert os.path.basename(moved) == 'report (1).pdf'
+        assert (tmp_path / 'dst' / 'report.pdf').read_text() == 'existing'
+        assert open(moved, 'rb').read() == data
+        assert not source.exists()
+
+    def test_source_removal_failure_keeps_move(self, tmp_path, source, caplog):
+        """コピー後に元のファイルを削除できなくても、移動は完了として扱う"""
+        real_remove = os.remove
+
+        def remove(path):
+            if path == str(source):
+                raise PermissionError(errno.EACCES, "Permission denied")
+            return real_remove(path)
+
+        with patch('service.file_mover._same_device', return_value=False), \
+             patch('service.file_mover.os.remove', side_effect=remove):
+            moved = move_file(str(source), str(tmp_path / 'dst'))
+
+        assert moved == str(tmp_path / 'dst' / 'report.pdf')
+        assert os.listdir(tmp_path / 'dst') == ['report.pdf']
+        assert "移動元のファイルを削除できませんでした" in caplog.text
+
+    def test_truncated_copy_is_not_published(self, tmp_path, source):
+        """コピーしたサイズが元のファイルと異なる場合は公開せず、元のファイルを残す"""
+        with patch('service.file_mover._same_device', return_value=False), \
+             patch('service.file_mover._copy_range', return_value=100):
+            with pytest.raises(OSError):
+                move_file(str(source), str(tmp_path / 'dst'))
+
+        assert os.listdir(tmp_path / 'dst') == []
+        assert source.exists()
@@ -1,13 +1,28 @@
+import errno
+import json
 import logging
+import os
+import random
 import re
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
 
 import pytest
-from watchdog.events import FileCreatedEvent, FileMovedEvent
+from watchdog.events import FileClosedEvent, FileCreatedEvent, FileMovedEvent
 
+from service.content_sniffer import ContentSniffer
+from service.deadline_fs import DeadlineFileSystem
 from service.file_rename_handler import FileRenameHandler
+from service.fs_backend import InlineExecutor, InMemoryFileSystem
+from service.lifecycle_trace import LifecycleTracer
+from service.post_actions import PostActionPipeline
+from service.retry_scheduler import RetryScheduler
+from service.timer_queue import TimerQueue
 
 
 @pytest.fixture
@@ -88,46 +103,88 @@ class TestFileRenameHandlerEventHandling:
             handler.on_moved(event)
             mock_process.assert_called_once_with(r'C:\test\file_ABC123.txt')
 
+    def test_event_thread_keeps_priority(self, handler):
+        """イベントを受け取るスレッドの優先度は下げず、走査のスレッドのみ下げる"""
+        handler.low_priority = True
+        with patch('service.file_rename_handler.lower_current_thread_priority') as mock_lower, \
+             patch.object(handler, '_process_file'):
+            handler.on_created(FileCreatedEvent(r'C:\test\file_ABC123.txt'))
+            mock_lower.assert_not_called()
+
+            thread = threading.Thread(target=handler.scan_directory, args=(r'C:\missing',))
+            thread.start()
+            thread.join()
+            assert mock_lower.called
+
 
 class TestFileRenameHandlerProcessFile:
     """ファイル処理のテスト"""
 
-    def test_process_file_waits_before_processing(self, handler):
+    def test_process_file_waits_before_processing(self, handler, tmp_path):
         """ファイル処理前に待機する"""
-        with patch('time.sleep') as mock_sleep, \
-             patch('pathlib.Path.exists', return_value=False):
-            handler._process_file(r'C:\test\file.txt')
+        with patch('time.sleep') as mock_sleep:
+            handler._process_file(str(tmp_path / 'file.txt'))
             mock_sleep.assert_called_once_with(0.1)
 
-    def test_process_file_returns_if_file_not_exists(self, handler):
+    def test_process_file_returns_if_file_not_exists(self, handler, tmp_path):
         """ファイルが存在しない場合は処理をスキップ"""
         with patch('time.sleep'), \
              patch.object(handler, 'should_rename') as mock_should_rename:
-            handler._process_file(r'C:\test\nonexistent.txt')
+            handler._process_file(str(tmp_path / 'nonexistent.txt'))
+            mock_should_rename.assert_not_called()
+
+    def test_process_file_returns_if_folder_not_exists(self, handler, tmp_path):
+        """フォルダが存在しない場合は処理をスキップ"""
+        with patch('time.sleep'), \
+             patch.object(handler, 'should_rename') as mock_should_rename:
+            handler._process_file(str(tmp_path / 'missing' / 'file_ABC123.txt'))
             mock_should_rename.assert_not_called()
 
-    def test_process_file_renames_when_should_rename_true(self, handler):
+    def test_process_file_renames_when_should_rename_true(self, handler, tmp_path):
         """リネーム対象の場合はリネームを実行"""
-        test_path_str = r'C:\test\file_ABC123.txt'
+        test_path = tmp_path / 'file_ABC123.txt'
+        test_path.write_text('data')
 
         with patch('time.sleep'), \
-             patch('pathlib.Path.exists', return_value=True), \
              patch.object(handler, 'should_rename', return_value=True), \
              patch.object(handler, 'rename_file') as mock_rename:
-            handler._process_file(test_path_str)
-            mock_rename.assert_called_once()
+            handler._process_file(str(test_path))
+            mock_rename.assert_called_once_with(
+                str(test_path), 'file_ABC123', '.txt', background=False, patterns=handler.patterns
+            )
 
-    def test_process_file_skips_when_should_rename_false(self, handler):
+    def test_process_file_skips_when_should_rename_false(self, handler, tmp_path):
         """リネーム対象でない場合はスキップ"""
-        test_path_str = r'C:\test\normalfile.txt'
+        test_path = tmp_path / 'normalfile.txt'
+        test_path.write_text('data')
 
         with patch('time.sleep'), \
-             patch('pathlib.Path.exists', return_value=True), \
              patch.object(handler, 'should_rename', return_value=False), \
              patch.object(handler, 'rename_file') as mock_rename:
-            handler._process_file(test_path_str)
+            handler._process_file(str(test_path))
             mock_rename.assert_not_called()
 
+    def test_process_file_accepts_bytes_path(self, handler, tmp_path):
+        """bytesのパスを処理できる"""
+        (tmp_path / 'file_ABC123.txt').write_text('data')
+
+        with patch('time.sleep'):
+            handler._process_file(os.fsencode(tmp_path / 'file_ABC123.txt'))
+
+        assert [p.name for p in tmp_path.iterdir()] == ['file.txt']
+
+    @pytest.mark.skipif(sys.platform != 'linux', reason="UTF-8として不正なファイル名はLinuxのみ作成可能")
+    def test_process_file_handles_non_utf8_name(self, handler, tmp_path):
+        """UTF-8として不正なバイト列を含むファイル名も処理できる"""
+        directory = os.fsencode(tmp_path)
+        source = os.path.join(directory, b'caf\xe9_ABC123.txt')
+        open(source, 'wb').close()
+
+        with patch('time.sleep'):
+            handler._process_file(source)
+
+        assert os.listdir(directory) == [b'caf\xe9.txt']
+
 
 class TestFileRenameHandlerShouldRename:
     """リネーム判定のテスト"""
@@ -168,61 +225,53 @@ class TestFileRenameHandlerShouldRename:
         assert handler.should_rename('fileABC123') is False
 
 
+def _names(directory: Path) -> list[str]:
+    return sorted(p.name for p in directory.iterdir())
+
+
 class TestFileRenameHandlerRenameFile:
     """ファイルリネームのテスト"""
 
-    def test_rename_file_removes_pattern(self, handler, caplog):
+    def test_rename_file_removes_pattern(self, handler, tmp_path, caplog):
         """パターンを削除してリネーム"""
-        mock_path = MagicMock(spec=Path)
-        mock_path.parent = Path(r'C:\test')
-        mock_path.name = 'file_ABC123.txt'
+        (tmp_path / 'file_ABC123.txt').write_text('data')
 
-        with patch('pathlib.Path.exists', return_value=False), \
-             caplog.at_level(logging.INFO):
-            handler.rename_file(mock_path, 'file_ABC123', '.txt')
-            mock_path.rename.assert_called_once()
-            assert "リネーム完了" in caplog.text
+        with caplog.at_level(logging.INFO):
+            handler.rename_file(str(tmp_path / 'file_ABC123.txt'), 'file_ABC123', '.txt')
+        assert _names(tmp_path) == ['file.txt']
+        assert "リネーム完了" in caplog.text
 
-    def test_rename_file_handles_duplicate_with_counter(self, handler):
+    def test_rename_file_handles_duplicate_with_counter(self, handler, tmp_path):
         """重複ファイル名の場合は連番を付与"""
-        mock_path = MagicMock(spec=Path)
-        mock_path.parent = Path(r'C:\test')
-        mock_path.name = 'file_ABC123.txt'
+        (tmp_path / 'file_ABC123.txt').write_text('data')
+        (tmp_path / 'file.txt').write_text('existing')
+        (tmp_path / 'file (1).txt').write_text('existing')
 
-        # 最初の2つは存在するが、3つ目は存在しない
-        exists_results = [True, True, False]
-        with patch('pathlib.Path.exists', side_effect=exists_results):
-            handler.rename_file(mock_path, 'file_ABC123', '.txt')
+        handler.rename_file(str(tmp_path / 'file_ABC123.txt'), 'file_ABC123', '.txt')
 
-            # file (2).txtにリネームされる
-            expected_path = Path(r'C:\test\file (2).txt')
-            mock_path.rename.assert_called_once_with(expected_path)
+        # file (2).txtにリネームされる
+        assert (tmp_path / 'file (2).txt').read_text() == 'data'
+        assert not (tmp_path / 'file_ABC123.txt').exists()
 
-    def test_rename_file_handles_permission_error(self, handler, caplog):
+    def test_rename_file_handles_permission_error(self, handler, tmp_path, caplog):
         """PermissionErrorを適切に処理"""
-        mock_path = MagicMock(spec=Path)
-        mock_path.parent = Path(r'C:\test')
-        mock_path.name = 'file_ABC123.txt'
-        mock_path.rename.side_effect = PermissionError
+        (tmp_path / 'file_ABC123.txt').write_text('data')
 
-        with patch('pathlib.Path.exists', return_value=False), \
+        with patch('service.directory_handle.os.rename', side_effect=PermissionError), \
              caplog.at_level(logging.ERROR):
-            handler.rename_file(mock_path, 'file_ABC123', '.txt')
-            assert "ファイルにアクセスできません" in caplog.text
+            handler.rename_file(str(tmp_path / 'file_ABC123.txt'), 'file_ABC123', '.txt')
+        assert "ファイルにアクセスできません" in caplog.text
 
-    def test_rename_file_handles_os_error(self, handler, caplog):
+    def test_rename_file_handles_os_error(self, handler, tmp_path, caplog):
         """OSErrorを適切に処理"""
-        mock_path = MagicMock(spec=Path)
-        mock_path.parent = Path(r'C:\test')
-        mock_path.name = 'file_ABC123.txt'
-        mock_path.rename.side_effect = OSError("Test error")
+        (tmp_path / 'file_ABC123.txt').write_text('data')
 
-        with patch('pathlib.Path.exists', return_value=False), \
+        with patch('service.directory_handle.os.rename', side_effect=OSError("Test error")), \
              caplog.at_level(logging.ERROR):
-            handler.rename_file(mock_path, 'file_ABC123', '.txt')
-            assert "リネーム失敗" in caplog.text
+            handler.rename_file(str(tmp_path / 'file_ABC123.txt'), 'file_ABC123', '.txt')
+        assert "リネーム失敗" in caplog.text
 
-    def test_rename_file_with_multiple_patterns(self):
+    def test_rename_file_with_multiple_patterns(self, tmp_path):
         """複数パターンを削除してリネーム"""
         with patch('service.file_rename_handler.get_rename_patterns') as mock_patterns, \
              patch('service.file_rename_handler.get_wait_time'):
@@ -231,68 +280,48 @@ class TestFileRenameHandlerRenameFile:
                 re.compile(r'_[A-Za-z0-9]{6}$')
             ]
             handler = FileRenameHandler()
+            (tmp_path / 'file_ABC123_tmp.txt').write_text('data')
 
-            mock_path = MagicMock(spec=Path)
-            mock_path.parent = Path(r'C:\test')
-            mock_path.name = 'file_ABC123_tmp.txt'
+            handler.rename_file(str(tmp_path / 'file_ABC123_tmp.txt'), 'file_ABC123_tmp', '.txt')
 
-            with patch('pathlib.Path.exists', return_value=False):
-                handler.rename_file(mock_path, 'file_ABC123_tmp', '.txt')
+            # 両方のパターンが削除される
+            assert _names(tmp_path) == ['file.txt']
 
-                # 両方のパターンが削除される
-                expected_path = Path(r'C:\test\file.txt')
-                mock_path.rename.assert_called_once_with(expected_path)
-
-    def test_rename_file_preserves_extension(self, handler):
+    def test_rename_file_preserves_extension(self, handler, tmp_path):
         """拡張子を保持してリネーム"""
-        mock_path = MagicMock(spec=Path)
-        mock_path.parent = Path(r'C:\test')
-        mock_path.name = 'document_ABC123.pdf'
+        (tmp_path / 'document_ABC123.pdf').write_text('data')
 
-        with patch('pathlib.Path.exists', return_value=False):
-            handler.rename_file(mock_path, 'document_ABC123', '.pdf')
+        handler.rename_file(str(tmp_path / 'document_ABC123.pdf'), 'document_ABC123', '.pdf')
 
-            expected_path = Path(r'C:\test\document.pdf')
-            mock_path.rename.assert_called_once_with(expected_path)
+        assert _names(tmp_path) == ['document.pdf']
 
-    def test_rename_file_increments_counter_correctly(self, handler):
+    def test_rename_file_increments_counter_correctly(self, handler, tmp_path):
         """連番が正しくインクリメントされる"""
-        mock_path = MagicMock(spec=Path)
-        mock_path.parent = Path(r'C:\test')
-        mock_path.name = 'file_ABC123.txt'
+        (tmp_path / 'file_ABC123.txt').write_text('data')
+        (tmp_path / 'file.txt').write_text('existing')
+        for i in range(1, 5):
+            (tmp_path / f'file ({i}).txt').write_text('existing')
 
-        # 最初の5つは存在し、6つ目は存在しない
-        exists_results = [True, True, True, True, True, False]
-        with patch('pathlib.Path.exists', side_effect=exists_results):
-            handler.rename_file(mock_path, 'file_ABC123', '.txt')
+        handler.rename_file(str(tmp_path / 'file_ABC123.txt'), 'file_ABC123', '.txt')
 
-            # file (5).txtにリネームされる
-            expected_path = Path(r'C:\test\file (5).txt')
-            mock_path.rename.assert_called_once_with(expected_path)
+        # file (5).txtにリネームされる
+        assert (tmp_path / 'file (5).txt').read_text() == 'data'
 
-    def test_rename_file_with_no_extension(self, handler):
+    def test_rename_file_with_no_extension(self, handler, tmp_path):
         """拡張子のないファイルをリネーム"""
-        mock_path = MagicMock(spec=Path)
-        mock_path.parent = Path(r'C:\test')
-        mock_path.name = 'file_ABC123'
+        (tmp_path / 'file_ABC123').write_text('data')
 
-        with patch('pathlib.Path.exists', return_value=False):
-            handler.rename_file(mock_path, 'file_ABC123', '')
+        handler.rename_file(str(tmp_path / 'file_ABC123'), 'file_ABC123', '')
 
-            expected_path = Path(r'C:\test\file')
-            mock_path.rename.assert_called_once_with(expected_path)
+        assert _names(tmp_path) == ['file']
 
-    def test_rename_file_with_long_extension(self, handler):
+    def test_rename_file_with_long_extension(self, handler, tmp_path):
         """長い拡張子のファイルをリネーム"""
-        mock_path = MagicMock(spec=Path)
-        mock_path.parent = Path(r'C:\test')
-        mock_path.name = 'archive_ABC123.tar.gz'
+        (tmp_path / 'archive_ABC123.tar.gz').write_text('data')
 
-        with patch('pathlib.Path.exists', return_value=False):
-            handler.rename_file(mock_path, 'archive_ABC123', '.tar.gz')
+        handler.rename_file(str(tmp_path / 'archive_ABC123.tar.gz'), 'archive_ABC123', '.tar.gz')
 
-            expected_path = Path(r'C:\test\archive.tar.gz')
-            mock_path.rename.assert_called_once_with(expected_path)
+        assert _names(tmp_path) == ['archive.tar.gz']
 
 
 class TestFileRenameHandlerEdgeCases:
@@ -306,7 +335,7 @@ class TestFileRenameHandlerEdgeCases:
             handler = FileRenameHandler()
             assert handler.should_rename('any_filename') is False
 
-    def test_zero_wait_time(self):
+    def test_zero_wait_time(self, tmp_path):
         """待機時間が0の場合"""
         with patch('service.file_rename_handler.get_rename_patterns') as mock_patterns, \
              patch('service.file_rename_handler.get_wait_time') as mock_wait_time:
@@ -314,60 +343,935 @@ class TestFileRenameHandlerEdgeCases:
             mock_wait_time.return_value = 0.0
             handler = FileRenameHandler()
 
-            with patch('time.sleep') as mock_sleep, \
-                 patch('pathlib.Path.exists', return_value=False):
-                handler._process_file(r'C:\test\file.txt')
+            with patch('time.sleep') as mock_sleep:
+                handler._process_file(str(tmp_path / 'file.txt'))
                 mock_sleep.assert_called_once_with(0.0)
 
-    def test_pattern_removes_entire_filename(self):
+    def test_pattern_removes_entire_filename(self, tmp_path):
         """パターンがファイル名全体にマッチする場合"""
         with patch('service.file_rename_handler.get_rename_patterns') as mock_patterns, \
              patch('service.file_rename_handler.get_wait_time'):
             # ファイル名全体を削除するパターン
             mock_patterns.return_value = [re.compile(r'^file_ABC123$')]
             handler = FileRenameHandler()
+            (tmp_path / 'file_ABC123.txt').write_text('data')
 
-            mock_path = MagicMock(spec=Path)
-            mock_path.parent = Path(r'C:\test')
-            mock_path.name = 'file_ABC123.txt'
-
-            with patch('pathlib.Path.exists', return_value=False):
-                handler.rename_file(mock_path, 'file_ABC123', '.txt')
+            handler.rename_file(str(tmp_path / 'file_ABC123.txt'), 'file_ABC123', '.txt')
 
-                # 空のファイル名になる
-                expected_path = Path(r'C:\test\.txt')
-                mock_path.rename.assert_called_once_with(expected_path)
+            # 空のファイル名になる
+            assert _names(tmp_path) == ['.txt']
 
-    def test_unicode_filename(self):
+    def test_unicode_filename(self, handler, tmp_path):
         """Unicode文字を含むファイル名の処理"""
-        with patch('service.file_rename_handler.get_rename_patterns') as mock_patterns, \
-             patch('service.file_rename_handler.get_wait_time'):
-            mock_patterns.return_value = [re.compile(r'_[A-Za-z0-9]{6}$')]
-            handler = FileRenameHandler()
-
-            mock_path = MagicMock(spec=Path)
-            mock_path.parent = Path(r'C:\test')
-            mock_path.name = '日本語ファイル_ABC123.txt'
+        (tmp_path / '日本語ファイル_ABC123.txt').write_text('data')
 
-            with patch('pathlib.Path.exists', return_value=False):
-                handler.rename_file(mock_path, '日本語ファイル_ABC123', '.txt')
+        handler.rename_file(str(tmp_path / '日本語ファイル_ABC123.txt'), '日本語ファイル_ABC123', '.txt')
 
-                expected_path = Path(r'C:\test\日本語ファイル.txt')
-                mock_path.rename.assert_called_once_with(expected_path)
+        assert _names(tmp_path) == ['日本語ファイル.txt']
 
-    def test_special_characters_in_filename(self):
+    def test_special_characters_in_filename(self, handler, tmp_path):
         """特殊文字を含むファイル名の処理"""
-        with patch('service.file_rename_handler.get_rename_patterns') as mock_patterns, \
-             patch('service.file_rename_handler.get_wait_time'):
-            mock_patterns.return_value = [re.compile(r'_[A-Za-z0-9]{6}$')]
-            handler = FileRenameHandler()
+        (tmp_path / 'file-name (with spaces)_ABC123.txt').write_text('data')
+
+        handler.rename_file(
+            str(tmp_path / 'file-name (with spaces)_ABC123.txt'), 'file-name (with spaces)_ABC123', '.txt'
+        )
+
+        assert _names(tmp_path) == ['file-name (with spaces).txt']
+
+
+class TestFileRenameHandlerScanDirectory:
+    """フォルダ走査のテスト"""
+
+    def test_scan_directory_renames_matching_files(self, handler, tmp_path):
+        """走査時にパターンに一致するファイルをリネームする"""
+        (tmp_path / 'report_ABC123.pdf').write_text('data')
+        (tmp_path / 'normal.txt').write_text('data')
+
+        handler.scan_directory(str(tmp_path))
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == ['normal.txt', 'report.pdf']
+
+    def test_scan_directory_uses_background_priority(self, handler, tmp_path):
+        """走査はバックグラウンド優先度でトークンを取得する"""
+        (tmp_path / 'report_ABC123.pdf').write_text('data')
+
+        with patch.object(handler.throttle, 'acquire') as mock_acquire:
+            handler.scan_directory(str(tmp_path))
+
+        assert mock_acquire.call_count >= 3
+        for call in mock_acquire.call_args_list:
+            assert call.args == (True,) or call.kwargs == {'background': True}
+
+    def test_scan_directory_matches_names_in_bulk(self, handler, tmp_path):
+        """種類を判定しない場合は名前をまとめて照合し、1件ずつ照合した場合と同じ結果になる"""
+        handler.patterns = [re.compile(r'_magnate_[A-Za-z0-9]{6}$'), re.compile(r'^tmp_')]
+        for name in ['a_magnate_ABC123.pdf', 'tmp_note.txt', 'b_magnate_AB.txt', 'c_ABC123.txt']:
+            (tmp_path / name).write_text('data')
+
+        with patch.object(handler, '_resolve_name') as mock_resolve:
+            handler.scan_directory(str(tmp_path))
+
+        mock_resolve.assert_not_called()
+        assert _names(tmp_path) == ['a.pdf', 'b_magnate_AB.txt', 'c_ABC123.txt', 'note.txt']
+
+    def test_scan_directory_logs_error_for_missing_folder(self, handler, tmp_path, caplog):
+        """存在しないフォルダの走査はエラーログを出力する"""
+        with caplog.at_level(logging.ERROR):
+            handler.scan_directory(str(tmp_path / 'missing'))
+        assert "フォルダの走査に失敗しました" in caplog.text
+
+
+class TestFileRenameHandlerPathFilter:
+    """一時ファイルのフィルターのテスト"""
+
+    @pytest.mark.parametrize('name', [
+        'file_ABC123.pdf.crdownload',
+        'file_ABC123.part',
+        'file_ABC123.TMP',
+        '~$document_ABC123.docx',
+    ])
+    def test_on_created_ignores_temporary_files(self, handler, name):
+        """一時ファイルの作成イベントは待機せずに無視される"""
+        event = FileCreatedEvent(f'/test/{name}')
+
+        with patch.object(handler, '_process_file') as mock_process, \
+             patch('time.sleep') as mock_sleep:
+            handler.on_created(event)
+            mock_process.assert_not_called()
+            mock_sleep.assert_not_called()
+
+    def test_on_moved_processes_final_destination(self, handler):
+        """一時ファイルから最終名への移動は移動先を処理する"""
+        event = FileMovedEvent('/test/file_ABC123.pdf.crdownload', '/test/file_ABC123.pdf')
+
+        with patch.object(handler, '_process_file') as mock_process:
+            handler.on_moved(event)
+            mock_process.assert_called_once_with('/test/file_ABC123.pdf')
+
+    def test_on_moved_ignores_temporary_destination(self, handler):
+        """移動先が一時ファイルの場合は無視される"""
+        event = FileMovedEvent('/test/file_ABC123.pdf', '/test/file_ABC123.pdf.tmp')
+
+        with patch.object(handler, '_process_file') as mock_process:
+            handler.on_moved(event)
+            mock_process.assert_not_called()
+
+
+class TestFileRenameHandlerPauseResume:
+    """一時停止と再開のテスト"""
+
+    def test_paused_handler_buffers_events(self, handler, tmp_path):
+        """一時停止中のイベントは処理せずに保留する"""
+        handler.pause()
+        with patch.object(handler, '_process_file') as mock_process:
+            handler.on_created(FileCreatedEvent(str(tmp_path / 'file_ABC123.txt')))
+            mock_process.assert_not_called()
+        assert handler.pending_count == 1
+
+    def test_paused_handler_coalesces_events_per_path(self, handler, tmp_path):
+        """同じパスのイベントは1件にまとめる"""
+        handler.pause()
+        path = str(tmp_path / 'file_ABC123.txt')
+        handler.on_created(FileCreatedEvent(path))
+        handler.on_moved(FileMovedEvent(str(tmp_path / 'file.part'), path))
+        handler.on_created(FileCreatedEvent(str(tmp_path / 'other_ABC123.txt')))
+        assert handler.pending_count == 2
+
+    def test_resume_drains_pending_files(self, handler, tmp_path):
+        """再開時に保留中のファイルをリネームする"""
+        handler.pause()
+        for name in ['a_ABC123.txt', 'b_ABC123.txt', 'c_ABC123.txt']:
+            (tmp_path / name).write_text('data')
+            handler.on_created(FileCreatedEvent(str(tmp_path / name)))
+
+        with patch('time.sleep'):
+            handler.resume().join(5)
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == ['a.txt', 'b.txt', 'c.txt']
+        assert handler.pending_count == 0
+        assert handler.paused is False
+
+    def test_resume_skips_wait_for_old_events(self, handler, tmp_path):
+        """待機時間が経過済みの保留ファイルは待たずに処理する"""
+        handler.pause()
+        (tmp_path / 'a_ABC123.txt').write_text('data')
+        handler.on_created(FileCreatedEvent(str(tmp_path / 'a_ABC123.txt')))
+        time.sleep(0.15)
+
+        with patch('time.sleep') as mock_sleep:
+            handler.resume().join(5)
+            mock_sleep.assert_not_called()
+
+    def test_pending_file_removed_while_paused_is_skipped(self, handler, tmp_path):
+        """保留中に削除されたファイルは処理しない"""
+        handler.pause()
+        handler.on_created(FileCreatedEvent(str(tmp_path / 'gone_ABC123.txt')))
+
+        with patch('time.sleep'), \
+             patch.object(handler, 'rename_file') as mock_rename:
+            handler.resume().join(5)
+            mock_rename.assert_not_called()
+
+
+class TestFileRenameHandlerDestination:
+    """移動先フォルダのテスト"""
+
+    def test_rename_moves_to_destination(self, handler, tmp_path):
+        """移動先フォルダが設定されている場合は変換後の名前で移動する"""
+        (tmp_path / 'src').mkdir()
+        (tmp_path / 'src' / 'report_ABC123.pdf').write_text('data')
+        handler.destination = str(tmp_path / 'dst')
+
+        new_path = handler.rename_file(str(tmp_path / 'src' / 'report_ABC123.pdf'), 'report_ABC123', '.pdf')
+
+        assert new_path == str(tmp_path / 'dst' / 'report.pdf')
+        assert (tmp_path / 'dst' / 'report.pdf').read_text() == 'data'
+        assert list((tmp_path / 'src').iterdir()) == []
+
+    def test_destination_collision_adds_counter(self, handler, tmp_path):
+        """移動先に同名のファイルがある場合は連番を付与する"""
+        (tmp_path / 'src').mkdir()
+        (tmp_path / 'dst').mkdir()
+        (tmp_path / 'src' / 'report_ABC123.pdf').write_text('data')
+        (tmp_path / 'dst' / 'report.pdf').write_text('existing')
+        handler.destination = str(tmp_path / 'dst')
+
+        new_path = handler.rename_file(str(tmp_path / 'src' / 'report_ABC123.pdf'), 'report_ABC123', '.pdf')
+
+        assert new_path == str(tmp_path / 'dst' / 'report (1).pdf')
+
+
+class TestFileRenameHandlerContentSniffing:
+    """ファイルの種類判定のテスト"""
+
+    @pytest.fixture
+    def sniffing_handler(self, handler):
+        handler.sniffer = ContentSniffer()
+        handler.fix_extension = True
+        return handler
+
+    def test_missing_extension_is_added(self, sniffing_handler, tmp_path):
+        """拡張子のないファイルに判定した種類の拡張子を付与する"""
+        (tmp_path / 'report_ABC123').write_bytes(b'%PDF-1.4\n')
+
+        with patch('time.sleep'):
+            sniffing_handler._process_file(str(tmp_path / 'report_ABC123'))
+
+        assert _names(tmp_path) == ['report.pdf']
+
+    def test_wrong_extension_is_fixed_without_pattern_match(self, sniffing_handler, tmp_path):
+        """パターンに一致しなくても拡張子が誤っている場合は修正する"""
+        (tmp_path / 'image.jpg').write_bytes(b'\x89PNG\r\n\x1a\n')
+
+        with patch('time.sleep'):
+            sniffing_handler._process_file(str(tmp_path / 'image.jpg'))
+
+        assert _names(tmp_path) == ['image.png']
+
+    def test_extension_kept_when_fix_disabled(self, sniffing_handler, tmp_path):
+        """拡張子の修正が無効な場合は拡張子を変更しない"""
+        sniffing_handler.fix_extension = False
+        (tmp_path / 'image_ABC123.jpg').write_bytes(b'\x89PNG\r\n\x1a\n')
+
+        with patch('time.sleep'):
+            sniffing_handler._process_file(str(tmp_path / 'image_ABC123.jpg'))
+
+        assert _names(tmp_path) == ['image.jpg']
+
+    def test_typed_patterns_are_used_for_detected_type(self, sniffing_handler, tmp_path):
+        """判定した種類のパターンが設定されている場合はそちらを使う"""
+        sniffing_handler.typed_patterns = {'pdf': [re.compile(r'_scan$')]}
+        (tmp_path / 'invoice_scan.pdf').write_bytes(b'%PDF-1.4\n')
+        (tmp_path / 'notes_ABC123.txt').write_bytes(b'plain text')
+
+        sniffing_handler.scan_directory(str(tmp_path))
+
+        assert _names(tmp_path) == ['invoice.pdf', 'notes.txt']
+
+
+class TestFileRenameHandlerLifecycleTrace:
+    """処理区間の記録のテスト"""
+
+    @pytest.fixture
+    def traced_handler(self, handler, tmp_path):
+        handler.tracer = LifecycleTracer(str(tmp_path / 'trace.jsonl'), sample_rate=1.0)
+        yield handler
+        handler.close()
+
+    def _records(self, tmp_path):
+        with open(tmp_path / 'trace.jsonl', encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_renamed_file_records_spans(self, traced_handler, tmp_path):
+        """リネームしたファイルの各区間を記録する"""
+        (tmp_path / 'watch').mkdir()
+        (tmp_path / 'watch' / 'file_ABC123.txt').write_text('data')
+
+        with patch('time.sleep'):
+            traced_handler.on_created(FileCreatedEvent(str(tmp_path / 'watch' / 'file_ABC123.txt')))
+        traced_handler.close()
+
+        records = self._records(tmp_path)
+        assert len(records) == 1
+        assert records[0]['outcome'] == 'renamed'
+        assert [span[0] for span in records[0]['spans']] == ['stability_wait', 'match', 'collision', 'rename']
+
+    def test_skipped_file_records_outcome(self, traced_handler, tmp_path):
+        """リネーム対象外のファイルも結果とともに記録する"""
+        (tmp_path / 'watch').mkdir()
+        (tmp_path / 'watch' / 'normal.txt').write_text('data')
+
+        with patch('time.sleep'):
+            traced_handler.on_created(FileCreatedEvent(str(tmp_path / 'watch' / 'normal.txt')))
+        traced_handler.close()
+
+        assert self._records(tmp_path)[0]['outcome'] == 'skipped'
+
+    def test_post_actions_complete_the_trace(self, traced_handler, tmp_path):
+        """リネーム後の処理がある場合は処理完了時に記録する"""
+        (tmp_path / 'watch').mkdir()
+        (tmp_path / 'watch' / 'file_ABC123.txt').write_text('data')
+        traced_handler.post_actions = PostActionPipeline([], workers=1)
+
+        with patch('time.sleep'):
+            traced_handler.on_created(FileCreatedEvent(str(tmp_path / 'watch' / 'file_ABC123.txt')))
+        traced_handler.close()
+
+        spans = [span[0] for span in self._records(tmp_path)[0]['spans']]
+        assert spans[-2:] == ['post_queued', 'post_process']
+
+    def test_grouped_files_are_recorded_after_group_rename(self, traced_handler, tmp_path):
+        """まとめてリネームするファイルは、まとめてリネームした後に記録する"""
+        traced_handler.group_window = 1.0
+        traced_handler.timers = TimerQueue(autostart=False)
+        executor = traced_handler._background_executor = ThreadPoolExecutor(max_workers=1)
+        (tmp_path / 'watch').mkdir()
+        for extension in ('.pdf', '.xml'):
+            (tmp_path / 'watch' / f"report_ABC123{extension}").write_text('data')
+            with patch('time.sleep'):
+                traced_handler.on_created(FileCreatedEvent(str(tmp_path / 'watch' / f"report_ABC123{extension}")))
+        assert self._records(tmp_path) == []
+
+        # まとめてリネームするのはバックグラウンドのスレッド
+        traced_handler.timers.run_pending(float('inf'))
+        executor.shutdown(wait=True)
+
+        records = self._records(tmp_path)
+        assert len(records) == 2
+        assert {record['outcome'] for record in records} == {'renamed'}
+        assert all([span[0] for span in record['spans']][-1] == 'rename' for record in records)
+
+    def test_tracer_uses_handler_clock(self, mock_config, tmp_path):
+        """処理区間はハンドラーと同じ時計で計測する"""
+        fs = InMemoryFileSystem()
+        with patch('service.file_rename_handler.get_trace_enabled', return_value=True), \
+             patch('service.file_rename_handler.get_trace_directory', return_value=str(tmp_path)), \
+             patch('service.file_rename_handler.get_trace_sample_rate', return_value=1.0):
+            handler = FileRenameHandler(fs=fs)
+        try:
+            assert handler.tracer is not None
+            trace = handler.tracer.start('/watch/a_ABC123.txt')
+            with trace.span('match'):
+                fs.sleep(3.0)
+            assert trace.spans[0][2] - trace.spans[0][1] == pytest.approx(3.0)
+        finally:
+            handler.close()
+
+
+class TestFileRenameHandlerRetry:
+    """リネーム失敗時の再試行のテスト"""
+
+    @pytest.fixture
+    def retry_handler(self, handler):
+        handler.timers = TimerQueue(autostart=False)
+        handler._background_executor = InlineExecutor()
+        handler.retries = RetryScheduler(
+            handler.timers, partial(handler._submit_background, handler._retry_file), max_attempts=2, initial_delay=0
+        )
+        return handler
+
+    def test_locked_file_is_renamed_on_retry(self, retry_handler, tmp_path):
+        """ロックされていたファイルは再試行でリネームする"""
+        (tmp_path / 'file_ABC123.txt').write_text('data')
+
+        with patch('service.directory_handle.os.rename', side_effect=PermissionError):
+            retry_handler.rename_file(str(tmp_path / 'file_ABC123.txt'), 'file_ABC123', '.txt')
+        assert retry_handler.retries.pending_count == 1
+
+        retry_handler.timers.run_pending(float('inf'))
+
+        assert _names(tmp_path) == ['file.txt']
+        assert retry_handler.retries.pending_count == 0
+
+    def test_missing_file_is_not_retried(self, retry_handler, tmp_path):
+        """ファイルが消えた場合は再試行しない"""
+        (tmp_path / 'file_ABC123.txt').write_text('data')
+
+        with patch('service.directory_handle.os.rename', side_effect=FileNotFoundError):
+            retry_handler.rename_file(str(tmp_path / 'file_ABC123.txt'), 'file_ABC123', '.txt')
+
+        assert retry_handler.retries.pending_count == 0
+
+    def test_new_event_releases_quarantine(self, retry_handler, tmp_path):
+        """隔離したファイルも新しいイベントを受けた場合は再処理する"""
+        path = str(tmp_path / 'file_ABC123.txt')
+        (tmp_path / 'file_ABC123.txt').write_text('data')
+        with patch('service.directory_handle.os.rename', side_effect=PermissionError):
+            retry_handler.rename_file(path, 'file_ABC123', '.txt')
+            for _ in range(3):
+                retry_handler.timers.run_pending(float('inf'))
+        assert path in retry_handler.retries.quarantined
+
+        with patch('time.sleep'):
+            retry_handler.on_created(FileCreatedEvent(path))
+
+        assert retry_handler.retries.quarantined == {}
+        assert _names(tmp_path) == ['file.txt']
+
+    def test_retry_runs_outside_timer_thread(self, retry_handler, tmp_path):
+        """再試行のリネームはタイマーのスレッドではなくバックグラウンドのスレッドで行う"""
+        (tmp_path / 'file_ABC123.txt').write_text('data')
+        with patch('service.directory_handle.os.rename', side_effect=PermissionError):
+            retry_handler.rename_file(str(tmp_path / 'file_ABC123.txt'), 'file_ABC123', '.txt')
+
+        threads = []
+        process = retry_handler._process_file
+        executor = retry_handler._background_executor = ThreadPoolExecutor(max_workers=1)
+        with patch.object(retry_handler, '_process_file',
+                          side_effect=lambda *args, **kwargs: threads.append(threading.current_thread())
+                          or process(*args, **kwargs)):
+            retry_handler.timers.run_pending(float('inf'))
+            executor.shutdown(wait=True)
+
+        assert threads and threads[0] is not threading.current_thread()
+        assert _names(tmp_path) == ['file.txt']
+
+
+class TestFileRenameHandlerCloseWrite:
+    """ファイルが閉じられた時点で処理する書き込み完了判定のテスト"""
+
+    @pytest.fixture
+    def close_write_handler(self, handler):
+        handler.readiness = 'close_write'
+        handler.timers = TimerQueue(autostart=False)
+        handler._background_executor = InlineExecutor()
+        handler.stability_interval = 1.0
+        handler.readiness_timeout = 60.0
+        return handler
+
+    def test_closed_file_is_renamed_without_sleep(self, close_write_handler, tmp_path):
+        """作成されたファイルは閉じられた時点で待機せずに処理する"""
+        path = str(tmp_path / 'file_ABC123.txt')
+        (tmp_path / 'file_ABC123.txt').write_text('data')
+
+        with patch('time.sleep') as mock_sleep:
+            close_write_handler.on_created(FileCreatedEvent(path))
+            assert _names(tmp_path) == ['file_ABC123.txt']
+            close_write_handler.on_closed(FileClosedEvent(path))
+
+        mock_sleep.assert_not_called()
+        assert _names(tmp_path) == ['file.txt']
+        assert len(close_write_handler.timers) == 0
+        assert close_write_handler.stats.events_received == close_write_handler.stats.events_finished == 1
+
+    def test_duplicate_events_are_coalesced(self, close_write_handler, tmp_path):
+        """書き込み中の重複イベントは1件として扱う"""
+        path = str(tmp_path / 'file_ABC123.txt')
+        (tmp_path / 'file_ABC123.txt').write_text('data')
+
+        close_write_handler.on_created(FileCreatedEvent(path))
+        close_write_handler.on_created(FileCreatedEvent(path))
+
+        assert len(close_write_handler.timers) == 1
+        assert close_write_handler.stats.events_received == 1
+
+    def test_unclosed_file_is_processed_when_stable(self, close_write_handler, tmp_path):
+        """閉じられないファイルはサイズと更新時刻が変化しなくなった時点で処理する"""
+        file = tmp_path / 'file_ABC123.txt'
+        file.write_text('data')
+        close_write_handler.on_created(FileCreatedEvent(str(file)))
+
+        close_write_handler.timers.run_pending(float('inf'))
+        assert _names(tmp_path) == ['file_ABC123.txt']
+
+        close_write_handler.timers.run_pending(float('inf'))
+        assert _names(tmp_path) == ['file.txt']
+        assert close_write_handler.stats.events_finished == 1
+
+    def test_stability_check_runs_outside_timer_thread(self, close_write_handler, tmp_path):
+        """サイズと更新時刻の確認はタイマーのスレッドではなくバックグラウンドのスレッドで行う"""
+        file = tmp_path / 'file_ABC123.txt'
+        file.write_text('data')
+        close_write_handler.on_created(FileCreatedEvent(str(file)))
+
+        threads = []
+        acquire = close_write_handler.throttle.acquire
+        executor = close_write_handler._background_executor = ThreadPoolExecutor(max_workers=1)
+        with patch.object(close_write_handler.throttle, 'acquire',
+                          side_effect=lambda *args, **kwargs: threads.append(threading.current_thread())
+                          or acquire(*args, **kwargs)):
+            close_write_handler.timers.run_pending(float('inf'))
+            executor.shutdown(wait=True)
+
+        assert threads and threads[0] is not threading.current_thread()
+        assert len(close_write_handler.timers) == 1
+
+    def test_growing_file_waits(self, close_write_handler, tmp_path):
+        """書き込みが続いている間は処理しない"""
+        file = tmp_path / 'file_ABC123.txt'
+        file.write_text('data')
+        close_write_handler.on_created(FileCreatedEvent(str(file)))
+
+        for size in range(2, 5):
+            close_write_handler.timers.run_pending(float('inf'))
+            file.write_text('data' * size)
+
+        assert _names(tmp_path) == ['file_ABC123.txt']
+        assert len(close_write_handler.timers) == 1
+
+    def test_timeout_processes_growing_file(self, close_write_handler, tmp_path):
+        """最大待機時間を過ぎたファイルは書き込みが続いていても処理する"""
+        close_write_handler.readiness_timeout = 0.0
+        file = tmp_path / 'file_ABC123.txt'
+        file.write_text('data')
+        close_write_handler.on_created(FileCreatedEvent(str(file)))
+
+        close_write_handler.timers.run_pending(float('inf'))
+
+        assert _names(tmp_path) == ['file.txt']
+
+    def test_deleted_file_stops_waiting(self, close_write_handler, tmp_path):
+        """待機中に削除されたファイルは待機を終了する"""
+        file = tmp_path / 'file_ABC123.txt'
+        file.write_text('data')
+        close_write_handler.on_created(FileCreatedEvent(str(file)))
+        file.unlink()
+
+        close_write_handler.timers.run_pending(float('inf'))
+
+        assert len(close_write_handler.timers) == 0
+        assert close_write_handler.stats.events_finished == 1
+
+    def test_moved_file_is_processed_immediately(self, close_write_handler, tmp_path):
+        """一時ファイルから移動されたファイルは移動先の名前で直ちに処理する"""
+        temp = tmp_path / 'download.tmp'
+        temp.write_text('data')
+        close_write_handler.on_created(FileCreatedEvent(str(temp)))
+        temp.rename(tmp_path / 'file_ABC123.txt')
+
+        with patch('time.sleep') as mock_sleep:
+            close_write_handler.on_moved(FileMovedEvent(str(temp), str(tmp_path / 'file_ABC123.txt')))
+
+        mock_sleep.assert_not_called()
+        assert _names(tmp_path) == ['file.txt']
+        assert len(close_write_handler.timers) == 0
+
+    def test_closed_event_ignored_in_sleep_mode(self, handler, tmp_path):
+        """sleepモードではファイルが閉じられたイベントを使わない"""
+        path = str(tmp_path / 'file_ABC123.txt')
+        (tmp_path / 'file_ABC123.txt').write_text('data')
+
+        with patch.object(handler, '_process_file') as mock_process:
+            handler.on_closed(FileClosedEvent(path))
+
+        mock_process.assert_not_called()
+
+
+class TestFileRenameHandlerProcessedIndex:
+    """処理済みファイルの索引を使った走査のテスト"""
+
+    @pytest.fixture
+    def index_handler(self, handler, tmp_path):
+        handler.index_enabled = True
+        with patch('service.file_rename_handler.get_index_directory', return_value=str(tmp_path / 'index')):
+            yield handler
+        handler.close()
+
+    def test_rescan_skips_evaluated_files(self, index_handler, tmp_path):
+        """2回目の走査では判定済みのファイルを照合しない"""
+        folder = tmp_path / 'folder'
+        folder.mkdir()
+        (folder / 'report_ABC123.pdf').write_text('data')
+        (folder / 'normal.txt').write_text('data')
+        index_handler.scan_directory(str(folder))
+        assert _names(folder) == ['normal.txt', 'report.pdf']
+
+        (folder / 'new_ABC123.txt').write_text('data')
+        with patch.object(index_handler, '_bulk_matches', wraps=index_handler._bulk_matches) as mock_matches:
+            index_handler.scan_directory(str(folder))
+
+        assert [name for name, _ in mock_matches.call_args.args[0]] == ['new_ABC123.txt']
+        assert _names(folder) == ['new.txt', 'normal.txt', 'report.pdf']
+
+    def test_failed_rename_is_evaluated_again(self, index_handler, tmp_path):
+        """リネームに失敗したファイルは次の走査で判定し直す"""
+        folder = tmp_path / 'folder'
+        folder.mkdir()
+        (folder / 'report_ABC123.pdf').write_text('data')
+        with patch('service.directory_handle.os.rename', side_effect=PermissionError):
+            index_handler.scan_directory(str(folder))
+
+        index_handler.scan_directory(str(folder))
+
+        assert _names(folder) == ['report.pdf']
+
+
+class TestFileRenameHandlerErrorAggregation:
+    """エラーの多発時のログ出力のテスト"""
+
+    def test_storm_is_summarized(self, handler, tmp_path, caplog):
+        """同じフォルダで多発したエラーは件数のみを出力する"""
+        handler.errors.burst = 2
+        for number in range(5):
+            (tmp_path / f"file{number}_ABC123.txt").write_text('data')
+
+        with patch('service.directory_handle.os.rename', side_effect=OSError(30, 'Read-only file system')):
+            with caplog.at_level(logging.ERROR):
+                for number in range(5):
+                    handler.rename_file(str(tmp_path / f"file{number}_ABC123.txt"), f"file{number}_ABC123", '.txt')
+                handler.errors.flush()
+
+        messages = [record.getMessage() for record in caplog.records]
+        assert sum('リネーム失敗' in message for message in messages) == 2
+        assert 'うち 3 件の出力を省略' in messages[-1]
+        assert handler.stats.errors_total == 5
+
+
+class TestFileRenameHandlerSubmit:
+    """書き込み完了を通知されたファイルの処理のテスト"""
+
+    def test_submit_renames_without_wait(self, handler, tmp_path):
+        """待機せずにリネームし、リネーム後のパスを返す"""
+        (tmp_path / 'file_ABC123.txt').write_text('data')
+
+        with patch('time.sleep') as mock_sleep:
+            result = handler.submit(str(tmp_path / 'file_ABC123.txt'))
+
+        mock_sleep.assert_not_called()
+        assert result == ('renamed', str(tmp_path / 'file.txt'))
+
+    def test_submit_unchanged_file(self, handler, tmp_path):
+        """パターンに一致しないファイルはそのままのパスを返す"""
+        (tmp_path / 'normal.txt').write_text('data')
+
+        assert handler.submit(str(tmp_path / 'normal.txt')) == ('unchanged', str(tmp_path / 'normal.txt'))
+
+    def test_submit_missing_file(self, handler, tmp_path):
+        assert handler.submit(str(tmp_path / 'missing_ABC123.txt')) == ('missing', None)
+
+    def test_submit_while_paused(self, handler, tmp_path):
+        """一時停止中は保留する"""
+        handler.pause()
+        path = str(tmp_path / 'file_ABC123.txt')
+
+        assert handler.submit(path) == ('queued', path)
+        assert handler.pending_count == 1
+
+
+class TestFileRenameHandlerGrouping:
+    """同じ名前のファイルをまとめてリネームするテスト"""
+
+    @pytest.fixture
+    def group_handler(self, handler):
+        handler.group_window = 1.0
+        handler.timers = TimerQueue(autostart=False)
+        handler._background_executor = InlineExecutor()
+        return handler
+
+    def test_sidecars_share_counter(self, group_handler, tmp_path):
+        """同じ名前のファイルには同じ連番を付ける"""
+        (tmp_path / 'report.pdf').write_text('existing')
+        for extension in ('.pdf', '.xml', '.json'):
+            (tmp_path / f"report_ABC123{extension}").write_text('data')
+            group_handler._process_file(str(tmp_path / f"report_ABC123{extension}"), wait=0)
+        assert len(group_handler.timers) == 1
+
+        group_handler.timers.run_pending(float('inf'))
+
+        assert _names(tmp_path) == ['report (1).json', 'report (1).pdf', 'report (1).xml', 'report.pdf']
+
+    def test_group_is_renamed_outside_timer_thread(self, group_handler, tmp_path):
+        """まとめてリネームする処理はタイマーのスレッドではなくバックグラウンドのスレッドで行う"""
+        for extension in ('.pdf', '.xml'):
+            (tmp_path / f"report_ABC123{extension}").write_text('data')
+            group_handler._process_file(str(tmp_path / f"report_ABC123{extension}"), wait=0)
+
+        threads = []
+        rename_group = group_handler._rename_group
+        executor = group_handler._background_executor = ThreadPoolExecutor(max_workers=1)
+        with patch.object(group_handler, '_rename_group',
+                          side_effect=lambda *args, **kwargs: threads.append(threading.current_thread())
+                          or rename_group(*args, **kwargs)):
+            group_handler.timers.run_pending(float('inf'))
+            executor.shutdown(wait=True)
+
+        assert threads and threads[0] is not threading.current_thread()
+        assert _names(tmp_path) == ['report.pdf', 'report.xml']
+
+    def test_group_without_collision(self, group_handler, tmp_path):
+        """衝突がない場合は連番を付けない"""
+        for extension in ('.pdf', '.xml'):
+            (tmp_path / f"report_ABC123{extension}").write_text('data')
+            group_handler._process_file(str(tmp_path / f"report_ABC123{extension}"), wait=0)
+
+        group_handler.timers.run_pending(float('inf'))
+
+        assert _names(tmp_path) == ['report.pdf', 'report.xml']
+
+    def test_group_reads_directory_once(self, group_handler, tmp_path):
+        """連番の決定にはフォルダを1回だけ読み込む"""
+        (tmp_path / 'report.xml').write_text('existing')
+        for extension in ('.pdf', '.xml'):
+            (tmp_path / f"report_ABC123{extension}").write_text('data')
+            group_handler._process_file(str(tmp_path / f"report_ABC123{extension}"), wait=0)
 
-            mock_path = MagicMock(spec=Path)
-            mock_path.parent = Path(r'C:\test')
-            mock_path.name = 'file-name (with spaces)_ABC123.txt'
+        with patch('service.directory_handle.DirectoryHandle.exists') as mock_exists:
+            with patch('service.directory_handle.os.scandir', wraps=os.scandir) as mock_scandir:
+                group_handler.timers.run_pending(float('inf'))
 
-            with patch('pathlib.Path.exists', return_value=False):
-                handler.rename_file(mock_path, 'file-name (with spaces)_ABC123', '.txt')
+        mock_exists.assert_not_called()
+        assert mock_scandir.call_count == 1
+        assert _names(tmp_path) == ['report (1).pdf', 'report (1).xml', 'report.xml']
+
+    def test_scan_groups_sidecars(self, group_handler, tmp_path):
+        """走査でも同じ名前のファイルに同じ連番を付ける"""
+        (tmp_path / 'report.xml').write_text('existing')
+        (tmp_path / 'report_ABC123.pdf').write_text('data')
+        (tmp_path / 'report_ABC123.xml').write_text('data')
+        (tmp_path / 'other_ABC123.txt').write_text('data')
+
+        group_handler.scan_directory(str(tmp_path))
+
+        assert _names(tmp_path) == ['other.txt', 'report (1).pdf', 'report (1).xml', 'report.xml']
+        assert len(group_handler.timers) == 0
+
+    def test_close_renames_pending_groups(self, group_handler, tmp_path):
+        """終了時に待機中のファイルをリネームする"""
+        (tmp_path / 'report_ABC123.pdf').write_text('data')
+        group_handler._process_file(str(tmp_path / 'report_ABC123.pdf'), wait=0)
+
+        group_handler.close()
+
+        assert _names(tmp_path) == ['report.pdf']
+
+    def test_removed_member_is_skipped(self, group_handler, tmp_path, caplog):
+        """待機中に削除されたファイルは除いてリネームする"""
+        for extension in ('.pdf', '.xml'):
+            (tmp_path / f"report_ABC123{extension}").write_text('data')
+            group_handler._process_file(str(tmp_path / f"report_ABC123{extension}"), wait=0)
+        (tmp_path / 'report_ABC123.xml').unlink()
+
+        with caplog.at_level(logging.DEBUG, logger='service.file_rename_handler'):
+            group_handler.timers.run_pending(float('inf'))
+
+        assert _names(tmp_path) == ['report.pdf']
+        assert group_handler.stats.errors_total == 0
+        assert "待機中にファイルがなくなったため" in caplog.text
+
+    def test_directory_error_is_retried(self, group_handler, tmp_path):
+        """フォルダを開けない場合はまとまりを破棄せずに再試行する"""
+        (tmp_path / 'report_ABC123.pdf').write_text('data')
+        group_handler._process_file(str(tmp_path / 'report_ABC123.pdf'), wait=0)
+        group_handler.close_directories()
+
+        with patch.object(group_handler, '_schedule_retry') as retry, \
+             patch.object(group_handler.fs, 'open_directory', side_effect=OSError(errno.EIO, "I/O error")):
+            group_handler.timers.run_pending(float('inf'))
+
+        retry.assert_called_once()
+        assert retry.call_args.args[0] == str(tmp_path / 'report_ABC123.pdf')
+
+    def test_submit_is_not_grouped(self, group_handler, tmp_path):
+        """通知されたファイルは待たずにリネームする"""
+        (tmp_path / 'report_ABC123.pdf').write_text('data')
+
+        assert group_handler.submit(str(tmp_path / 'report_ABC123.pdf')) == ('renamed', str(tmp_path / 'report.pdf'))
+
+
+class TestFileRenameHandlerInMemory:
+    """メモリ上のファイルシステムと仮想の時計を使ったテスト"""
+
+    @pytest.fixture
+    def memory_handler(self, mock_config):
+        fs = InMemoryFileSystem()
+        fs.makedirs('/watch')
+        handler = FileRenameHandler(fs=fs)
+        yield handler
+        handler.close()
+
+    def test_event_is_renamed_without_disk(self, memory_handler):
+        """作成イベントのファイルを待機せずにメモリ上でリネームする"""
+        fs = memory_handler.fs
+        fs.write('/watch/report_ABC123.pdf')
+        fs.write('/watch/report.pdf')
+
+        started = time.monotonic()
+        memory_handler.on_created(FileCreatedEvent('/watch/report_ABC123.pdf'))
+
+        assert time.monotonic() - started < 0.1
+        assert fs.monotonic() == pytest.approx(memory_handler.wait_time)
+        assert fs.listdir('/watch') == ['report (1).pdf', 'report.pdf']
+
+    def test_close_write_stability_with_virtual_clock(self, memory_handler):
+        """閉じられないファイルはサイズと更新時刻が変化しなくなった時点で処理する"""
+        fs = memory_handler.fs
+        memory_handler.readiness = 'close_write'
+        memory_handler.stability_interval = 1.0
+        fs.write('/watch/file_ABC123.txt', b'a')
+        memory_handler.on_created(FileCreatedEvent('/watch/file_ABC123.txt'))
+
+        fs.advance(1.0)
+        fs.write('/watch/file_ABC123.txt', b'ab')
+        fs.advance(1.0)
+        assert fs.listdir('/watch') == ['file_ABC123.txt']
+
+        fs.advance(1.0)
+        assert fs.listdir('/watch') == ['file.txt']
+
+    def test_many_events_keep_every_file(self, memory_handler):
+        """重複する名前を含む多数のイベントでもファイルを失わず、パターンに一致する名前を残さない"""
+        fs = memory_handler.fs
+        generator = random.Random(0)
+        names = {f"doc{generator.randrange(20)}_{number:06d}.pdf" for number in range(2000)}
+        names |= {f"plain{number}.txt" for number in range(200)}
+        for name in names:
+            fs.write(f'/watch/{name}')
+
+        for name in sorted(names):
+            memory_handler.on_created(FileCreatedEvent(f'/watch/{name}'))
+
+        result = fs.listdir('/watch')
+        assert len(result) == len(names)
+        assert not any(memory_handler.should_rename(os.path.splitext(name)[0]) for name in result)
+
+
+class TestFileRenameHandlerStorm:
+    """イベントの多発時にまとめて走査するテスト"""
+
+    @pytest.fixture
+    def storm_handler(self, mock_config):
+        fs = InMemoryFileSystem()
+        fs.makedirs('/watch')
+        handler = FileRenameHandler(fs=fs)
+        handler.storm_threshold = 100
+        handler.storm_exit_threshold = 50
+        handler.storm_min_events = 5
+        handler.storm_scan_interval = 2.0
+        yield handler
+        handler.close()
+
+    def test_storm_switches_to_folder_scan(self, storm_handler):
+        """多発中のイベントは個別に処理せず、走査でまとめてリネームする"""
+        fs = storm_handler.fs
+        names = [f"doc{number}_ABC{number:03d}.pdf" for number in range(20)]
+        for name in names:
+            fs.write(f'/watch/{name}')
+
+        with patch.object(storm_handler, '_process_file', wraps=storm_handler._process_file) as process:
+            for name in names:
+                storm_handler.on_created(FileCreatedEvent(f'/watch/{name}'))
+        # 多発と判定されるまでのイベントのみ個別に処理する
+        assert process.call_count == 4
+
+        storm_handler.fs.advance(2.0)
+        assert fs.listdir('/watch') == sorted(f"doc{number}.pdf" for number in range(20))
+
+    def test_scan_runs_outside_timer_thread(self, storm_handler):
+        """走査はタイマーのスレッドではなく走査用のスレッドで行う"""
+        fs = storm_handler.fs
+        for number in range(5):
+            fs.write(f'/watch/a{number}_ABC123.txt')
+            storm_handler.on_created(FileCreatedEvent(f'/watch/a{number}_ABC123.txt'))
+
+        threads = []
+        scan = storm_handler.scan_directory
+        executor = storm_handler._background_executor = ThreadPoolExecutor(max_workers=1)
+        with patch.object(storm_handler, 'scan_directory',
+                          side_effect=lambda *args, **kwargs: threads.append(threading.current_thread()) or scan(*args, **kwargs)):
+            # 仮想時計のタイマーは advance を呼んだスレッドで実行される
+            storm_handler.fs.advance(2.0)
+            executor.shutdown(wait=True)
+        assert threads and threads[0] is not threading.current_thread()
+        assert fs.listdir('/watch') == [f'a{number}.txt' for number in range(5)]
+
+    def test_files_being_written_wait_for_next_scan(self, storm_handler):
+        """更新から wait_time 経過していないファイルは次回の走査で処理する"""
+        fs = storm_handler.fs
+        for number in range(5):
+            fs.write(f'/watch/old{number}_ABC123.txt')
+            storm_handler.on_created(FileCreatedEvent(f'/watch/old{number}_ABC123.txt'))
+
+        # 走査の直前に書き込まれたファイル
+        fs.sleep(1.95)
+        fs.write('/watch/new_ABC123.txt')
+        storm_handler.fs.advance(0.05)
+        assert fs.listdir('/watch') == ['new_ABC123.txt'] + [f'old{number}.txt' for number in range(5)]
+
+        storm_handler.fs.advance(2.0)
+        assert 'new.txt' in fs.listdir('/watch')
+        assert 'new_ABC123.txt' not in fs.listdir('/watch')
+
+    def test_returns_to_per_event_processing(self, storm_handler):
+        """多発が収まれば、次のイベントから個別に処理する"""
+        fs = storm_handler.fs
+        for number in range(5):
+            fs.write(f'/watch/a{number}_ABC123.txt')
+            storm_handler.on_created(FileCreatedEvent(f'/watch/a{number}_ABC123.txt'))
+        storm_handler.fs.advance(2.0)
+        storm_handler.fs.advance(2.0)
+
+        fs.write('/watch/b_ABC123.txt')
+        storm_handler.on_created(FileCreatedEvent('/watch/b_ABC123.txt'))
+        assert 'b.txt' in fs.listdir('/watch')
+
+    def test_disabled_by_default(self, handler):
+        """threshold が0の場合はイベントの頻度を計測しない"""
+        assert handler.storm_threshold == 0
+        assert handler._storm_detector('/watch/a_ABC123.txt') is None
+
+
+class TestFileRenameHandlerDeadline:
+    """応答しないフォルダの処理を保留するテスト"""
+
+    @pytest.fixture
+    def deadline_handler(self, mock_config):
+        memory = InMemoryFileSystem()
+        memory.makedirs('/slow')
+        memory.makedirs('/fast')
+        handler = FileRenameHandler(fs=DeadlineFileSystem(memory, timeout=0.05, probe_interval=5.0, workers=2))
+        yield handler, memory
+        handler.close()
+
+    def test_slow_folder_is_deferred_until_recovered(self, deadline_handler):
+        """応答しないフォルダのファイルは保留し、他のフォルダのファイルは処理を続ける"""
+        handler, memory = deadline_handler
+        memory.write('/slow/a_ABC123.txt')
+        memory.write('/fast/b_ABC123.txt')
+        memory.set_latency('/slow', 0.3, real=True)
+
+        handler.on_created(FileCreatedEvent('/slow/a_ABC123.txt'))
+        handler.on_created(FileCreatedEvent('/fast/b_ABC123.txt'))
+
+        assert memory.listdir('/fast') == ['b.txt']
+        assert handler.deferred_count == 1
+
+        memory.set_latency('/slow', 0.0)
+        time.sleep(0.35)
+        memory.advance(5.0)
+        deadline = time.monotonic() + 2.0
+        while memory.listdir('/slow') != ['a.txt'] and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert memory.listdir('/slow') == ['a.txt']
+        assert handler.deferred_count == 0
+
+    def test_submit_reports_deferred_file_as_queued(self, deadline_handler):
+        """受け付けたファイルのフォルダが応答しない場合は保留として返す"""
+        handler, memory = deadline_handler
+        memory.write('/slow/a_ABC123.txt')
+        memory.set_latency('/slow', 0.3, real=True)
+
+        assert handler.submit('/slow/a_ABC123.txt') == ('queued', '/slow/a_ABC123.txt')
+        assert handler.deferred_count == 1
 
-                expected_path = Path(r'C:\test\file-name (with spaces).txt')
-                mock_path.rename.assert_called_once_with(expected_path)
@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+
+import pytest
+
+from service.fs_backend import InMemoryFileSystem, OSFileSystem
+
+
+@pytest.fixture
+def fs():
+    memory = InMemoryFileSystem()
+    memory.makedirs('/root/folder')
+    return memory
+
+
+class TestInMemoryFileSystem:
+    """メモリ上のファイルシステムのテスト"""
+
+    def test_stat_and_rename(self, fs):
+        """フォルダ内のファイルをstat・リネームできる"""
+        fs.write('/root/folder/a.txt', b'data')
+        handle = fs.open_directory('/root/folder')
+
+        stat = handle.stat('a.txt')
+        assert stat.st_size == 4
+        handle.rename('a.txt', 'b.txt')
+
+        assert handle.stat('a.txt') is None
+        assert handle.stat('b.txt').st_ino == stat.st_ino
+        assert fs.listdir('/root/folder') == ['b.txt']
+
+    def test_missing_file_and_folder(self, fs):
+        """存在しないファイル・フォルダはOSと同じ例外を送出する"""
+        handle = fs.open_directory('/root/folder')
+        with pytest.raises(FileNotFoundError):
+            handle.rename('missing.txt', 'b.txt')
+        with pytest.raises(FileNotFoundError):
+            handle.read_head('missing.txt', 10)
+        with pytest.raises(FileNotFoundError):
+            fs.open_directory('/root/missing')
+        assert not fs.lexists('/root/folder/missing.txt')
+        assert fs.lexists('/root/folder')
+
+    def test_scandir_returns_entries_with_stat(self, fs):
+        """scandir のエントリは os.DirEntry と同様に使える"""
+        fs.write('/root/folder/a.txt', b'12')
+        with fs.open_directory('/root/folder').scandir() as entries:
+            entries = list(entries)
+
+        assert [entry.name for entry in entries] == ['a.txt']
+        assert entries[0].is_file(follow_symlinks=False)
+        assert entries[0].stat(follow_symlinks=False).st_size == 2
+
+    def test_read_head(self, fs):
+        """ファイルの先頭を読み込む"""
+        fs.write('/root/folder/a.pdf', b'%PDF-1.7 data')
+        assert fs.open_directory('/root/folder').read_head('a.pdf', 5) == b'%PDF-'
+
+    def test_move_file_adds_counter(self, fs):
+        """移動先に同名のファイルがある場合は連番を付与する"""
+        fs.write('/root/dest/report.pdf')
+        fs.write('/root/folder/a.pdf')
+
+        new_path = fs.move_file('/root/folder/a.pdf', '/root/dest', 'report.pdf')
+
+        assert new_path == os.path.join('/root/dest', 'report (1).pdf')
+        assert fs.listdir('/root/dest') == ['report (1).pdf', 'report.pdf']
+
+    def test_sleep_advances_virtual_clock(self, fs):
+        """sleep は待機せずに仮想の時計を進める"""
+        started = time.monotonic()
+        fs.sleep(3600)
+        assert fs.monotonic() == 3600
+        assert time.monotonic() - started < 1.0
+
+    def test_write_records_modification_time(self, fs):
+        """更新時刻は仮想の時計で記録する"""
+        fs.write('/root/folder/a.txt')
+        fs.sleep(2.0)
+        fs.write('/root/folder/a.txt', b'more')
+
+        stat = fs.open_directory('/root/folder').stat('a.txt')
+        assert stat.st_mtime_ns == 2_000_000_000
+
+    def test_advance_runs_due_timers(self, fs):
+        """advance で時計を進めると期限を過ぎたタイマーを実行する"""
+        timers = fs.create_timers()
+        calls = []
+        timers.schedule(1.0, calls.append, 'a')
+        timers.schedule(5.0, calls.append, 'b')
+
+        assert fs.advance(2.0) == 1
+        assert calls == ['a']
+        assert fs.advance(3.0) == 1
+        assert calls == ['a', 'b']
+
+    def test_executor_runs_on_calling_thread(self, fs):
+        """タイマーから渡された処理は advance を呼んだスレッドで完了させる"""
+        executor = fs.create_executor(2, 'background')
+        timers = fs.create_timers()
+        threads = []
+        timers.schedule(1.0, executor.submit, lambda: threads.append(threading.current_thread()))
+
+        fs.advance(1.0)
+        assert threads == [threading.current_thread()]
+
+    def test_latency_advances_virtual_clock_per_operation(self, fs):
+        """遅延を指定したフォルダの操作ごとに仮想の時計を進める"""
+        fs.write('/root/folder/a.txt')
+        fs.set_latency('/root/folder', 0.5)
+        handle = fs.open_directory('/root/folder')
+        handle.stat('a.txt')
+        handle.rename('a.txt', 'b.txt')
+
+        assert fs.monotonic() == pytest.approx(1.5)
+        assert fs.operations == 3
+
+    def test_real_latency_blocks(self, fs):
+        """real=True の場合は実際に待機する"""
+        fs.set_latency('/root/folder', 0.05, real=True)
+        started = time.monotonic()
+        fs.open_directory('/root/folder').stat('a.txt')
+        assert time.monotonic() - started >= 0.05
+        assert fs.monotonic() == 0.0
+
+
+class TestOSFileSystem:
+    """ローカルのOSのファイルシステムのテスト"""
+
+    def test_directory_operations(self, tmp_path):
+        """フォルダのハンドルでstat・リネームできる"""
+        (tmp_path / 'a.txt').write_text('data')
+        fs = OSFileSystem()
+        handle = fs.open_directory(str(tmp_path))
+        try:
+            handle.rename('a.txt', 'b.txt')
+        finally:
+            handle.close()
+
+        assert fs.lexists(str(tmp_path / 'b.txt'))
+        assert not fs.lexists(str(tmp_path / 'a.txt'))
+
+    def test_move_file_adds_counter(self, tmp_path):
+        """移動先に同名のファイルがある場合は連番を付与する"""
+        (tmp_path / 'dest').mkdir()
+        (tmp_path / 'dest' / 'report.pdf').write_text('old')
+        (tmp_path / 'a.pdf').write_text('new')
+
+        new_path = OSFileSystem().move_file(str(tmp_path / 'a.pdf'), str(tmp_path / 'dest'), 'report.pdf')
+
+        assert new_path == str(tmp_path / 'dest' / 'report (1).pdf')
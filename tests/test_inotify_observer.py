@@ -0,0 +1,146 @@
+import os
+import struct
+import threading
+import time
+
+import pytest
+from watchdog.events import (
+    EVENT_TYPE_MODIFIED,
+    FileClosedEvent,
+    FileCreatedEvent,
+    FileDeletedEvent,
+    FileMovedEvent,
+    FileSystemEventHandler,
+)
+
+from service.inotify_observer import IN_CREATE, IN_MOVED_TO, InotifyObserver, inotify_available, parse_events
+
+pytestmark = pytest.mark.skipif(not inotify_available(), reason="inotifyはLinuxのみ")
+
+
+class CollectingHandler(FileSystemEventHandler):
+    def __init__(self):
+        self.events = []
+        self._condition = threading.Condition()
+
+    def dispatch(self, event):
+        with self._condition:
+            self.events.append(event)
+            self._condition.notify_all()
+
+    def wait_for(self, predicate, timeout: float = 2.0) -> bool:
+        with self._condition:
+            return self._condition.wait_for(lambda: predicate(self.events), timeout)
+
+
+@pytest.fixture
+def watched(tmp_path):
+    handler = CollectingHandler()
+    observer = InotifyObserver()
+    observer.schedule(handler, str(tmp_path), recursive=False)
+    observer.start()
+    yield observer, handler, tmp_path
+    observer.stop()
+    observer.join()
+
+
+class TestParseEvents:
+    def test_parses_padded_names(self):
+        """NULで埋められた名前を含むイベントの並びを変換する"""
+        buffer = struct.pack('iIII', 1, IN_CREATE, 0, 16) + b'a.txt'.ljust(16, b'\0')
+        buffer += struct.pack('iIII', 1, IN_MOVED_TO, 7, 0)
+
+        assert parse_events(buffer) == [(1, IN_CREATE, 0, b'a.txt'), (1, IN_MOVED_TO, 7, b'')]
+
+
+class TestInotifyObserver:
+    def test_delivers_created_and_closed_without_modified(self, watched):
+        """作成と書き込み完了のイベントのみ受け取り、変更イベントは届かない"""
+        observer, handler, root = watched
+        path = root / 'a_ABC123.txt'
+        with open(path, 'wb') as file:
+            for _ in range(100):
+                file.write(b'x')
+                file.flush()
+
+        assert handler.wait_for(lambda events: any(isinstance(e, FileClosedEvent) for e in events))
+        assert isinstance(handler.events[0], FileCreatedEvent)
+        assert handler.events[0].src_path == str(path)
+        assert not any(event.event_type == EVENT_TYPE_MODIFIED for event in handler.events)
+
+    def test_rename_in_folder_is_moved_event(self, watched):
+        """フォルダ内の名前の変更は移動元と移動先を持つ移動イベントになる"""
+        observer, handler, root = watched
+        (root / 'a.part').write_bytes(b'x')
+        os.rename(root / 'a.part', root / 'a_ABC123.txt')
+
+        assert handler.wait_for(lambda events: any(isinstance(e, FileMovedEvent) for e in events))
+        moved = next(event for event in handler.events if isinstance(event, FileMovedEvent))
+        assert (moved.src_path, moved.dest_path) == (str(root / 'a.part'), str(root / 'a_ABC123.txt'))
+
+    def test_moved_in_and_out_of_folder(self, watched, tmp_path_factory):
+        """フォルダ外からの移動は作成、フォルダ外への移動は削除として扱う"""
+        observer, handler, root = watched
+        outside = tmp_path_factory.mktemp('outside')
+        (outside / 'in.txt').write_bytes(b'x')
+        os.rename(outside / 'in.txt', root / 'in.txt')
+        os.rename(root / 'in.txt', outside / 'out.txt')
+
+        assert handler.wait_for(lambda events: any(isinstance(e, FileDeletedEvent) for e in events))
+        assert [type(event) for event in handler.events] == [FileCreatedEvent, FileDeletedEvent]
+
+    def test_removed_folder_stops_emitter(self, tmp_path):
+        """監視フォルダが削除されると読み込み用のスレッドが終了する"""
+        root = tmp_path / 'watch'
+        root.mkdir()
+        observer = InotifyObserver()
+        observer.schedule(CollectingHandler(), str(root))
+        observer.start()
+        root.rmdir()
+
+        deadline = time.monotonic() + 2.0
+        while observer.is_alive() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not observer.emitters[0].is_alive()
+        assert not observer.is_alive()
+        observer.stop()
+        observer.join()
+
+    def test_recursive_is_not_supported(self, tmp_path):
+        """サブフォルダの監視は指定できない"""
+        observer = InotifyObserver()
+        with pytest.raises(ValueError):
+            observer.schedule(CollectingHandler(), str(tmp_path), recursive=True)
+        observer.stop()
+
+    def test_stop_before_start(self, tmp_path):
+        """開始前に停止してもエラーにならない"""
+        observer = InotifyObserver()
+        observer.schedule(CollectingHandler(), str(tmp_path))
+        observer.stop()
+        observer.join()
+
+    def test_moved_out_is_reported_during_event_storm(self, watched, tmp_path_factory):
+        """イベントが続いている間も、フォルダ外への移動を期限後に削除として渡す"""
+        observer, handler, root = watched
+        outside = tmp_path_factory.mktemp('outside')
+        (root / 'leaving.txt').write_bytes(b'x')
+        stop = threading.Event()
+
+        def storm():
+            number = 0
+            while not stop.is_set():
+                (root / f'storm{number}.txt').write_bytes(b'x')
+                number += 1
+                time.sleep(0.01)
+
+        thread = threading.Thread(target=storm)
+        thread.start()
+        try:
+            time.sleep(0.05)
+            os.rename(root / 'leaving.txt', outside / 'leaving.txt')
+            deleted = handler.wait_for(lambda events: any(isinstance(e, FileDeletedEvent) for e in events), 1.0)
+        finally:
+            stop.set()
+            thread.join()
+        assert deleted
@@ -0,0 +1,109 @@
+import threading
+import time
+from unittest.mock import patch
+
+from service.io_throttle import IOThrottle, lower_current_thread_priority
+
+
+class TestIOThrottle:
+    """IOThrottleのテスト"""
+
+    def test_disabled_when_rate_is_zero(self):
+        """毎秒上限が0の場合は制限しない"""
+        throttle = IOThrottle(0)
+        assert throttle.enabled is False
+
+        start = time.monotonic()
+        for _ in range(1000):
+            throttle.acquire()
+        assert time.monotonic() - start < 0.5
+
+    def test_burst_is_available_immediately(self):
+        """バースト分のトークンは待機せずに取得できる"""
+        throttle = IOThrottle(1, burst=5)
+
+        start = time.monotonic()
+        for _ in range(5):
+            throttle.acquire()
+        assert time.monotonic() - start < 0.1
+
+    def test_waits_when_tokens_exhausted(self):
+        """トークンが尽きた場合は補充まで待機する"""
+        throttle = IOThrottle(20, burst=1)
+        throttle.acquire()
+
+        start = time.monotonic()
+        throttle.acquire()
+        assert time.monotonic() - start >= 0.03
+
+    def test_live_requests_take_priority_over_background(self):
+        """通常処理はバックグラウンド処理より先にトークンを取得する"""
+        throttle = IOThrottle(20, burst=1)
+        throttle.acquire()
+        order = []
+
+        def worker(name, background):
+            throttle.acquire(background=background)
+            order.append(name)
+
+        background_thread = threading.Thread(target=worker, args=('background', True))
+        background_thread.start()
+        time.sleep(0.005)
+        live_thread = threading.Thread(target=worker, args=('live', False))
+        live_thread.start()
+        background_thread.join(2)
+        live_thread.join(2)
+
+        assert order == ['live', 'background']
+
+    def test_background_waits_for_notification(self):
+        """通常処理の待ちがある間、バックグラウンド処理は短い間隔で確認せずに通知を待つ"""
+        throttle = IOThrottle(1000, burst=5)
+        throttle._live_waiting = 1
+        timeouts = []
+        wait = throttle._condition.wait
+
+        def counting_wait(timeout=None):
+            timeouts.append(timeout)
+            return wait(timeout)
+
+        with patch.object(throttle._condition, 'wait', side_effect=counting_wait):
+            thread = threading.Thread(target=throttle.acquire, kwargs={'background': True})
+            thread.start()
+            time.sleep(0.05)
+            with throttle._condition:
+                throttle._live_waiting = 0
+                throttle._condition.notify_all()
+            thread.join(2)
+
+        assert not thread.is_alive()
+        assert timeouts == [None]
+
+
+class TestLowerThreadPriority:
+    """スレッド優先度変更のテスト"""
+
+    def test_lower_priority_on_linux_sets_nice_value(self):
+        """Linuxではスレッド単位でnice値を変更する"""
+        with patch('service.io_throttle.sys.platform', 'linux'), \
+             patch('service.io_throttle.os.getpriority', return_value=0, create=True), \
+             patch('service.io_throttle.os.setpriority', create=True) as mock_setpriority, \
+             patch('service.io_throttle.platform.machine', return_value='unknown'):
+            lower_current_thread_priority()
+            mock_setpriority.assert_called_once()
+            assert mock_setpriority.call_args[0][2] == 10
+
+    def test_lower_priority_logs_warning_on_failure(self, caplog):
+        """優先度の変更に失敗しても例外を送出しない"""
+        with patch('service.io_throttle.sys.platform', 'linux'), \
+             patch('service.io_throttle.os.getpriority', side_effect=OSError("denied"), create=True), \
+             patch('service.io_throttle.platform.machine', return_value='unknown'):
+            lower_current_thread_priority()
+            assert "CPU優先度の変更に失敗しました" in caplog.text
+
+    def test_other_platforms_keep_process_priority(self):
+        """スレッド単位で変更できない環境ではプロセス全体の優先度を変更しない"""
+        with patch('service.io_throttle.sys.platform', 'darwin'), \
+             patch('service.io_throttle.os.nice', create=True) as mock_nice:
+            lower_current_thread_priority()
+            mock_nice.assert_not_called()
@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+import stat
+import time
+from multiprocessing.connection import Client
+from unittest.mock import patch
+
+import pytest
+
+from service.ipc_server import SubmitServer, default_authkey, submit_paths
+
+
+@pytest.fixture
+def root(tmp_path):
+    root = tmp_path / 'watch'
+    root.mkdir()
+    return root
+
+
+@pytest.fixture
+def address(tmp_path):
+    if os.name == 'nt':
+        return rf'\\.\pipe\FileFolderRenamer-test-{os.getpid()}-{time.monotonic_ns()}'
+    return str(tmp_path / 'submit.sock')
+
+
+def _rename(path: str) -> tuple[str, str | None]:
+    new_path = path.replace('_ABC123', '')
+    os.rename(path, new_path)
+    return 'renamed', new_path
+
+
+@pytest.fixture
+def server(address, root):
+    server = SubmitServer(address, _rename, str(root), workers=2)
+    server.start()
+    yield server
+    server.stop()
+
+
+class TestSubmitServer:
+    """ファイルのパスを受け付けるAPIのテスト"""
+
+    def test_submit_returns_new_names(self, server, address, root):
+        """送信したパスごとにリネーム後のパスを返す"""
+        paths = []
+        for number in range(3):
+            (root / f"file{number}_ABC123.txt").write_text('data')
+            paths.append(str(root / f"file{number}_ABC123.txt"))
+
+        results = list(submit_paths(paths, address))
+
+        assert sorted(result['new_path'] for result in results) == [
+            os.path.realpath(root / f"file{number}.txt") for number in range(3)
+        ]
+        assert {result['status'] for result in results} == {'renamed'}
+        assert server.submitted == 3
+
+    def test_many_batches_on_one_connection(self, server, address, root):
+        """1つの接続で複数の要求を続けて送信できる"""
+        paths = []
+        for number in range(50):
+            (root / f"f{number}_ABC123.txt").write_text('data')
+            paths.append(str(root / f"f{number}_ABC123.txt"))
+
+        results = list(submit_paths(paths, address, batch_size=7))
+
+        assert len(results) == 50
+        assert sorted(os.listdir(root)) == sorted(f"f{number}.txt" for number in range(50))
+
+    def test_path_outside_root_is_ignored(self, server, address, tmp_path):
+        """監視フォルダ外のパスは処理しない"""
+        outside = tmp_path / 'other_ABC123.txt'
+        outside.write_text('data')
+
+        results = list(submit_paths([str(outside)], address))
+
+        assert results[0]['status'] == 'ignored'
+        assert outside.exists()
+
+    def test_invalid_request_returns_error(self, server, address):
+        """読み込めない要求にはエラーを返し、接続を続ける"""
+        with Client(address) as connection:
+            connection.send_bytes(b'not json')
+            assert 'error' in json.loads(connection.recv_bytes())
+            connection.send_bytes(json.dumps({'id': 1, 'paths': []}).encode('utf-8'))
+            assert json.loads(connection.recv_bytes()) == {'id': 1, 'done': True, 'count': 0}
+
+    def test_stop_closes_listener(self, address, root):
+        """停止後は接続を受け付けない"""
+        server = SubmitServer(address, _rename, str(root))
+        server.start()
+        server.stop()
+
+        with pytest.raises(OSError):
+            Client(address)
+        assert not any(thread.name == 'ipc-server' and thread.is_alive() for thread in threading.enumerate())
+
+    def test_handler_errors_are_reported(self, address, root):
+        """処理中の例外は failed として返す"""
+        def broken(path):
+            raise RuntimeError('broken')
+
+        (root / 'a.txt').write_text('data')
+        server = SubmitServer(address, broken, str(root))
+        server.start()
+        try:
+            results = list(submit_paths([str(root / 'a.txt')], address))
+        finally:
+            server.stop()
+
+        assert results[0]['status'] == 'failed'
+
+    @pytest.mark.skipif(os.name == 'nt', reason="Unixドメインソケットのみ")
+    def test_socket_is_created_owner_only(self, address, root):
+        """ソケットは作成時から所有者のみが接続でき、umaskは元に戻す"""
+        previous = os.umask(0o022)
+        try:
+            server = SubmitServer(address, _rename, str(root))
+            with patch('service.ipc_server.os.chmod') as chmod:
+                server.start()
+            try:
+                assert stat.S_IMODE(os.stat(address).st_mode) == 0o600
+                chmod.assert_not_called()
+            finally:
+                server.stop()
+            assert os.umask(0o022) == 0o022
+        finally:
+            os.umask(previous)
+
+    def test_many_long_paths_do_not_stall(self, address, root):
+        """応答がソケットのバッファを超える件数・長さでも、送信と受信が止まらない"""
+        server = SubmitServer(address, lambda path: ('renamed', path), str(root), workers=4)
+        server.start()
+        directory = str(root / ('d' * 200))
+        paths = [os.path.join(directory, f"file{number:06d}_ABC123.txt") for number in range(20000)]
+        results = []
+        client = threading.Thread(target=lambda: results.extend(submit_paths(paths, address)), daemon=True)
+        try:
+            client.start()
+            client.join(30)
+            assert not client.is_alive()
+        finally:
+            stopper = threading.Thread(target=server.stop, daemon=True)
+            stopper.start()
+            stopper.join(10)
+        assert not stopper.is_alive()
+        assert len(results) == len(paths)
+
+
+class TestDefaultAuthkey:
+    """default_authkeyのテスト"""
+
+    def test_windows_key_is_created_once_per_user(self, tmp_path, monkeypatch):
+        """Windowsではユーザーごとのフォルダにキーを作成し、以降は同じキーを返す"""
+        monkeypatch.setenv('LOCALAPPDATA', str(tmp_path))
+        with patch('service.ipc_server.sys.platform', 'win32'):
+            key = default_authkey()
+            assert key is not None and len(key) == 32
+            assert default_authkey() == key
+        assert (tmp_path / 'FileFolderRenamer' / 'ipc.key').read_bytes() == key
+
+    def test_no_key_for_unix_sockets(self):
+        """Unixドメインソケットではファイルの権限で制限するためキーを使わない"""
+        with patch('service.ipc_server.sys.platform', 'linux'):
+            assert default_authkey() is None
@@ -0,0 +1,149 @@
+import json
+import threading
+import time
+
+import pytest
+
+from service.lifecycle_trace import (
+    NULL_TRACE,
+    SPAN_MATCH,
+    SPAN_RENAME,
+    FileTrace,
+    LifecycleTracer,
+    load_traces,
+    percentile,
+    summarize,
+)
+
+
+@pytest.fixture
+def trace_path(tmp_path):
+    return str(tmp_path / 'lifecycle-trace.jsonl')
+
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+class TestLifecycleTracer:
+    """LifecycleTracerのテスト"""
+
+    def test_records_spans_as_jsonl(self, trace_path):
+        """区間を開始からの経過時間と所要時間で記録する"""
+        tracer = LifecycleTracer(trace_path, sample_rate=1.0)
+        trace = tracer.start('/watch/file_ABC123.txt')
+        with trace.span(SPAN_MATCH):
+            pass
+        trace.add_span(SPAN_RENAME, trace.started + 0.010, trace.started + 0.025)
+        trace.finish('renamed')
+        tracer.close()
+
+        records = _read(trace_path)
+        assert len(records) == 1
+        assert records[0]['file'] == '/watch/file_ABC123.txt'
+        assert records[0]['outcome'] == 'renamed'
+        assert [span[0] for span in records[0]['spans']] == [SPAN_MATCH, SPAN_RENAME]
+        assert records[0]['spans'][1][1:] == pytest.approx([10.0, 15.0])
+
+    def test_unsampled_files_are_not_recorded(self, trace_path):
+        """サンプリング対象外のファイルは何も記録しない"""
+        tracer = LifecycleTracer(trace_path, sample_rate=0.0)
+        trace = tracer.start('/watch/file.txt')
+        with trace.span(SPAN_MATCH):
+            pass
+        trace.finish('skipped')
+        tracer.close()
+
+        assert trace is NULL_TRACE
+        assert _read(trace_path) == []
+
+    def test_sampling_uses_rate(self, trace_path):
+        """指定した割合のファイルのみ記録する"""
+        tracer = LifecycleTracer(trace_path, sample_rate=0.5)
+        values = iter([0.1, 0.9, 0.4, 0.6])
+        tracer._random = lambda: next(values)
+        traces = [tracer.start(f'/watch/{i}.txt') for i in range(4)]
+        tracer.close()
+
+        assert [isinstance(trace, FileTrace) for trace in traces] == [True, False, True, False]
+
+    def test_start_accepts_past_event_time(self, trace_path):
+        """保留していたイベントは受信時刻からの経過時間で記録する"""
+        tracer = LifecycleTracer(trace_path, sample_rate=1.0)
+        trace = tracer.start(b'/watch/file.txt', started=time.monotonic() - 2.0)
+        trace.finish()
+        tracer.close()
+
+        assert _read(trace_path)[0]['total_ms'] >= 2000
+
+    def test_rotates_by_size(self, tmp_path, trace_path):
+        """記録ファイルはサイズでローテーションする"""
+        tracer = LifecycleTracer(trace_path, sample_rate=1.0, max_bytes=200, backup_count=2)
+        for i in range(10):
+            tracer.start(f'/watch/{i}.txt').finish('renamed')
+        tracer.close()
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            'lifecycle-trace.jsonl', 'lifecycle-trace.jsonl.1', 'lifecycle-trace.jsonl.2',
+        ]
+
+    def test_uses_given_clock(self, trace_path):
+        """指定した時計で区間を計測する"""
+        now = [100.0]
+        tracer = LifecycleTracer(trace_path, sample_rate=1.0, clock=lambda: now[0])
+        trace = tracer.start('/watch/file.txt')
+        with trace.span(SPAN_MATCH):
+            now[0] += 1.5
+        trace.finish('skipped')
+        tracer.close()
+
+        record = _read(trace_path)[0]
+        assert record['spans'] == [[SPAN_MATCH, 0.0, 1500.0]]
+        assert record['total_ms'] == 1500.0
+
+    def test_resume_moves_completion_to_current_thread(self, trace_path):
+        """引き継いだ記録は、再開したスレッドでのみ未完了として扱う"""
+        tracer = LifecycleTracer(trace_path, sample_rate=1.0)
+        trace = tracer.start('/watch/file.txt')
+        trace.hand_off()
+        resumed = []
+        worker = threading.Thread(target=lambda: (trace.resume(), resumed.append(trace.handed_off)))
+        worker.start()
+        worker.join()
+        tracer.close()
+
+        assert resumed == [False]
+        assert trace.handed_off
+
+
+class TestSummarize:
+    """集計のテスト"""
+
+    def test_percentile_nearest_rank(self):
+        """最近傍法でパーセンタイルを求める"""
+        values = list(range(1, 101))
+        assert percentile(values, 0.50) == 50
+        assert percentile(values, 0.99) == 99
+        assert percentile([], 0.5) == 0.0
+
+    def test_summarize_sums_repeated_spans_per_file(self, tmp_path):
+        """同じ区間が複数回ある場合はファイルごとに合計する"""
+        path = tmp_path / 'trace.jsonl'
+        path.write_text('\n'.join(json.dumps(record) for record in [
+            {'file': 'a', 'time': 0, 'outcome': 'renamed', 'total_ms': 100.0,
+             'spans': [['stability_wait', 0, 80.0], ['rename', 80, 5.0], ['rename', 90, 5.0]]},
+            {'file': 'b', 'time': 0, 'outcome': 'renamed', 'total_ms': 40.0,
+             'spans': [['stability_wait', 0, 30.0], ['rename', 30, 2.0]]},
+        ]) + '\n', encoding='utf-8')
+
+        summary = summarize(load_traces([str(path)]))
+
+        assert list(summary) == ['total', 'stability_wait', 'rename']
+        assert summary['rename']['max'] == 10.0
+        assert summary['stability_wait']['p50'] == 30.0
+        assert summary['total']['p99'] == 100.0
+
+    def test_summarize_empty(self):
+        """記録がない場合は空の結果を返す"""
+        assert summarize([]) == {}
@@ -0,0 +1,40 @@
+from service.path_filter import PathFilter
+
+
+class TestPathFilter:
+    """PathFilterのテスト"""
+
+    def test_accepts_all_files_without_rules(self):
+        """ルールがない場合は全ファイルを対象とする"""
+        path_filter = PathFilter()
+        assert path_filter.accepts('/test/file_ABC123.txt') is True
+
+    def test_excludes_extensions_case_insensitively(self):
+        """除外拡張子は大文字小文字を区別しない"""
+        path_filter = PathFilter(exclude_extensions=['.part', 'crdownload'])
+        assert path_filter.accepts('/test/movie.PART') is False
+        assert path_filter.accepts('/test/file.pdf.crdownload') is False
+        assert path_filter.accepts('/test/file.pdf') is True
+
+    def test_excludes_globs(self):
+        """除外globに一致するファイルは対象外"""
+        path_filter = PathFilter(exclude_globs=['~$*'])
+        assert path_filter.accepts('/test/~$report.docx') is False
+        assert path_filter.accepts('/test/report.docx') is True
+
+    def test_include_globs_limit_targets(self):
+        """include_globsを指定した場合は一致するファイルのみ対象"""
+        path_filter = PathFilter(include_globs=['*.pdf', '*.xml'])
+        assert path_filter.accepts('/test/report.pdf') is True
+        assert path_filter.accepts('/test/report.txt') is False
+
+    def test_exclude_takes_precedence_over_include(self):
+        """除外ルールはincludeより優先される"""
+        path_filter = PathFilter(include_globs=['*'], exclude_extensions=['.tmp'])
+        assert path_filter.accepts('/test/file.tmp') is False
+
+    def test_accepts_bytes_path(self):
+        """bytesのパスも判定できる"""
+        path_filter = PathFilter(exclude_extensions=['.tmp'])
+        assert path_filter.accepts(b'/test/file.tmp') is False
+        assert path_filter.accepts(b'/test/file.txt') is True
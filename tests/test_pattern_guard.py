@@ -0,0 +1,78 @@
+import re
+from unittest.mock import patch
+
+import pytest
+
+from utils.config_manager import get_rename_patterns
+from utils.pattern_guard import check_pattern, generate_realistic_names, lint_pattern
+
+
+class TestLintPattern:
+    """量指定子の入れ子の静的検査のテスト"""
+
+    @pytest.mark.parametrize('pattern', [r'(a+)+$', r'(\w+\s?)*$', r'(?:x*y?)+$'])
+    def test_detects_nested_quantifiers(self, pattern):
+        """量指定子の入れ子を検出する"""
+        assert lint_pattern(pattern)
+
+    @pytest.mark.parametrize('pattern', [
+        r'_[A-Za-z0-9]{6}$',
+        r'_magnate_[A-Za-z0-9]{6}$',
+        r'(_[A-Z]{3})+$',
+        r'(?>a+)+$',
+        r'\(copy\)$',
+    ])
+    def test_accepts_safe_patterns(self, pattern):
+        """固定長の繰り返しやアトミックグループは検出しない"""
+        assert lint_pattern(pattern) == []
+
+
+class TestCheckPattern:
+    """実行時間計測による検査のテスト"""
+
+    def test_config_patterns_are_within_budget(self):
+        """設定ファイルの標準パターンは予算内に収まる"""
+        for pattern_str in [r'_[A-Za-z0-9]{6}$', r'_magnate_[A-Za-z0-9]{6}$']:
+            report = check_pattern(re.compile(pattern_str))
+            assert report.over_budget is False
+
+    def test_catastrophic_pattern_exceeds_budget(self):
+        """破滅的バックトラックを起こすパターンは予算超過となる"""
+        report = check_pattern(re.compile(r'(a+)+$'), budget_seconds=0.005)
+        assert report.over_budget is True
+        assert report.worst_input_length < 64
+
+    def test_realistic_names_are_deterministic(self):
+        """同じシードでは同じサンプルを生成する"""
+        assert generate_realistic_names(20, seed=1) == generate_realistic_names(20, seed=1)
+
+
+class TestGetRenamePatternsGuard:
+    """設定読み込み時の検査のテスト"""
+
+    @staticmethod
+    def _config_text(pattern, mode):
+        return f"[Rename]\npattern1 = {pattern}\n[App]\npattern_guard = {mode}\npattern_time_budget_ms = 5\n"
+
+    def _load(self, tmp_path, pattern, mode):
+        config_path = tmp_path / 'config.ini'
+        config_path.write_text(self._config_text(pattern, mode), encoding='utf-8')
+        with patch('utils.config_manager.CONFIG_PATH', str(config_path)):
+            return get_rename_patterns()
+
+    def test_reject_mode_raises_for_slow_pattern(self, tmp_path):
+        """rejectモードでは遅いパターンを拒否する"""
+        with pytest.raises(ValueError):
+            self._load(tmp_path, r'(a+)+$', 'reject')
+
+    def test_warn_mode_keeps_slow_pattern(self, tmp_path, capsys):
+        """warnモードでは警告のみでパターンを採用する"""
+        patterns = self._load(tmp_path, r'(a+)+$', 'warn')
+        assert [p.pattern for p in patterns] == [r'(a+)+$']
+        assert "警告" in capsys.readouterr().out
+
+    def test_off_mode_skips_check(self, tmp_path):
+        """offモードでは検査しない"""
+        with patch('utils.config_manager.check_pattern') as mock_check:
+            self._load(tmp_path, r'_[A-Za-z0-9]{6}$', 'off')
+            mock_check.assert_not_called()
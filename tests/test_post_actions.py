@@ -0,0 +1,197 @@
+import re
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from service.file_rename_handler import FileRenameHandler
+from service.post_actions import (
+    CommandAction,
+    MoveToFolderAction,
+    PostActionPipeline,
+    PostRenameAction,
+    build_action,
+    split_command,
+)
+
+
+class RecordingAction(PostRenameAction):
+    """実行されたパスを記録するテスト用の処理"""
+
+    def __init__(self, name='record', delay=0.0, error=None):
+        super().__init__(name)
+        self.delay = delay
+        self.error = error
+        self.paths = []
+
+    def run(self, file_path):
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        self.paths.append(file_path)
+        return file_path
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("条件を満たしませんでした")
+        time.sleep(0.01)
+
+
+class TestActions:
+    """リネーム後の処理のテスト"""
+
+    def test_move_to_folder_expands_template(self, tmp_path):
+        """テンプレートのプレースホルダーを展開して移動する"""
+        source = tmp_path / 'report.pdf'
+        source.write_text('data')
+        action = MoveToFolderAction(str(tmp_path / 'archive' / '{year}' / '{ext}'))
+
+        with patch('service.post_actions.datetime') as mock_datetime:
+            mock_datetime.now.return_value.year = 2025
+            mock_datetime.now.return_value.month = 12
+            mock_datetime.now.return_value.day = 24
+            moved = action.run(str(source))
+
+        assert moved == str(tmp_path / 'archive' / '2025' / '.pdf' / 'report.pdf')
+        assert not source.exists()
+
+    def test_move_to_folder_avoids_overwrite(self, tmp_path):
+        """移動先に同名ファイルがある場合は連番を付与する"""
+        (tmp_path / 'archive').mkdir()
+        (tmp_path / 'archive' / 'report.pdf').write_text('old')
+        source = tmp_path / 'report.pdf'
+        source.write_text('new')
+
+        moved = MoveToFolderAction(str(tmp_path / 'archive')).run(str(source))
+
+        assert moved.endswith('report (1).pdf')
+        assert (tmp_path / 'archive' / 'report.pdf').read_text() == 'old'
+
+    def test_command_action_passes_path_as_single_argument(self, tmp_path):
+        """空白を含むパスも1つの引数として渡す"""
+        action = CommandAction(f'"{sys.executable}" -c "import sys; sys.exit(0)" "{{path}}"')
+        with patch('service.post_actions.subprocess.run') as mock_run:
+            action.run(str(tmp_path / 'my report.pdf'))
+        args = mock_run.call_args[0][0]
+        assert args[-1] == str(tmp_path / 'my report.pdf')
+
+    def test_windows_split_removes_quotes_around_placeholder(self):
+        """Windowsの分割でも引用符で囲んだプレースホルダーは引用符なしの1つの引数になる"""
+        args = split_command('notify.exe "{path}" --title "My Title"', posix=False)
+
+        assert args == ['notify.exe', '{path}', '--title', 'My Title']
+        assert args[1].format(path=r'C:\a b\f.pdf') == r'C:\a b\f.pdf'
+
+    def test_command_receives_path_with_spaces_unquoted(self, tmp_path):
+        """空白を含むパスが引用符なしでそのままコマンドに渡される"""
+        output = tmp_path / 'argv.txt'
+        script = "import sys; open(sys.argv[2], 'w').write(sys.argv[1])"
+        action = CommandAction(f'"{sys.executable}" -c "{script}" "{{path}}" "{output}"')
+
+        action.run(str(tmp_path / 'my report.pdf'))
+
+        assert output.read_text() == str(tmp_path / 'my report.pdf')
+
+    def test_command_keeps_literal_braces(self, tmp_path):
+        """プレースホルダー以外の { } はそのまま渡す"""
+        action = CommandAction('curl -d \'{"file": "{name}"}\' http://localhost/hook')
+        with patch('service.post_actions.subprocess.run') as mock_run:
+            action.run(str(tmp_path / 'report.pdf'))
+        assert mock_run.call_args[0][0][2] == '{"file": "report.pdf"}'
+
+    def test_unknown_placeholder_is_rejected_at_load(self):
+        """不明なプレースホルダーは処理の作成時にエラー"""
+        with pytest.raises(ValueError, match=r'\{filename\}'):
+            build_action('command', 'notify.exe "{filename}"')
+        with pytest.raises(ValueError, match=r'\{yr\}'):
+            build_action('move', 'D:\\archive\\{yr}')
+
+    def test_build_action_rejects_unknown_kind(self):
+        """不明な種類の処理はエラー"""
+        with pytest.raises(ValueError):
+            build_action('upload', 'x')
+
+
+class TestPostActionPipeline:
+    """PostActionPipelineのテスト"""
+
+    def test_runs_actions_in_order_and_records_stats(self):
+        """処理を順に実行し、件数と所要時間を記録する"""
+        first, second = RecordingAction('first'), RecordingAction('second')
+        pipeline = PostActionPipeline([first, second], workers=1)
+
+        pipeline.submit('/test/a.txt')
+        pipeline.stop()
+
+        assert first.paths == ['/test/a.txt']
+        assert second.paths == ['/test/a.txt']
+        assert pipeline.stats['first'].count == 1
+        assert pipeline.stats['second'].failures == 0
+
+    def test_failure_stops_following_actions(self, caplog):
+        """処理が失敗した場合は後続の処理を実行しない"""
+        failing = RecordingAction('failing', error=OSError("disk full"))
+        following = RecordingAction('following')
+        pipeline = PostActionPipeline([failing, following], workers=1)
+
+        pipeline.submit('/test/a.txt')
+        pipeline.stop()
+
+        assert following.paths == []
+        assert pipeline.stats['failing'].failures == 1
+        assert "リネーム後の処理に失敗しました" in caplog.text
+
+    def test_submit_does_not_block_when_queue_is_full(self):
+        """キューが満杯でも呼び出し元を待たせない"""
+        release = threading.Event()
+        blocking = RecordingAction('blocking')
+        blocking.run = lambda path: release.wait(5) and path
+        pipeline = PostActionPipeline([blocking], workers=1, queue_size=1)
+
+        pipeline.submit('/test/1.txt')
+        wait_until(lambda: pipeline.queue_depth == 0)
+        pipeline.submit('/test/2.txt')
+
+        start = time.monotonic()
+        assert pipeline.submit('/test/3.txt') is False
+        assert time.monotonic() - start < 0.1
+        assert pipeline.dropped == 1
+
+        release.set()
+        pipeline.stop()
+
+    def test_workers_run_concurrently(self):
+        """複数のスレッドで並行して処理する"""
+        slow = RecordingAction('slow', delay=0.1)
+        pipeline = PostActionPipeline([slow], workers=4)
+
+        start = time.monotonic()
+        for i in range(4):
+            pipeline.submit(f'/test/{i}.txt')
+        pipeline.stop()
+
+        assert len(slow.paths) == 4
+        assert time.monotonic() - start < 0.35
+
+
+class TestHandlerIntegration:
+    """ハンドラーとの連携のテスト"""
+
+    def test_rename_submits_new_path(self, tmp_path):
+        """リネーム成功後に変換後のパスを処理キューに追加する"""
+        with patch('service.file_rename_handler.get_rename_patterns', return_value=[re.compile(r'_[A-Za-z0-9]{6}$')]), \
+             patch('service.file_rename_handler.get_post_actions', return_value=[('move', str(tmp_path / 'archive'))]):
+            handler = FileRenameHandler()
+
+        (tmp_path / 'report_ABC123.pdf').write_text('data')
+        new_path = handler.rename_file(str(tmp_path / 'report_ABC123.pdf'), 'report_ABC123', '.pdf')
+        handler.close()
+
+        assert new_path == str(tmp_path / 'report.pdf')
+        assert (tmp_path / 'archive' / 'report.pdf').read_text() == 'data'
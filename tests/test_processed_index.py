@@ -0,0 +1,167 @@
+import os
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from service.processed_index import ProcessedIndex
+
+
+def _files(directory) -> list[tuple[str, os.stat_result]]:
+    return sorted((entry.name, entry.stat()) for entry in os.scandir(directory))
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ProcessedIndex(str(tmp_path / 'index' / 'root.sqlite3'), 'fingerprint')
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / 'folder'
+    folder.mkdir()
+    for name in ('a.txt', 'b.txt', 'c.txt'):
+        (folder / name).write_text(name)
+    return folder
+
+
+class TestProcessedIndex:
+    """処理済みファイルの索引のテスト"""
+
+    def test_new_files_are_unseen(self, index, folder):
+        """記録されていないファイルはすべて判定対象"""
+        assert [name for name, _ in index.unseen(_files(folder))] == ['a.txt', 'b.txt', 'c.txt']
+
+    def test_recorded_files_are_skipped(self, index, folder):
+        """記録済みのファイルは次の走査で省略する"""
+        index.record(_files(folder))
+        (folder / 'd.txt').write_text('d')
+
+        assert [name for name, _ in index.unseen(_files(folder))] == ['d.txt']
+
+    def test_changed_file_is_unseen(self, index, folder):
+        """サイズや更新時刻が変わったファイルは判定し直す"""
+        index.record(_files(folder))
+        (folder / 'b.txt').write_text('changed')
+
+        assert [name for name, _ in index.unseen(_files(folder))] == ['b.txt']
+        assert len(index) == 3
+
+    def test_renamed_file_is_unseen(self, index, folder):
+        """停止中に名前だけを変更されたファイルは判定し直す"""
+        index.record(_files(folder))
+        (folder / 'b.txt').rename(folder / 'b_ABC123.txt')
+
+        assert [name for name, _ in index.unseen(_files(folder))] == ['b_ABC123.txt']
+
+    def test_old_schema_is_rebuilt(self, tmp_path, folder):
+        """名前のハッシュを持たない以前の索引は作り直す"""
+        path = tmp_path / 'root.sqlite3'
+        connection = sqlite3.connect(str(path))
+        connection.executescript(
+            "CREATE TABLE entries (dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER, PRIMARY KEY (dev, ino));"
+            "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+            "INSERT INTO meta VALUES ('fingerprint', 'fingerprint');"
+        )
+        connection.close()
+
+        index = ProcessedIndex(str(path), 'fingerprint')
+        try:
+            assert len(index.unseen(_files(folder))) == 3
+            index.record(_files(folder))
+            assert index.unseen(_files(folder)) == []
+        finally:
+            index.close()
+
+    def test_records_persist_across_reopen(self, tmp_path, folder):
+        """再起動後も記録を使う"""
+        path = str(tmp_path / 'root.sqlite3')
+        index = ProcessedIndex(path, 'fingerprint')
+        index.record(_files(folder))
+        index.close()
+
+        index = ProcessedIndex(path, 'fingerprint')
+        try:
+            assert index.unseen(_files(folder)) == []
+        finally:
+            index.close()
+
+    def test_fingerprint_change_discards_records(self, tmp_path, folder):
+        """設定が変わった場合は記録を破棄する"""
+        path = str(tmp_path / 'root.sqlite3')
+        index = ProcessedIndex(path, 'old')
+        index.record(_files(folder))
+        index.close()
+
+        index = ProcessedIndex(path, 'new')
+        try:
+            assert len(index) == 0
+        finally:
+            index.close()
+
+    def test_compact_removes_missing_files(self, index, folder):
+        """最新の走査で見つからなかったファイルの記録を圧縮時に削除する"""
+        index.record(_files(folder))
+        (folder / 'a.txt').unlink()
+
+        assert index.compact(_files(folder)) == 1
+        assert len(index) == 2
+
+    def test_finish_scan_compacts_after_interval(self, tmp_path, folder):
+        """前回の圧縮から一定時間が経過するまでは圧縮しない"""
+        index = ProcessedIndex(str(tmp_path / 'root.sqlite3'), 'fingerprint', compact_interval=3600)
+        try:
+            index.record(_files(folder))
+            index.finish_scan(_files(folder))
+            (folder / 'a.txt').unlink()
+
+            index.finish_scan(_files(folder))
+
+            assert len(index) == 3
+        finally:
+            index.close()
+
+    def test_large_batch(self, index):
+        """問い合わせの上限を超える件数も判定できる"""
+        files = [
+            (f"{number}.txt", SimpleNamespace(st_dev=1, st_ino=number + 1, st_size=10, st_mtime_ns=0))
+            for number in range(1000)
+        ]
+        index.record(files[:500])
+
+        assert len(index.unseen(files)) == 500
+
+    def test_files_without_inode_are_recorded_by_name(self, index):
+        """inodeがない場合（Windowsの走査）は名前ごとに記録し、同じ更新時刻の別のファイルと区別する"""
+        files = [
+            (name, SimpleNamespace(st_dev=0, st_ino=0, st_size=10, st_mtime_ns=5)) for name in ('a.txt', 'b.txt')
+        ]
+        index.record(files[:1])
+
+        assert [name for name, _ in index.unseen(files)] == ['b.txt']
+        changed = [('a.txt', SimpleNamespace(st_dev=0, st_ino=0, st_size=11, st_mtime_ns=5))]
+        assert [name for name, _ in index.unseen(changed)] == ['a.txt']
+
+    def test_compact_removes_missing_names(self, index):
+        """inodeのない記録も、走査で見つからなかった名前を圧縮時に削除する"""
+        files = [
+            (name, SimpleNamespace(st_dev=0, st_ino=0, st_size=10, st_mtime_ns=5)) for name in ('a.txt', 'b.txt')
+        ]
+        index.record(files)
+
+        assert index.compact(files[1:]) == 1
+        assert len(index) == 1
+
+    def test_corrupt_index_is_rebuilt(self, tmp_path):
+        """破損した索引は作り直す"""
+        path = tmp_path / 'root.sqlite3'
+        path.write_bytes(b'not a database' * 100)
+
+        index = ProcessedIndex(str(path), 'fingerprint')
+        try:
+            assert len(index) == 0
+        finally:
+            index.close()
+        assert sqlite3.connect(str(path)).execute("SELECT COUNT(*) FROM entries").fetchone() == (0,)
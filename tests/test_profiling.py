@@ -0,0 +1,154 @@
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+import pytest
+
+from utils.profiling import MemorySnapshotter, SamplingProfiler, build_pstats, collapsed_stacks
+
+MAIN = ('app.py', 1, 'main')
+WORK = ('worker.py', 10, 'work')
+LEAF = ('worker.py', 20, 'leaf')
+
+
+@pytest.fixture
+def samples():
+    return Counter({
+        ('observer', (MAIN, WORK, LEAF)): 3,
+        ('observer', (MAIN, WORK)): 1,
+        ('post-action-0', (MAIN,)): 2,
+    })
+
+
+class TestProfileFormats:
+    """出力形式のテスト"""
+
+    def test_collapsed_stacks(self, samples):
+        """スレッド名;関数;関数... 件数 の形式に変換する"""
+        lines = collapsed_stacks(samples)
+        assert lines['observer;main_(app.py:1);work_(worker.py:10);leaf_(worker.py:20)'] == 3
+        assert lines['post-action-0;main_(app.py:1)'] == 2
+
+    def test_build_pstats_estimates_times(self, samples):
+        """採取回数 × 間隔で自身の時間と累積時間を推定する"""
+        stats = build_pstats(samples, interval=0.01)
+
+        calls, _, own, cumulative, callers = stats[WORK]
+        assert calls == 4
+        assert own == pytest.approx(0.01)
+        assert cumulative == pytest.approx(0.04)
+        assert callers[MAIN][0] == 4
+        assert stats[MAIN][3] == pytest.approx(0.06)
+
+    def test_build_pstats_counts_recursion_once(self):
+        """再帰呼び出しは1回の採取につき1回だけ累積時間に含める"""
+        stats = build_pstats(Counter({('t', (MAIN, WORK, WORK)): 1}), interval=1.0)
+        assert stats[WORK][3] == pytest.approx(1.0)
+
+    def test_pstats_file_is_loadable(self, tmp_path, samples):
+        """出力したファイルをpstatsで読み込める"""
+        import marshal
+        path = tmp_path / 'profile.pstats'
+        path.write_bytes(marshal.dumps(build_pstats(samples, 0.01)))
+
+        stats = pstats.Stats(str(path))
+        assert stats.total_tt == pytest.approx(0.06)
+
+
+class TestSamplingProfiler:
+    """SamplingProfilerのテスト"""
+
+    def test_profile_samples_other_threads(self, tmp_path):
+        """他のスレッドのスタックを採取してpstatsとcollapsed stacksで保存する"""
+        stop = threading.Event()
+
+        def busy_worker():
+            while not stop.is_set():
+                sum(range(1000))
+
+        worker = threading.Thread(target=busy_worker, name='busy-worker')
+        worker.start()
+        profiler = SamplingProfiler(str(tmp_path), duration=10, interval=0.001)
+        try:
+            profiler.start()
+            assert profiler.running
+            time.sleep(0.05)
+            profiler.stop(wait=True)
+        finally:
+            stop.set()
+            worker.join()
+
+        assert not profiler.running
+        pstats_path, collapsed_path = profiler.last_outputs
+        assert os.path.dirname(pstats_path) == str(tmp_path)
+        assert any(key[2] == 'busy_worker' for key in pstats.Stats(pstats_path).stats)
+        with open(collapsed_path, encoding='utf-8') as f:
+            assert any(line.startswith('busy-worker;') for line in f)
+
+    def test_profile_stops_after_duration(self, tmp_path):
+        """最大時間が経過すると自動的に停止する"""
+        profiler = SamplingProfiler(str(tmp_path), duration=0.02, interval=0.001)
+        profiler.start()
+        profiler._thread.join(2)
+        assert not profiler.running
+        assert len(profiler.last_outputs) == 2
+
+    def test_toggle_starts_and_stops(self, tmp_path):
+        """toggleで開始と停止を切り替える"""
+        profiler = SamplingProfiler(str(tmp_path), duration=10, interval=0.001)
+        profiler.toggle()
+        assert profiler.running
+        profiler.toggle()
+        profiler._thread.join(2)
+        assert not profiler.running
+
+    def test_start_while_running_is_ignored(self, tmp_path):
+        """採取中に開始しても二重に開始しない"""
+        profiler = SamplingProfiler(str(tmp_path), duration=10, interval=0.001)
+        assert profiler.start() is True
+        assert profiler.start() is False
+        profiler.stop(wait=True)
+
+
+class TestMemorySnapshotter:
+    """MemorySnapshotterのテスト"""
+
+    def test_toggle_starts_tracing_then_saves_snapshot(self, tmp_path):
+        """1回目で追跡を開始し、2回目でスナップショットを保存して追跡を終了する"""
+        if tracemalloc.is_tracing():
+            pytest.skip("tracemallocが既に有効な環境では実行しない")
+        snapshotter = MemorySnapshotter(str(tmp_path))
+
+        snapshotter.toggle()
+        assert snapshotter.tracing
+        data = [bytearray(1024) for _ in range(100)]
+        snapshotter.toggle()
+
+        assert not snapshotter.tracing
+        snapshot = tracemalloc.Snapshot.load(snapshotter.last_output)
+        assert sum(stat.size for stat in snapshot.statistics('filename')) >= 100 * 1024
+        del data
+
+    def test_snapshot_without_tracing_returns_none(self, tmp_path):
+        """追跡していない場合は何もしない"""
+        if tracemalloc.is_tracing():
+            pytest.skip("tracemallocが既に有効な環境では実行しない")
+        assert MemorySnapshotter(str(tmp_path)).snapshot() is None
+
+    def test_snapshot_write_failure_is_logged(self, tmp_path, caplog):
+        """保存先に書き込めない場合は例外を送出せずにログに記録し、追跡を終了する"""
+        if tracemalloc.is_tracing():
+            pytest.skip("tracemallocが既に有効な環境では実行しない")
+        blocker = tmp_path / 'file'
+        blocker.write_text('')
+        snapshotter = MemorySnapshotter(str(blocker / 'profiles'))
+
+        snapshotter.toggle()
+        assert snapshotter.snapshot() is None
+
+        assert not snapshotter.tracing
+        assert snapshotter.last_output is None
+        assert "メモリのスナップショットの保存に失敗しました" in caplog.text
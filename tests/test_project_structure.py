@@ -0,0 +1,121 @@
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from scripts.project_structure import ProjectStructureGenerator
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / 'project'
+    for directory in ('app', 'app/views', 'service', 'service/core', 'environment', 'env', '__pycache__'):
+        (root / directory).mkdir(parents=True)
+    for file in ('README.md', 'main.py', 'app/ui.py', 'app/views/list.py', 'service/core/engine.py',
+                 'environment/settings.py', 'env/python', 'main.pyc'):
+        (root / file).write_text('data')
+    return root
+
+
+def _body(lines):
+    """ヘッダー（生成日時を含む）を除いた行"""
+    return list(lines)[6:]
+
+
+class TestShouldIgnore:
+    """除外パターンの判定のテスト"""
+
+    def test_matches_whole_name(self):
+        """除外パターンは名前全体で判定する（部分一致で除外しない）"""
+        generator = ProjectStructureGenerator()
+        assert generator.should_ignore('env')
+        assert not generator.should_ignore('environment')
+        assert not generator.should_ignore('my.env.py')
+
+    def test_wildcards_and_case(self):
+        """ワイルドカードは名前全体に一致し、大文字と小文字を区別しない"""
+        generator = ProjectStructureGenerator()
+        assert generator.should_ignore('module.pyc')
+        assert not generator.should_ignore('module.pyc.bak')
+        assert generator.should_ignore('THUMBS.DB')
+        assert generator.should_ignore(Path('/project/__pycache__'))
+
+    def test_changed_patterns_are_recompiled(self):
+        """ignore_patterns を変更した場合は新しいパターンで判定する"""
+        generator = ProjectStructureGenerator()
+        assert generator.should_ignore('.venv')
+
+        generator.ignore_patterns = {pattern for pattern in generator.ignore_patterns if not pattern.startswith('.')}
+        assert not generator.should_ignore('.venv')
+        assert generator.should_ignore('venv')
+
+        generator.ignore_patterns = set()
+        assert not generator.should_ignore('venv')
+
+
+class TestIterStructure:
+    """構造の出力のテスト"""
+
+    def test_tree_order_and_ignored_entries(self, tree):
+        """フォルダを先に、重要なファイルを次に並べ、除外する名前を出力しない"""
+        body = _body(ProjectStructureGenerator().iter_structure(str(tree)))
+
+        assert body == [
+            "└── project",
+            "    ├── app",
+            "    │   ├── views",
+            "    │   │   └── list.py",
+            "    │   └── ui.py",
+            "    ├── environment",
+            "    │   └── settings.py",
+            "    ├── service",
+            "    │   └── core",
+            "    │       └── engine.py",
+            "    ├── README.md",
+            "    └── main.py",
+        ]
+
+    @pytest.mark.parametrize('max_depth', [None, 1, 2])
+    def test_jobs_output_matches_sequential(self, tree, max_depth):
+        """サブフォルダを並列に読み込んでも、出力は1スレッドの場合と同じ"""
+        generator = ProjectStructureGenerator()
+        sequential = _body(generator.iter_structure(str(tree), max_depth=max_depth, show_size=True))
+        parallel = _body(generator.iter_structure(str(tree), max_depth=max_depth, show_size=True, jobs=4))
+
+        assert parallel == sequential
+
+    def test_jobs_prefetch_subfolders_on_worker_threads(self, tree):
+        """jobs が2以上の場合は、サブフォルダを別のスレッドで先行して読み込む"""
+        generator = ProjectStructureGenerator()
+        threads = {}
+        list_directory = generator.list_directory
+
+        def recording(path, show_size=False):
+            threads[Path(path).name] = threading.current_thread()
+            return list_directory(path, show_size)
+
+        with patch.object(generator, 'list_directory', side_effect=recording):
+            list(generator.iter_structure(str(tree), jobs=2))
+
+        assert threads['project'] is threading.current_thread()
+        assert all(threads[name] is not threading.current_thread() for name in ('app', 'views', 'core'))
+
+    def test_unreadable_subfolder_with_jobs(self, tree):
+        """先行して読み込んだサブフォルダにアクセスできない場合も、その位置に表示する"""
+        generator = ProjectStructureGenerator()
+        list_directory = generator.list_directory
+
+        def denied(path, show_size=False):
+            return None if Path(path).name == 'service' else list_directory(path, show_size)
+
+        with patch.object(generator, 'list_directory', side_effect=denied):
+            body = _body(generator.iter_structure(str(tree), jobs=3))
+
+        assert body[body.index("    ├── service") + 1] == "    │   (アクセス権限なし)"
+
+    def test_file_size_shows_fraction(self):
+        """MB・GBの表示は小数第1位まで表示する"""
+        generator = ProjectStructureGenerator()
+        assert generator.get_file_size_str(1536 * 1024) == "1.5MB"
+        assert generator.get_file_size_str(int(2.5 * 1024 ** 3)) == "2.5GB"
@@ -0,0 +1,101 @@
+import sys
+import threading
+from unittest.mock import patch
+
+from service.rename_stats import STATE_BUSY, STATE_ERROR, STATE_IDLE, RenameStats
+
+
+class TestRenameStats:
+    """RenameStatsのテスト"""
+
+    def test_initial_snapshot_is_idle(self):
+        """初期状態は待機中"""
+        snapshot = RenameStats().snapshot()
+        assert snapshot.state == STATE_IDLE
+        assert snapshot.queue_depth == 0
+        assert snapshot.renames_last_minute == 0
+        assert snapshot.last_error is None
+
+    def test_pending_events_make_state_busy(self):
+        """処理中のイベントがある場合は処理中"""
+        stats = RenameStats()
+        stats.event_received()
+        stats.event_received()
+        stats.event_finished()
+
+        snapshot = stats.snapshot(extra_queue_depth=2)
+        assert snapshot.state == STATE_BUSY
+        assert snapshot.queue_depth == 3
+
+    def test_recent_error_makes_state_error(self):
+        """直近のエラーがある場合はエラー状態"""
+        stats = RenameStats()
+        stats.record_error("リネーム失敗: test")
+
+        snapshot = stats.snapshot()
+        assert snapshot.state == STATE_ERROR
+        assert snapshot.last_error == "リネーム失敗: test"
+
+    def test_old_error_returns_to_idle(self):
+        """時間が経過したエラーは状態に影響しない"""
+        stats = RenameStats()
+        with patch('service.rename_stats.time.time', return_value=1000.0):
+            stats.record_error("リネーム失敗: test")
+        with patch('service.rename_stats.time.time', return_value=2000.0):
+            assert stats.snapshot().state == STATE_IDLE
+
+    def test_renames_last_minute_drops_old_buckets(self):
+        """1分より前のリネームは集計しない"""
+        stats = RenameStats()
+        with patch('service.rename_stats.time.monotonic', return_value=10000.0):
+            stats.record_rename()
+            stats.record_rename()
+        with patch('service.rename_stats.time.monotonic', return_value=10030.0):
+            stats.record_rename()
+            assert stats.renames_last_minute() == 3
+        with patch('service.rename_stats.time.monotonic', return_value=10075.0):
+            assert stats.renames_last_minute() == 1
+        assert stats.renames_total == 3
+
+    def test_concurrent_updates_are_not_lost(self):
+        """複数のスレッドから更新しても件数がずれない"""
+        stats = RenameStats()
+
+        def work():
+            for _ in range(20000):
+                stats.event_received()
+                stats.record_rename()
+                stats.event_finished()
+
+        previous = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=work) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(previous)
+
+        assert stats.events_received == stats.events_finished == 80000
+        assert stats.renames_total == 80000
+        assert stats.snapshot().queue_depth == 0
+
+    def test_finished_threads_are_folded(self):
+        """終了したスレッドの件数は合計に移し、スレッドごとの記録を残さない"""
+        stats = RenameStats()
+
+        def work():
+            stats.event_received()
+            stats.event_finished()
+            stats.record_error("リネーム失敗: test")
+
+        for _ in range(10):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+
+        assert stats.events_received == stats.events_finished == 10
+        assert stats.errors_total == 10
+        assert stats._threads == {}
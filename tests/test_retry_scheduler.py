@@ -0,0 +1,114 @@
+import logging
+from unittest.mock import MagicMock
+
+import pytest
+
+from service.retry_scheduler import RetryScheduler
+from service.timer_queue import TimerQueue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def timers(clock):
+    return TimerQueue(clock, autostart=False)
+
+
+def _scheduler(timers, action, **kwargs):
+    scheduler = RetryScheduler(timers, action, **kwargs)
+    scheduler._random = lambda: 0.5  # ジッターなし
+    return scheduler
+
+
+class TestRetryScheduler:
+    """RetrySchedulerのテスト"""
+
+    def test_delay_grows_exponentially_up_to_max(self, timers):
+        """待機時間は失敗のたびに倍になり、最大値で止まる"""
+        scheduler = _scheduler(timers, MagicMock(), initial_delay=2.0, max_delay=10.0)
+        assert [scheduler.delay_for(n) for n in range(1, 6)] == [2.0, 4.0, 8.0, 10.0, 10.0]
+
+    def test_jitter_spreads_delay(self, timers):
+        """ジッターにより待機時間を前後に分散する"""
+        scheduler = RetryScheduler(timers, MagicMock(), initial_delay=10.0, jitter=0.2)
+        scheduler._random = lambda: 0.0
+        assert scheduler.delay_for(1) == pytest.approx(8.0)
+        scheduler._random = lambda: 1.0
+        assert scheduler.delay_for(1) == pytest.approx(12.0)
+
+    def test_retry_runs_action_after_delay(self, clock, timers):
+        """待機時間の経過後に再処理する"""
+        action = MagicMock()
+        scheduler = _scheduler(timers, action, initial_delay=2.0)
+
+        assert scheduler.schedule('/watch/a.txt', 'locked') is True
+        timers.run_pending(1.9)
+        action.assert_not_called()
+        timers.run_pending(2.0)
+        action.assert_called_once_with('/watch/a.txt')
+        assert scheduler.pending_count == 0
+
+    def test_duplicate_schedule_is_coalesced(self, timers):
+        """待機中のファイルは重複して登録しない"""
+        scheduler = _scheduler(timers, MagicMock())
+        scheduler.schedule('/watch/a.txt', 'locked')
+        scheduler.schedule('/watch/a.txt', 'locked')
+        assert len(timers) == 1
+
+    def test_repeated_failures_are_quarantined(self, clock, timers, caplog):
+        """最大回数まで失敗したファイルは隔離する"""
+        scheduler = None
+
+        def failing_action(path):
+            scheduler.schedule(path, 'still locked')
+
+        scheduler = _scheduler(timers, failing_action, max_attempts=3, initial_delay=1.0)
+        scheduler.schedule('/watch/a.txt', 'locked')
+
+        with caplog.at_level(logging.WARNING):
+            for _ in range(3):
+                clock.now = timers.next_deadline()
+                timers.run_pending()
+
+        assert '/watch/a.txt' in scheduler.quarantined
+        assert scheduler.quarantined['/watch/a.txt'].attempts == 3
+        assert scheduler.quarantined['/watch/a.txt'].last_error == 'still locked'
+        assert len(timers) == 0
+        assert "隔離リストに追加しました" in caplog.text
+        assert scheduler.schedule('/watch/a.txt', 'locked') is False
+
+    def test_success_resets_attempts(self, clock, timers):
+        """再処理に成功した場合は失敗回数をリセットする"""
+        scheduler = _scheduler(timers, MagicMock(), initial_delay=1.0)
+        scheduler.schedule('/watch/a.txt', 'locked')
+        clock.now = 1.0
+        timers.run_pending()
+
+        # 1回目の失敗として扱われるため、待機時間は最初の値に戻る
+        scheduler.schedule('/watch/a.txt', 'locked again')
+        assert timers.next_deadline() == pytest.approx(clock.now + 1.0)
+
+    def test_forget_cancels_and_releases(self, timers):
+        """新しいイベントを受けたファイルは待機中の再試行と隔離を解除する"""
+        scheduler = _scheduler(timers, MagicMock(), max_attempts=0)
+        scheduler.schedule('/watch/q.txt', 'locked')
+        scheduler.max_attempts = 5
+        scheduler.schedule('/watch/p.txt', 'locked')
+
+        scheduler.forget('/watch/q.txt')
+        scheduler.forget('/watch/p.txt')
+
+        assert scheduler.quarantined == {}
+        assert scheduler.pending_count == 0
+        assert len(timers) == 0
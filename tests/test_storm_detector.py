@@ -0,0 +1,69 @@
+import pytest
+
+from service.storm_detector import StormDetector
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class TestStormDetector:
+    def test_enters_storm_after_min_events_at_high_rate(self, clock):
+        """min_events 件以上が閾値以上の頻度で届いた時点で多発中とする"""
+        detector = StormDetector(100, min_events=10, clock=clock)
+        for _ in range(9):
+            clock.now += 0.001
+            assert detector.record() is False
+        clock.now += 0.001
+
+        assert detector.record() is True
+        assert detector.rate >= 100
+
+    def test_low_rate_is_not_storm(self, clock):
+        """閾値未満の頻度では件数が多くても多発中としない"""
+        detector = StormDetector(100, min_events=10, clock=clock)
+        for _ in range(100):
+            clock.now += 0.1
+            assert detector.record() is False
+
+    def test_busy_time_is_excluded_from_rate(self, clock):
+        """処理中（待機を含む）の時間は頻度の計算から除く"""
+        detector = StormDetector(100, min_events=10, clock=clock)
+        storming = False
+        for _ in range(10):
+            # 1件ごとに0.5秒待機する処理の間に届いたイベントは、処理を終えてから続けて受け取る
+            clock.now += 0.5
+            detector.add_busy(0.5)
+            storming = detector.record()
+
+        assert storming is True
+
+    def test_storm_continues_until_exit_threshold(self, clock):
+        """多発中は exit_threshold を下回るまで続ける"""
+        detector = StormDetector(100, exit_threshold=20, min_events=10, window=1.0, clock=clock)
+        for _ in range(10):
+            detector.record()
+        assert detector.storming is True
+
+        # 50件/秒: threshold 未満だが exit_threshold 以上
+        for _ in range(50):
+            clock.now += 0.02
+            detector.record()
+        clock.now += 0.02
+        assert detector.poll() is True
+
+        clock.now += 2.0
+        assert detector.poll() is False
+
+    def test_default_exit_threshold_is_half(self):
+        """exit_threshold を省略した場合は threshold の半分"""
+        assert StormDetector(100).exit_threshold == 50
@@ -0,0 +1,101 @@
+import threading
+import time
+
+from service.timer_queue import TimerQueue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTimerQueue:
+    """TimerQueueのテスト"""
+
+    def test_run_pending_executes_due_timers_in_order(self):
+        """期限を過ぎたタイマーを期限順に実行する"""
+        clock = FakeClock()
+        timers = TimerQueue(clock, autostart=False)
+        calls = []
+        timers.schedule(3.0, calls.append, 'c')
+        timers.schedule(1.0, calls.append, 'a')
+        timers.schedule(2.0, calls.append, 'b')
+
+        assert timers.run_pending(1.5) == 1
+        assert timers.run_pending(10.0) == 2
+        assert calls == ['a', 'b', 'c']
+        assert len(timers) == 0
+
+    def test_same_deadline_runs_in_registration_order(self):
+        """同じ期限のタイマーは登録順に実行する"""
+        timers = TimerQueue(FakeClock(), autostart=False)
+        calls = []
+        for name in 'xyz':
+            timers.schedule(1.0, calls.append, name)
+        timers.run_pending(1.0)
+        assert calls == ['x', 'y', 'z']
+
+    def test_cancel(self):
+        """取り消したタイマーは実行しない"""
+        timers = TimerQueue(FakeClock(), autostart=False)
+        calls = []
+        handle = timers.schedule(1.0, calls.append, 'a')
+        timers.schedule(2.0, calls.append, 'b')
+        timers.cancel(handle)
+        timers.cancel(handle)
+
+        assert len(timers) == 1
+        assert timers.next_deadline() == 2.0
+        timers.run_pending(5.0)
+        assert calls == ['b']
+
+    def test_many_cancellations_rebuild_heap(self):
+        """取り消しが多い場合はヒープを作り直す"""
+        timers = TimerQueue(FakeClock(), autostart=False)
+        handles = [timers.schedule(float(i), lambda: None) for i in range(200)]
+        for handle in handles[:150]:
+            timers.cancel(handle)
+
+        assert len(timers) == 50
+        assert len(timers._heap) < 200
+
+    def test_callback_errors_do_not_stop_other_timers(self):
+        """タイマーの処理で例外が発生しても他のタイマーは実行する"""
+        timers = TimerQueue(FakeClock(), autostart=False)
+        calls = []
+        timers.schedule(1.0, lambda: 1 / 0)
+        timers.schedule(1.0, calls.append, 'ok')
+        assert timers.run_pending(1.0) == 2
+        assert calls == ['ok']
+
+    def test_thread_runs_timers_with_single_thread(self):
+        """多数のタイマーを1つのスレッドで実行する"""
+        timers = TimerQueue()
+        done = threading.Event()
+        results = []
+        before = threading.active_count()
+
+        for i in range(1000):
+            timers.schedule(0.01, results.append, i)
+        timers.schedule(0.02, done.set)
+
+        assert threading.active_count() == before + 1
+        assert done.wait(2)
+        timers.stop()
+        assert sorted(results) == list(range(1000))
+
+    def test_earlier_timer_wakes_thread(self):
+        """待機中に早い期限のタイマーを登録した場合もその期限で実行する"""
+        timers = TimerQueue()
+        done = threading.Event()
+        timers.schedule(60.0, lambda: None)
+        time.sleep(0.01)
+        start = time.monotonic()
+        timers.schedule(0.01, done.set)
+
+        assert done.wait(2)
+        assert time.monotonic() - start < 1.0
+        timers.stop()
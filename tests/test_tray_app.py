@@ -1,4 +1,5 @@
 import logging
+import signal
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -6,6 +7,7 @@ from PIL import Image
 from watchdog.observers import Observer
 
 from app.tray_app import TrayApp
+from service.rename_stats import STATE_BUSY, STATE_ERROR, STATE_IDLE, STATE_PAUSED, StatusSnapshot
 
 
 @pytest.fixture
@@ -170,6 +172,32 @@ class TestTrayAppWatching:
                 observer_instance.start.assert_called_once()
                 assert "フォルダ監視を開始しました" in caplog.text
 
+    def test_start_watching_with_inotify_backend(self, mock_config, mock_observer):
+        """observer = inotify の場合はinotifyを直接使う監視を作成する"""
+        with patch('app.tray_app.get_observer_backend', return_value='inotify'), \
+             patch('app.tray_app.inotify_available', return_value=True), \
+             patch('app.tray_app.InotifyObserver') as mock_inotify, \
+             patch('app.tray_app.FileRenameHandler'), \
+             patch('os.path.exists', return_value=True):
+            app = TrayApp()
+            app.start_watching()
+
+            mock_observer.assert_not_called()
+            mock_inotify.return_value.schedule.assert_called_once()
+            mock_inotify.return_value.start.assert_called_once()
+
+    def test_inotify_backend_falls_back_to_watchdog(self, mock_config, mock_observer, caplog):
+        """inotifyを使用できない場合はwatchdogで監視する"""
+        with patch('app.tray_app.get_observer_backend', return_value='inotify'), \
+             patch('app.tray_app.inotify_available', return_value=False), \
+             patch('app.tray_app.FileRenameHandler'), \
+             patch('os.path.exists', return_value=True):
+            app = TrayApp()
+            app.start_watching()
+
+            mock_observer.return_value.start.assert_called_once()
+            assert "inotifyを使用できないため" in caplog.text
+
     def test_stop_watching_stops_observer(self, mock_config, caplog):
         """ファイル監視が正しく停止される"""
         with patch('os.path.exists', return_value=True):
@@ -318,3 +346,186 @@ class TestTrayAppEdgeCases:
             app._quit_app()
             app.observer.stop.assert_called_once()
             app.icon.stop.assert_called_once()
+
+
+class TestTrayAppStatus:
+    """処理状況表示のテスト"""
+
+    def test_icons_are_prerendered_for_each_state(self, mock_config):
+        """状態ごとのアイコンが起動時に作成される"""
+        with patch('os.path.exists', return_value=True):
+            app = TrayApp()
+
+        assert set(app._icons) == {STATE_IDLE, STATE_BUSY, STATE_ERROR, STATE_PAUSED}
+        assert app._icons[STATE_IDLE].tobytes() != app._icons[STATE_ERROR].tobytes()
+
+    def test_refresh_status_switches_icon_on_state_change(self, mock_config):
+        """状態が変化した場合のみアイコンを切り替える"""
+        with patch('os.path.exists', return_value=True):
+            app = TrayApp()
+        app.icon = MagicMock()
+        app.event_handler = MagicMock()
+        app.event_handler.stats.snapshot.return_value = StatusSnapshot(STATE_BUSY, 3, 5, None, None)
+
+        app._refresh_status()
+        assert app.icon.icon is app._icons[STATE_BUSY]
+        app.icon.update_menu.assert_called_once()
+
+        # 変化がない場合は更新しない
+        app._refresh_status()
+        app.icon.update_menu.assert_called_once()
+
+    def test_take_snapshot_includes_observer_queue(self, mock_config):
+        """監視キューの件数を待ち件数に加算する"""
+        with patch('os.path.exists', return_value=True):
+            app = TrayApp()
+        app.event_handler = MagicMock()
+        app.event_handler.pending_count = 2
+        app.event_handler.paused = False
+        app.observer = MagicMock()
+        app.observer.event_queue.qsize.return_value = 7
+
+        app._take_snapshot()
+        app.event_handler.stats.snapshot.assert_called_once_with(extra_queue_depth=9, paused=False)
+
+    def test_status_text_shows_counters(self, mock_config):
+        """メニューに待ち件数と直近1分の件数を表示する"""
+        with patch('os.path.exists', return_value=True):
+            app = TrayApp()
+        app._snapshot = StatusSnapshot(STATE_BUSY, 4, 12, None, None)
+
+        assert app._status_text() == "状態: 処理中 / 待ち 4 件 / 直近1分 12 件"
+
+    def test_error_text_shows_last_error(self, mock_config):
+        """メニューに最後のエラーを表示する"""
+        with patch('os.path.exists', return_value=True):
+            app = TrayApp()
+        app._snapshot = StatusSnapshot(STATE_ERROR, 0, 0, "リネーム失敗: disk full", 0.0)
+
+        assert "リネーム失敗: disk full" in app._error_text()
+
+    def test_quit_app_stops_status_refresh(self, mock_config):
+        """終了時に状態表示の更新を停止する"""
+        with patch('os.path.exists', return_value=True):
+            app = TrayApp()
+        app._quit_app()
+        assert app._stop_event.is_set()
+
+    def test_toggle_pause_pauses_and_resumes(self, mock_config):
+        """一時停止メニューで一時停止と再開を切り替える"""
+        with patch('os.path.exists', return_value=True):
+            app = TrayApp()
+        app.event_handler = MagicMock()
+        app.event_handler.paused = False
+
+        app._toggle_pause()
+        app.event_handler.pause.assert_called_once()
+
+        app.event_handler.paused = True
+        app._toggle_pause()
+        app.event_handler.resume.assert_called_once()
+
+    def test_toggle_pause_without_handler(self, mock_config):
+        """監視開始前は何もしない"""
+        with patch('os.path.exists', return_value=True):
+            app = TrayApp()
+        app._toggle_pause()
+        assert app._is_paused() is False
+
+
+class TestTrayAppProfiling:
+    """プロファイル操作のテスト"""
+
+    def test_profile_output_goes_to_log_directory(self, mock_config):
+        """プロファイルの出力先はログディレクトリ"""
+        with patch('os.path.exists', return_value=True), \
+             patch('app.tray_app.get_log_info', return_value={'log_directory': '/var/log/renamer'}):
+            app = TrayApp()
+        assert app.profiler.output_dir == '/var/log/renamer'
+        assert app.memory_snapshotter.output_dir == '/var/log/renamer'
+
+    def test_menu_text_reflects_profiler_state(self, mock_config):
+        """メニューの表示は採取中かどうかで切り替わる"""
+        with patch('os.path.exists', return_value=True):
+            app = TrayApp()
+        app.profiler = MagicMock(running=False, duration=30)
+        assert app._profile_text() == "CPUプロファイルを開始（30秒）"
+        app.profiler.running = True
+        assert app._profile_text() == "CPUプロファイルを停止して保存"
+
+    @pytest.mark.skipif(not hasattr(signal, 'SIGUSR1'), reason="SIGUSR1はPOSIXのみ")
+    def test_signal_toggles_profilers(self, mock_config):
+        """SIGUSR1でCPUプロファイル、SIGUSR2でメモリスナップショットを操作する"""
+        with patch('os.path.exists', return_value=True):
+            app = TrayApp()
+        app.profiler = MagicMock()
+        app.memory_snapshotter = MagicMock()
+        previous = {signum: signal.getsignal(signum) for signum in (signal.SIGUSR1, signal.SIGUSR2)}
+        try:
+            app._install_signal_handlers()
+            signal.raise_signal(signal.SIGUSR1)
+            signal.raise_signal(signal.SIGUSR2)
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+        app.profiler.toggle.assert_called_once()
+        app.memory_snapshotter.toggle.assert_called_once()
+
+
+class TestTrayAppSupervision:
+    """監視の復旧のテスト"""
+
+    def test_create_observer_schedules_handler_and_recorder(self, mock_config, mock_observer):
+        """復旧時もハンドラーを登録し、記録用のハンドラーは別の監視で開始し直す"""
+        with patch('os.path.exists', return_value=True):
+            app = TrayApp()
+        app.event_handler = MagicMock()
+        app.recorder = MagicMock()
+        main_observer, record_observer, next_main, next_record = (MagicMock() for _ in range(4))
+        mock_observer.side_effect = [main_observer, record_observer, next_main, next_record]
+
+        observer = app._create_observer()
+
+        assert app.observer is observer is main_observer
+        main_observer.schedule.assert_called_once_with(app.event_handler, app.src_dir, recursive=False)
+        record_observer.schedule.assert_called_once_with(app.recorder, app.src_dir, recursive=False)
+        record_observer.start.assert_called_once()
+        assert app.record_observer is record_observer
+
+        # 復旧時は前の記録用の監視を停止してから作り直す
+        app._create_observer()
+        record_observer.stop.assert_called_once()
+        assert app.record_observer is next_record
+        next_record.start.assert_called_once()
+
+    def test_on_watch_recovered_reopens_and_scans(self, mock_config):
+        """復旧後はフォルダのハンドルを開き直して走査する"""
+        with patch('os.path.exists', return_value=True):
+            app = TrayApp()
+        app.event_handler = MagicMock()
+
+        with patch('app.tray_app.get_recovery_scan', return_value=True):
+            app._on_watch_recovered()
+
+        app.event_handler.close_directories.assert_called_once()
+        app.event_handler.scan_directory.assert_called_once_with(app.src_dir)
+
+    def test_watch_logs_exceptions(self, mock_config, caplog):
+        """監視スレッド内の例外をログに残す"""
+        with patch('os.path.exists', return_value=True):
+            app = TrayApp()
+
+        with patch.object(app, 'start_watching', side_effect=RuntimeError("boom")), \
+             caplog.at_level(logging.ERROR):
+            app._watch()
+
+        assert "ファイル監視スレッドでエラーが発生しました" in caplog.text
+
+    def test_stop_watching_stops_supervisor(self, mock_config):
+        """監視の停止後は復旧を行わない"""
+        with patch('os.path.exists', return_value=True):
+            app = TrayApp()
+        app.supervisor = MagicMock()
+        app.stop_watching()
+        app.supervisor.stop.assert_called_once()
@@ -0,0 +1,155 @@
+import logging
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from service.watch_supervisor import (
+    REASON_EMITTER_STOPPED,
+    REASON_MISSING,
+    REASON_OBSERVER_STOPPED,
+    REASON_REPLACED,
+    WatchSupervisor,
+)
+
+
+def _observer(alive=True, emitters_alive=(True,)):
+    observer = MagicMock()
+    observer.is_alive.return_value = alive
+    observer.emitters = [MagicMock(**{'is_alive.return_value': value}) for value in emitters_alive]
+    return observer
+
+
+class RecordingEvent(threading.Event):
+    """待機時間を記録し、指定した回数目の待機で処理を実行するイベント"""
+
+    def __init__(self, on_wait=None):
+        super().__init__()
+        self.waits = []
+        self.on_wait = on_wait or {}
+
+    def wait(self, timeout=None):
+        self.waits.append(timeout)
+        action = self.on_wait.get(len(self.waits))
+        if action is not None:
+            action()
+        return self.is_set()
+
+
+@pytest.fixture
+def root(tmp_path):
+    path = tmp_path / 'watch'
+    path.mkdir()
+    return path
+
+
+class TestWatchSupervisorCheck:
+    """状態確認のテスト"""
+
+    def test_healthy_watch(self, root):
+        """異常がない場合はNone"""
+        supervisor = WatchSupervisor(str(root), _observer)
+        supervisor.start()
+        assert supervisor.check() is None
+
+    def test_missing_root(self, root):
+        """監視フォルダが消えた場合"""
+        supervisor = WatchSupervisor(str(root), _observer)
+        supervisor.start()
+        root.rmdir()
+        assert supervisor.check() == REASON_MISSING
+
+    def test_replaced_root(self, root):
+        """監視フォルダが別のフォルダに置き換えられた場合"""
+        supervisor = WatchSupervisor(str(root), _observer)
+        supervisor.start()
+        root.rename(root.with_name('old'))
+        root.mkdir()
+        assert supervisor.check() == REASON_REPLACED
+
+    def test_observer_stopped(self, root):
+        """監視スレッドが停止した場合"""
+        supervisor = WatchSupervisor(str(root), lambda: _observer(alive=False))
+        supervisor.start()
+        assert supervisor.check() == REASON_OBSERVER_STOPPED
+
+    def test_emitter_stopped(self, root):
+        """イベント取得スレッドが停止した場合"""
+        supervisor = WatchSupervisor(str(root), lambda: _observer(emitters_alive=(True, False)))
+        supervisor.start()
+        assert supervisor.check() == REASON_EMITTER_STOPPED
+
+
+class TestWatchSupervisorRecover:
+    """復旧のテスト"""
+
+    def test_recover_restarts_observer_and_runs_callback(self, root):
+        """監視を作り直し、復旧後の処理を呼び出す"""
+        observers = []
+
+        def create_observer():
+            observers.append(_observer())
+            return observers[-1]
+
+        on_recovered = MagicMock()
+        supervisor = WatchSupervisor(str(root), create_observer, on_recovered)
+        supervisor.start()
+
+        assert supervisor.recover(REASON_OBSERVER_STOPPED, RecordingEvent()) is True
+
+        assert len(observers) == 2
+        observers[0].stop.assert_called_once()
+        observers[1].start.assert_called_once()
+        assert supervisor.observer is observers[1]
+        on_recovered.assert_called_once()
+        assert supervisor.recoveries == 1
+        assert supervisor.last_recovery_seconds is not None
+
+    def test_recover_retries_with_backoff_until_root_returns(self, root, caplog):
+        """監視フォルダが戻るまで間隔を倍にしながら再試行する"""
+        supervisor = WatchSupervisor(str(root), _observer, initial_backoff=1.0, max_backoff=3.0)
+        supervisor.start()
+        root.rmdir()
+        stop_event = RecordingEvent(on_wait={3: root.mkdir})
+
+        with caplog.at_level(logging.INFO):
+            assert supervisor.recover(REASON_MISSING, stop_event) is True
+
+        assert stop_event.waits == [1.0, 2.0, 3.0]
+        assert "監視を復旧しました" in caplog.text
+        assert supervisor.check() is None
+
+    def test_recover_stops_when_stop_event_set(self, root):
+        """終了が要求された場合は再試行をやめる"""
+        supervisor = WatchSupervisor(str(root), _observer)
+        supervisor.start()
+        root.rmdir()
+        stop_event = RecordingEvent()
+        stop_event.on_wait = {1: stop_event.set}
+
+        assert supervisor.recover(REASON_MISSING, stop_event) is False
+        assert supervisor.recoveries == 0
+
+    def test_stopped_supervisor_does_not_restart(self, root):
+        """停止後は監視を作り直さない"""
+        create_observer = MagicMock(side_effect=_observer)
+        supervisor = WatchSupervisor(str(root), create_observer)
+        supervisor.start()
+        supervisor.stop()
+
+        assert supervisor.recover(REASON_OBSERVER_STOPPED, RecordingEvent()) is False
+        assert create_observer.call_count == 1
+
+    def test_run_logs_errors_and_keeps_checking(self, root, caplog):
+        """確認中の例外をログに残して確認を続ける"""
+        supervisor = WatchSupervisor(str(root), _observer, check_interval=0.5)
+        supervisor.start()
+        stop_event = RecordingEvent()
+        stop_event.on_wait = {3: stop_event.set}
+
+        with caplog.at_level(logging.ERROR):
+            supervisor.check = MagicMock(side_effect=[RuntimeError("boom"), None])
+            supervisor.run(stop_event)
+
+        assert supervisor.check.call_count == 2
+        assert "監視の状態確認中にエラーが発生しました" in caplog.text
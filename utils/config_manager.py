@@ -3,6 +3,8 @@ import os
 import re
 import sys
 
+from utils.pattern_guard import check_pattern
+
 
 def get_config_path() -> str:
     if getattr(sys, 'frozen', False):
@@ -50,36 +52,435 @@ def get_src_dir() -> str:
 def get_rename_patterns() -> list[re.Pattern]:
     """ファイル名変換用の正規表現パターンリストを取得"""
     config = load_config()
+    return _compile_patterns(config, 'Rename')
+
+
+def get_typed_rename_patterns() -> dict[str, list[re.Pattern]]:
+    """ファイルの種類ごとのパターンリストを取得（[Rename:pdf] などのセクション）"""
+    config = load_config()
+    typed_patterns = {}
+    for section in config.sections():
+        prefix, _, type_name = section.partition(':')
+        if prefix == 'Rename' and type_name.strip():
+            typed_patterns[type_name.strip().lower()] = _compile_patterns(config, section)
+    return typed_patterns
+
+
+def _compile_patterns(config: configparser.ConfigParser, section: str) -> list[re.Pattern]:
+    """セクション内の pattern1, pattern2... をコンパイル"""
     pattern_items = []
+    guard_mode = config.get('App', 'pattern_guard', fallback='reject').strip().lower()
+    budget_seconds = config.getfloat('App', 'pattern_time_budget_ms', fallback=50.0) / 1000
 
     # pattern1, pattern2, pattern3... の形式で全パターンを取得
-    for key in config['Rename']:
+    for key in config[section]:
         if key.startswith('pattern'):
-            pattern_str = config.get('Rename', key)
+            pattern_str = config.get(section, key)
 
             # パターンが$で終わっていない場合は末尾マッチとして$を追加
             if not pattern_str.endswith('$'):
                 pattern_str = pattern_str + '$'
 
             try:
-                pattern_items.append((pattern_str, re.compile(pattern_str)))
+                pattern = re.compile(pattern_str)
             except re.error as e:
                 print(f"正規表現パターンが無効です: {pattern_str}")
                 print(f"エラー: {e}")
                 raise
 
+            if guard_mode != 'off':
+                _guard_pattern(pattern, guard_mode, budget_seconds)
+            pattern_items.append((pattern_str, pattern))
+
     # より具体的なパターン（長いパターン）を先に適用するため、パターン文字列長の降順でソート
     pattern_items.sort(key=lambda x: len(x[0]), reverse=True)
 
     return [pattern for _, pattern in pattern_items]
 
 
+def _guard_pattern(pattern: re.Pattern, guard_mode: str, budget_seconds: float):
+    """破滅的バックトラックを起こすパターンを警告または拒否する"""
+    report = check_pattern(pattern, budget_seconds)
+
+    for finding in report.nested_quantifiers:
+        print(f"警告: 正規表現パターンに{finding}があります: {pattern.pattern}")
+
+    if report.over_budget:
+        message = (
+            f"正規表現パターンの照合が遅すぎます: {pattern.pattern} "
+            f"({report.worst_input_length}文字の入力で{report.worst_seconds * 1000:.1f}ms)"
+        )
+        if guard_mode == 'reject':
+            print(message)
+            raise ValueError(message)
+        print(f"警告: {message}")
+
+
+def get_destination_dir() -> str | None:
+    """リネーム後のファイルの移動先フォルダを取得（未設定の場合は監視フォルダ内でリネーム）"""
+    config = load_config()
+    destination = config.get('Rename', 'destination', fallback='').strip()
+    return destination or None
+
+
+def get_sniff_enabled() -> bool:
+    """ファイルの先頭バイトから種類を判定するかどうかを取得"""
+    config = load_config()
+    return config.getboolean('Sniff', 'enabled', fallback=False)
+
+
+def get_sniff_fix_extension() -> bool:
+    """判定した種類と拡張子が異なる場合に拡張子を修正するかどうかを取得"""
+    config = load_config()
+    return config.getboolean('Sniff', 'fix_extension', fallback=False)
+
+
+def get_sniff_max_bytes() -> int:
+    """種類の判定に読み込むファイル先頭のバイト数を取得"""
+    config = load_config()
+    return max(config.getint('Sniff', 'max_bytes', fallback=4096), 16)
+
+
+def get_sniff_cache_size() -> int:
+    """種類の判定結果を保持する件数を取得"""
+    config = load_config()
+    return max(config.getint('Sniff', 'cache_size', fallback=10000), 1)
+
+
 def get_wait_time() -> float:
     """ファイル書き込み完了を待つ時間を取得（秒）"""
     config = load_config()
     return config.getfloat('App', 'wait_time', fallback=0.5)
 
 
+def get_error_window() -> float:
+    """エラーをまとめて出力する期間を取得（秒、0でまとめない）"""
+    config = load_config()
+    return max(config.getfloat('LOGGING', 'error_window', fallback=10.0), 0.0)
+
+
+def get_error_burst() -> int:
+    """期間ごとに1件ずつ出力するエラーの件数を取得"""
+    config = load_config()
+    return max(config.getint('LOGGING', 'error_burst', fallback=5), 0)
+
+
+def get_readiness_mode() -> str:
+    """書き込み完了の判定方法を取得（sleep: 一定時間待つ / close_write: ファイルが閉じられるまで待つ）"""
+    config = load_config()
+    mode = config.get('App', 'readiness', fallback='sleep').strip().lower()
+    return mode if mode in ('sleep', 'close_write') else 'sleep'
+
+
+def get_observer_backend() -> str:
+    """フォルダの監視方法を取得（watchdog: watchdogのObserver / inotify: inotifyを直接使用）"""
+    config = load_config()
+    backend = config.get('App', 'observer', fallback='watchdog').strip().lower()
+    return backend if backend in ('watchdog', 'inotify') else 'watchdog'
+
+
+def get_stability_interval() -> float:
+    """閉じられないファイルのサイズ・更新時刻を確認する間隔を取得（秒）"""
+    config = load_config()
+    return max(config.getfloat('App', 'stability_interval', fallback=2.0), 0.1)
+
+
+def get_readiness_timeout() -> float:
+    """ファイルが閉じられるのを待つ最大時間を取得（秒）"""
+    config = load_config()
+    return max(config.getfloat('App', 'readiness_timeout', fallback=60.0), 0.0)
+
+
+def get_group_window() -> float:
+    """同じ名前のファイルをまとめてリネームするまでの待機時間を取得（秒、0でまとめない）"""
+    config = load_config()
+    return max(config.getfloat('App', 'group_window', fallback=0.0), 0.0)
+
+
+def get_catch_up_scan() -> bool:
+    """起動時に監視フォルダ内の既存ファイルを走査するかどうかを取得"""
+    config = load_config()
+    return config.getboolean('App', 'catch_up_scan', fallback=False)
+
+
+def get_status_refresh_interval() -> float:
+    """タスクトレイの状態表示を更新する間隔を取得（秒）"""
+    config = load_config()
+    return config.getfloat('App', 'status_refresh_interval', fallback=2.0)
+
+
+def get_resume_workers() -> int:
+    """一時停止から再開したときに保留中のファイルを処理するスレッド数を取得"""
+    config = load_config()
+    return max(config.getint('App', 'resume_workers', fallback=4), 1)
+
+
+def get_supervisor_interval() -> float:
+    """監視の状態を確認する間隔を取得（秒、0以下で確認しない）"""
+    config = load_config()
+    return config.getfloat('Supervisor', 'check_interval', fallback=5.0)
+
+
+def get_supervisor_max_backoff() -> float:
+    """監視の再開を再試行する最大間隔を取得（秒）"""
+    config = load_config()
+    return max(config.getfloat('Supervisor', 'max_backoff', fallback=60.0), 1.0)
+
+
+def get_recovery_scan() -> bool:
+    """監視の復旧後に監視フォルダを走査するかどうかを取得"""
+    config = load_config()
+    return config.getboolean('Supervisor', 'catch_up_scan', fallback=True)
+
+
+def get_retry_max_attempts() -> int:
+    """リネームに失敗したファイルを再試行する最大回数を取得（0で再試行しない）"""
+    config = load_config()
+    return max(config.getint('Retry', 'max_attempts', fallback=0), 0)
+
+
+def get_retry_initial_delay() -> float:
+    """最初の再試行までの待機時間を取得（秒）"""
+    config = load_config()
+    return max(config.getfloat('Retry', 'initial_delay', fallback=2.0), 0.0)
+
+
+def get_retry_max_delay() -> float:
+    """再試行までの最大待機時間を取得（秒）"""
+    config = load_config()
+    return max(config.getfloat('Retry', 'max_delay', fallback=300.0), 0.0)
+
+
+def get_retry_jitter() -> float:
+    """再試行の待機時間のばらつきの割合を取得（0〜1）"""
+    config = load_config()
+    return min(max(config.getfloat('Retry', 'jitter', fallback=0.2), 0.0), 1.0)
+
+
+def get_io_ops_per_second() -> float:
+    """ファイル操作の毎秒上限を取得（0以下で無制限）"""
+    config = load_config()
+    return config.getfloat('Throttle', 'io_ops_per_second', fallback=0.0)
+
+
+def get_io_burst() -> int:
+    """ファイル操作の瞬間的な上限回数を取得"""
+    config = load_config()
+    return config.getint('Throttle', 'io_burst', fallback=10)
+
+
+def get_low_priority() -> bool:
+    """ワーカースレッドのCPU・I/O優先度を下げるかどうかを取得"""
+    config = load_config()
+    return config.getboolean('Throttle', 'low_priority', fallback=False)
+
+
+def get_post_actions() -> list[tuple[str, str]]:
+    """リネーム後の処理（種類, 値）のリストを取得"""
+    config = load_config()
+    if not config.has_section('PostActions'):
+        return []
+
+    actions = []
+    # action1, action2, action3... の形式で記載順に取得
+    for key in config['PostActions']:
+        if key.startswith('action'):
+            kind, _, value = config.get('PostActions', key).partition(':')
+            actions.append((kind.strip().lower(), value.strip()))
+    return actions
+
+
+def get_post_action_workers() -> int:
+    """リネーム後の処理を実行するスレッド数を取得"""
+    config = load_config()
+    return max(config.getint('PostActions', 'workers', fallback=2), 1)
+
+
+def get_post_action_queue_size() -> int:
+    """リネーム後の処理キューの上限を取得"""
+    config = load_config()
+    return max(config.getint('PostActions', 'queue_size', fallback=1000), 1)
+
+
+def get_post_action_command_timeout() -> float:
+    """リネーム後に実行するコマンドのタイムアウトを取得（秒）"""
+    config = load_config()
+    return config.getfloat('PostActions', 'command_timeout', fallback=60.0)
+
+
+def get_record_events() -> bool:
+    """監視イベントを記録するかどうかを取得"""
+    config = load_config()
+    return config.getboolean('Recorder', 'enabled', fallback=False)
+
+
+def get_record_sizes() -> bool:
+    """イベント記録時にファイルサイズも記録するかどうかを取得"""
+    config = load_config()
+    return config.getboolean('Recorder', 'record_sizes', fallback=False)
+
+
+def get_record_directory() -> str:
+    """イベント記録ファイルの保存先を取得（空の場合はログディレクトリ）"""
+    config = load_config()
+    return config.get('Recorder', 'directory', fallback='').strip()
+
+
+def get_trace_enabled() -> bool:
+    """ファイルごとの処理区間を記録するかどうかを取得"""
+    config = load_config()
+    return config.getboolean('Trace', 'enabled', fallback=False)
+
+
+def get_trace_sample_rate() -> float:
+    """処理区間を記録するファイルの割合を取得（0〜1）"""
+    config = load_config()
+    return min(max(config.getfloat('Trace', 'sample_rate', fallback=0.01), 0.0), 1.0)
+
+
+def get_trace_max_bytes() -> int:
+    """処理区間の記録ファイルをローテーションするサイズを取得（バイト）"""
+    config = load_config()
+    return config.getint('Trace', 'max_bytes', fallback=10 * 1024 * 1024)
+
+
+def get_trace_backup_count() -> int:
+    """処理区間の記録ファイルを保持する世代数を取得"""
+    config = load_config()
+    return config.getint('Trace', 'backup_count', fallback=5)
+
+
+def get_trace_directory() -> str:
+    """処理区間の記録ファイルの保存先を取得（空の場合はログディレクトリ）"""
+    config = load_config()
+    return config.get('Trace', 'directory', fallback='').strip()
+
+
+def get_index_enabled() -> bool:
+    """判定済みのファイルを索引に記録するかどうかを取得"""
+    config = load_config()
+    return config.getboolean('Index', 'enabled', fallback=False)
+
+
+def get_index_directory() -> str:
+    """索引ファイルの保存先を取得（空の場合はログディレクトリ）"""
+    config = load_config()
+    return config.get('Index', 'directory', fallback='').strip()
+
+
+def get_index_compact_interval() -> float:
+    """索引を圧縮する間隔を取得（秒）"""
+    config = load_config()
+    return max(config.getfloat('Index', 'compact_interval_hours', fallback=24.0), 0.0) * 60 * 60
+
+
+def get_ipc_enabled() -> bool:
+    """他のアプリケーションからファイルのパスを受け付けるかどうかを取得"""
+    config = load_config()
+    return config.getboolean('IPC', 'enabled', fallback=False)
+
+
+def get_ipc_address() -> str:
+    """パスを受け付ける接続先を取得（空の場合は既定の接続先）"""
+    config = load_config()
+    return config.get('IPC', 'address', fallback='').strip()
+
+
+def get_ipc_workers() -> int:
+    """受け付けたファイルを処理するスレッド数を取得"""
+    config = load_config()
+    return max(config.getint('IPC', 'workers', fallback=4), 1)
+
+
+def get_storm_threshold() -> float:
+    """まとめて走査に切り替えるイベントの受信頻度を取得（件/秒、0で無効）"""
+    config = load_config()
+    return max(config.getfloat('Storm', 'threshold', fallback=0.0), 0.0)
+
+
+def get_storm_exit_threshold() -> float | None:
+    """イベントごとの処理に戻す受信頻度を取得（件/秒、未設定の場合はNone）"""
+    config = load_config()
+    value = config.getfloat('Storm', 'exit_threshold', fallback=0.0)
+    return value if value > 0 else None
+
+
+def get_storm_min_events() -> int:
+    """多発と判定するのに必要な最少のイベント数を取得"""
+    config = load_config()
+    return max(config.getint('Storm', 'min_events', fallback=50), 1)
+
+
+def get_storm_scan_interval() -> float:
+    """多発中にフォルダを走査する間隔を取得（秒）"""
+    config = load_config()
+    return max(config.getfloat('Storm', 'scan_interval', fallback=2.0), 0.1)
+
+
+def get_deadline_enabled() -> bool:
+    """ファイル操作に期限を設けるかどうかを取得"""
+    config = load_config()
+    return config.getboolean('Deadline', 'enabled', fallback=False)
+
+
+def get_deadline_timeout() -> float:
+    """1回のファイル操作の期限を取得（秒）"""
+    config = load_config()
+    return max(config.getfloat('Deadline', 'timeout', fallback=10.0), 0.1)
+
+
+def get_deadline_probe_interval() -> float:
+    """応答しないフォルダの復旧を確認する間隔を取得（秒）"""
+    config = load_config()
+    return max(config.getfloat('Deadline', 'probe_interval', fallback=15.0), 0.1)
+
+
+def get_deadline_workers() -> int:
+    """フォルダごとのファイル操作のスレッド数を取得"""
+    config = load_config()
+    return max(config.getint('Deadline', 'workers', fallback=4), 1)
+
+
+def get_profile_duration() -> float:
+    """CPUプロファイルを採取する最大時間を取得（秒）"""
+    config = load_config()
+    return max(config.getfloat('Profiling', 'duration_seconds', fallback=30.0), 1.0)
+
+
+def get_profile_interval() -> float:
+    """CPUプロファイルのスタックを採取する間隔を取得（秒）"""
+    config = load_config()
+    return max(config.getfloat('Profiling', 'interval_ms', fallback=5.0), 1.0) / 1000
+
+
+def get_profile_signals() -> bool:
+    """シグナル（SIGUSR1/SIGUSR2、WindowsではCtrl+Break）でプロファイルを操作するかどうかを取得"""
+    config = load_config()
+    return config.getboolean('Profiling', 'signals', fallback=True)
+
+
+def _get_list(section: str, key: str, fallback: str = '') -> list[str]:
+    """カンマ区切りの設定値をリストとして取得"""
+    config = load_config()
+    value = config.get(section, key, fallback=fallback)
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def get_include_globs() -> list[str]:
+    """処理対象とするファイル名のglobパターンを取得（空の場合は全ファイル）"""
+    return _get_list('Filter', 'include_globs')
+
+
+def get_exclude_globs() -> list[str]:
+    """処理対象外とするファイル名のglobパターンを取得"""
+    return _get_list('Filter', 'exclude_globs', '~$*')
+
+
+def get_exclude_extensions() -> list[str]:
+    """処理対象外とする拡張子（一時ファイル・ダウンロード途中のファイル）を取得"""
+    return _get_list('Filter', 'exclude_extensions', '.crdownload, .part, .partial, .tmp, .download')
+
+
 def get_config_value(config: configparser.ConfigParser, section: str, key: str, default=None):
     """設定値を取得する汎用ヘルパー関数"""
     if not config.has_option(section, key):
@@ -0,0 +1,168 @@
+import random
+import re
+import string
+import time
+from dataclasses import dataclass, field
+from re import _constants as sre_constants  # type: ignore[attr-defined]
+from re import _parser as sre_parse  # type: ignore[attr-defined]
+
+# ファイル名の最大長（NTFS・ext4ともに255文字程度）を超える入力は検査しない
+MAX_NAME_LENGTH = 255
+
+_REPEAT_OPS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+_ADVERSARIAL_TAILS = ('!', '\x00', ' .')
+
+
+@dataclass
+class PatternReport:
+    """正規表現パターンの検査結果"""
+    pattern: str
+    nested_quantifiers: list[str] = field(default_factory=list)
+    worst_seconds: float = 0.0
+    worst_input_length: int = 0
+    over_budget: bool = False
+
+
+def _is_unbounded(max_count: int) -> bool:
+    return max_count == sre_constants.MAXREPEAT
+
+
+def _iter_subpatterns(op, av):
+    """量指定子の検査対象となる子パターンを列挙"""
+    if op in _REPEAT_OPS:
+        yield av[2]
+    elif op == sre_constants.SUBPATTERN:
+        yield av[3]
+    elif op == sre_constants.BRANCH:
+        yield from av[1]
+    elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+        yield av[1]
+    elif op == sre_constants.GROUPREF_EXISTS:
+        yield av[1]
+        if av[2] is not None:
+            yield av[2]
+
+
+def _find_repeats(parsed, outer_unbounded: bool, findings: list[str], depth: int):
+    for op, av in parsed:
+        # アトミックグループ・強欲な量指定子はバックトラックしないため対象外
+        if op == sre_constants.ATOMIC_GROUP or op == getattr(sre_constants, 'POSSESSIVE_REPEAT', None):
+            continue
+        if op in _REPEAT_OPS:
+            min_count, max_count, _ = av
+            if depth > 0 and max_count > 1 and (outer_unbounded or _is_unbounded(max_count)) \
+                    and min_count != max_count:
+                findings.append(f"量指定子の入れ子（{{{min_count},{'' if _is_unbounded(max_count) else max_count}}}）")
+            if max_count > 1:
+                _find_repeats(av[2], outer_unbounded or _is_unbounded(max_count), findings, depth + 1)
+                continue
+        for child in _iter_subpatterns(op, av):
+            _find_repeats(child, outer_unbounded, findings, depth)
+
+
+def lint_pattern(pattern_str: str) -> list[str]:
+    """破滅的バックトラックの原因となる量指定子の入れ子を静的に検出"""
+    findings: list[str] = []
+    _find_repeats(sre_parse.parse(pattern_str), False, findings, 0)
+    return findings
+
+
+def _literal_chars(pattern_str: str) -> str:
+    """パターンに含まれるリテラル文字を抽出（攻撃的入力の生成に使用）"""
+    chars = set()
+
+    def walk(parsed):
+        for op, av in parsed:
+            if op == sre_constants.LITERAL:
+                chars.add(chr(av))
+            elif op == sre_constants.IN:
+                for item_op, item_av in av:
+                    if item_op == sre_constants.LITERAL:
+                        chars.add(chr(item_av))
+                    elif item_op == sre_constants.RANGE:
+                        chars.add(chr(item_av[0]))
+            elif op in _REPEAT_OPS:
+                walk(av[2])
+            elif op == sre_constants.ATOMIC_GROUP:
+                walk(av)
+            else:
+                for child in _iter_subpatterns(op, av):
+                    walk(child)
+
+    walk(sre_parse.parse(pattern_str))
+    return ''.join(sorted(chars))
+
+
+def _input_lengths():
+    length = 2
+    while length <= MAX_NAME_LENGTH:
+        yield length
+        # 指数的に遅くなるパターンは短い入力で検出できるため、序盤は細かく増やす
+        length = length + 2 if length < 40 else int(length * 1.3)
+    yield MAX_NAME_LENGTH
+
+
+def generate_adversarial_seeds(pattern_str: str) -> list[str]:
+    """バックトラックを誘発しやすい繰り返し単位を生成"""
+    base_chars = _literal_chars(pattern_str) + 'aA0_ -.'
+    seeds = list(dict.fromkeys(base_chars))
+    seeds.append(''.join(dict.fromkeys(base_chars))[:8])
+    return seeds
+
+
+def generate_realistic_names(count: int = 200, seed: int = 0) -> list[str]:
+    """実際のファイル名に近いサンプルを生成"""
+    rng = random.Random(seed)
+    words = ['report', 'document', '請求書', 'image', 'data', 'scan', 'invoice', '議事録', 'backup']
+    alphabet = string.ascii_letters + string.digits
+    names = []
+    for i in range(count):
+        stem = rng.choice(words)
+        if i % 3 != 2:
+            stem += f"_{rng.randint(1, 9999)}"
+        if i % 2 == 0:
+            stem += f"_{''.join(rng.choices(alphabet, k=6))}"
+        if i % 7 == 0:
+            stem += f"_magnate_{''.join(rng.choices(alphabet, k=6))}"
+        names.append(stem)
+    return names
+
+
+def _time_search(pattern: re.Pattern, text: str) -> float:
+    start = time.perf_counter()
+    pattern.search(text)
+    return time.perf_counter() - start
+
+
+def check_pattern(pattern: re.Pattern, budget_seconds: float = 0.05) -> PatternReport:
+    """静的検査と実行時間の計測でパターンの危険性を判定
+
+    入力長を少しずつ伸ばしながら計測し、1回の照合が予算を超えた時点で打ち切るため、
+    破滅的なパターンでも検査自体が停止することはない。
+    """
+    report = PatternReport(pattern=pattern.pattern, nested_quantifiers=lint_pattern(pattern.pattern))
+
+    def measure(text: str) -> bool:
+        elapsed = _time_search(pattern, text)
+        if elapsed > budget_seconds:
+            # スレッド切り替えなどによる一時的な遅延を除くため再計測する
+            elapsed = min(elapsed, _time_search(pattern, text))
+        if elapsed > report.worst_seconds:
+            report.worst_seconds = elapsed
+            report.worst_input_length = len(text)
+        if elapsed > budget_seconds:
+            report.over_budget = True
+        return report.over_budget
+
+    for name in generate_realistic_names():
+        if measure(name):
+            return report
+
+    for unit in generate_adversarial_seeds(pattern.pattern):
+        for length in _input_lengths():
+            repeated = (unit * (length // len(unit) + 1))[:length]
+            for tail in _ADVERSARIAL_TAILS:
+                if measure(repeated + tail):
+                    return report
+
+    return report
@@ -0,0 +1,216 @@
+import logging
+import marshal
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# (ファイル名, 開始行, 関数名) 。pstatsの関数キーと同じ形式
+FunctionKey = tuple[str, int, str]
+
+
+def _timestamp() -> str:
+    return datetime.now().strftime('%Y%m%d-%H%M%S')
+
+
+def _function_key(frame) -> FunctionKey:
+    code = frame.f_code
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+class SamplingProfiler:
+    """全スレッドのスタックを一定間隔で採取する時間制限付きのプロファイラー
+
+    停止中は採取用のスレッドも存在しないため、処理への影響はない。
+    結果は pstats 形式（snakeviz などで表示可能）と collapsed stacks 形式
+    （flamegraph.pl・speedscope で表示可能）で出力する。
+    """
+
+    def __init__(self, output_dir: str, duration: float = 30.0, interval: float = 0.005):
+        self.output_dir = output_dir
+        self.duration = duration
+        self.interval = interval
+        self.last_outputs: list[str] = []
+        self._thread: threading.Thread | None = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def toggle(self):
+        """採取中であれば停止し、停止中であれば開始する"""
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+
+    def start(self) -> bool:
+        with self._lock:
+            if self.running:
+                return False
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+        logger.info(f"CPUプロファイルを開始しました（最大 {self.duration:.0f} 秒）")
+        return True
+
+    def stop(self, wait: bool = False):
+        """採取を停止する（結果は採取スレッドが出力する）"""
+        self._stop_event.set()
+        thread = self._thread
+        if wait and thread is not None:
+            thread.join()
+
+    def _run(self):
+        samples: Counter[tuple[str, tuple[FunctionKey, ...]]] = Counter()
+        own_ident = threading.get_ident()
+        started = time.monotonic()
+        deadline = started + self.duration
+        sample_count = 0
+
+        while not self._stop_event.is_set() and time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_function_key(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                samples[(names.get(ident, str(ident)), tuple(stack))] += 1
+            sample_count += 1
+            self._stop_event.wait(self.interval)
+
+        elapsed = time.monotonic() - started
+        try:
+            self.last_outputs = self._write(samples)
+        except OSError as e:
+            logger.error(f"CPUプロファイルの出力に失敗しました: {e}")
+            return
+        logger.info(
+            f"CPUプロファイルを保存しました（{elapsed:.1f} 秒 / {sample_count} 回採取）: "
+            + ", ".join(self.last_outputs)
+        )
+
+    def _write(self, samples: Counter) -> list[str]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"profile-{_timestamp()}")
+
+        collapsed_path = f"{base}.collapsed"
+        with open(collapsed_path, 'w', encoding='utf-8') as f:
+            for line, count in sorted(collapsed_stacks(samples).items()):
+                f.write(f"{line} {count}\n")
+
+        pstats_path = f"{base}.pstats"
+        with open(pstats_path, 'wb') as f:
+            marshal.dump(build_pstats(samples, self.interval), f)
+
+        return [pstats_path, collapsed_path]
+
+
+def collapsed_stacks(samples: Counter) -> Counter:
+    """採取結果を collapsed stacks 形式（スレッド名;関数;関数... 件数）に変換"""
+    lines: Counter[str] = Counter()
+    for (thread_name, stack), count in samples.items():
+        frames = [thread_name.replace(';', '_').replace(' ', '_')]
+        frames.extend(
+            f"{name} ({os.path.basename(filename)}:{line})".replace(';', '_').replace(' ', '_')
+            for filename, line, name in stack
+        )
+        lines[';'.join(frames)] += count
+    return lines
+
+
+def build_pstats(samples: Counter, interval: float) -> dict:
+    """採取結果から pstats.Stats で読み込める統計を作成
+
+    呼び出し回数の代わりに採取回数を使い、時間は採取回数 × 採取間隔で推定する。
+    """
+    # 関数ごとの [採取回数, 自身の時間, 累積時間, {呼び出し元: [採取回数, 自身, 累積]}]
+    stats: dict[FunctionKey, list] = {}
+    for (_, stack), count in samples.items():
+        if not stack:
+            continue
+        seconds = count * interval
+        seen: set[FunctionKey] = set()
+        for index, key in enumerate(stack):
+            entry = stats.setdefault(key, [0, 0.0, 0.0, {}])
+            is_leaf = index == len(stack) - 1
+            # 再帰呼び出しは1回の採取につき1回だけ累積時間に含める
+            if key not in seen:
+                seen.add(key)
+                entry[0] += count
+                entry[2] += seconds
+            if is_leaf:
+                entry[1] += seconds
+            if index > 0:
+                caller = entry[3].setdefault(stack[index - 1], [0, 0.0, 0.0])
+                caller[0] += count
+                caller[2] += seconds
+                if is_leaf:
+                    caller[1] += seconds
+
+    return {
+        key: (
+            calls, calls, own, cumulative,
+            {caller: (c[0], c[0], c[1], c[2]) for caller, c in callers.items()},
+        )
+        for key, (calls, own, cumulative, callers) in stats.items()
+    }
+
+
+class MemorySnapshotter:
+    """tracemallocによるメモリ割り当ての追跡とスナップショットの保存
+
+    追跡の開始後に割り当てられたメモリのみが対象となるため、開始と保存の2段階で操作する。
+    """
+
+    def __init__(self, output_dir: str, frames: int = 10, top: int = 10):
+        self.output_dir = output_dir
+        self.frames = frames
+        self.top = top
+        self.last_output: str | None = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def toggle(self):
+        """追跡中であればスナップショットを保存して追跡を終了し、停止中であれば追跡を開始する"""
+        if self.tracing:
+            self.snapshot()
+        else:
+            tracemalloc.start(self.frames)
+            logger.info("メモリ割り当ての追跡を開始しました（もう一度操作するとスナップショットを保存します）")
+
+    def snapshot(self) -> str | None:
+        """スナップショットを保存して追跡を終了する（保存できなかった場合はNone）"""
+        if not self.tracing:
+            return None
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        path = os.path.join(self.output_dir, f"memory-{_timestamp()}.tracemalloc")
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            snapshot.dump(path)
+        except OSError as e:
+            logger.error(f"メモリのスナップショットの保存に失敗しました: {e}")
+            return None
+        self.last_output = path
+
+        statistics = snapshot.statistics('lineno')
+        total = sum(stat.size for stat in statistics)
+        logger.info(f"メモリのスナップショットを保存しました（追跡中の割り当て {total / 1024:.1f}KB）: {path}")
+        for stat in statistics[:self.top]:
+            logger.info(f"  {stat}")
+        return path